@@ -7,12 +7,13 @@ Uso:
     python manage.py sync_siesa
     python manage.py sync_siesa --catalogo CENTROS-OPERACIONES
     python manage.py sync_siesa --dry-run
+    python manage.py sync_siesa --concurrente --hilos 6
 """
 
 from django.core.management.base import BaseCommand, CommandError
 
 from Api.services.siesa_client import ENDPOINTS
-from Api.services.sync_service import sincronizar_todo
+from Api.services.sync_service import HILOS_DESCARGA, sincronizar_todo
 
 
 class Command(BaseCommand):
@@ -30,6 +31,18 @@ class Command(BaseCommand):
             action='store_true',
             help='Llama los endpoints y muestra cuántos registros habría, sin escribir en BD.',
         )
+        parser.add_argument(
+            '--concurrente',
+            action='store_true',
+            help='Descarga varios catálogos en paralelo mientras se escriben los ya recibidos.',
+        )
+        parser.add_argument(
+            '--hilos',
+            type=int,
+            default=HILOS_DESCARGA,
+            help=f'Catálogos descargados a la vez con --concurrente (default: {HILOS_DESCARGA}). '
+                 'Las peticiones simultáneas al host las limita SIESA_API_MAX_CONCURRENCIA.',
+        )
 
     def handle(self, *args, **options):
         catalogo = options.get('catalogo')
@@ -39,7 +52,12 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING('[DRY-RUN] No se escribirá en la base de datos.\n'))
 
         try:
-            resultados = sincronizar_todo(endpoint_filtro=catalogo, dry_run=dry_run)
+            resultados = sincronizar_todo(
+                endpoint_filtro=catalogo,
+                dry_run=dry_run,
+                concurrente=options['concurrente'],
+                hilos=options['hilos'],
+            )
         except (RuntimeError, ValueError) as exc:
             raise CommandError(str(exc))
 
@@ -0,0 +1,58 @@
+from django.db import migrations
+
+# Columnas de búsqueda del navegador de catálogos (Api/services/catalogos.py)
+INDICES = {
+    'siesa_centros_operaciones': ['f285_id', 'f285_descripcion'],
+    'siesa_instalaciones': ['f157_id', 'f157_descripcion'],
+    'siesa_tipos_documentos': ['f021_id', 'f021_descripcion'],
+    'siesa_unidades_negocios': ['f281_id', 'f281_descripcion'],
+    'siesa_ccostos': ['f284_id', 'f284_descripcion'],
+    'siesa_proyectos': ['f107_id', 'f107_descripcion', 'f107_id_referencia'],
+    'siesa_conceptos': ['f145_id', 'f145_descripcion'],
+    'siesa_motivos': ['f146_id', 'f146_id_concepto'],
+    'siesa_ubicaciones': ['f155_id', 'f155_descripcion'],
+}
+
+
+def _nombre(tabla, columna):
+    return f'{tabla}_{columna}_trgm_idx'
+
+
+def crear_indices_trigram(apps, schema_editor):
+    """
+    Índices GIN trigram para los icontains de la búsqueda de catálogos
+    (Django los traduce a UPPER(col::text) LIKE UPPER(...)). Solo si el
+    servidor ofrece pg_trgm; sin la extensión la búsqueda funciona sin índice.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for tabla, columnas in INDICES.items():
+        for columna in columnas:
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {_nombre(tabla, columna)} ON {tabla} '
+                f'USING gin (UPPER({columna}::text) gin_trgm_ops)'
+            )
+
+
+def eliminar_indices_trigram(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for tabla, columnas in INDICES.items():
+        for columna in columnas:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {_nombre(tabla, columna)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices_trigram, eliminar_indices_trigram),
+    ]
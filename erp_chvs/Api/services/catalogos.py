@@ -0,0 +1,247 @@
+"""Navegación paginada de los catálogos SIESA locales.
+
+Cada catálogo declara sus columnas, la clave de orden (índice único) y los
+campos de búsqueda. Las páginas se leen con values_list() proyectando solo
+las columnas visibles y con paginación por clave (keyset): el cursor es la
+clave de la última/primera fila mostrada, así que el costo de una página no
+crece con el tamaño del catálogo ni con lo lejos que esté la página.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.db.models import Count, Q, Value
+
+from Api.models import (
+    SiesaCentroCosto,
+    SiesaCentroOperacion,
+    SiesaConcepto,
+    SiesaInstalacion,
+    SiesaItem,
+    SiesaMotivo,
+    SiesaProyecto,
+    SiesaSolicitante,
+    SiesaTipoDocumento,
+    SiesaUbicacion,
+    SiesaUnidadNegocio,
+)
+
+TAMANO_PAGINA = 25
+
+CATALOGOS = {
+    'centros_operacion': {
+        'modelo': SiesaCentroOperacion,
+        'titulo': 'Centros de Operación',
+        'columnas': [('f285_id', 'ID'), ('f285_descripcion', 'Descripción'), ('fecha_sincronizacion', 'Sincronizado')],
+        'clave': ['f285_id'],
+        'busqueda': ['f285_id', 'f285_descripcion'],
+    },
+    'instalaciones': {
+        'modelo': SiesaInstalacion,
+        'titulo': 'Instalaciones',
+        'columnas': [
+            ('f157_id', 'ID'), ('f157_descripcion', 'Descripción'), ('f157_id_co', 'ID Centro Operación'),
+            ('fecha_sincronizacion', 'Sincronizado'),
+        ],
+        'clave': ['f157_id'],
+        'busqueda': ['f157_id', 'f157_descripcion'],
+    },
+    'tipos_documento': {
+        'modelo': SiesaTipoDocumento,
+        'titulo': 'Tipos de Documento',
+        'columnas': [('f021_id', 'ID'), ('f021_descripcion', 'Descripción'), ('fecha_sincronizacion', 'Sincronizado')],
+        'clave': ['f021_id'],
+        'busqueda': ['f021_id', 'f021_descripcion'],
+    },
+    'unidades_negocio': {
+        'modelo': SiesaUnidadNegocio,
+        'titulo': 'Unidades de Negocio',
+        'columnas': [('f281_id', 'ID'), ('f281_descripcion', 'Descripción'), ('fecha_sincronizacion', 'Sincronizado')],
+        'clave': ['f281_id'],
+        'busqueda': ['f281_id', 'f281_descripcion'],
+    },
+    'centros_costo': {
+        'modelo': SiesaCentroCosto,
+        'titulo': 'Centros de Costo',
+        'columnas': [
+            ('f284_id', 'ID'), ('f284_descripcion', 'Descripción'), ('f284_id_co', 'ID Centro Operación'),
+            ('f284_id_un', 'ID Unidad Negocio'), ('fecha_sincronizacion', 'Sincronizado'),
+        ],
+        'clave': ['f284_id'],
+        'busqueda': ['f284_id', 'f284_descripcion'],
+    },
+    'proyectos': {
+        'modelo': SiesaProyecto,
+        'titulo': 'Proyectos',
+        'columnas': [
+            ('f107_id', 'ID'), ('f107_descripcion', 'Descripción'), ('f107_id_referencia', 'ID Referencia'),
+            ('fecha_sincronizacion', 'Sincronizado'),
+        ],
+        'clave': ['f107_id'],
+        'busqueda': ['f107_id', 'f107_descripcion', 'f107_id_referencia'],
+        'tamano': 50,
+    },
+    'conceptos': {
+        'modelo': SiesaConcepto,
+        'titulo': 'Conceptos',
+        'columnas': [
+            ('f145_id', 'ID'), ('f145_descripcion', 'Descripción'), ('f145_ind_naturaleza', 'Ind. Naturaleza'),
+            ('f145_ind_liquidacion', 'Ind. Liquidación'), ('fecha_sincronizacion', 'Sincronizado'),
+        ],
+        'clave': ['f145_id'],
+        'busqueda': ['f145_id', 'f145_descripcion'],
+    },
+    'motivos': {
+        'modelo': SiesaMotivo,
+        'titulo': 'Motivos',
+        'columnas': [
+            ('f146_id', 'ID Motivo'), ('f146_id_concepto', 'ID Concepto'), ('f146_ind_naturaleza', 'Ind. Naturaleza'),
+            ('fecha_sincronizacion', 'Sincronizado'),
+        ],
+        'clave': ['f146_id_concepto', 'f146_id'],  # unique_together
+        'busqueda': ['f146_id', 'f146_id_concepto'],
+    },
+    'ubicaciones': {
+        'modelo': SiesaUbicacion,
+        'titulo': 'Ubicaciones / Bodegas',
+        'columnas': [
+            ('f155_id', 'ID'), ('f155_descripcion', 'Descripción'), ('f150_id', 'ID f150'),
+            ('fecha_sincronizacion', 'Sincronizado'),
+        ],
+        'clave': ['f155_id'],
+        'busqueda': ['f155_id', 'f155_descripcion'],
+    },
+    'solicitantes': {
+        'modelo': SiesaSolicitante,
+        'titulo': 'Solicitantes',
+        'columnas': [('id', 'ID'), ('payload', 'Payload'), ('fecha_sincronizacion', 'Sincronizado')],
+        'clave': ['id'],
+        'busqueda': [],
+        'pendiente': True,
+    },
+    'items': {
+        'modelo': SiesaItem,
+        'titulo': 'Items (Plan de Cuentas)',
+        'columnas': [('id', 'ID'), ('payload', 'Payload'), ('fecha_sincronizacion', 'Sincronizado')],
+        'clave': ['id'],
+        'busqueda': [],
+        'pendiente': True,
+    },
+}
+
+
+def contar_catalogos() -> dict:
+    """Registros por catálogo en una sola consulta UNION ALL."""
+    consultas = [
+        cfg['modelo'].objects.order_by().values(catalogo=Value(slug)).annotate(total=Count('pk'))
+        for slug, cfg in CATALOGOS.items()
+    ]
+    totales = dict.fromkeys(CATALOGOS, 0)
+    primera, *resto = consultas
+    for fila in primera.union(*resto, all=True):
+        totales[fila['catalogo']] = fila['total']
+    return totales
+
+
+# ── Cursor ────────────────────────────────────────────────────────────────────
+
+def codificar_cursor(valores) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(valores)).encode('utf-8')).decode('ascii')
+
+
+def decodificar_cursor(cursor: str, clave: list):
+    """Clave del cursor, o None si falta o no es válido (se vuelve a la primera página)."""
+    if not cursor:
+        return None
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(valores, list) or len(valores) != len(clave):
+        return None
+    return valores
+
+
+def _q_posterior(clave: list, valores: list, hacia_atras: bool = False) -> Q:
+    """(c1, c2, ...) > (v1, v2, ...), o < con hacia_atras."""
+    op = 'lt' if hacia_atras else 'gt'
+    condicion = Q()
+    iguales = {}
+    for campo, valor in zip(clave, valores):
+        condicion |= Q(**iguales, **{f'{campo}__{op}': valor})
+        iguales[campo] = valor
+    # Cota redundante sobre la primera columna para que el índice acote el rango
+    return Q(**{f'{clave[0]}__{op}e': valores[0]}) & condicion
+
+
+def _celda(valor):
+    if hasattr(valor, 'strftime'):
+        return valor.strftime('%d/%m/%Y %H:%M')
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False)
+    return valor if valor not in ('', None) else '—'
+
+
+def pagina_catalogo(slug: str, q: str = '', cursor: str = '', direccion: str = 'siguiente') -> dict:
+    """
+    Una página del catálogo.
+
+    Args:
+        slug: Clave en CATALOGOS
+        q: Texto a buscar en los campos de búsqueda del catálogo
+        cursor: Clave límite (codificar_cursor) de la página de la que se viene
+        direccion: 'siguiente' (después del cursor), 'anterior' (antes del
+            cursor) o 'ultima' (ignora el cursor)
+
+    Returns:
+        Dict con titulo, columnas, filas (celdas ya formateadas) y paginacion
+        (has_next, has_previous, cursor_siguiente, cursor_anterior).
+    """
+    cfg = CATALOGOS[slug]
+    tamano = cfg.get('tamano', TAMANO_PAGINA)
+    campos = [campo for campo, _ in cfg['columnas']]
+    clave = cfg['clave']
+    posiciones_clave = [campos.index(c) for c in clave]
+
+    qs = cfg['modelo'].objects.all()
+    q = q.strip()
+    if q and cfg['busqueda']:
+        qs = qs.filter(reduce(or_, (Q(**{f'{campo}__icontains': q}) for campo in cfg['busqueda'])))
+
+    valores = None if direccion == 'ultima' else decodificar_cursor(cursor, clave)
+    hacia_atras = direccion == 'ultima' or (direccion == 'anterior' and valores is not None)
+    if valores is not None:
+        qs = qs.filter(_q_posterior(clave, valores, hacia_atras))
+    orden = [f'-{campo}' if hacia_atras else campo for campo in clave]
+
+    # Solo las columnas visibles; una fila de más indica si hay otra página
+    filas = list(qs.order_by(*orden).values_list(*campos)[:tamano + 1])
+    hay_mas = len(filas) > tamano
+    filas = filas[:tamano]
+    if hacia_atras:
+        filas.reverse()
+        has_previous, has_next = hay_mas, direccion == 'anterior'
+    else:
+        has_previous, has_next = valores is not None, hay_mas
+
+    def cursor_de(fila):
+        return codificar_cursor(fila[i] for i in posiciones_clave)
+
+    return {
+        'titulo': cfg['titulo'],
+        'columnas': [etiqueta for _, etiqueta in cfg['columnas']],
+        'filas': [[_celda(v) for v in fila] for fila in filas],
+        'busqueda_habilitada': bool(cfg['busqueda']),
+        'vacio_es_esperado': cfg.get('pendiente', False),
+        'paginacion': {
+            'has_next': has_next,
+            'has_previous': has_previous,
+            'has_other_pages': has_next or has_previous,
+            'cursor_siguiente': cursor_de(filas[-1]) if filas else '',
+            'cursor_anterior': cursor_de(filas[0]) if filas else '',
+        },
+    }
@@ -4,15 +4,25 @@ Wrapper sobre `requests.Session` con:
 - Autenticación HTTP Basic (credenciales en .env)
 - Timeout configurable
 - Retry simple ante fallos transitorios (5xx y errores de red)
+- Límite de peticiones simultáneas por host (SIESA_API_MAX_CONCURRENCIA),
+  compartido por todos los clientes del proceso; el backoff entre reintentos
+  se duerme sin ocupar cupo
+- Una sesión por hilo, para poder usar el mismo cliente desde un pool
+- Lectura en streaming del arreglo `data` para catálogos grandes
 - Logger dedicado `Api.siesa_client`
 """
 
 from __future__ import annotations
 
+import codecs
+import json
 import logging
 import os
+import re
+import threading
 import time
-from typing import Any
+from typing import Any, Iterable, Iterator
+from urllib.parse import urlsplit
 
 import requests
 from requests.auth import HTTPBasicAuth
@@ -34,11 +44,77 @@ ENDPOINTS = (
     'UBICACIONES',  # alias real para "BODEGAS" en el Postman
 )
 
+TAMANO_FRAGMENTO = 64 * 1024  # Bytes por lectura en streaming
+
+_cupos_por_host: dict[str, threading.BoundedSemaphore] = {}
+_cupos_lock = threading.Lock()
+
 
 class SiesaClientError(Exception):
     """Error en una llamada al API de SIESA después de agotar reintentos."""
 
 
+def _cupo_host(base_url: str, maximo: int) -> threading.BoundedSemaphore:
+    """Semáforo del host de base_url (el primer cliente que lo crea fija el máximo)."""
+    host = urlsplit(base_url).netloc
+    with _cupos_lock:
+        if host not in _cupos_por_host:
+            _cupos_por_host[host] = threading.BoundedSemaphore(maximo)
+        return _cupos_por_host[host]
+
+
+def iterar_arreglo_json(fragmentos: Iterable[str], clave: str = 'data') -> Iterator[Any]:
+    """
+    Parser incremental: entrega uno a uno los elementos del arreglo bajo
+    `clave` (o del arreglo raíz) a medida que llegan los fragmentos de texto,
+    sin construir el documento completo.
+
+    Si el payload no trae ese arreglo (p. ej. `"data": null`), se lee
+    completo y se aplica la misma regla que la lectura no incremental.
+    Lanza ValueError si el JSON termina antes de cerrar el arreglo.
+    """
+    decoder = json.JSONDecoder()
+    inicio = re.compile(r'^\s*\[|"%s"\s*:\s*\[' % re.escape(clave))
+    fragmentos = iter(fragmentos)
+
+    buffer = ''
+    for fragmento in fragmentos:
+        buffer += fragmento
+        encontrado = inicio.search(buffer)
+        if encontrado:
+            buffer = buffer[encontrado.end():]
+            break
+    else:
+        payload = json.loads(buffer) if buffer.strip() else None
+        if isinstance(payload, dict):
+            yield from payload.get(clave) or []
+        elif isinstance(payload, list):
+            yield from payload
+        return
+
+    pos = 0
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos < len(buffer):
+            if buffer[pos] == ']':
+                return
+            try:
+                elemento, fin = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                fin = None
+            # Solo se acepta si hay algo después: un número al final del búfer puede venir cortado
+            if fin is not None and fin < len(buffer):
+                yield elemento
+                pos = fin
+                continue
+        fragmento = next(fragmentos, None)
+        if fragmento is None:
+            raise ValueError('JSON truncado: el arreglo no se cerró')
+        buffer = buffer[pos:] + fragmento
+        pos = 0
+
+
 class SiesaClient:
     def __init__(
         self,
@@ -48,6 +124,7 @@ class SiesaClient:
         timeout: int | None = None,
         max_retries: int = 3,
         retry_backoff: float = 1.5,
+        max_concurrencia: int | None = None,
     ) -> None:
         self.base_url = (base_url or os.environ.get('SIESA_API_BASE_URL', '')).rstrip('/')
         self.user = user or os.environ.get('SIESA_API_USER', '')
@@ -55,50 +132,112 @@ class SiesaClient:
         self.timeout = int(timeout if timeout is not None else os.environ.get('SIESA_API_TIMEOUT', 30))
         self.max_retries = max_retries
         self.retry_backoff = retry_backoff
+        self.max_concurrencia = int(
+            max_concurrencia if max_concurrencia is not None else os.environ.get('SIESA_API_MAX_CONCURRENCIA', 4)
+        )
 
         if not self.base_url or not self.user or not self.password:
             raise SiesaClientError(
                 'Faltan variables SIESA_API_BASE_URL / SIESA_API_USER / SIESA_API_PASSWORD en el entorno.'
             )
 
-        self.session = requests.Session()
-        self.session.auth = HTTPBasicAuth(self.user, self.password)
-        self.session.headers.update({'Accept': 'application/json'})
-
-    def get(self, endpoint: str, params: dict | None = None) -> Any:
-        """GET a `<base_url>/<endpoint>`. Retorna el JSON parseado."""
+        self._cupo = _cupo_host(self.base_url, self.max_concurrencia)
+        self._local = threading.local()
+        self._sesiones: list[requests.Session] = []
+        self._sesiones_lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        """Sesión del hilo actual (requests.Session no es segura entre hilos)."""
+        sesion = getattr(self._local, 'session', None)
+        if sesion is None:
+            sesion = requests.Session()
+            sesion.auth = HTTPBasicAuth(self.user, self.password)
+            sesion.headers.update({'Accept': 'application/json'})
+            self._local.session = sesion
+            with self._sesiones_lock:
+                self._sesiones.append(sesion)
+        return sesion
+
+    def _enviar(self, endpoint: str, params: dict | None, stream: bool) -> requests.Response:
+        """
+        GET con reintentos. Retorna la respuesta exitosa con el cupo del host
+        tomado: quien la consume debe llamar a _liberar(resp).
+        """
         url = f'{self.base_url}/{endpoint.strip("/")}'
         last_exc: Exception | None = None
 
         for intento in range(1, self.max_retries + 1):
+            self._cupo.acquire()
+            resp = None
             try:
                 logger.debug('GET %s (intento %s/%s)', url, intento, self.max_retries)
-                resp = self.session.get(url, params=params, timeout=self.timeout)
+                resp = self.session.get(url, params=params, timeout=self.timeout, stream=stream)
             except requests.RequestException as exc:
                 last_exc = exc
                 logger.warning('Fallo de red en %s: %s', url, exc)
             else:
                 if resp.status_code == 401:
                     logger.error('401 en %s — credenciales SIESA inválidas o rotadas.', url)
+                    self._liberar(resp)
                     raise SiesaClientError(f'401 Unauthorized en {endpoint}')
                 if resp.status_code >= 500:
                     last_exc = SiesaClientError(f'{resp.status_code} en {endpoint}: {resp.text[:200]}')
                     logger.warning('5xx en %s: %s', url, resp.status_code)
                 else:
-                    resp.raise_for_status()
                     try:
-                        return resp.json()
-                    except ValueError as exc:
-                        logger.error('Respuesta no-JSON en %s: %s', url, resp.text[:200])
-                        raise SiesaClientError(f'Respuesta no-JSON en {endpoint}') from exc
+                        resp.raise_for_status()
+                    except requests.HTTPError:
+                        self._liberar(resp)
+                        raise
+                    return resp
+            self._liberar(resp)
 
             if intento < self.max_retries:
                 time.sleep(self.retry_backoff ** intento)
 
         raise SiesaClientError(f'GET {endpoint} falló tras {self.max_retries} intentos: {last_exc}')
 
+    def _liberar(self, resp: requests.Response | None) -> None:
+        if resp is not None:
+            resp.close()
+        self._cupo.release()
+
+    def get(self, endpoint: str, params: dict | None = None) -> Any:
+        """GET a `<base_url>/<endpoint>`. Retorna el JSON parseado."""
+        resp = self._enviar(endpoint, params, stream=False)
+        try:
+            return resp.json()
+        except ValueError as exc:
+            logger.error('Respuesta no-JSON en %s: %s', resp.url, resp.text[:200])
+            raise SiesaClientError(f'Respuesta no-JSON en {endpoint}') from exc
+        finally:
+            self._liberar(resp)
+
+    def iter_registros(self, endpoint: str, params: dict | None = None, clave: str = 'data') -> Iterator[Any]:
+        """
+        GET en streaming: entrega los registros del arreglo `clave` a medida
+        que se descargan. Los reintentos solo cubren el establecimiento de la
+        respuesta; un corte a mitad de la descarga lanza SiesaClientError.
+        El cupo del host queda tomado mientras dura la descarga.
+        """
+        resp = self._enviar(endpoint, params, stream=True)
+        decodificador = codecs.getincrementaldecoder(resp.encoding or 'utf-8')()
+        fragmentos = (
+            decodificador.decode(fragmento) for fragmento in resp.iter_content(TAMANO_FRAGMENTO)
+        )
+        try:
+            yield from iterar_arreglo_json(fragmentos, clave)
+        except (requests.RequestException, ValueError) as exc:
+            raise SiesaClientError(f'Respuesta incompleta o no-JSON en {endpoint}: {exc}') from exc
+        finally:
+            self._liberar(resp)
+
     def close(self) -> None:
-        self.session.close()
+        with self._sesiones_lock:
+            for sesion in self._sesiones:
+                sesion.close()
+            self._sesiones.clear()
 
     def __enter__(self) -> 'SiesaClient':
         return self
@@ -3,13 +3,25 @@
 Descarga cada catálogo completo y hace upsert en las tablas locales.
 Sin lógica delta (full sync siempre) — los endpoints actuales de SIESA
 no exponen filtro por fecha de modificación.
+
+Los registros se leen en streaming (SiesaClient.iter_registros) y se
+persisten por lotes de LOTE_REGISTROS con un upsert en bloque. En modo
+concurrente un pool de hilos descarga varios catálogos a la vez (el cliente
+limita las peticiones simultáneas por host) y entrega los lotes por una cola
+acotada a un único escritor en el hilo principal: las escrituras en BD se
+solapan con la descarga y, si la BD se atrasa, la cola frena a los hilos.
 """
 
 from __future__ import annotations
 
 import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Any, Callable
+from typing import Callable
+
+from django.db import transaction
 
 from Api.models import (
     SiesaCentroCosto,
@@ -30,6 +42,10 @@ from Api.services.siesa_client import ENDPOINTS, SiesaClient, SiesaClientError
 
 logger = logging.getLogger('Api')
 
+LOTE_REGISTROS = 500
+HILOS_DESCARGA = 4
+COLA_MAX_LOTES = 8
+
 
 CATALOGO_CONFIG = [
     {
@@ -103,13 +119,135 @@ CATALOGO_CONFIG = [
 ENDPOINT_A_CONFIG = {c['endpoint']: c for c in CATALOGO_CONFIG}
 
 
-def _extraer_lista(payload: Any) -> list:
-    """Extrae el array de registros del payload de SIESA (siempre en `data`)."""
-    if isinstance(payload, dict):
-        return payload.get('data') or []
-    if isinstance(payload, list):
-        return payload
-    return []
+class _Avance:
+    """
+    Contadores de un catálogo mientras se sincroniza; al cerrar produce el
+    SiesaSyncLog. recibidos/errores_mapeo los lleva el hilo que descarga y
+    el resto el que persiste.
+    """
+
+    def __init__(self, endpoint: str) -> None:
+        self.log = SiesaSyncLog(endpoint=endpoint, inicio=datetime.now(timezone.utc))
+        self.recibidos = self.errores_mapeo = 0
+        self.insertados = self.actualizados = self.errores = 0
+        self.error_descarga: str | None = None
+
+    def cerrar(self, dry_run: bool) -> SiesaSyncLog:
+        log = self.log
+        log.fin = datetime.now(timezone.utc)
+        log.registros_insertados = self.insertados
+        log.registros_actualizados = self.actualizados
+        log.errores = errores = self.errores + self.errores_mapeo
+        if self.error_descarga:
+            log.estado = SiesaSyncLog.ESTADO_ERROR
+            log.detalle_error = self.error_descarga
+            logger.error('Error al obtener %s: %s', log.endpoint, self.error_descarga)
+        else:
+            log.estado = (
+                SiesaSyncLog.ESTADO_ERROR if errores and not (self.insertados + self.actualizados)
+                else SiesaSyncLog.ESTADO_OK
+            )
+        if not dry_run:
+            log.save()
+        logger.info(
+            '%s: %s registros recibidos, insertados=%s, actualizados=%s, errores=%s',
+            log.endpoint, self.recibidos, self.insertados, self.actualizados, errores,
+        )
+        return log
+
+
+def _descargar(client: SiesaClient, cfg: dict, avance: _Avance, entregar: Callable[[list], None]) -> None:
+    """
+    Lee el catálogo en streaming, mapea cada registro y entrega lotes de
+    hasta LOTE_REGISTROS tuplas (lookup, defaults). No toca la BD.
+    """
+    lote = []
+    try:
+        for item in client.iter_registros(cfg['endpoint']):
+            avance.recibidos += 1
+            try:
+                lote.append(cfg['mapper'](item))
+            except Exception as exc:
+                avance.errores_mapeo += 1
+                logger.warning('%s: error procesando registro %s: %s', cfg['endpoint'], item, exc)
+                continue
+            if len(lote) >= LOTE_REGISTROS:
+                entregar(lote)
+                lote = []
+    except SiesaClientError as exc:
+        avance.error_descarga = str(exc)
+    if lote:
+        entregar(lote)
+
+
+def _persistir_lote(cfg: dict, lote: list, avance: _Avance, dry_run: bool) -> None:
+    """
+    Upsert en bloque de un lote: una consulta para saber qué claves ya
+    existen y un INSERT ... ON CONFLICT DO UPDATE. Si el lote falla se
+    reintenta registro a registro para aislar los errores.
+    """
+    if dry_run:
+        avance.insertados += len(lote)
+        return
+
+    modelo = cfg['modelo']
+    if not cfg['con_lookup']:
+        try:
+            with transaction.atomic():
+                modelo.objects.bulk_create([modelo(**defaults) for _, defaults in lote])
+            avance.insertados += len(lote)
+        except Exception:
+            _persistir_uno_a_uno(cfg, lote, avance)
+        return
+
+    # Una misma clave dos veces en el lote rompe el ON CONFLICT: gana la última
+    por_clave = {}
+    for lookup, defaults in lote:
+        por_clave[tuple(lookup.items())] = (lookup, defaults)
+    campos_clave = list(next(iter(por_clave.values()))[0])
+    campos_datos = list(next(iter(por_clave.values()))[1]) + ['fecha_sincronizacion']
+
+    try:
+        with transaction.atomic():
+            existentes = set(
+                modelo.objects
+                .filter(**{f'{campo}__in': {lk[campo] for lk, _ in por_clave.values()} for campo in campos_clave})
+                .values_list(*campos_clave)
+            )
+            modelo.objects.bulk_create(
+                [modelo(**lookup, **defaults) for lookup, defaults in por_clave.values()],
+                update_conflicts=True,
+                unique_fields=campos_clave,
+                update_fields=campos_datos,
+            )
+    except Exception as exc:
+        logger.warning('%s: falló el upsert en bloque (%s); se reintenta por registro', cfg['endpoint'], exc)
+        _persistir_uno_a_uno(cfg, lote, avance)
+        return
+
+    nuevos = sum(1 for clave in por_clave if tuple(v for _, v in clave) not in existentes)
+    avance.insertados += nuevos
+    avance.actualizados += len(lote) - nuevos
+
+
+def _persistir_uno_a_uno(cfg: dict, lote: list, avance: _Avance) -> None:
+    modelo = cfg['modelo']
+    for lookup, defaults in lote:
+        try:
+            with transaction.atomic():
+                if cfg['con_lookup'] and lookup:
+                    _, created = modelo.objects.update_or_create(defaults=defaults, **lookup)
+                else:
+                    modelo.objects.create(**defaults)
+                    created = True
+        except Exception as exc:
+            avance.errores += 1
+            logger.warning('%s: error guardando registro %s: %s', cfg['endpoint'], lookup or defaults, exc)
+            continue
+        if created:
+            avance.insertados += 1
+        else:
+            avance.actualizados += 1
 
 
 def sincronizar_catalogo(
@@ -121,62 +259,72 @@ def sincronizar_catalogo(
     dry_run: bool = False,
 ) -> SiesaSyncLog:
     """Sincroniza un catálogo individual. Retorna el SiesaSyncLog resultante."""
-    inicio = datetime.now(timezone.utc)
-    log = SiesaSyncLog(endpoint=endpoint, inicio=inicio)
-    insertados = actualizados = errores = 0
+    cfg = {'endpoint': endpoint, 'modelo': modelo, 'mapper': mapper, 'con_lookup': con_lookup}
+    avance = _Avance(endpoint)
+    _descargar(client, cfg, avance, lambda lote: _persistir_lote(cfg, lote, avance, dry_run))
+    return avance.cerrar(dry_run)
 
-    try:
-        payload = client.get(endpoint)
-    except SiesaClientError as exc:
-        log.fin = datetime.now(timezone.utc)
-        log.estado = SiesaSyncLog.ESTADO_ERROR
-        log.detalle_error = str(exc)
-        if not dry_run:
-            log.save()
-        logger.error('Error al obtener %s: %s', endpoint, exc)
-        return log
 
-    registros = _extraer_lista(payload)
-    logger.info('%s: %s registros recibidos', endpoint, len(registros))
+class _Cancelado(Exception):
+    """El escritor se detuvo; los hilos de descarga deben abandonar."""
 
-    for item in registros:
-        try:
-            lookup, defaults = mapper(item)
-            if dry_run:
-                insertados += 1
+
+def _sincronizar_concurrente(client: SiesaClient, configs: list, dry_run: bool, hilos: int) -> list[SiesaSyncLog]:
+    """
+    Descarga los catálogos en un pool de hilos y persiste en este hilo los
+    lotes que llegan por la cola acotada. Los logs se retornan en el orden
+    de configs.
+    """
+    cola: queue.Queue = queue.Queue(maxsize=COLA_MAX_LOTES)
+    cancelado = threading.Event()
+    avances = {cfg['endpoint']: _Avance(cfg['endpoint']) for cfg in configs}
+
+    def encolar(mensaje):
+        while True:
+            if cancelado.is_set():
+                raise _Cancelado
+            try:
+                cola.put(mensaje, timeout=1)
+                return
+            except queue.Full:
                 continue
-            if con_lookup and lookup:
-                _, created = modelo.objects.update_or_create(defaults=defaults, **lookup)
-                if created:
-                    insertados += 1
-                else:
-                    actualizados += 1
-            else:
-                modelo.objects.create(**defaults)
-                insertados += 1
-        except Exception as exc:
-            errores += 1
-            logger.warning('%s: error procesando registro %s: %s', endpoint, item, exc)
 
-    log.fin = datetime.now(timezone.utc)
-    log.registros_insertados = insertados
-    log.registros_actualizados = actualizados
-    log.errores = errores
-    log.estado = SiesaSyncLog.ESTADO_ERROR if errores and not (insertados + actualizados) else SiesaSyncLog.ESTADO_OK
+    def descargar(cfg):
+        try:
+            _descargar(client, cfg, avances[cfg['endpoint']], lambda lote: encolar((cfg, lote)))
+        finally:
+            if not cancelado.is_set():
+                encolar((cfg, None))  # Fin del catálogo
 
-    if not dry_run:
-        log.save()
+    logs = {}
+    with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='siesa-sync') as pool:
+        futuros = [pool.submit(descargar, cfg) for cfg in configs]
+        try:
+            while len(logs) < len(configs):
+                cfg, lote = cola.get()
+                avance = avances[cfg['endpoint']]
+                if lote is None:
+                    logs[cfg['endpoint']] = avance.cerrar(dry_run)
+                else:
+                    _persistir_lote(cfg, lote, avance, dry_run)
+        finally:
+            cancelado.set()
+        for futuro in futuros:
+            futuro.result()  # Propaga errores inesperados de los hilos
 
-    logger.info(
-        '%s: insertados=%s, actualizados=%s, errores=%s',
-        endpoint, insertados, actualizados, errores,
-    )
-    return log
+    return [logs[cfg['endpoint']] for cfg in configs]
 
 
-def sincronizar_todo(endpoint_filtro: str | None = None, dry_run: bool = False) -> list[SiesaSyncLog]:
+def sincronizar_todo(
+    endpoint_filtro: str | None = None,
+    dry_run: bool = False,
+    concurrente: bool = False,
+    hilos: int = HILOS_DESCARGA,
+    client: SiesaClient | None = None,
+) -> list[SiesaSyncLog]:
     """Sincroniza todos los catálogos (o uno específico si se indica).
 
+    Con concurrente=True descarga hasta `hilos` catálogos en paralelo.
     Retorna lista de SiesaSyncLog con resultados por catálogo.
     """
     if endpoint_filtro and endpoint_filtro not in ENDPOINT_A_CONFIG:
@@ -186,13 +334,17 @@ def sincronizar_todo(endpoint_filtro: str | None = None, dry_run: bool = False)
 
     configs = [ENDPOINT_A_CONFIG[endpoint_filtro]] if endpoint_filtro else CATALOGO_CONFIG
 
-    try:
-        client = SiesaClient()
-    except SiesaClientError as exc:
-        raise RuntimeError(str(exc)) from exc
+    if client is None:
+        try:
+            client = SiesaClient()
+        except SiesaClientError as exc:
+            raise RuntimeError(str(exc)) from exc
 
-    resultados = []
     with client:
+        if concurrente and len(configs) > 1:
+            return _sincronizar_concurrente(client, configs, dry_run, hilos)
+
+        resultados = []
         for cfg in configs:
             log = sincronizar_catalogo(
                 client=client,
@@ -1,3 +1,185 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from .models import SiesaCentroCosto, SiesaCentroOperacion, SiesaMotivo, SiesaProyecto, SiesaSyncLog
+from .services.catalogos import contar_catalogos, pagina_catalogo
+from .services.siesa_client import ENDPOINTS, SiesaClient, iterar_arreglo_json
+from .services.sync_service import sincronizar_todo
+
+
+class CatalogosSiesaTests(TestCase):
+    """Navegador de catálogos SIESA: conteo en una consulta y paginación por clave."""
+
+    @classmethod
+    def setUpTestData(cls):
+        SiesaCentroOperacion.objects.bulk_create([
+            SiesaCentroOperacion(f285_id=f'{i:03d}', f285_descripcion=f'Centro {i}') for i in range(60)
+        ])
+        SiesaMotivo.objects.bulk_create([
+            SiesaMotivo(f146_id=f'{m:02d}', f146_id_concepto=f'C{c}') for c in range(3) for m in range(10)
+        ])
+        SiesaProyecto.objects.create(f107_id='P1', f107_descripcion='Alimentación escolar')
+
+    def test_conteo_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            totales = contar_catalogos()
+        self.assertEqual(totales['centros_operacion'], 60)
+        self.assertEqual(totales['motivos'], 30)
+        self.assertEqual(totales['items'], 0)
+
+    def test_paginacion_por_clave_adelante_y_atras(self):
+        primera = pagina_catalogo('centros_operacion')
+        self.assertEqual([f[0] for f in primera['filas']], [f'{i:03d}' for i in range(25)])
+        self.assertEqual((primera['paginacion']['has_previous'], primera['paginacion']['has_next']), (False, True))
+
+        with self.assertNumQueries(1):
+            segunda = pagina_catalogo('centros_operacion', cursor=primera['paginacion']['cursor_siguiente'])
+        self.assertEqual(segunda['filas'][0][0], '025')
+
+        ultima = pagina_catalogo('centros_operacion', direccion='ultima')
+        self.assertEqual([f[0] for f in ultima['filas']], [f'{i:03d}' for i in range(35, 60)])
+        self.assertEqual((ultima['paginacion']['has_previous'], ultima['paginacion']['has_next']), (True, False))
+
+        atras = pagina_catalogo('centros_operacion', cursor=segunda['paginacion']['cursor_anterior'], direccion='anterior')
+        self.assertEqual(atras['filas'], primera['filas'])
+        self.assertEqual((atras['paginacion']['has_previous'], atras['paginacion']['has_next']), (False, True))
+
+    def test_clave_compuesta_y_busqueda(self):
+        primera = pagina_catalogo('motivos')
+        segunda = pagina_catalogo('motivos', cursor=primera['paginacion']['cursor_siguiente'])
+        # Clave (f146_id_concepto, f146_id): la página 2 sigue dentro del concepto C2
+        self.assertEqual(segunda['filas'][0][:2], ['05', 'C2'])
+        self.assertEqual(len(segunda['filas']), 5)
+        self.assertFalse(segunda['paginacion']['has_next'])
+
+        self.assertEqual(len(pagina_catalogo('centros_operacion', q='centro 5')['filas']), 11)
+        self.assertEqual(pagina_catalogo('proyectos', q='escolar')['filas'][0][0], 'P1')
+        # Un cursor inválido vuelve a la primera página
+        self.assertEqual(pagina_catalogo('centros_operacion', cursor='basura')['filas'][0][0], '000')
+
+    def test_vistas(self):
+        self.client.force_login(User.objects.create_superuser('siesa', 's@x.com', 'x'))
+        resp = self.client.get('/siesa/', secure=True)
+        self.assertEqual(resp.context['total_centros_operacion'], 60)
+        resp = self.client.get('/siesa/centros-operacion/', {'q': 'Centro 1'}, secure=True)
+        self.assertContains(resp, 'Centro 19')
+        self.assertNotContains(resp, 'Centro 20')
+
+
+
+class _ServidorSiesaFalso:
+    """API SIESA mínima en un hilo: responde {"data": [...]} por endpoint y mide la concurrencia."""
+
+    def __init__(self, respuestas, demora=0.0, fallos=None):
+        self.respuestas = respuestas
+        self.demora = demora
+        self.fallos = dict(fallos or {})  # endpoint -> respuestas 500 antes de la buena
+        self.activas = self.max_activas = 0
+        self.lock = threading.Lock()
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                endpoint = self.path.strip('/')
+                with servidor.lock:
+                    servidor.activas += 1
+                    servidor.max_activas = max(servidor.max_activas, servidor.activas)
+                    fallar = servidor.fallos.get(endpoint, 0) > 0
+                    if fallar:
+                        servidor.fallos[endpoint] -= 1
+                try:
+                    time.sleep(servidor.demora)
+                    cuerpo = servidor.respuestas.get(endpoint, '{"data": []}').encode('utf-8')
+                    self.send_response(500 if fallar else 200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(cuerpo)))
+                    self.end_headers()
+                    self.wfile.write(cuerpo)
+                finally:
+                    with servidor.lock:
+                        servidor.activas -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def cliente(self, **kwargs):
+        return SiesaClient(base_url=self.url, user='u', password='p', retry_backoff=0.01, **kwargs)
+
+    def cerrar(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class SincronizacionSiesaTests(TestCase):
+    """Sincronización: parser en streaming, upsert por lotes y descarga concurrente contra un servidor falso."""
+
+    def test_parser_incremental(self):
+        texto = '{"ok": true, "data": [{"a": "x]"}, {"a": [2, 3]}, 45], "total": 3}'
+        fragmentos = [texto[i:i + 3] for i in range(0, len(texto), 3)]
+        self.assertEqual(list(iterar_arreglo_json(fragmentos)), [{'a': 'x]'}, {'a': [2, 3]}, 45])
+        self.assertEqual(list(iterar_arreglo_json(['[1,', ' 2]'])), [1, 2])
+        self.assertEqual(list(iterar_arreglo_json(['{"data": null}'])), [])
+        with self.assertRaises(ValueError):
+            list(iterar_arreglo_json(['{"data": [{"a": 1}, {"a"']))
+
+    def test_sincronizacion_concurrente(self):
+        SiesaMotivo.objects.create(f146_id='1', f146_id_concepto='A', f146_ind_naturaleza='X')
+        centros = [{'f285_id': f'{i:04d}', 'f285_descripcion': f'Centro {i}'} for i in range(1200)]
+        motivos = [
+            {'f146_id': '1', 'f146_id_concepto': 'A', 'f146_ind_naturaleza': 'D'},
+            {'f146_id': '2', 'f146_id_concepto': 'A', 'f146_ind_naturaleza': 'C'},
+            {'f146_id': '1', 'f146_id_concepto': 'A', 'f146_ind_naturaleza': 'C'},
+            {'f146_id_concepto': 'SIN-ID'},
+        ]
+        servidor = _ServidorSiesaFalso(
+            {
+                'CENTROS-OPERACIONES': json.dumps({'data': centros}),
+                'MOTIVOS': json.dumps({'data': motivos}),
+                'CCOSTOS': json.dumps({'data': [{'f284_id': 'CC1', 'f284_descripcion': 'Cocina'}]}),
+            },
+            demora=0.2,
+            fallos={'CCOSTOS': 1},
+        )
+        try:
+            logs = sincronizar_todo(concurrente=True, hilos=6, client=servidor.cliente(max_concurrencia=3))
+        finally:
+            servidor.cerrar()
+
+        # Varias descargas a la vez, sin pasar el límite por host
+        self.assertEqual(servidor.max_activas, 3)
+        self.assertEqual([log.endpoint for log in logs], list(ENDPOINTS))
+        por_endpoint = {log.endpoint: log for log in logs}
+        self.assertEqual(por_endpoint['CENTROS-OPERACIONES'].registros_insertados, 1200)
+        motivo = por_endpoint['MOTIVOS']
+        self.assertEqual((motivo.registros_insertados, motivo.registros_actualizados, motivo.errores), (1, 2, 1))
+        self.assertEqual(por_endpoint['CCOSTOS'].estado, SiesaSyncLog.ESTADO_OK)
+
+        self.assertEqual(SiesaCentroOperacion.objects.count(), 1200)
+        self.assertEqual(SiesaMotivo.objects.get(f146_id='1').f146_ind_naturaleza, 'C')
+        self.assertTrue(SiesaCentroCosto.objects.filter(f284_id='CC1').exists())
+        self.assertEqual(SiesaSyncLog.objects.count(), len(ENDPOINTS))
+
+    def test_error_de_descarga_y_resincronizacion(self):
+        servidor = _ServidorSiesaFalso({
+            'CENTROS-OPERACIONES': '{"data": [{"f285_id": "1", "f285_descripcion": "Uno"}, {"f285_id"',
+        })
+        try:
+            log, = sincronizar_todo('CENTROS-OPERACIONES', client=servidor.cliente())
+            self.assertEqual((log.estado, log.registros_insertados), (SiesaSyncLog.ESTADO_ERROR, 1))
+            self.assertIn('incompleta', log.detalle_error)
+
+            servidor.respuestas['CENTROS-OPERACIONES'] = '[{"f285_id": "1", "f285_descripcion": "Uno bis"}]'
+            log, = sincronizar_todo('CENTROS-OPERACIONES', client=servidor.cliente())
+        finally:
+            servidor.cerrar()
+        self.assertEqual((log.estado, log.registros_actualizados), (SiesaSyncLog.ESTADO_OK, 1))
+        self.assertEqual(SiesaCentroOperacion.objects.get().f285_descripcion, 'Uno bis')
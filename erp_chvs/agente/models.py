@@ -1,8 +1,11 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 
 from nutricion.models import (
-    TablaMenus, ComponentesAlimentos, GruposAlimentos, TablaAlimentos2018Icbf
+    TablaMenus, ComponentesAlimentos, GruposAlimentos, TablaAlimentos2018Icbf,
+    ComponentesModalidades, TablaPreparaciones, TablaPreparacionIngredientes,
 )
 from principal.models import ModalidadesDeConsumo
 
@@ -198,3 +201,38 @@ class LoteGeneracion(models.Model):
 
     def __str__(self):
         return f"Lote {self.id} — {self.modalidad} x{self.cantidad_total} ({self.estado})"
+
+
+# ===== Invalidación del contexto cacheado por modalidad (context_builder) =====
+
+def _invalidar_contexto(modalidad_id):
+    """Invalida al confirmar la transacción; modalidad None = todas."""
+    from .services.context_builder import invalidar_contexto
+
+    transaction.on_commit(lambda: invalidar_contexto(modalidad_id))
+
+
+@receiver([post_save, post_delete], sender=TablaMenus)
+@receiver([post_save, post_delete], sender=ComponentesModalidades)
+def _contexto_cambio_modalidad(sender, instance, **kwargs):
+    _invalidar_contexto(instance.id_modalidad_id)
+
+
+@receiver([post_save, post_delete], sender=TablaPreparaciones)
+@receiver([post_save, post_delete], sender=TablaPreparacionIngredientes)
+@receiver([post_save, post_delete], sender=TablaAlimentos2018Icbf)
+def _contexto_cambio_menus(sender, instance, **kwargs):
+    # Resolver la modalidad costaría una consulta por escritura; las modalidades
+    # son pocas y el contexto se reconstruye con pocas consultas.
+    _invalidar_contexto(None)
+
+
+# ===== Conteo del pool y canal de progreso =====
+
+@receiver([post_save, post_delete], sender=GeneracionIA)
+def _pool_cambio_generacion(sender, instance, **kwargs):
+    if instance.id_modalidad_id is None:
+        return
+    from .services.pool_service import invalidar_disponibles
+
+    transaction.on_commit(lambda: invalidar_disponibles(instance.id_modalidad_id))
@@ -1,6 +1,22 @@
+"""
+Contexto de una modalidad para generar borradores de menú con el agente.
+
+La parte determinista (componentes, ids de menús y frecuencias de
+ingredientes ya rankeadas y limitadas en SQL con ROW_NUMBER) se cachea por
+modalidad; por borrador solo se repite el muestreo aleatorio. Las
+ediciones de menús, preparaciones e ingredientes cambian la versión de la
+caché (señales en agente.models). El contexto queda en la caché local del
+worker, pero las versiones viven en la caché compartida 'versiones': una
+edición hecha en un worker invalida el contexto de todos.
+"""
+
 import random
+import uuid
 
-from django.db.models import Count
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connection
+from django.db.models import Count, F
 
 from nutricion.models import (
     TablaMenus, TablaPreparacionIngredientes, ComponentesModalidades,
@@ -8,8 +24,52 @@ from nutricion.models import (
 )
 from principal.models import ModalidadesDeConsumo
 
+TOP_POR_COMPONENTE = 8
+EXTRAS_POR_COMPONENTE = 2
+CANDIDATOS_EXTRAS_COMPONENTE = 24  # Rangos 9..32: de aquí salen los extras aleatorios
+TOP_CATALOGO = 20
+CANDIDATOS_POR_GRUPO = 10  # Más frecuentes de cada grupo fuera del top, para la rotación
+
+_CACHE_PREFIJO = 'agente:contexto:'
+
 
 def obtener_contexto_modalidad(modalidad_id) -> dict:
+    base = obtener_contexto_base(modalidad_id)
+
+    return {
+        'modalidad': base['modalidad'],
+        'menus_similares': _obtener_menus_similares(base['ids_menus']),
+        'componentes_validos': base['componentes_validos'],
+        'ingredientes_por_componente': _muestrear_ingredientes_por_componente(base['frecuencias_componente']),
+        'catalogo_soporte': _muestrear_catalogo_soporte(base['catalogo']),
+    }
+
+
+def _clave_version(modalidad_id) -> str:
+    return f'{_CACHE_PREFIJO}version:{modalidad_id or "todas"}'
+
+
+def version_contexto(modalidad_id=None) -> str:
+    """Versión del contexto de la modalidad (o de todas, con None); cambia al invalidar."""
+    return caches['versiones'].get_or_set(_clave_version(modalidad_id), uuid.uuid4().hex, None)
+
+
+def invalidar_contexto(modalidad_id=None) -> None:
+    """Descarta el contexto cacheado de la modalidad; sin modalidad, el de todas."""
+    caches['versiones'].set(_clave_version(modalidad_id), uuid.uuid4().hex, None)
+
+
+def obtener_contexto_base(modalidad_id) -> dict:
+    """Parte determinista del contexto, cacheada (AGENTE_CONTEXTO_CACHE_TTL segundos)."""
+    clave = f'{_CACHE_PREFIJO}{modalidad_id}:{version_contexto()}:{version_contexto(modalidad_id)}'
+    base = cache.get(clave)
+    if base is None:
+        base = _construir_contexto_base(modalidad_id)
+        cache.set(clave, base, getattr(settings, 'AGENTE_CONTEXTO_CACHE_TTL', 3600))
+    return base
+
+
+def _construir_contexto_base(modalidad_id) -> dict:
     modalidad = ModalidadesDeConsumo.objects.get(id_modalidades=modalidad_id)
     componentes = _obtener_componentes_modalidad(modalidad_id)
 
@@ -18,20 +78,18 @@ def obtener_contexto_modalidad(modalidad_id) -> dict:
             'id': str(modalidad.id_modalidades),
             'nombre': modalidad.modalidad,
         },
-        'menus_similares': _obtener_menus_similares(modalidad_id),
+        'ids_menus': list(
+            TablaMenus.objects.filter(id_modalidad=modalidad_id).values_list('id_menu', flat=True)
+        ),
         'componentes_validos': componentes,
-        'ingredientes_por_componente': _obtener_ingredientes_por_componente(modalidad_id, componentes),
-        'catalogo_soporte': _obtener_catalogo_soporte(modalidad_id),
+        'frecuencias_componente': _frecuencias_por_componente(modalidad_id, componentes),
+        'catalogo': _frecuencias_catalogo(modalidad_id),
     }
 
 
-def _obtener_menus_similares(modalidad_id) -> list:
+def _obtener_menus_similares(ids_menus) -> list:
     # Muestra aleatoria de hasta 5 menús para no sesgar siempre hacia los más recientes
-    ids = list(
-        TablaMenus.objects.filter(id_modalidad=modalidad_id)
-        .values_list('id_menu', flat=True)
-    )
-    ids_muestra = random.sample(ids, min(5, len(ids))) if ids else []
+    ids_muestra = random.sample(ids_menus, min(5, len(ids_menus))) if ids_menus else []
     menus = TablaMenus.objects.filter(id_menu__in=ids_muestra).prefetch_related(
         'preparaciones__ingredientes__id_ingrediente_siesa',
         'preparaciones__id_componente'
@@ -75,83 +133,113 @@ def _obtener_componentes_modalidad(modalidad_id) -> list:
     ]
 
 
-def _obtener_ingredientes_por_componente(modalidad_id, componentes: list) -> dict:
+def _rankear(agrupado, rangos: dict, condicion: str, params_condicion: list) -> list:
     """
-    Para cada componente, retorna los ingredientes PRINCIPALES más usados
-    en preparaciones de ese componente (top 8 + 2 aleatorios para variedad).
-    Estos definen el ingrediente estrella de cada preparación.
+    Envuelve una consulta agrupada (con alias ``frecuencia`` y ``codigo``) y
+    le agrega columnas ROW_NUMBER() por frecuencia. Va en SQL porque el ORM
+    mete la ventana en el GROUP BY cuando ordena por un agregado. ``rangos``
+    mapea alias -> columna de partición (None = sin partición) y
+    ``condicion`` filtra sobre esos alias.
     """
-    resultado = {}
-    for comp in componentes:
-        comp_id = comp['id']
+    sql, params = agrupado.order_by().query.sql_with_params()
+    columnas = ', '.join(
+        'ROW_NUMBER() OVER ({}ORDER BY frecuencia DESC, codigo) AS {}'.format(
+            f'PARTITION BY {particion} ' if particion else '', alias
+        )
+        for alias, particion in rangos.items()
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT * FROM (SELECT agrupado.*, {columnas} FROM ({sql}) agrupado) rankeado '
+            f'WHERE {condicion} ORDER BY {", ".join(rangos)}',
+            [*params, *params_condicion],
+        )
+        nombres = [col[0] for col in cursor.description]
+        return [dict(zip(nombres, fila)) for fila in cursor.fetchall()]
+
 
-        top_qs = TablaPreparacionIngredientes.objects.filter(
+def _frecuencias_por_componente(modalidad_id, componentes: list) -> dict:
+    """
+    Ingredientes PRINCIPALES más usados en preparaciones de cada componente,
+    en una sola consulta agrupada con ROW_NUMBER() OVER (PARTITION BY
+    componente ORDER BY frecuencia). Retorna por componente el top
+    (TOP_POR_COMPONENTE) y los candidatos para los extras aleatorios.
+    """
+    agrupado = (
+        TablaPreparacionIngredientes.objects
+        .filter(
             id_preparacion__id_menu__id_modalidad=modalidad_id,
-            id_preparacion__id_componente=comp_id,
-        ).values(
-            'id_ingrediente_siesa__codigo',
-            'id_ingrediente_siesa__nombre_del_alimento',
-        ).annotate(
-            frecuencia=Count('id')
-        ).order_by('-frecuencia')
-
-        top_list = list(top_qs)
-        top_8 = top_list[:8]
-        codigos_top = {i['id_ingrediente_siesa__codigo'] for i in top_8}
-
-        resto = [i for i in top_list[8:] if i['id_ingrediente_siesa__codigo'] not in codigos_top]
-        extras = random.sample(resto, min(2, len(resto))) if resto else []
-
-        resultado[comp_id] = [
-            {
-                'codigo': i['id_ingrediente_siesa__codigo'],
-                'nombre': i['id_ingrediente_siesa__nombre_del_alimento'],
-            }
-            for i in top_8 + extras
-        ]
+            id_preparacion__id_componente__in=[c['id'] for c in componentes],
+        )
+        .values(
+            componente=F('id_preparacion__id_componente'),
+            codigo=F('id_ingrediente_siesa__codigo'),
+            nombre=F('id_ingrediente_siesa__nombre_del_alimento'),
+        )
+        .annotate(frecuencia=Count('id'))
+    )
+    filas = _rankear(
+        agrupado, {'rango': 'componente'}, 'rango <= %s',
+        [TOP_POR_COMPONENTE + CANDIDATOS_EXTRAS_COMPONENTE],
+    )
 
+    resultado = {c['id']: {'top': [], 'candidatos': []} for c in componentes}
+    for fila in sorted(filas, key=lambda f: (f['componente'], f['rango'])):
+        destino = 'top' if fila['rango'] <= TOP_POR_COMPONENTE else 'candidatos'
+        resultado[fila['componente']][destino].append({'codigo': fila['codigo'], 'nombre': fila['nombre']})
     return resultado
 
 
-def _obtener_catalogo_soporte(modalidad_id, limit=40) -> list:
+def _frecuencias_catalogo(modalidad_id) -> dict:
     """
-    Catálogo general de ingredientes usados en la modalidad.
-    Incluye condimentos, aceites, especias, verduras de guiso y otros
-    ingredientes de soporte que acompañan al ingrediente principal.
-    Top 20 más frecuentes + muestra aleatoria por grupo para variedad.
+    Catálogo general de ingredientes usados en la modalidad: condimentos,
+    aceites, especias, verduras de guiso y otros ingredientes de soporte.
+    Una consulta con dos rangos: el global (top TOP_CATALOGO) y el de cada
+    grupo de alimentos (candidatos para la rotación por grupo).
     """
-    top_qs = TablaPreparacionIngredientes.objects.filter(
-        id_preparacion__id_menu__id_modalidad=modalidad_id
-    ).values(
-        'id_ingrediente_siesa__codigo',
-        'id_ingrediente_siesa__nombre_del_alimento',
-        'id_ingrediente_siesa__id_componente__id_grupo_alimentos__grupo_alimentos',
-    ).annotate(
-        frecuencia=Count('id')
-    ).order_by('-frecuencia')
-
-    top_list = list(top_qs)
-    top_20 = top_list[:20]
-    codigos_top = {i['id_ingrediente_siesa__codigo'] for i in top_20}
-
-    # Muestra aleatoria por grupo para cubrir variedad de soporte
-    grupos: dict = {}
-    for item in top_list[20:]:
-        grupo = item['id_ingrediente_siesa__id_componente__id_grupo_alimentos__grupo_alimentos'] or 'Sin grupo'
-        grupos.setdefault(grupo, []).append(item)
+    agrupado = (
+        TablaPreparacionIngredientes.objects
+        .filter(id_preparacion__id_menu__id_modalidad=modalidad_id)
+        .values(
+            codigo=F('id_ingrediente_siesa__codigo'),
+            nombre=F('id_ingrediente_siesa__nombre_del_alimento'),
+            grupo=F('id_ingrediente_siesa__id_componente__id_grupo_alimentos__grupo_alimentos'),
+        )
+        .annotate(frecuencia=Count('id'))
+    )
+    filas = _rankear(
+        agrupado, {'rango': None, 'rango_grupo': 'grupo'}, 'rango <= %s OR rango_grupo <= %s',
+        [TOP_CATALOGO, CANDIDATOS_POR_GRUPO],
+    )
+
+    top, candidatos_por_grupo = [], {}
+    for fila in filas:
+        item = {'codigo': fila['codigo'], 'nombre': fila['nombre']}
+        if fila['rango'] <= TOP_CATALOGO:
+            top.append(item)
+        else:
+            candidatos_por_grupo.setdefault(fila['grupo'] or 'Sin grupo', []).append(item)
+    return {'top': top, 'candidatos_por_grupo': candidatos_por_grupo}
+
 
+def _muestrear_ingredientes_por_componente(frecuencias: dict) -> dict:
+    """
+    Para cada componente: el top 8 + 2 aleatorios para variedad. Estos
+    definen el ingrediente estrella de cada preparación.
+    """
+    return {
+        comp_id: datos['top'] + random.sample(
+            datos['candidatos'], min(EXTRAS_POR_COMPONENTE, len(datos['candidatos']))
+        )
+        for comp_id, datos in frecuencias.items()
+    }
+
+
+def _muestrear_catalogo_soporte(catalogo: dict, limit=40) -> list:
+    """Top 20 más frecuentes + muestra aleatoria por grupo para variedad."""
     rotacion = []
-    for items_grupo in grupos.values():
+    for items_grupo in catalogo['candidatos_por_grupo'].values():
         rotacion.extend(random.sample(items_grupo, min(2, len(items_grupo))))
 
     random.shuffle(rotacion)
-    extras = [i for i in rotacion if i['id_ingrediente_siesa__codigo'] not in codigos_top]
-    combinado = top_20 + extras[:limit - len(top_20)]
-
-    return [
-        {
-            'codigo': i['id_ingrediente_siesa__codigo'],
-            'nombre': i['id_ingrediente_siesa__nombre_del_alimento'],
-        }
-        for i in combinado
-    ]
+    return catalogo['top'] + rotacion[:limit - len(catalogo['top'])]
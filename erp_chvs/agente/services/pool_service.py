@@ -10,51 +10,86 @@ estado='disponible_pool' listos para ser tomados por los nutricionistas.
 import time
 import logging
 
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
 from agente.models import GeneracionIA
 
 logger = logging.getLogger(__name__)
 
+_CACHE_PREFIJO = 'agente:pool:'
+
+
+def contar_disponibles_bd(modalidad_id) -> int:
+    """Borradores en el pool para la modalidad, contados en la BD."""
+    return GeneracionIA.objects.filter(estado=GeneracionIA.ESTADO_POOL, id_modalidad_id=modalidad_id).count()
+
 
-def _crear_registros_borrador(generacion, preparaciones_validadas):
-    """Crea BorradorPreparacionIA + BorradorIngredienteIA para una generación."""
+def contar_disponibles(modalidad_id) -> int:
+    """
+    Borradores en el pool para la modalidad. Se cachea unos segundos
+    (AGENTE_POOL_CACHE_TTL) porque es de las consultas más frecuentes; los
+    cambios de estado de GeneracionIA la invalidan (señal en agente.models),
+    pero solo en el worker que hizo el cambio. Quien necesite el valor
+    exacto (el long-poll) usa contar_disponibles_bd().
+    """
+    return cache.get_or_set(
+        f'{_CACHE_PREFIJO}{modalidad_id}',
+        lambda: contar_disponibles_bd(modalidad_id),
+        settings.AGENTE_POOL_CACHE_TTL,
+    )
+
+
+def invalidar_disponibles(modalidad_id):
+    from agente.services.progreso import canal_pool, publicar
+
+    cache.delete(f'{_CACHE_PREFIJO}{modalidad_id}')
+    publicar(canal_pool(modalidad_id))
+
+
+def crear_registros_borrador(generacion, preparaciones_validadas):
+    """
+    Crea BorradorPreparacionIA + BorradorIngredienteIA para una generación:
+    dos consultas para resolver componentes y alimentos y un bulk_create
+    por tabla.
+    """
     from agente.models import BorradorPreparacionIA, BorradorIngredienteIA
     from nutricion.models import TablaAlimentos2018Icbf, ComponentesAlimentos
 
-    for prep in preparaciones_validadas:
-        componente_obj = None
-        if prep['id_componente']:
-            try:
-                componente_obj = ComponentesAlimentos.objects.get(
-                    id_componente=prep['id_componente']
-                )
-            except ComponentesAlimentos.DoesNotExist:
-                pass
-
-        prep_borrador = BorradorPreparacionIA.objects.create(
+    componentes = ComponentesAlimentos.objects.in_bulk(
+        {p['id_componente'] for p in preparaciones_validadas if p['id_componente']}
+    )
+    alimentos = TablaAlimentos2018Icbf.objects.in_bulk({
+        ing['codigo_icbf']
+        for p in preparaciones_validadas for ing in p['ingredientes']
+        if ing['estado_validacion'] == 'valido' and ing.get('codigo_icbf')
+    })
+
+    preparaciones = BorradorPreparacionIA.objects.bulk_create([
+        BorradorPreparacionIA(
             generacion=generacion,
             nombre_preparacion=prep['nombre'],
-            componente_sugerido=componente_obj,
+            componente_sugerido=componentes.get(prep['id_componente']),
             estado_validacion=prep['estado_validacion'],
             observaciones=prep['observaciones'],
             procedimiento=prep.get('procedimiento', ''),
         )
-
-        for ing in prep['ingredientes']:
-            alimento = None
-            if ing['estado_validacion'] == 'valido':
-                try:
-                    alimento = TablaAlimentos2018Icbf.objects.get(codigo=ing['codigo_icbf'])
-                except TablaAlimentos2018Icbf.DoesNotExist:
-                    pass
-
-            BorradorIngredienteIA.objects.create(
-                borrador_preparacion=prep_borrador,
-                codigo_icbf_sugerido=ing.get('codigo_icbf', ''),
-                nombre_sugerido=ing.get('nombre', ''),
-                alimento_icbf=alimento,
-                estado_validacion=ing['estado_validacion'],
-                observaciones=ing.get('observaciones', ''),
-            )
+        for prep in preparaciones_validadas
+    ])
+
+    BorradorIngredienteIA.objects.bulk_create([
+        BorradorIngredienteIA(
+            borrador_preparacion=prep_borrador,
+            codigo_icbf_sugerido=ing.get('codigo_icbf', ''),
+            nombre_sugerido=ing.get('nombre', ''),
+            alimento_icbf=alimentos.get(ing.get('codigo_icbf')) if ing['estado_validacion'] == 'valido' else None,
+            estado_validacion=ing['estado_validacion'],
+            observaciones=ing.get('observaciones', ''),
+        )
+        for prep_borrador, prep in zip(preparaciones, preparaciones_validadas)
+        for ing in prep['ingredientes']
+    ])
 
 
 # Modalidades que participan en el pool automático
@@ -123,9 +158,9 @@ def rellenar_pool(min_por_modalidad=20, pausa_entre_llamadas=1.5, ids_modalidad=
                 generacion.prompt_final = resultado['prompt']
                 generacion.respuesta_cruda = resultado['respuesta_cruda']
                 generacion.estado = GeneracionIA.ESTADO_POOL
-                generacion.save()
-
-                _crear_registros_borrador(generacion, preparaciones_validadas)
+                with transaction.atomic():
+                    crear_registros_borrador(generacion, preparaciones_validadas)
+                    generacion.save()
                 total_generados += 1
                 logger.info(f"[pool_service] {modalidad.modalidad} #{i+1}/{a_generar} → pool (ID {generacion.id})")
 
@@ -0,0 +1,152 @@
+"""
+Canal de progreso de las generaciones y lotes del agente.
+
+Los hilos de trabajo publican cada transición en un canal en memoria del
+proceso (un threading.Condition) y solo persisten en BD por bloques. Las
+vistas de long-poll esperan en el canal hasta que el estado cambie respecto
+a la firma que ya tiene el cliente; como el hilo puede correr en otro
+proceso del servidor, mientras esperan releen la BD cada INTERVALO_BD
+segundos como respaldo.
+"""
+
+import itertools
+import threading
+import time
+
+from django.utils import timezone
+
+TIMEOUT_ESPERA = 25  # Segundos máximos que una petición de long-poll queda abierta
+INTERVALO_BD = 5  # Cada cuánto se relee la BD mientras se espera
+PERSISTIR_CADA_ITEMS = 5
+PERSISTIR_CADA_SEGUNDOS = 10
+
+_condicion = threading.Condition()
+_eventos = {}  # canal -> (secuencia, estado | None)
+_secuencia = itertools.count(1)
+
+
+def canal_generacion(generacion_id) -> str:
+    return f'generacion:{generacion_id}'
+
+
+def canal_lote(lote_id) -> str:
+    return f'lote:{lote_id}'
+
+
+def canal_pool(modalidad_id) -> str:
+    return f'pool:{modalidad_id}'
+
+
+def publicar(canal: str, estado=None, final=False):
+    """
+    Publica el estado actual de un canal y despierta a quienes esperan.
+
+    estado=None indica "cambió, releer la BD". Con final=True el canal se
+    descarta: el estado final ya debe estar persistido y los clientes lo
+    leen de la BD.
+    """
+    with _condicion:
+        if final:
+            _eventos.pop(canal, None)
+        else:
+            _eventos[canal] = (next(_secuencia), estado)
+        _condicion.notify_all()
+
+
+def esperar_cambio(canal: str, firma_conocida, leer_bd, timeout=TIMEOUT_ESPERA, intervalo_bd=INTERVALO_BD) -> dict:
+    """
+    Espera hasta que el estado del canal tenga una firma distinta de
+    firma_conocida o venza el timeout, y retorna el estado en ese momento.
+
+    leer_bd() construye el estado desde la BD; cada estado es un dict con
+    la clave 'firma'.
+    """
+    limite = time.monotonic() + timeout
+    while True:
+        with _condicion:
+            evento = _eventos.get(canal)
+        if evento is not None and evento[1] is not None:
+            estado = evento[1]
+        else:
+            estado = leer_bd()
+
+        restante = limite - time.monotonic()
+        if estado['firma'] != firma_conocida or restante <= 0:
+            return estado
+
+        with _condicion:
+            _condicion.wait_for(lambda: _eventos.get(canal) is not evento, timeout=min(restante, intervalo_bd))
+
+
+# ── Estados ───────────────────────────────────────────────────────────────────
+
+def estado_generacion(generacion, paso=None) -> dict:
+    error = generacion.errores_validacion[0] if generacion.errores_validacion else None
+    return {
+        'ok': True,
+        'generacion_id': generacion.id,
+        'estado': generacion.estado,
+        'paso': paso,
+        'error': error,
+        'firma': f'{generacion.estado}:{paso or ""}',
+    }
+
+
+def estado_lote(lote) -> dict:
+    return {
+        'ok': True,
+        'lote_id': lote.id,
+        'estado': lote.estado,
+        'cantidad_total': lote.cantidad_total,
+        'cantidad_procesada': lote.cantidad_procesada,
+        'cantidad_exitosa': lote.cantidad_exitosa,
+        'cantidad_fallida': lote.cantidad_fallida,
+        'resultados': lote.resultados,
+        'fecha_fin': lote.fecha_fin.isoformat() if lote.fecha_fin else None,
+        'firma': f'{lote.estado}:{lote.cantidad_procesada}',
+    }
+
+
+class ProgresoLote:
+    """
+    Acumula el avance de un LoteGeneracion: publica cada ítem en el canal y
+    lo persiste cada `cada_items` ítems o `cada_segundos` segundos (y
+    siempre al finalizar).
+    """
+
+    CAMPOS = ['cantidad_procesada', 'cantidad_exitosa', 'cantidad_fallida', 'resultados']
+
+    def __init__(self, lote, cada_items=PERSISTIR_CADA_ITEMS, cada_segundos=PERSISTIR_CADA_SEGUNDOS):
+        self.lote = lote
+        self.canal = canal_lote(lote.id)
+        self.cada_items = cada_items
+        self.cada_segundos = cada_segundos
+        self._pendientes = 0
+        self._ultimo_guardado = time.monotonic()
+
+    def registrar(self, resultado: dict):
+        """Registra el resultado de un ítem ({'num', 'ok', ...})."""
+        lote = self.lote
+        if resultado['ok']:
+            lote.cantidad_exitosa += 1
+        else:
+            lote.cantidad_fallida += 1
+        lote.resultados = lote.resultados + [resultado]
+        lote.cantidad_procesada += 1
+        self._pendientes += 1
+
+        if (self._pendientes >= self.cada_items
+                or time.monotonic() - self._ultimo_guardado >= self.cada_segundos):
+            self.persistir()
+        publicar(self.canal, estado_lote(lote))
+
+    def persistir(self, campos_extra=()):
+        self.lote.save(update_fields=self.CAMPOS + list(campos_extra))
+        self._pendientes = 0
+        self._ultimo_guardado = time.monotonic()
+
+    def finalizar(self, estado):
+        self.lote.estado = estado
+        self.lote.fecha_fin = timezone.now()
+        self.persistir(campos_extra=['estado', 'fecha_fin'])
+        publicar(self.canal, final=True)
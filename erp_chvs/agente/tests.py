@@ -1,3 +1,237 @@
-from django.test import TestCase
+import threading
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from nutricion.models import (
+    ComponentesAlimentos, ComponentesModalidades, GruposAlimentos, TablaAlimentos2018Icbf,
+    TablaMenus, TablaPreparacionIngredientes, TablaPreparaciones,
+)
+from planeacion.models import Programa
+from principal.models import ModalidadesDeConsumo, PrincipalMunicipio
+
+from .models import BorradorIngredienteIA, GeneracionIA, LoteGeneracion
+from .services import context_builder, progreso
+from .services.context_builder import obtener_contexto_base, obtener_contexto_modalidad
+from .services.pool_service import contar_disponibles, crear_registros_borrador
+
+
+class ContextoModalidadTests(TestCase):
+    """Contexto del agente: frecuencias rankeadas en SQL y parte determinista cacheada."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.modalidad = ModalidadesDeConsumo.objects.create(
+            id_modalidades='modctx', modalidad='ALMUERZO', cod_modalidad='ALM'
+        )
+        municipio = PrincipalMunicipio.objects.create(
+            codigo_municipio=44444, nombre_municipio='Municipio CTX', codigo_departamento='76'
+        )
+        programa = Programa.objects.create(
+            programa='Programa CTX', contrato='CT-CTX', municipio=municipio, tipo_programa_id='pae',
+            fecha_inicial=date(2026, 1, 1), fecha_final=date(2026, 12, 31), estado='activo',
+        )
+        grupo = GruposAlimentos.objects.create(id_grupo_alimentos='grp_ctx', grupo_alimentos='Cereales')
+        cls.componentes = [
+            ComponentesAlimentos.objects.create(id_componente=f'ctx{i}', componente=f'Componente {i}', id_grupo_alimentos=grupo)
+            for i in range(2)
+        ]
+        for componente in cls.componentes:
+            ComponentesModalidades.objects.create(id_componente=componente, id_modalidad=cls.modalidad)
+
+        alimentos = [
+            TablaAlimentos2018Icbf.objects.create(
+                codigo=f'C{i:02d}', nombre_del_alimento=f'Alimento {i:02d}', humedad_g=Decimal('80'),
+                energia_kcal=100, energia_kj=418, proteina_g=Decimal('3'), lipidos_g=Decimal('3'),
+                carbohidratos_totales_g=Decimal('10'), calcio_mg=100, hierro_mg=Decimal('1'), sodio_mg=50,
+            )
+            for i in range(40)
+        ]
+        # Menú i: el alimento j entra en la preparación del componente 0 si j >= i,
+        # así la frecuencia sube con j (C39 es el más usado).
+        cls.menus = []
+        for i in range(40):
+            menu = TablaMenus.objects.create(menu=str(i + 1), id_modalidad=cls.modalidad, id_contrato=programa)
+            cls.menus.append(menu)
+            preparacion = TablaPreparaciones.objects.create(
+                preparacion=f'Arroz {i}', id_menu=menu, id_componente=cls.componentes[0]
+            )
+            TablaPreparacionIngredientes.objects.bulk_create([
+                TablaPreparacionIngredientes(id_preparacion=preparacion, id_ingrediente_siesa=a)
+                for a in alimentos[i:]
+            ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_frecuencias_por_componente_limitadas_en_sql(self):
+        base = obtener_contexto_base(self.modalidad.id_modalidades)
+        frecuencias = base['frecuencias_componente']
+
+        self.assertEqual(list(frecuencias), ['ctx0', 'ctx1'])
+        self.assertEqual([i['codigo'] for i in frecuencias['ctx0']['top']], [f'C{j:02d}' for j in range(39, 31, -1)])
+        self.assertEqual(len(frecuencias['ctx0']['candidatos']), context_builder.CANDIDATOS_EXTRAS_COMPONENTE)
+        self.assertEqual(frecuencias['ctx1'], {'top': [], 'candidatos': []})
+        self.assertEqual(len(base['catalogo']['top']), context_builder.TOP_CATALOGO)
+
+        contexto = obtener_contexto_modalidad(self.modalidad.id_modalidades)
+        self.assertEqual(len(contexto['ingredientes_por_componente']['ctx0']), 10)
+        self.assertLessEqual(len(contexto['catalogo_soporte']), 40)
+        self.assertEqual(len(contexto['menus_similares']), 5)
+
+    def test_parte_determinista_cacheada_e_invalidada(self):
+        obtener_contexto_modalidad(self.modalidad.id_modalidades)
+        # Con la base en caché solo se consultan los 5 menús de muestra y sus prefetch
+        with self.assertNumQueries(5):
+            obtener_contexto_modalidad(self.modalidad.id_modalidades)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sopa = TablaPreparaciones.objects.create(
+                preparacion='Sopa', id_menu=self.menus[0], id_componente=self.componentes[1]
+            )
+            TablaPreparacionIngredientes.objects.create(id_preparacion=sopa, id_ingrediente_siesa_id='C00')
+        base = obtener_contexto_base(self.modalidad.id_modalidades)
+        self.assertEqual([i['codigo'] for i in base['frecuencias_componente']['ctx1']['top']], ['C00'])
+        self.assertEqual(len(base['ids_menus']), 40)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.menus[-1].delete()
+        self.assertEqual(len(obtener_contexto_base(self.modalidad.id_modalidades)['ids_menus']), 39)
+
+    def test_invalidacion_llega_a_otros_workers(self):
+        def worker(nombre):
+            # Caché local propia de cada worker; la de versiones es compartida
+            return override_settings(CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': nombre},
+                'versiones': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-versiones'},
+            })
+
+        with worker('worker-b'):
+            self.assertEqual(len(obtener_contexto_base(self.modalidad.id_modalidades)['ids_menus']), 40)
+        with worker('worker-a'), self.captureOnCommitCallbacks(execute=True):
+            self.menus[-1].delete()
+        with worker('worker-b'):
+            self.assertEqual(len(obtener_contexto_base(self.modalidad.id_modalidades)['ids_menus']), 39)
+
+
+class ProgresoAgenteTests(TestCase):
+    """Canal de progreso (long-poll), persistencia por bloques y borradores en bloque."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('agente', 'a@x.com', 'x')
+        cls.modalidad = ModalidadesDeConsumo.objects.create(
+            id_modalidades='modprg', modalidad='REFRIGERIO', cod_modalidad='REF'
+        )
+        grupo = GruposAlimentos.objects.create(id_grupo_alimentos='grp_prg', grupo_alimentos='Lácteos')
+        ComponentesAlimentos.objects.create(id_componente='prg0', componente='Bebida', id_grupo_alimentos=grupo)
+        for codigo in ('P01', 'P02'):
+            TablaAlimentos2018Icbf.objects.create(
+                codigo=codigo, nombre_del_alimento=f'Alimento {codigo}', humedad_g=Decimal('80'),
+                energia_kcal=100, energia_kj=418, proteina_g=Decimal('3'), lipidos_g=Decimal('3'),
+                carbohidratos_totales_g=Decimal('10'), calcio_mg=100, hierro_mg=Decimal('1'), sodio_mg=50,
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_esperar_cambio_despierta_al_publicar(self):
+        canal = 'prueba:despertar'
+        temporizador = threading.Timer(0.1, progreso.publicar, args=(canal, {'firma': 'b'}))
+        temporizador.start()
+        estado = progreso.esperar_cambio(canal, 'a', lambda: {'firma': 'a'}, timeout=5)
+        temporizador.join()
+        self.assertEqual(estado, {'firma': 'b'})
+
+        # Al cerrar el canal se vuelve a leer la BD; sin cambios vence la espera
+        progreso.publicar(canal, final=True)
+        self.assertEqual(progreso.esperar_cambio(canal, 'a', lambda: {'firma': 'a'}, timeout=0.05), {'firma': 'a'})
+
+    def test_lote_persiste_por_bloques(self):
+        lote = LoteGeneracion.objects.create(usuario=self.usuario, modalidad=self.modalidad, cantidad_total=4)
+        avance = progreso.ProgresoLote(lote, cada_items=3, cada_segundos=3600)
+        for num in range(1, 5):
+            avance.registrar({'num': num, 'ok': num != 2})
+
+        guardado = LoteGeneracion.objects.get(id=lote.id)
+        self.assertEqual((guardado.cantidad_procesada, guardado.cantidad_fallida), (3, 1))
+
+        # El long-poll ve el avance en memoria antes de que se persista
+        self.client.force_login(self.usuario)
+        with self.assertNumQueries(3):  # sesión, usuario y el lote
+            datos = self.client.get(
+                f'/agente/api/lote/{lote.id}/esperar/', {'firma': 'procesando:3'}, secure=True
+            ).json()
+        self.assertEqual((datos['cantidad_procesada'], datos['firma']), (4, 'procesando:4'))
+
+        avance.finalizar(LoteGeneracion.COMPLETADO)
+        guardado.refresh_from_db()
+        self.assertEqual((guardado.estado, guardado.cantidad_procesada, len(guardado.resultados)), ('completado', 4, 4))
+        datos = self.client.get(f'/agente/api/lote/{lote.id}/esperar/', {'firma': 'procesando:4'}, secure=True).json()
+        self.assertEqual(datos['firma'], 'completado:4')
+
+    def test_esperar_generacion_y_pool_disponible(self):
+        generacion = GeneracionIA.objects.create(id_modalidad=self.modalidad, usuario_solicitante=self.usuario)
+        self.client.force_login(self.usuario)
+
+        datos = self.client.get(f'/agente/api/generar/{generacion.id}/esperar/', secure=True).json()
+        self.assertEqual((datos['estado'], datos['firma']), ('procesando', 'procesando:'))
+        progreso.publicar(progreso.canal_generacion(generacion.id), progreso.estado_generacion(generacion, 'generando'))
+        datos = self.client.get(
+            f'/agente/api/generar/{generacion.id}/esperar/', {'firma': datos['firma']}, secure=True
+        ).json()
+        self.assertEqual(datos['paso'], 'generando')
+        progreso.publicar(progreso.canal_generacion(generacion.id), final=True)
+
+        self.assertEqual(contar_disponibles(self.modalidad.id_modalidades), 0)
+        with self.assertNumQueries(0):
+            contar_disponibles(self.modalidad.id_modalidades)
+        with self.captureOnCommitCallbacks(execute=True):
+            generacion.estado = GeneracionIA.ESTADO_POOL
+            generacion.save()
+        datos = self.client.get(
+            '/agente/api/lote/pool-disponible/',
+            {'modalidad_id': self.modalidad.id_modalidades, 'disponibles': 0}, secure=True,
+        ).json()
+        self.assertEqual(datos, {'ok': True, 'disponibles': 1})
+
+    def test_long_poll_del_pool_no_usa_la_cache_local(self):
+        self.client.force_login(self.usuario)
+        self.assertEqual(contar_disponibles(self.modalidad.id_modalidades), 0)
+
+        # Otro worker pasa un borrador al pool: la caché de este worker sigue en 0
+        generacion = GeneracionIA.objects.create(id_modalidad=self.modalidad)
+        GeneracionIA.objects.filter(pk=generacion.pk).update(estado=GeneracionIA.ESTADO_POOL)
+        self.assertEqual(contar_disponibles(self.modalidad.id_modalidades), 0)
+
+        datos = self.client.get(
+            '/agente/api/lote/pool-disponible/',
+            {'modalidad_id': self.modalidad.id_modalidades, 'disponibles': 0}, secure=True,
+        ).json()
+        self.assertEqual(datos, {'ok': True, 'disponibles': 1})
+
+    def test_crear_registros_borrador_en_bloque(self):
+        generacion = GeneracionIA.objects.create(id_modalidad=self.modalidad)
+        preparaciones = [
+            {
+                'nombre': f'Preparación {i}', 'id_componente': 'prg0' if i else 'NOEXISTE',
+                'estado_validacion': 'valida', 'observaciones': '',
+                'ingredientes': [
+                    {'codigo_icbf': 'P01', 'nombre': 'Uno', 'estado_validacion': 'valido'},
+                    {'codigo_icbf': 'P02', 'nombre': 'Dos', 'estado_validacion': 'valido'},
+                    {'codigo_icbf': 'X99', 'nombre': 'Tres', 'estado_validacion': 'no_encontrado'},
+                ],
+            }
+            for i in range(3)
+        ]
+        with self.assertNumQueries(4):
+            crear_registros_borrador(generacion, preparaciones)
+
+        preps = list(generacion.preparaciones.all())
+        self.assertEqual([p.componente_sugerido_id for p in preps], [None, 'prg0', 'prg0'])
+        ingredientes = BorradorIngredienteIA.objects.filter(borrador_preparacion__generacion=generacion)
+        self.assertEqual(ingredientes.count(), 9)
+        self.assertEqual(ingredientes.filter(alimento_icbf__isnull=False).count(), 6)
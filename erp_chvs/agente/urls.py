@@ -11,6 +11,7 @@ urlpatterns = [
     path('api/menus/', views.api_menus_por_programa_modalidad, name='api_menus'),
     path('api/generar/', views.api_generar, name='api_generar'),
     path('api/generar/<int:generacion_id>/estado/', views.api_estado_generacion, name='api_estado_generacion'),
+    path('api/generar/<int:generacion_id>/esperar/', views.api_esperar_generacion, name='api_esperar_generacion'),
     path('api/aprobar/<int:generacion_id>/', views.api_aprobar, name='api_aprobar'),
     path('api/descartar/<int:generacion_id>/', views.api_descartar, name='api_descartar'),
     path('api/rechazar/<int:generacion_id>/', views.api_rechazar_borrador, name='api_rechazar_borrador'),
@@ -25,6 +26,7 @@ urlpatterns = [
     path('api/lote/pool-disponible/', views.api_pool_disponible, name='api_pool_disponible'),
     path('api/lote/iniciar/', views.api_iniciar_lote, name='api_iniciar_lote'),
     path('api/lote/<int:lote_id>/estado/', views.api_estado_lote, name='api_estado_lote'),
+    path('api/lote/<int:lote_id>/esperar/', views.api_esperar_lote, name='api_esperar_lote'),
     path('api/lote/crear-menus/', views.api_crear_menus_lote, name='api_crear_menus_lote'),
     path('api/lote/borradores/', views.api_borradores_pendientes, name='api_borradores_pendientes'),
 ]
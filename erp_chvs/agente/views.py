@@ -10,72 +10,37 @@ from django.shortcuts import get_object_or_404, render
 from django.utils import timezone
 from django.views.decorators.http import require_POST
 
-from nutricion.models import (
-    TablaMenus, TablaAlimentos2018Icbf, ComponentesAlimentos
-)
+from nutricion.models import TablaMenus, TablaAlimentos2018Icbf
 from planeacion.models import Programa
 from principal.models import ModalidadesDeConsumo
 
 from .models import GeneracionIA, BorradorPreparacionIA, BorradorIngredienteIA, LoteGeneracion
+from .services import progreso
 from .services.context_builder import obtener_contexto_modalidad
 from .services.llm_service import generar_borrador
 from .services.validador import validar_preparaciones
 from .services.importador import importar_borrador
+from .services.pool_service import contar_disponibles, contar_disponibles_bd, crear_registros_borrador
 
 logger = logging.getLogger(__name__)
 
 
 # ── Helpers internos ─────────────────────────────────────────────────────────
 
-def _guardar_borradores(generacion, preparaciones_validadas):
-    """Crea BorradorPreparacionIA + BorradorIngredienteIA a partir de preparaciones validadas."""
-    for prep in preparaciones_validadas:
-        componente_obj = None
-        if prep['id_componente']:
-            try:
-                componente_obj = ComponentesAlimentos.objects.get(
-                    id_componente=prep['id_componente']
-                )
-            except ComponentesAlimentos.DoesNotExist:
-                pass
-
-        prep_borrador = BorradorPreparacionIA.objects.create(
-            generacion=generacion,
-            nombre_preparacion=prep['nombre'],
-            componente_sugerido=componente_obj,
-            estado_validacion=prep['estado_validacion'],
-            observaciones=prep['observaciones'],
-            procedimiento=prep.get('procedimiento', ''),
-        )
-
-        for ing in prep['ingredientes']:
-            alimento = None
-            if ing['estado_validacion'] == 'valido':
-                try:
-                    alimento = TablaAlimentos2018Icbf.objects.get(codigo=ing['codigo_icbf'])
-                except TablaAlimentos2018Icbf.DoesNotExist:
-                    pass
-
-            BorradorIngredienteIA.objects.create(
-                borrador_preparacion=prep_borrador,
-                codigo_icbf_sugerido=ing.get('codigo_icbf', ''),
-                nombre_sugerido=ing.get('nombre', ''),
-                alimento_icbf=alimento,
-                estado_validacion=ing['estado_validacion'],
-                observaciones=ing.get('observaciones', ''),
-            )
-
-
 def _ejecutar_generacion(generacion_id, modalidad_id, ocasion_especial, estado_final):
     """
     Ejecuta el ciclo completo de generación para un GeneracionIA ya creado.
-    Llamar desde un hilo de background.
+    Llamar desde un hilo de background. Los pasos intermedios solo se
+    publican en el canal de progreso; en BD se escribe una vez, al final.
     estado_final: GeneracionIA.ESTADO_PENDIENTE o GeneracionIA.ESTADO_POOL
     """
     from django.db import connection as db_conn
+    canal = progreso.canal_generacion(generacion_id)
     try:
         generacion = GeneracionIA.objects.get(id=generacion_id)
+        progreso.publicar(canal, progreso.estado_generacion(generacion, 'contexto'))
         contexto = obtener_contexto_modalidad(modalidad_id)
+        progreso.publicar(canal, progreso.estado_generacion(generacion, 'generando'))
         resultado_llm = generar_borrador(contexto, ocasion_especial)
 
         if not resultado_llm['ok']:
@@ -84,14 +49,16 @@ def _ejecutar_generacion(generacion_id, modalidad_id, ocasion_especial, estado_f
             generacion.save()
             return
 
+        progreso.publicar(canal, progreso.estado_generacion(generacion, 'validando'))
         preparaciones_validadas = validar_preparaciones(resultado_llm['preparaciones'])
 
         generacion.prompt_final = resultado_llm['prompt']
         generacion.respuesta_cruda = resultado_llm['respuesta_cruda']
         generacion.estado = estado_final
-        generacion.save()
-
-        _guardar_borradores(generacion, preparaciones_validadas)
+        # El estado final solo se ve cuando los borradores ya existen
+        with transaction.atomic():
+            crear_registros_borrador(generacion, preparaciones_validadas)
+            generacion.save()
 
     except Exception as e:
         logger.error(f"Error en hilo de generación [{generacion_id}]: {e}")
@@ -103,14 +70,20 @@ def _ejecutar_generacion(generacion_id, modalidad_id, ocasion_especial, estado_f
         except Exception:
             pass
     finally:
+        progreso.publicar(canal, final=True)
         db_conn.close()
 
 
 def _hilo_lote(lote_id):
-    """Hilo de background para generar N borradores en lote (para el pool)."""
+    """
+    Hilo de background para generar N borradores en lote (para el pool).
+    El avance se publica por ítem y se persiste por bloques (ProgresoLote).
+    """
     from django.db import connection as db_conn
+    avance = None
     try:
         lote = LoteGeneracion.objects.get(id=lote_id)
+        avance = progreso.ProgresoLote(lote)
         modalidad_id = lote.modalidad_id
         ocasion = lote.ocasion_especial
         cantidad = lote.cantidad_total
@@ -131,42 +104,38 @@ def _hilo_lote(lote_id):
                     generacion.estado = GeneracionIA.ESTADO_ERROR
                     generacion.errores_validacion = [resultado_llm.get('error', 'Error')]
                     generacion.save()
-                    lote.cantidad_fallida += 1
-                    lote.resultados = lote.resultados + [{'num': i + 1, 'ok': False, 'error': resultado_llm.get('error', 'Error LLM')}]
+                    avance.registrar({'num': i + 1, 'ok': False, 'error': resultado_llm.get('error', 'Error LLM')})
                 else:
                     preparaciones_validadas = validar_preparaciones(resultado_llm['preparaciones'])
                     generacion.prompt_final = resultado_llm['prompt']
                     generacion.respuesta_cruda = resultado_llm['respuesta_cruda']
                     generacion.estado = GeneracionIA.ESTADO_POOL
-                    generacion.save()
-                    _guardar_borradores(generacion, preparaciones_validadas)
-                    lote.cantidad_exitosa += 1
-                    lote.resultados = lote.resultados + [{'num': i + 1, 'ok': True, 'generacion_id': generacion.id}]
+                    with transaction.atomic():
+                        crear_registros_borrador(generacion, preparaciones_validadas)
+                        generacion.save()
+                    avance.registrar({'num': i + 1, 'ok': True, 'generacion_id': generacion.id})
 
             except Exception as e:
                 logger.error(f"Error en lote {lote_id} item {i + 1}: {e}")
-                lote.cantidad_fallida += 1
-                lote.resultados = lote.resultados + [{'num': i + 1, 'ok': False, 'error': str(e)}]
-
-            lote.cantidad_procesada = i + 1
-            lote.save(update_fields=['cantidad_procesada', 'cantidad_exitosa', 'cantidad_fallida', 'resultados'])
+                avance.registrar({'num': i + 1, 'ok': False, 'error': str(e)})
 
             if i < cantidad - 1:
                 time.sleep(1.5)
 
-        lote.estado = LoteGeneracion.COMPLETADO
-        lote.fecha_fin = timezone.now()
-        lote.save(update_fields=['estado', 'fecha_fin'])
+        avance.finalizar(LoteGeneracion.COMPLETADO)
 
     except Exception as e:
         logger.error(f"Error crítico en lote {lote_id}: {e}")
         try:
-            lote = LoteGeneracion.objects.get(id=lote_id)
-            lote.estado = LoteGeneracion.ERROR
-            lote.fecha_fin = timezone.now()
-            lote.save(update_fields=['estado', 'fecha_fin'])
+            if avance is not None:
+                avance.finalizar(LoteGeneracion.ERROR)
+            else:
+                LoteGeneracion.objects.filter(id=lote_id).update(
+                    estado=LoteGeneracion.ERROR, fecha_fin=timezone.now()
+                )
         except Exception:
             pass
+        progreso.publicar(progreso.canal_lote(lote_id), final=True)
     finally:
         db_conn.close()
 
@@ -337,12 +306,27 @@ def api_generar(request):
 def api_estado_generacion(request, generacion_id):
     """Consulta el estado de una generación individual (para polling desde el frontend)."""
     generacion = get_object_or_404(GeneracionIA, id=generacion_id)
-    return JsonResponse({
-        'ok': True,
-        'estado': generacion.estado,
-        'generacion_id': generacion.id,
-        'error': generacion.errores_validacion[0] if generacion.errores_validacion else None,
-    })
+    return JsonResponse(progreso.estado_generacion(generacion))
+
+
+@login_required
+def api_esperar_generacion(request, generacion_id):
+    """
+    GET /agente/api/generar/<id>/esperar/?firma=<firma>
+    Long-poll: responde cuando el estado de la generación tiene una firma
+    distinta de la recibida (o al vencer la espera) con el mismo formato
+    de api_estado_generacion.
+    """
+    generacion = get_object_or_404(GeneracionIA, id=generacion_id)
+
+    def leer_bd():
+        generacion.refresh_from_db(fields=['estado', 'errores_validacion'])
+        return progreso.estado_generacion(generacion)
+
+    estado = progreso.esperar_cambio(
+        progreso.canal_generacion(generacion_id), request.GET.get('firma'), leer_bd
+    )
+    return JsonResponse(estado)
 
 
 @login_required
@@ -487,19 +471,26 @@ def api_buscar_alimento(request):
 @login_required
 def api_pool_disponible(request):
     """
-    GET /agente/api/lote/pool-disponible/?modalidad_id=X
+    GET /agente/api/lote/pool-disponible/?modalidad_id=X[&disponibles=N]
     Retorna cuántos borradores hay en el pool para la modalidad indicada.
+    Con `disponibles` espera (long-poll) hasta que la cantidad sea otra.
     """
     modalidad_id = request.GET.get('modalidad_id')
     if not modalidad_id:
         return JsonResponse({'ok': False, 'error': 'Falta modalidad_id'}, status=400)
 
-    cantidad = GeneracionIA.objects.filter(
-        estado=GeneracionIA.ESTADO_POOL,
-        id_modalidad_id=modalidad_id,
-    ).count()
+    conocidos = request.GET.get('disponibles')
+    if conocidos is None:
+        return JsonResponse({'ok': True, 'disponibles': contar_disponibles(modalidad_id)})
 
-    return JsonResponse({'ok': True, 'disponibles': cantidad})
+    # Long-poll: esperar a que el pool cambie respecto a lo que ya tiene el cliente.
+    # Se relee la BD y no la caché local: el cambio pudo ocurrir en otro worker.
+    def leer_bd():
+        cantidad = contar_disponibles_bd(modalidad_id)
+        return {'ok': True, 'disponibles': cantidad, 'firma': str(cantidad)}
+
+    estado = progreso.esperar_cambio(progreso.canal_pool(modalidad_id), conocidos, leer_bd)
+    return JsonResponse({'ok': True, 'disponibles': estado['disponibles']})
 
 
 @login_required
@@ -601,17 +592,24 @@ def api_estado_lote(request, lote_id):
     Retorna el estado actual del lote para polling desde el frontend.
     """
     lote = get_object_or_404(LoteGeneracion, id=lote_id, usuario=request.user)
-    return JsonResponse({
-        'ok': True,
-        'lote_id': lote.id,
-        'estado': lote.estado,
-        'cantidad_total': lote.cantidad_total,
-        'cantidad_procesada': lote.cantidad_procesada,
-        'cantidad_exitosa': lote.cantidad_exitosa,
-        'cantidad_fallida': lote.cantidad_fallida,
-        'resultados': lote.resultados,
-        'fecha_fin': lote.fecha_fin.isoformat() if lote.fecha_fin else None,
-    })
+    return JsonResponse(progreso.estado_lote(lote))
+
+
+@login_required
+def api_esperar_lote(request, lote_id):
+    """
+    GET /agente/api/lote/<lote_id>/esperar/?firma=<firma>
+    Long-poll del avance del lote; mismo formato que api_estado_lote. El
+    avance en memoria del hilo llega antes que su persistencia por bloques.
+    """
+    lote = get_object_or_404(LoteGeneracion, id=lote_id, usuario=request.user)
+
+    def leer_bd():
+        lote.refresh_from_db()
+        return progreso.estado_lote(lote)
+
+    estado = progreso.esperar_cambio(progreso.canal_lote(lote_id), request.GET.get('firma'), leer_bd)
+    return JsonResponse(estado)
 
 
 @login_required
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CertificadoCalidad
+from .models import CertificadoCalidad, EmpleadoEspejo
 
 
 @admin.register(CertificadoCalidad)
@@ -8,3 +8,11 @@ class CertificadoCalidadAdmin(admin.ModelAdmin):
     list_filter = ('tipo_empleado', 'fecha_emision')
     search_fields = ('cedula', 'nombre_completo', 'numero_certificado')
     readonly_fields = ('numero_certificado', 'fecha_emision')
+
+
+@admin.register(EmpleadoEspejo)
+class EmpleadoEspejoAdmin(admin.ModelAdmin):
+    list_display = ('cedula', 'nombre_completo', 'cargo', 'tipo_empleado', 'fecha_sincronizacion')
+    list_filter = ('tipo_empleado',)
+    search_fields = ('cedula', 'nombre_completo')
+    readonly_fields = ('fecha_sincronizacion',)
@@ -0,0 +1,40 @@
+"""
+Management command: sincronizar_empleados
+
+Refresca el espejo local de la BD externa de empleados (calidad_empleados_espejo).
+Requiere EMPLEADOS_DB_URL. Para que las búsquedas usen el espejo, activar
+EMPLEADOS_USAR_ESPEJO=True.
+
+Uso:
+    python manage.py sincronizar_empleados
+    python manage.py sincronizar_empleados --lote 5000
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from calidad.services import cerrar_pool, sincronizar_espejo_empleados
+
+
+class Command(BaseCommand):
+    help = 'Copia los empleados de la BD externa al espejo local de calidad.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=2000,
+            help='Filas por lote al leer y escribir (default: 2000)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            resultado = sincronizar_espejo_empleados(tamano_lote=options['lote'])
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+        finally:
+            cerrar_pool()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Espejo actualizado — Sincronizados: {resultado['sincronizados']} | "
+            f"Eliminados: {resultado['eliminados']}"
+        ))
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calidad', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmpleadoEspejo',
+            fields=[
+                ('cedula', models.CharField(max_length=20, primary_key=True, serialize=False, verbose_name='Cédula')),
+                ('nombre_completo', models.CharField(max_length=200, verbose_name='Nombre Completo')),
+                ('cargo', models.CharField(blank=True, max_length=200, verbose_name='Cargo')),
+                ('eps', models.CharField(blank=True, max_length=200, verbose_name='EPS')),
+                ('programa_empresa', models.CharField(blank=True, max_length=300, verbose_name='Programa / Empresa')),
+                ('tipo_empleado', models.CharField(choices=[('manipuladora', 'Manipuladora de Alimentos'), ('planta', 'Personal de Planta'), ('aprendiz', 'Aprendiz SENA')], max_length=20, verbose_name='Tipo de Empleado')),
+                ('fecha_sincronizacion', models.DateTimeField(verbose_name='Fecha de Sincronización')),
+            ],
+            options={
+                'verbose_name': 'Empleado (espejo)',
+                'verbose_name_plural': 'Empleados (espejo)',
+                'db_table': 'calidad_empleados_espejo',
+                'ordering': ['nombre_completo'],
+            },
+        ),
+    ]
@@ -1,5 +1,9 @@
 import datetime
-from django.db import models
+import zlib
+
+from django.db import connection, models, transaction
+from django.db.models import IntegerField, Max
+from django.db.models.functions import Cast, Substr
 from django.contrib.auth.models import User
 
 
@@ -36,10 +40,55 @@ class CertificadoCalidad(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.numero_certificado:
-            self.numero_certificado = self._generar_numero()
+            with transaction.atomic():
+                self.numero_certificado = self.reservar_numeros(1)[0]
+                super().save(*args, **kwargs)
+            return
         super().save(*args, **kwargs)
 
-    def _generar_numero(self):
+    @classmethod
+    def reservar_numeros(cls, cantidad: int) -> list:
+        """
+        Reserva `cantidad` números consecutivos CC-<año>-NNNN con una sola consulta.
+
+        Debe llamarse dentro de transaction.atomic(): en PostgreSQL toma un
+        advisory lock por año hasta el commit, para que dos lotes concurrentes
+        no calculen el mismo consecutivo.
+        """
         year = datetime.date.today().year
-        count = CertificadoCalidad.objects.filter(fecha_emision__year=year).count() + 1
-        return f"CC-{year}-{count:04d}"
+        prefijo = f"CC-{year}-"
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", [zlib.crc32(prefijo.encode())])
+        ultimo = (
+            cls.objects
+            .filter(numero_certificado__startswith=prefijo)
+            .aggregate(n=Max(Cast(Substr('numero_certificado', len(prefijo) + 1), IntegerField())))
+        )['n'] or 0
+        return [f"{prefijo}{n:04d}" for n in range(ultimo + 1, ultimo + cantidad + 1)]
+
+
+class EmpleadoEspejo(models.Model):
+    """
+    Copia local de la BD externa de empleados (manipuladoras, planta, aprendices).
+    Se refresca con `python manage.py sincronizar_empleados` y se consulta antes
+    que la BD externa cuando EMPLEADOS_USAR_ESPEJO está activo.
+    """
+    cedula = models.CharField(max_length=20, primary_key=True, verbose_name='Cédula')
+    nombre_completo = models.CharField(max_length=200, verbose_name='Nombre Completo')
+    cargo = models.CharField(max_length=200, blank=True, verbose_name='Cargo')
+    eps = models.CharField(max_length=200, blank=True, verbose_name='EPS')
+    programa_empresa = models.CharField(max_length=300, blank=True, verbose_name='Programa / Empresa')
+    tipo_empleado = models.CharField(
+        max_length=20, choices=CertificadoCalidad.TIPO_EMPLEADO_CHOICES, verbose_name='Tipo de Empleado'
+    )
+    fecha_sincronizacion = models.DateTimeField(verbose_name='Fecha de Sincronización')
+
+    class Meta:
+        db_table = 'calidad_empleados_espejo'
+        ordering = ['nombre_completo']
+        verbose_name = 'Empleado (espejo)'
+        verbose_name_plural = 'Empleados (espejo)'
+
+    def __str__(self):
+        return f"{self.cedula} - {self.nombre_completo}"
@@ -1,4 +1,5 @@
 import logging
+from functools import lru_cache
 from io import BytesIO
 from pathlib import Path
 
@@ -42,7 +43,11 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 LOGO_STATIC_REL = "calidad/images/logo.jpeg"
 FIRMA_STATIC_REL = "calidad/images/firma.png"
 
+# Subir al cambiar el diseño del certificado: invalida los PDFs cacheados.
+PLANTILLA_VERSION = "1"
 
+
+@lru_cache(maxsize=None)
 def _resolver_static_image(static_rel_path: str) -> Path | None:
     """Resuelve un estático en dev/prod para uso de ReportLab (ruta de archivo local)."""
     found = finders.find(static_rel_path)
@@ -92,6 +97,22 @@ def generar_certificado_calidad_pdf(certificado) -> BytesIO:
     return buffer
 
 
+def generar_certificados_lote_pdf(certificados: list) -> BytesIO:
+    """
+    Genera un solo PDF con una página (carta horizontal) por certificado.
+    Al compartir el canvas, logo y firma se incrustan una sola vez en el archivo.
+    """
+    buffer = BytesIO()
+    ancho, alto = landscape(LETTER)
+    c = canvas.Canvas(buffer, pagesize=landscape(LETTER))
+    for cert in certificados:
+        _dibujar_pagina(c, cert, ancho, alto)
+        c.showPage()
+    c.save()
+    buffer.seek(0)
+    return buffer
+
+
 def _dibujar_pagina(c: canvas.Canvas, cert, w: float, h: float):
     margin = 0.6 * cm
     center_x = w / 2
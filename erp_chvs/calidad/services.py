@@ -1,60 +1,170 @@
+import hashlib
 import logging
+import multiprocessing
+import os
+import threading
+import zipfile
+from contextlib import contextmanager
+from io import BytesIO
+
 import psycopg2
 import psycopg2.extras
+import psycopg2.pool
 from django.conf import settings
+from django.core.cache import cache, caches
 
 logger = logging.getLogger(__name__)
 
+# Orden de precedencia cuando una cédula aparece en varias tablas.
+PRECEDENCIA_TIPO = {'manipuladora': 0, 'planta': 1, 'aprendiz': 2}
 
-def _get_empleados_conn():
-    """Abre una conexión directa a la BD externa de empleados."""
-    url = settings.EMPLEADOS_DB_URL
-    if not url:
-        raise RuntimeError(
-            "La variable de entorno EMPLEADOS_DB_URL no está configurada. "
-            "Agrégala en Railway → Variables antes de hacer el deploy."
-        )
-    return psycopg2.connect(url)
+CAMPOS_EMPLEADO = ('cedula', 'nombre_completo', 'cargo', 'eps', 'programa_empresa', 'tipo_empleado')
 
+_CACHE_PREFIJO = 'calidad:empleado:'
+# Marca para cachear "no encontrado" y no repetir la consulta externa.
+_NO_ENCONTRADO = '__no_encontrado__'
 
-def buscar_empleados_por_cedulas(cedulas: list) -> dict:
-    """
-    Busca múltiples empleados en una sola conexión usando IN.
-    Retorna dict {cedula: empleado_dict}. Si la misma cédula aparece
-    en varias tablas, prevalece la primera coincidencia (manipuladora > planta > aprendiz).
-    """
-    cedulas = [str(c).strip() for c in cedulas if str(c).strip()]
-    if not cedulas:
-        return {}
+_pool = None
+_pool_lock = threading.Lock()
 
-    ph = ','.join(['%s'] * len(cedulas))
-    query = f"""
+
+class EmpleadosNoDisponibles(Exception):
+    """No se pudo consultar la BD de empleados (espejo o externa)."""
+
+
+def _union_empleados(filtro: str) -> str:
+    """UNION ALL de las tres tablas externas con el mismo filtro por cédula."""
+    return f"""
         SELECT cedula, nombre_completo, cargo, eps,
                programa_pertenece AS programa_empresa,
                'manipuladora' AS tipo_empleado
-        FROM tabla_manipuladoras WHERE cedula IN ({ph})
+        FROM tabla_manipuladoras {filtro}
         UNION ALL
         SELECT cedula, nombre_completo, cargo, eps,
                empresa AS programa_empresa,
                'planta' AS tipo_empleado
-        FROM tabla_planta WHERE cedula IN ({ph})
+        FROM tabla_planta {filtro}
         UNION ALL
         SELECT cedula, nombre_completo, cargo, eps,
                programa_pertenece AS programa_empresa,
                'aprendiz' AS tipo_empleado
-        FROM tabla_aprendices WHERE cedula IN ({ph})
+        FROM tabla_aprendices {filtro}
+    """
+
+
+def _get_pool():
+    """Pool de conexiones (por proceso) hacia la BD externa de empleados."""
+    global _pool
+    if _pool is not None:
+        return _pool
+    with _pool_lock:
+        if _pool is None:
+            url = settings.EMPLEADOS_DB_URL
+            if not url:
+                raise RuntimeError(
+                    "La variable de entorno EMPLEADOS_DB_URL no está configurada. "
+                    "Agrégala en Railway → Variables antes de hacer el deploy."
+                )
+            _pool = psycopg2.pool.ThreadedConnectionPool(
+                1,
+                getattr(settings, 'EMPLEADOS_DB_POOL_MAX', 5),
+                url,
+                connect_timeout=10,
+            )
+    return _pool
+
+
+def cerrar_pool():
+    """Cierra todas las conexiones del pool (útil en tests y al terminar un comando)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+@contextmanager
+def _empleados_conn():
     """
-    conn = _get_empleados_conn()
+    Presta una conexión del pool. Si la conexión falla se descarta en lugar de
+    devolverla, para que el siguiente uso abra una nueva.
+    """
+    pool = _get_pool()
+    conn = pool.getconn()
+    descartar = False
     try:
+        conn.autocommit = True  # Solo lectura: sin transacciones abiertas entre usos
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        descartar = True
+        raise
+    finally:
+        pool.putconn(conn, close=descartar or bool(conn.closed))
+
+
+def _consultar_externa(cedulas: list) -> dict:
+    ph = ','.join(['%s'] * len(cedulas))
+    query = _union_empleados(f"WHERE cedula IN ({ph})")
+    resultado = {}
+    with _empleados_conn() as conn:
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
             cur.execute(query, cedulas * 3)
-            resultado = {}
             for row in cur.fetchall():
-                if row['cedula'] not in resultado:
-                    resultado[row['cedula']] = dict(row)
-            return resultado
-    finally:
-        conn.close()
+                # Misma clave que usan los llamadores y el espejo (columna numérica o char con relleno)
+                cedula = str(row['cedula']).strip()
+                actual = resultado.get(cedula)
+                if actual is None or PRECEDENCIA_TIPO[row['tipo_empleado']] < PRECEDENCIA_TIPO[actual['tipo_empleado']]:
+                    resultado[cedula] = dict(row, cedula=cedula)
+    return resultado
+
+
+def _consultar_espejo(cedulas: list) -> dict:
+    from .models import EmpleadoEspejo
+
+    return {
+        row['cedula']: row
+        for row in EmpleadoEspejo.objects.filter(cedula__in=cedulas).values(*CAMPOS_EMPLEADO)
+    }
+
+
+def buscar_empleados_por_cedulas(cedulas: list) -> dict:
+    """
+    Busca múltiples empleados. Retorna dict {cedula: empleado_dict}.
+    Si la misma cédula aparece en varias tablas, prevalece la primera
+    coincidencia (manipuladora > planta > aprendiz).
+
+    Orden de resolución: caché → espejo local (si EMPLEADOS_USAR_ESPEJO) → BD externa.
+    """
+    cedulas = list(dict.fromkeys(str(c).strip() for c in cedulas if str(c).strip()))
+    if not cedulas:
+        return {}
+
+    resultado = {}
+    cacheados = cache.get_many([_CACHE_PREFIJO + c for c in cedulas])
+    pendientes = []
+    for cedula in cedulas:
+        valor = cacheados.get(_CACHE_PREFIJO + cedula)
+        if valor is None:
+            pendientes.append(cedula)
+        elif valor != _NO_ENCONTRADO:
+            resultado[cedula] = valor
+
+    if pendientes and getattr(settings, 'EMPLEADOS_USAR_ESPEJO', False):
+        encontrados = _consultar_espejo(pendientes)
+        resultado.update(encontrados)
+        pendientes = [c for c in pendientes if c not in encontrados]
+
+    if pendientes:
+        encontrados = _consultar_externa(pendientes)
+        resultado.update(encontrados)
+        ttl = getattr(settings, 'EMPLEADOS_CACHE_TTL', 300)
+        cache.set_many({_CACHE_PREFIJO + c: emp for c, emp in encontrados.items()}, ttl)
+        no_encontrados = [c for c in pendientes if c not in encontrados]
+        if no_encontrados:
+            # TTL corto para que un empleado recién registrado aparezca pronto.
+            cache.set_many({_CACHE_PREFIJO + c: _NO_ENCONTRADO for c in no_encontrados}, min(ttl, 60))
+
+    return resultado
 
 
 def buscar_empleado_por_cedula(cedula: str) -> dict | None:
@@ -68,30 +178,279 @@ def buscar_empleado_por_cedula(cedula: str) -> dict | None:
     cedula = cedula.strip()
     if not cedula:
         return None
+    return buscar_empleados_por_cedulas([cedula]).get(cedula)
 
-    query = """
-        SELECT cedula, nombre_completo, cargo, eps,
-               programa_pertenece AS programa_empresa,
-               'manipuladora' AS tipo_empleado
-        FROM tabla_manipuladoras WHERE cedula = %s
-        UNION ALL
-        SELECT cedula, nombre_completo, cargo, eps,
-               empresa AS programa_empresa,
-               'planta' AS tipo_empleado
-        FROM tabla_planta WHERE cedula = %s
-        UNION ALL
-        SELECT cedula, nombre_completo, cargo, eps,
-               programa_pertenece AS programa_empresa,
-               'aprendiz' AS tipo_empleado
-        FROM tabla_aprendices WHERE cedula = %s
-        LIMIT 1
+
+def invalidar_cache_empleados(cedulas: list) -> None:
+    cache.delete_many([_CACHE_PREFIJO + str(c).strip() for c in cedulas])
+
+
+def sincronizar_espejo_empleados(tamano_lote: int = 2000) -> dict:
     """
+    Copia las tres tablas externas al espejo local `calidad_empleados_espejo`.
 
-    conn = _get_empleados_conn()
-    try:
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute(query, (cedula, cedula, cedula))
-            row = cur.fetchone()
-            return dict(row) if row else None
-    finally:
-        conn.close()
+    Lee con un cursor de servidor en lotes, aplica la precedencia de tablas,
+    hace upsert con bulk_create(update_conflicts=True) y elimina las cédulas
+    que ya no existen en la BD externa.
+    """
+    from django.db import transaction
+    from django.utils import timezone
+
+    from .models import EmpleadoEspejo
+
+    empleados = {}
+    with _empleados_conn() as conn:
+        conn.autocommit = False  # Los cursores con nombre requieren transacción
+        try:
+            with conn.cursor('espejo_empleados', cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                cur.itersize = tamano_lote
+                cur.execute(_union_empleados(''))
+                for row in cur:
+                    cedula = str(row['cedula']).strip()
+                    actual = empleados.get(cedula)
+                    if actual is None or PRECEDENCIA_TIPO[row['tipo_empleado']] < PRECEDENCIA_TIPO[actual['tipo_empleado']]:
+                        empleados[cedula] = dict(row, cedula=cedula)
+        finally:
+            conn.rollback()
+
+    ahora = timezone.now()
+    objetos = [
+        EmpleadoEspejo(
+            cedula=cedula,
+            nombre_completo=emp.get('nombre_completo') or '',
+            cargo=emp.get('cargo') or '',
+            eps=emp.get('eps') or '',
+            programa_empresa=emp.get('programa_empresa') or '',
+            tipo_empleado=emp['tipo_empleado'],
+            fecha_sincronizacion=ahora,
+        )
+        for cedula, emp in empleados.items()
+    ]
+
+    with transaction.atomic():
+        EmpleadoEspejo.objects.bulk_create(
+            objetos,
+            batch_size=tamano_lote,
+            update_conflicts=True,
+            unique_fields=['cedula'],
+            update_fields=['nombre_completo', 'cargo', 'eps', 'programa_empresa',
+                           'tipo_empleado', 'fecha_sincronizacion'],
+        )
+        eliminados, _ = EmpleadoEspejo.objects.filter(fecha_sincronizacion__lt=ahora).delete()
+
+    cache.delete_many([_CACHE_PREFIJO + c for c in empleados])
+    logger.info(f"Espejo de empleados sincronizado: {len(objetos)} registros, {eliminados} eliminados")
+    return {'sincronizados': len(objetos), 'eliminados': eliminados}
+
+
+# ── Emisión y PDFs de certificados en lote ─────────────────────────────────────
+
+_PDF_CACHE_PREFIJO = 'calidad:pdf:'
+
+_pool_pdfs = None
+_pool_pdfs_lock = threading.Lock()
+
+
+def emitir_certificados_lote(cedulas: list, observaciones: str, usuario) -> list:
+    """
+    Emite certificados para una lista de cédulas (ya deduplicada, en orden).
+
+    Reutiliza el certificado más reciente si la cédula ya tiene uno; para las
+    demás busca a los empleados en una sola consulta, reserva todos los números
+    de una vez y los inserta con bulk_create. Retorna un resultado por cédula
+    con las llaves que espera el frontend.
+
+    Levanta EmpleadosNoDisponibles si falla la consulta de empleados; los
+    errores al reservar números o insertar se propagan tal cual.
+    """
+    from django.db import transaction
+
+    from .models import CertificadoCalidad
+
+    # 1. Certificado más reciente por cédula
+    existentes_map = {}
+    for cert in (
+        CertificadoCalidad.objects
+        .filter(cedula__in=cedulas)
+        .order_by('cedula', '-fecha_emision', '-id')
+    ):
+        existentes_map.setdefault(cert.cedula, cert)
+
+    # 2. Solo se consultan en la BD de empleados las cédulas sin certificado
+    cedulas_nuevas = [c for c in cedulas if c not in existentes_map]
+    empleados_map = {}
+    if cedulas_nuevas:
+        try:
+            empleados_map = buscar_empleados_por_cedulas(cedulas_nuevas)
+        except Exception as e:
+            raise EmpleadosNoDisponibles(str(e)) from e
+
+    a_crear = [c for c in cedulas_nuevas if c in empleados_map]
+    creados_map = {}
+    if a_crear:
+        with transaction.atomic():
+            numeros = CertificadoCalidad.reservar_numeros(len(a_crear))
+            nuevos = []
+            for cedula, numero in zip(a_crear, numeros):
+                empleado = empleados_map[cedula]
+                nuevos.append(CertificadoCalidad(
+                    numero_certificado=numero,
+                    cedula=empleado['cedula'],
+                    nombre_completo=empleado.get('nombre_completo') or '',
+                    cargo=empleado.get('cargo') or '',
+                    programa_empresa=empleado.get('programa_empresa') or '',
+                    eps=empleado.get('eps') or '',
+                    tipo_empleado=empleado['tipo_empleado'],
+                    observaciones=observaciones,
+                    creado_por=usuario,
+                ))
+            CertificadoCalidad.objects.bulk_create(nuevos, batch_size=500)
+        if any(cert.pk is None for cert in nuevos):
+            # Backends sin RETURNING: recuperar los pk por número de certificado
+            pks = dict(
+                CertificadoCalidad.objects.filter(numero_certificado__in=numeros)
+                .values_list('numero_certificado', 'pk')
+            )
+            for cert in nuevos:
+                cert.pk = pks[cert.numero_certificado]
+        creados_map = dict(zip(a_crear, nuevos))
+
+    # 3. Resultados en el orden original de cédulas
+    resultados = []
+    for cedula in cedulas:
+        cert = existentes_map.get(cedula) or creados_map.get(cedula)
+        if cert is None:
+            resultados.append({'cedula': cedula, 'ok': False, 'error': 'Empleado no encontrado.'})
+            continue
+        resultados.append({
+            'cedula': cedula,
+            'ok': True,
+            'pk': cert.pk,
+            'numero': cert.numero_certificado,
+            'nombre': cert.nombre_completo,
+            'cargo': cert.cargo or '—',
+            'url_descargar': f'/calidad/certificados/{cert.pk}/descargar/',
+            'ya_existia': cedula in existentes_map,
+        })
+    return resultados
+
+
+def _clave_pdf(cert) -> str:
+    """
+    Clave de caché del PDF: cambia si cambia cualquier dato impreso o la
+    versión de la plantilla, así que nunca se sirve un PDF desactualizado.
+    """
+    from .pdf_generator import PLANTILLA_VERSION
+
+    datos = '|'.join(str(v) for v in (
+        PLANTILLA_VERSION, cert.numero_certificado, cert.cedula, cert.nombre_completo,
+        cert.cargo, cert.programa_empresa, cert.eps, cert.tipo_empleado,
+        cert.observaciones, cert.fecha_emision,
+    ))
+    return f"{_PDF_CACHE_PREFIJO}{cert.pk}:{hashlib.sha1(datos.encode()).hexdigest()}"
+
+
+def _renderizar_pdf(cert) -> bytes:
+    from .pdf_generator import generar_certificado_calidad_pdf
+
+    return generar_certificado_calidad_pdf(cert).getvalue()
+
+
+def obtener_pdf_certificado(cert) -> bytes:
+    """PDF individual del certificado, servido desde caché si ya se generó."""
+    clave = _clave_pdf(cert)
+    pdf = caches['pdfs'].get(clave)
+    if pdf is None:
+        pdf = _renderizar_pdf(cert)
+        caches['pdfs'].set(clave, pdf, getattr(settings, 'CALIDAD_PDF_CACHE_TTL', 86400))
+    return pdf
+
+
+def _get_pool_pdfs(workers: int):
+    """
+    Pool de procesos para renderizar PDFs, uno por proceso y creado al primer
+    uso. Arranca con 'spawn': los workers de gunicorn son gevent y hacer fork
+    de un proceso parcheado, con conexiones a la BD abiertas, puede colgarse.
+    """
+    global _pool_pdfs
+    with _pool_pdfs_lock:
+        if _pool_pdfs is None:
+            import django
+            from concurrent.futures import ProcessPoolExecutor
+
+            _pool_pdfs = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+        return _pool_pdfs
+
+
+def cerrar_pool_pdfs():
+    """Cierra el pool de PDFs; el siguiente lote crea uno nuevo."""
+    global _pool_pdfs
+    with _pool_pdfs_lock:
+        if _pool_pdfs is not None:
+            _pool_pdfs.shutdown(wait=False, cancel_futures=True)
+            _pool_pdfs = None
+
+
+def obtener_pdfs_certificados(certificados: list) -> list:
+    """
+    PDFs individuales de un lote, en el mismo orden. Los que no están en caché
+    se generan en el pool de procesos (ReportLab es CPU y no libera el GIL);
+    lotes pequeños se generan en el mismo proceso.
+    """
+    claves = [_clave_pdf(cert) for cert in certificados]
+    cacheados = caches['pdfs'].get_many(claves)
+    pendientes = [(clave, cert) for clave, cert in zip(claves, certificados) if clave not in cacheados]
+
+    if pendientes:
+        workers = min(getattr(settings, 'CALIDAD_PDF_WORKERS', 4), os.cpu_count() or 1)
+        certs = [cert for _, cert in pendientes]
+        generados = None
+        if workers > 1 and len(certs) >= getattr(settings, 'CALIDAD_PDF_LOTE_MIN_PARALELO', 20):
+            try:
+                pool = _get_pool_pdfs(workers)
+                generados = list(pool.map(_renderizar_pdf, certs, chunksize=max(1, len(certs) // (workers * 4))))
+            except (OSError, RuntimeError) as e:  # BrokenProcessPool es RuntimeError
+                logger.warning(f"Pool de PDFs no disponible, se genera en serie: {e}")
+                cerrar_pool_pdfs()
+        if generados is None:
+            generados = [_renderizar_pdf(cert) for cert in certs]
+        nuevos = {clave: pdf for (clave, _), pdf in zip(pendientes, generados)}
+        caches['pdfs'].set_many(nuevos, getattr(settings, 'CALIDAD_PDF_CACHE_TTL', 86400))
+        cacheados.update(nuevos)
+
+    return [cacheados[clave] for clave in claves]
+
+
+def generar_pdf_certificados(certificados: list) -> BytesIO:
+    """
+    Un solo PDF con una página por certificado, armado con los PDFs
+    individuales (caché y pool de procesos). Los objetos repetidos en cada
+    página (logo, firma, fuentes) se guardan una sola vez.
+    """
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for pdf in obtener_pdfs_certificados(certificados):
+        writer.append(BytesIO(pdf))
+    # Dos pasadas: primero se unifican las máscaras (SMask) de las imágenes y
+    # luego las imágenes que las referencian.
+    for _ in range(2):
+        writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+    buffer = BytesIO()
+    writer.write(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def generar_zip_certificados(certificados: list) -> BytesIO:
+    """ZIP con un PDF por certificado (almacenado sin recomprimir: el PDF ya va comprimido)."""
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as zf:
+        for cert, pdf in zip(certificados, obtener_pdfs_certificados(certificados)):
+            zf.writestr(f"Certificado_{cert.numero_certificado}_{cert.cedula}.pdf", pdf)
+    buffer.seek(0)
+    return buffer
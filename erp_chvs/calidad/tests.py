@@ -1,3 +1,231 @@
-from django.test import TestCase
+import json
+import zipfile
+from io import BytesIO
+from unittest.mock import MagicMock, patch
 
-# Create your tests here.
+import psycopg2
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from pypdf import PdfReader
+
+from calidad import services
+from calidad.models import CertificadoCalidad, EmpleadoEspejo
+
+EMPLEADO = {
+    'cedula': '123',
+    'nombre_completo': 'ANA GOMEZ',
+    'cargo': 'MANIPULADORA',
+    'eps': 'SURA',
+    'programa_empresa': 'PAE CALI',
+    'tipo_empleado': 'manipuladora',
+}
+
+
+class BuscarEmpleadosCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    @patch('calidad.services._consultar_externa', return_value={'123': EMPLEADO})
+    def test_segunda_busqueda_sale_de_cache(self, consultar):
+        self.assertEqual(services.buscar_empleado_por_cedula('123'), EMPLEADO)
+        self.assertEqual(services.buscar_empleado_por_cedula(' 123 '), EMPLEADO)
+
+        consultar.assert_called_once_with(['123'])
+
+    @patch('calidad.services._consultar_externa', return_value={})
+    def test_no_encontrado_tambien_se_cachea(self, consultar):
+        self.assertIsNone(services.buscar_empleado_por_cedula('999'))
+        self.assertIsNone(services.buscar_empleado_por_cedula('999'))
+
+        consultar.assert_called_once_with(['999'])
+
+    @patch('calidad.services._consultar_externa', return_value={'123': EMPLEADO})
+    def test_lote_solo_consulta_cedulas_no_cacheadas(self, consultar):
+        services.buscar_empleado_por_cedula('123')
+
+        resultado = services.buscar_empleados_por_cedulas(['123', '456', '123'])
+
+        self.assertEqual(list(resultado), ['123'])
+        self.assertEqual(consultar.call_args_list[-1].args, (['456'],))
+
+    @override_settings(EMPLEADOS_USAR_ESPEJO=True)
+    @patch('calidad.services._consultar_externa', return_value={})
+    def test_espejo_evita_consulta_externa(self, consultar):
+        EmpleadoEspejo.objects.create(fecha_sincronizacion=timezone.now(), **EMPLEADO)
+
+        resultado = services.buscar_empleados_por_cedulas(['123'])
+
+        self.assertEqual(resultado['123']['nombre_completo'], 'ANA GOMEZ')
+        consultar.assert_not_called()
+
+    def test_cedula_externa_se_normaliza(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value.__enter__.return_value
+        cur.fetchall.return_value = [dict(EMPLEADO, cedula='123   '), dict(EMPLEADO, cedula=456, tipo_empleado='planta')]
+
+        with patch('calidad.services._empleados_conn') as empleados_conn:
+            empleados_conn.return_value.__enter__.return_value = conn
+            self.assertEqual(services.buscar_empleado_por_cedula('123'), EMPLEADO)
+            self.assertEqual(services.buscar_empleados_por_cedulas([456])['456']['cedula'], '456')
+
+
+class PoolEmpleadosTests(TestCase):
+    def test_conexion_rota_se_descarta(self):
+        pool = MagicMock()
+        conn = MagicMock(closed=0)
+        pool.getconn.return_value = conn
+
+        with patch('calidad.services._get_pool', return_value=pool):
+            with self.assertRaises(psycopg2.OperationalError):
+                with services._empleados_conn():
+                    raise psycopg2.OperationalError('server closed the connection')
+
+        pool.putconn.assert_called_once_with(conn, close=True)
+
+    def test_conexion_sana_vuelve_al_pool(self):
+        pool = MagicMock()
+        conn = MagicMock(closed=0)
+        pool.getconn.return_value = conn
+
+        with patch('calidad.services._get_pool', return_value=pool):
+            with services._empleados_conn():
+                pass
+
+        pool.putconn.assert_called_once_with(conn, close=False)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'pdfs': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-pdfs'},
+})
+class CertificadosLoteTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+
+        caches['pdfs'].clear()
+        self.usuario = User.objects.create_superuser('calidad', 'c@x.com', 'x')
+
+    def _empleados(self, cedulas):
+        return {c: dict(EMPLEADO, cedula=c, nombre_completo=f'EMP {c}') for c in cedulas if c != '000'}
+
+    def test_emision_en_lote_usa_bulk_y_numeros_consecutivos(self):
+        existente = CertificadoCalidad.objects.create(
+            cedula='100', nombre_completo='PREVIO', tipo_empleado='planta'
+        )
+        cedulas = ['100', '200', '000', '300']
+
+        with patch('calidad.services.buscar_empleados_por_cedulas', side_effect=self._empleados) as buscar:
+            resultados = services.emitir_certificados_lote(cedulas, 'obs', self.usuario)
+
+        buscar.assert_called_once_with(['200', '000', '300'])
+        self.assertEqual([r['cedula'] for r in resultados], cedulas)
+        self.assertTrue(resultados[0]['ya_existia'])
+        self.assertEqual(resultados[0]['pk'], existente.pk)
+        self.assertFalse(resultados[2]['ok'])
+
+        base = int(existente.numero_certificado.rsplit('-', 1)[1])
+        self.assertEqual(
+            [int(resultados[i]['numero'].rsplit('-', 1)[1]) for i in (1, 3)],
+            [base + 1, base + 2],
+        )
+        self.assertEqual(CertificadoCalidad.objects.get(pk=resultados[3]['pk']).cedula, '300')
+
+    def test_vista_lote_distingue_errores_de_empleados_y_de_emision(self):
+        self.client.force_login(self.usuario)
+
+        def post():
+            return self.client.post(
+                '/calidad/certificados/generar-lote/',
+                data=json.dumps({'cedulas': '11, 22'}), content_type='application/json', secure=True,
+            )
+
+        with patch('calidad.services.buscar_empleados_por_cedulas', side_effect=psycopg2.OperationalError('caída')):
+            resp = post()
+        self.assertEqual(resp.json()['error'], 'Error al consultar la base de datos de empleados.')
+
+        with patch('calidad.services.buscar_empleados_por_cedulas', side_effect=self._empleados), \
+                patch('calidad.models.CertificadoCalidad.reservar_numeros', side_effect=RuntimeError('secuencia')), \
+                self.assertLogs('calidad.views', 'ERROR') as logs:
+            resp = post()
+        self.assertEqual((resp.status_code, resp.json()['error']), (500, 'Error al emitir los certificados.'))
+        self.assertIn('secuencia', logs.output[0])
+
+    def test_numero_no_se_repite_tras_eliminar(self):
+        a = CertificadoCalidad.objects.create(cedula='1', nombre_completo='A', tipo_empleado='planta')
+        b = CertificadoCalidad.objects.create(cedula='2', nombre_completo='B', tipo_empleado='planta')
+        a.delete()
+
+        c = CertificadoCalidad.objects.create(cedula='3', nombre_completo='C', tipo_empleado='planta')
+
+        self.assertNotEqual(c.numero_certificado, b.numero_certificado)
+
+    def test_vista_lote_registra_una_sola_actividad(self):
+        from principal.models import RegistroActividad
+
+        self.client.force_login(self.usuario)
+        with patch('calidad.services.buscar_empleados_por_cedulas', side_effect=self._empleados):
+            resp = self.client.post(
+                '/calidad/certificados/generar-lote/',
+                data=json.dumps({'cedulas': '11, 22, 33, 11'}),
+                content_type='application/json',
+                secure=True,
+            )
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['exitosos'], 3)
+        self.assertEqual(CertificadoCalidad.objects.count(), 3)
+        self.assertEqual(RegistroActividad.objects.filter(accion='generar_certificado_lote').count(), 1)
+
+    def test_pdf_individual_se_cachea_por_version(self):
+        cert = CertificadoCalidad.objects.create(cedula='1', nombre_completo='A', tipo_empleado='planta')
+
+        with patch('calidad.services._renderizar_pdf', return_value=b'%PDF-1') as render:
+            services.obtener_pdf_certificado(cert)
+            services.obtener_pdf_certificado(cert)
+            self.assertEqual(render.call_count, 1)
+
+            cert.nombre_completo = 'A CORREGIDO'
+            services.obtener_pdf_certificado(cert)
+            self.assertEqual(render.call_count, 2)
+
+    @override_settings(CALIDAD_PDF_WORKERS=2, CALIDAD_PDF_LOTE_MIN_PARALELO=2)
+    def test_lote_grande_usa_un_pool_spawn_por_proceso(self):
+        self.addCleanup(services.cerrar_pool_pdfs)
+        certs = [
+            CertificadoCalidad.objects.create(cedula=str(i), nombre_completo=f'E{i}', tipo_empleado='planta')
+            for i in range(4)
+        ]
+
+        with patch('calidad.services.os.cpu_count', return_value=2):
+            pdfs = services.obtener_pdfs_certificados(certs[:2])
+            pool = services._pool_pdfs
+            pdfs += services.obtener_pdfs_certificados(certs[2:])
+
+        self.assertTrue(all(pdf.startswith(b'%PDF') for pdf in pdfs))
+        self.assertIs(services._pool_pdfs, pool)
+        self.assertEqual(pool._mp_context.get_start_method(), 'spawn')
+
+    def test_descarga_lote_pdf_y_zip(self):
+        certs = [
+            CertificadoCalidad.objects.create(cedula=str(i), nombre_completo=f'E{i}', tipo_empleado='planta')
+            for i in range(3)
+        ]
+        pks = ','.join(str(c.pk) for c in certs)
+        self.client.force_login(self.usuario)
+
+        resp = self.client.post('/calidad/certificados/pdf-lote/', {'pks': pks}, secure=True)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(PdfReader(BytesIO(resp.content)).pages), 3)
+
+        # Un PDF único repetido se arma con los individuales ya cacheados
+        with patch('calidad.services._renderizar_pdf') as render:
+            resp = self.client.get('/calidad/certificados/pdf-lote/', {'pks': pks}, secure=True)
+        render.assert_not_called()
+        self.assertEqual(len(PdfReader(BytesIO(resp.content)).pages), 3)
+
+        resp = self.client.get('/calidad/certificados/pdf-lote/', {'pks': pks, 'formato': 'zip'}, secure=True)
+        self.assertEqual(resp.status_code, 200)
+        with zipfile.ZipFile(BytesIO(resp.content)) as zf:
+            self.assertEqual(len(zf.namelist()), 3)
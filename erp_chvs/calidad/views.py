@@ -12,8 +12,15 @@ from django.views.decorators.csrf import csrf_exempt
 
 from principal.models import RegistroActividad
 from .models import CertificadoCalidad
-from .pdf_generator import generar_certificado_calidad_pdf, generar_carnets_lote_pdf
-from .services import buscar_empleado_por_cedula, buscar_empleados_por_cedulas
+from .pdf_generator import generar_carnets_lote_pdf
+from .services import (
+    EmpleadosNoDisponibles,
+    buscar_empleado_por_cedula,
+    emitir_certificados_lote,
+    generar_pdf_certificados,
+    generar_zip_certificados,
+    obtener_pdf_certificado,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -55,7 +62,7 @@ def calidad_principal(request):
 
 @login_required
 def lista_certificados(request):
-    return render(request, 'calidad/certificados.html')
+    return render(request, 'calidad/certificados.html', {'max_lote': settings.CALIDAD_MAX_LOTE})
 
 
 # ── APIs ──────────────────────────────────────────────────────────────────────
@@ -190,81 +197,28 @@ def generar_certificados_lote(request):
 
     if not cedulas:
         return JsonResponse({'error': 'Ingresa al menos una cédula.'}, status=400)
-    if len(cedulas) > 100:
-        return JsonResponse({'error': 'Máximo 100 cédulas por lote.'}, status=400)
 
     cedulas = list(dict.fromkeys(cedulas))  # deduplicar conservando orden
+    max_lote = settings.CALIDAD_MAX_LOTE
+    if len(cedulas) > max_lote:
+        return JsonResponse({'error': f'Máximo {max_lote} cédulas por lote.'}, status=400)
 
-    # 1. Detectar cuáles cédulas ya tienen certificado (el más reciente por cédula)
-    existentes_qs = (
-        CertificadoCalidad.objects
-        .filter(cedula__in=cedulas)
-        .order_by('cedula', '-fecha_emision', '-id')
-    )
-    existentes_map = {}
-    for cert in existentes_qs:
-        if cert.cedula not in existentes_map:
-            existentes_map[cert.cedula] = cert
-
-    # 2. Solo buscar en BD externa las cédulas que NO existen
-    cedulas_nuevas = [c for c in cedulas if c not in existentes_map]
-    empleados_map = {}
-    if cedulas_nuevas:
-        try:
-            empleados_map = buscar_empleados_por_cedulas(cedulas_nuevas)
-        except Exception as e:
-            logger.error(f"Error buscando empleados en lote: {e}")
-            return JsonResponse({'error': 'Error al consultar la base de datos de empleados.'}, status=500)
-
-    # 3. Construir resultados en el orden original de cédulas
-    resultados = []
-    for cedula in cedulas:
-        # ── Certificado ya existente ──────────────────────────────────────
-        if cedula in existentes_map:
-            cert = existentes_map[cedula]
-            resultados.append({
-                'cedula': cedula,
-                'ok': True,
-                'pk': cert.pk,
-                'numero': cert.numero_certificado,
-                'nombre': cert.nombre_completo,
-                'cargo': cert.cargo or '—',
-                'url_descargar': f'/calidad/certificados/{cert.pk}/descargar/',
-                'ya_existia': True,
-            })
-            continue
-
-        # ── Empleado no encontrado en BD externa ──────────────────────────
-        empleado = empleados_map.get(cedula)
-        if not empleado:
-            resultados.append({'cedula': cedula, 'ok': False, 'error': 'Empleado no encontrado.'})
-            continue
-
-        # ── Crear nuevo certificado ───────────────────────────────────────
-        cert = CertificadoCalidad.objects.create(
-            cedula=empleado['cedula'],
-            nombre_completo=empleado.get('nombre_completo') or '',
-            cargo=empleado.get('cargo') or '',
-            programa_empresa=empleado.get('programa_empresa') or '',
-            eps=empleado.get('eps') or '',
-            tipo_empleado=empleado['tipo_empleado'],
-            observaciones=observaciones,
-            creado_por=request.user,
-        )
+    try:
+        resultados = emitir_certificados_lote(cedulas, observaciones, request.user)
+    except EmpleadosNoDisponibles as e:
+        logger.error(f"Error buscando empleados en lote: {e}")
+        return JsonResponse({'error': 'Error al consultar la base de datos de empleados.'}, status=500)
+    except Exception as e:
+        logger.exception(f"Error emitiendo certificados en lote: {e}")
+        return JsonResponse({'error': 'Error al emitir los certificados.'}, status=500)
+
+    nuevos = [r for r in resultados if r['ok'] and not r['ya_existia']]
+    if nuevos:
         RegistroActividad.registrar(
             request, 'calidad', 'generar_certificado_lote',
-            f"Certificado {cert.numero_certificado} — {cert.nombre_completo} (C.C. {cert.cedula})"
+            f"{len(nuevos)} certificado(s) generados en lote: "
+            f"{nuevos[0]['numero']} a {nuevos[-1]['numero']}"
         )
-        resultados.append({
-            'cedula': cedula,
-            'ok': True,
-            'pk': cert.pk,
-            'numero': cert.numero_certificado,
-            'nombre': cert.nombre_completo,
-            'cargo': cert.cargo or '—',
-            'url_descargar': f'/calidad/certificados/{cert.pk}/descargar/',
-            'ya_existia': False,
-        })
 
     exitosos = sum(1 for r in resultados if r['ok'])
     ya_existian = sum(1 for r in resultados if r.get('ya_existia'))
@@ -293,33 +247,44 @@ def descargar_certificado(request, pk):
     except CertificadoCalidad.DoesNotExist:
         return HttpResponse('Certificado no encontrado.', status=404)
 
-    pdf_buffer = generar_certificado_calidad_pdf(cert)
     nombre = f"Certificado_{cert.numero_certificado}_{cert.cedula}.pdf"
-    response = HttpResponse(pdf_buffer, content_type='application/pdf')
+    response = HttpResponse(obtener_pdf_certificado(cert), content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="{nombre}"'
     return response
 
 
-@login_required
-def pdf_carnets_lote(request):
+def _certificados_de_request(request):
     """
-    Genera un PDF A4 con 3 carnets por hoja para un lote de certificados.
-    Recibe los PKs como query string: ?pks=1,2,3
+    Lee los PKs del lote (?pks=1,2,3 o campo `pks` en un POST, para lotes que
+    no caben en la URL). Retorna (certificados, HttpResponse de error o None).
     """
-    pks_raw = request.GET.get('pks', '')
+    pks_raw = request.POST.get('pks', '') if request.method == 'POST' else request.GET.get('pks', '')
     try:
         pks = [int(pk.strip()) for pk in pks_raw.split(',') if pk.strip()]
     except ValueError:
-        return HttpResponse('PKs inválidos.', status=400)
+        return None, HttpResponse('PKs inválidos.', status=400)
 
     if not pks:
-        return HttpResponse('Indica al menos un certificado.', status=400)
-    if len(pks) > 100:
-        return HttpResponse('Máximo 100 certificados por lote.', status=400)
+        return None, HttpResponse('Indica al menos un certificado.', status=400)
+    max_lote = settings.CALIDAD_MAX_LOTE
+    if len(pks) > max_lote:
+        return None, HttpResponse(f'Máximo {max_lote} certificados por lote.', status=400)
 
     certificados = list(CertificadoCalidad.objects.filter(pk__in=pks).order_by('nombre_completo'))
     if not certificados:
-        return HttpResponse('No se encontraron certificados.', status=404)
+        return None, HttpResponse('No se encontraron certificados.', status=404)
+    return certificados, None
+
+
+@login_required
+def pdf_carnets_lote(request):
+    """
+    Genera un PDF A4 con 3 carnets por hoja para un lote de certificados.
+    Recibe los PKs como query string: ?pks=1,2,3
+    """
+    certificados, error = _certificados_de_request(request)
+    if error:
+        return error
 
     pdf_buffer = generar_carnets_lote_pdf(certificados)
     response = HttpResponse(pdf_buffer, content_type='application/pdf')
@@ -327,6 +292,31 @@ def pdf_carnets_lote(request):
     return response
 
 
+@login_required
+def pdf_certificados_lote(request):
+    """
+    Descarga los certificados de un lote: ?formato=pdf (por defecto) un único
+    PDF con una página por certificado; ?formato=zip un ZIP con un PDF por
+    certificado. En ambos casos los PDFs individuales salen de la caché o se
+    generan en paralelo.
+    """
+    certificados, error = _certificados_de_request(request)
+    if error:
+        return error
+
+    formato = (request.POST.get('formato') or request.GET.get('formato') or 'pdf').lower()
+    if formato == 'zip':
+        response = HttpResponse(generar_zip_certificados(certificados), content_type='application/zip')
+        response['Content-Disposition'] = 'attachment; filename="certificados_lote.zip"'
+        return response
+    if formato != 'pdf':
+        return HttpResponse('Formato inválido (pdf o zip).', status=400)
+
+    response = HttpResponse(generar_pdf_certificados(certificados), content_type='application/pdf')
+    response['Content-Disposition'] = 'attachment; filename="certificados_lote.pdf"'
+    return response
+
+
 # ── API para integración WhatsApp (sin sesión, requiere API key) ───────────────
 
 @csrf_exempt
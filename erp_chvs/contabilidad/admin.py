@@ -1,9 +1,11 @@
 from django.contrib import admin
+from django.db import transaction
 
 from .models import (
     RegistroContable, Factura, ItemChecklist,
     VerificacionChecklist, HistorialEstado
 )
+from .services import ContabilidadService
 
 
 @admin.register(RegistroContable)
@@ -17,6 +19,8 @@ class RegistroContableAdmin(admin.ModelAdmin):
         'fecha_reenvio', 'fecha_reentrega_fisica', 'fecha_aprobacion_compras',
         'fecha_inicio_revision_contabilidad', 'fecha_observacion_contabilidad',
         'fecha_respuesta_compras', 'fecha_aprobacion_contabilidad', 'fecha_cierre',
+        # Resumen de las facturas: lo mantiene ContabilidadService.actualizar_resumen
+        *RegistroContable.CAMPOS_RESUMEN,
     ]
     ordering = ['-fecha_creacion']
 
@@ -28,6 +32,33 @@ class FacturaAdmin(admin.ModelAdmin):
     search_fields = ['numero_factura', 'proveedor', 'concepto']
     readonly_fields = ['fecha_carga']
 
+    # Las facturas editadas desde el admin también recalculan el resumen de
+    # sus registros (el anterior y el nuevo si se cambia de registro).
+
+    @staticmethod
+    def _actualizar_resumenes(registro_ids):
+        registros = RegistroContable.objects.filter(pk__in=registro_ids)
+        ContabilidadService.actualizar_resumen(*registros)
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            registro_ids = {obj.registro_id}
+            if change:
+                registro_ids.update(Factura.objects.filter(pk=obj.pk).values_list('registro_id', flat=True))
+            super().save_model(request, obj, form, change)
+            self._actualizar_resumenes(registro_ids)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            self._actualizar_resumenes([obj.registro_id])
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            registro_ids = set(queryset.values_list('registro_id', flat=True))
+            super().delete_queryset(request, queryset)
+            self._actualizar_resumenes(registro_ids)
+
 
 @admin.register(ItemChecklist)
 class ItemChecklistAdmin(admin.ModelAdmin):
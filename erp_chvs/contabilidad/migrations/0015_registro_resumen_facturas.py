@@ -0,0 +1,53 @@
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def calcular_resumen(apps, schema_editor):
+    """Llena valor_total / num_facturas / contratos de los registros existentes."""
+    RegistroContable = apps.get_model('contabilidad', 'RegistroContable')
+    Factura = apps.get_model('contabilidad', 'Factura')
+
+    totales = {
+        fila['registro_id']: fila
+        for fila in Factura.objects.order_by().values('registro_id').annotate(total=Sum('valor'), n=Count('id'))
+    }
+    contratos = defaultdict(set)
+    for registro_id, contrato in (
+        Factura.objects.exclude(tipo_contrato='').values_list('registro_id', 'tipo_contrato').distinct()
+    ):
+        contratos[registro_id].add(contrato)
+
+    registros = list(RegistroContable.objects.filter(id__in=totales).only('id'))
+    for registro in registros:
+        registro.valor_total = totales[registro.id]['total'] or 0
+        registro.num_facturas = totales[registro.id]['n']
+        registro.contratos = sorted(contratos[registro.id])
+    RegistroContable.objects.bulk_update(registros, ['valor_total', 'num_facturas', 'contratos'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contabilidad', '0014_factura_tipo_contrato'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registrocontable',
+            name='valor_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Valor Total'),
+        ),
+        migrations.AddField(
+            model_name='registrocontable',
+            name='num_facturas',
+            field=models.PositiveIntegerField(default=0, verbose_name='Número de Facturas'),
+        ),
+        migrations.AddField(
+            model_name='registrocontable',
+            name='contratos',
+            field=models.JSONField(blank=True, default=list, verbose_name='Tipos de Contrato'),
+        ),
+        migrations.RunPython(calcular_resumen, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,5 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models import Sum
 
 
 class RegistroContable(models.Model):
@@ -77,6 +76,14 @@ class RegistroContable(models.Model):
     justificacion_demora_compras = models.TextField(blank=True, verbose_name="Justificación Demora Compras")
     justificacion_demora_contabilidad = models.TextField(blank=True, verbose_name="Justificación Demora Contabilidad")
 
+    # Resumen de las facturas — lo mantiene ContabilidadService.actualizar_resumen
+    # en la misma transacción de cada escritura de facturas.
+    valor_total = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Valor Total")
+    num_facturas = models.PositiveIntegerField(default=0, verbose_name="Número de Facturas")
+    contratos = models.JSONField(default=list, blank=True, verbose_name="Tipos de Contrato")
+
+    CAMPOS_RESUMEN = ('valor_total', 'num_facturas', 'contratos')
+
     class Meta:
         db_table = 'contabilidad_registros'
         verbose_name = "Registro Contable"
@@ -91,14 +98,19 @@ class RegistroContable(models.Model):
     def __str__(self):
         return f"RC-{self.pk} | {self.get_tipo_display()} | {self.periodo_mes}/{self.periodo_ano} | {self.get_estado_display()}"
 
-    @property
-    def valor_total(self):
-        resultado = self.facturas.aggregate(total=Sum('valor'))
-        return resultado['total'] or 0
+    def save(self, *args, **kwargs):
+        # Un save() completo de una instancia cargada antes de agregar facturas
+        # no debe pisar el resumen: esas columnas solo las escribe actualizar_resumen.
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.CAMPOS_RESUMEN
+            ]
+        super().save(*args, **kwargs)
 
     @property
     def total_documentos(self):
-        return self.facturas.count()
+        return self.num_facturas
 
 
 class Factura(models.Model):
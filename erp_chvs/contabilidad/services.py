@@ -1,7 +1,9 @@
 from datetime import timedelta
 
 import pytz
+from django.contrib.postgres.aggregates import ArrayAgg
 from django.db import models, transaction
+from django.db.models import Count, Q, Sum
 from django.utils import timezone
 
 from django.contrib.auth.models import User
@@ -117,6 +119,33 @@ class ContabilidadService:
     ESTADOS_EDITABLES = ('BORRADOR', 'DEVUELTO_COMPRAS')
 
     @staticmethod
+    def actualizar_resumen(*registros):
+        """
+        Recalcula valor_total, num_facturas y contratos de los registros a
+        partir de sus facturas y los persiste (también en las instancias).
+        Se llama dentro de la transacción que modificó las facturas; el
+        bloqueo de las filas serializa escrituras concurrentes sobre el mismo
+        registro, así el último en recalcular ve las facturas del otro.
+        """
+        ids = [r.pk for r in registros]
+        list(RegistroContable.objects.select_for_update().filter(pk__in=ids).values_list('pk', flat=True))
+        resumen = {
+            fila['registro_id']: fila
+            for fila in Factura.objects.filter(registro_id__in=ids).order_by().values('registro_id').annotate(
+                total=Sum('valor'),
+                n=Count('id'),
+                tipos=ArrayAgg('tipo_contrato', distinct=True, filter=~Q(tipo_contrato='')),
+            )
+        }
+        for registro in registros:
+            fila = resumen.get(registro.pk, {})
+            registro.valor_total = fila.get('total') or 0
+            registro.num_facturas = fila.get('n', 0)
+            registro.contratos = sorted(fila.get('tipos') or [])
+        RegistroContable.objects.bulk_update(registros, RegistroContable.CAMPOS_RESUMEN)
+
+    @staticmethod
+    @transaction.atomic
     def agregar_factura(registro, datos):
         """
         Agrega una Factura al registro. Solo permitido cuando el registro está
@@ -139,9 +168,11 @@ class ContabilidadService:
             metodo_pago=datos.get('metodo_pago', '').strip(),
             tipo_contrato=datos.get('tipo_contrato', '').strip(),
         )
+        ContabilidadService.actualizar_resumen(registro)
         return factura
 
     @staticmethod
+    @transaction.atomic
     def cargar_facturas_desde_excel(registro, archivo):
         """
         Lee un Excel con 8 columnas (por posición) y crea facturas en bloque.
@@ -222,19 +253,20 @@ class ContabilidadService:
                         except Exception:
                             pass  # si no parsea, queda None sin bloquear la fila
 
-                factura = Factura.objects.create(
-                    registro=registro,
-                    numero_factura=numero_factura,
-                    fecha_factura=fecha_factura,
-                    proveedor=proveedor,
-                    concepto=concepto,
-                    valor=valor,
-                    observacion_retraso=observacion_retraso,
-                    estado_contable=estado_contable,
-                    referencia_appd=referencia_appd,
-                    numero_orden_compra=numero_orden_compra,
-                    fecha_recepcion_lider=fecha_recepcion_lider,
-                )
+                with transaction.atomic():  # Un error de BD solo descarta la fila
+                    factura = Factura.objects.create(
+                        registro=registro,
+                        numero_factura=numero_factura,
+                        fecha_factura=fecha_factura,
+                        proveedor=proveedor,
+                        concepto=concepto,
+                        valor=valor,
+                        observacion_retraso=observacion_retraso,
+                        estado_contable=estado_contable,
+                        referencia_appd=referencia_appd,
+                        numero_orden_compra=numero_orden_compra,
+                        fecha_recepcion_lider=fecha_recepcion_lider,
+                    )
                 creadas.append(factura)
 
             except InvalidOperation:
@@ -242,9 +274,12 @@ class ContabilidadService:
             except Exception as e:
                 errores.append({'fila': num_fila, 'error': str(e)})
 
+        if creadas:
+            ContabilidadService.actualizar_resumen(registro)
         return creadas, errores
 
     @staticmethod
+    @transaction.atomic
     def eliminar_factura(factura, usuario):
         """
         Elimina una Factura. En DEVUELTO_COMPRAS solo se pueden eliminar facturas DEVUELTA.
@@ -258,7 +293,9 @@ class ContabilidadService:
             raise ValueError(
                 "Solo se pueden eliminar facturas que fueron devueltas por Compras."
             )
+        registro = factura.registro
         factura.delete()
+        ContabilidadService.actualizar_resumen(registro)
 
     @staticmethod
     def editar_descripcion(registro, descripcion, usuario):
@@ -561,6 +598,7 @@ class ContabilidadService:
         # 2. Mover facturas aprobadas al nuevo registro
         aprobadas_ids = [f.pk for f in aprobadas]
         Factura.objects.filter(pk__in=aprobadas_ids).update(registro=nuevo)
+        ContabilidadService.actualizar_resumen(registro, nuevo)
 
         # 3. Registro original: queda solo con las devueltas → DEVUELTO_COMPRAS
         ContabilidadService._transicion(
@@ -882,6 +920,7 @@ class ContabilidadService:
 
         # 2. Mover facturas aprobadas al nuevo registro
         Factura.objects.filter(pk__in=[f.pk for f in aprobadas]).update(registro=nuevo)
+        ContabilidadService.actualizar_resumen(registro, nuevo)
 
         # 3. Registro original: queda con las devueltas → OBSERVADO_CONTABILIDAD
         registro.fecha_inicio_revision_contabilidad = registro.fecha_inicio_revision_contabilidad or now
@@ -2,7 +2,7 @@ import json
 
 from django.contrib.auth.models import Group, User
 from django.db.models import Q
-from django.test import Client, TestCase
+from django.test import Client, RequestFactory, TestCase
 
 from .models import (
     Factura, HistorialEstado, ItemChecklist,
@@ -803,3 +803,118 @@ class ContabilidadDevolucionParcialAPITests(TestCase):
         )
 
         self.assertEqual(response.status_code, 302)
+
+
+class ResumenRegistroTests(TestCase):
+    """valor_total / num_facturas / contratos almacenados y listado en una consulta."""
+
+    def setUp(self):
+        self.client = Client()
+        self.lider = User.objects.create_superuser(
+            username='resumen_lider', email='r@x.com', password='test1234', first_name='Ana', last_name='Pérez'
+        )
+        self.compras = User.objects.create_user(username='resumen_compras', password='test1234')
+        ItemChecklist.objects.all().update(activo=False)
+
+    def _registro(self, facturas):
+        registro = ContabilidadService.crear_registro(
+            lider=self.lider, tipo='SERVICIOS', periodo_mes=6, periodo_ano=2025
+        )
+        for i, (valor, contrato) in enumerate(facturas):
+            ContabilidadService.agregar_factura(registro, {
+                'numero_factura': f'FR-{i}', 'proveedor': 'P', 'concepto': 'C',
+                'valor': valor, 'fecha_factura': '2025-06-01', 'tipo_contrato': contrato,
+            })
+        return registro
+
+    def test_resumen_se_mantiene_al_agregar_eliminar_y_split(self):
+        registro = self._registro([(100, 'OBRA'), (250, ''), (50, 'OBRA'), (10, 'ARRIENDO')])
+        guardado = RegistroContable.objects.get(pk=registro.pk)
+        self.assertEqual((guardado.valor_total, guardado.num_facturas), (410, 4))
+        self.assertEqual(guardado.contratos, ['ARRIENDO', 'OBRA'])
+
+        ContabilidadService.eliminar_factura(registro.facturas.get(numero_factura='FR-3'), self.lider)
+        guardado.refresh_from_db()
+        self.assertEqual((guardado.valor_total, guardado.num_facturas, guardado.contratos), (400, 3, ['OBRA']))
+
+        # Un save() completo de una instancia vieja no pisa el resumen
+        viejo = RegistroContable.objects.get(pk=registro.pk)
+        ContabilidadService.agregar_factura(registro, {
+            'numero_factura': 'FR-9', 'proveedor': 'P', 'concepto': 'C',
+            'valor': 1, 'fecha_factura': '2025-06-01',
+        })
+        viejo.descripcion = 'Editado'
+        viejo.save()
+        guardado.refresh_from_db()
+        self.assertEqual((guardado.valor_total, guardado.descripcion), (401, 'Editado'))
+
+        ContabilidadService.enviar(registro, self.lider)
+        ContabilidadService.confirmar_recepcion(registro, self.compras)
+        for factura in registro.facturas.all():
+            if factura.numero_factura == 'FR-0':
+                ContabilidadService.devolver_factura(factura, self.compras, 'Falta firma')
+            else:
+                ContabilidadService.aprobar_factura(factura, self.compras)
+        original, nuevo = ContabilidadService.finalizar_revision_compras(registro, self.compras)
+
+        original.refresh_from_db()
+        nuevo.refresh_from_db()
+        self.assertEqual((original.valor_total, original.num_facturas, original.contratos), (100, 1, ['OBRA']))
+        self.assertEqual((nuevo.valor_total, nuevo.num_facturas, nuevo.contratos), (301, 3, ['OBRA']))
+
+    def test_listado_en_una_consulta_y_paginado(self):
+        for i in range(5):
+            self._registro([(100 * (i + 1), f'K{i}')])
+        self.client.force_login(self.lider)
+
+        # Sesión, usuario y el listado, sin importar cuántos registros haya
+        with self.assertNumQueries(3):
+            datos = self.client.get('/contabilidad/api/registros/', secure=True).json()
+        self.assertEqual(len(datos['data']), 5)
+        primero = datos['data'][0]
+        self.assertEqual((primero['valor_total'], primero['total_documentos']), (500.0, 1))
+        self.assertEqual((primero['lider'], primero['contratos']), ('Ana Pérez', ['K4']))
+
+        datos = self.client.get('/contabilidad/api/registros/', {'pagina': 2, 'por_pagina': 2}, secure=True).json()
+        self.assertEqual([r['valor_total'] for r in datos['data']], [300.0, 200.0])
+        self.assertEqual(datos['paginacion']['total'], 5)
+        self.assertEqual(datos['paginacion']['num_paginas'], 3)
+        self.assertTrue(datos['paginacion']['has_next'])
+
+        # Después de la última página: sin filas, pero con el total real
+        datos = self.client.get('/contabilidad/api/registros/', {'pagina': 9, 'por_pagina': 2}, secure=True).json()
+        self.assertEqual(datos['data'], [])
+        self.assertEqual((datos['paginacion']['total'], datos['paginacion']['num_paginas']), (5, 3))
+        self.assertFalse(datos['paginacion']['has_next'])
+
+        datos = self.client.get('/contabilidad/api/registros/', {'contrato': 'K1'}, secure=True).json()
+        self.assertEqual([r['valor_total'] for r in datos['data']], [200.0])
+
+    def test_admin_de_facturas_recalcula_el_resumen(self):
+        from django.contrib.admin.sites import site
+
+        origen = self._registro([(100, 'OBRA'), (50, 'ARRIENDO')])
+        destino = self._registro([(10, '')])
+        factura_admin = site._registry[Factura]
+        request = RequestFactory().post('/admin/contabilidad/factura/')
+        request.user = self.lider
+
+        # Mover una factura a otro registro recalcula los dos
+        factura = origen.facturas.get(numero_factura='FR-1')
+        factura.registro = destino
+        factura_admin.save_model(request, factura, None, change=True)
+        origen.refresh_from_db()
+        destino.refresh_from_db()
+        self.assertEqual((origen.valor_total, origen.num_facturas, origen.contratos), (100, 1, ['OBRA']))
+        self.assertEqual((destino.valor_total, destino.num_facturas, destino.contratos), (60, 2, ['ARRIENDO']))
+
+        factura_admin.delete_model(request, factura)
+        destino.refresh_from_db()
+        self.assertEqual((destino.valor_total, destino.num_facturas), (10, 1))
+
+        factura_admin.delete_queryset(request, Factura.objects.filter(registro__in=[origen, destino]))
+        for registro in (origen, destino):
+            registro.refresh_from_db()
+            self.assertEqual((registro.valor_total, registro.num_facturas, registro.contratos), (0, 0, []))
+
+        self.assertTrue(set(RegistroContable.CAMPOS_RESUMEN) <= set(site._registry[RegistroContable].readonly_fields))
@@ -1,6 +1,8 @@
 import json
 
 from django.contrib.auth.decorators import login_required
+from django.db.models import Count, F, Value, Window
+from django.db.models.functions import Coalesce, Concat, NullIf, Trim
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, render
 from django.views.decorators.csrf import csrf_exempt
@@ -26,9 +28,22 @@ def _estado_display_efectivo(registro):
     """Retorna el display del estado considerando el tipo de registro.
     Para MATERIAS_PRIMAS en estado APROBADO_COMPRAS, muestra 'Enviado a Contabilidad'
     porque Compras no intervino en ese proceso."""
-    if registro.tipo in ('MATERIAS_PRIMAS', 'SERVICIOS_FIJOS') and registro.estado == 'APROBADO_COMPRAS':
+    return _estado_display_valores(registro.tipo, registro.estado)
+
+
+_TIPOS_DISPLAY = dict(RegistroContable.TIPO_CHOICES)
+_ESTADOS_DISPLAY = dict(RegistroContable.ESTADO_CHOICES)
+POR_PAGINA_REGISTROS = 50
+_CAMPOS_LISTADO = (
+    'id', 'tipo', 'periodo_mes', 'periodo_ano', 'descripcion', 'estado', 'lider_id', 'lider_nombre',
+    'fecha_creacion', 'fecha_envio', 'valor_total', 'num_facturas', 'contratos', 'registro_origen_id',
+)
+
+
+def _estado_display_valores(tipo, estado):
+    if tipo in ('MATERIAS_PRIMAS', 'SERVICIOS_FIJOS') and estado == 'APROBADO_COMPRAS':
         return 'Enviado a Contabilidad'
-    return registro.get_estado_display()
+    return _ESTADOS_DISPLAY.get(estado, estado)
 
 
 # --------------------------------------------------------------------------- #
@@ -150,7 +165,11 @@ def api_crear_registro(request):
 
 @login_required
 def api_listar_registros(request):
-    """GET — Lista registros según rol del usuario."""
+    """
+    GET — Lista registros según rol del usuario.
+    Filtros opcionales: tipo, estado, contrato. Con ?pagina=N (y por_pagina,
+    máx. 200) responde solo esa página y agrega 'paginacion'.
+    """
     if request.method != 'GET':
         return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
 
@@ -168,32 +187,70 @@ def api_listar_registros(request):
         # Líder: solo sus propios registros
         qs = RegistroContable.objects.filter(lider=user).select_related('lider')
 
+    # Filtros opcionales en el servidor (las pantallas actuales también filtran en el cliente)
+    if request.GET.get('tipo'):
+        qs = qs.filter(tipo=request.GET['tipo'])
+    if request.GET.get('estado'):
+        qs = qs.filter(estado=request.GET['estado'])
+    if request.GET.get('contrato'):
+        qs = qs.filter(contratos__contains=[request.GET['contrato']])
+
+    # Una sola consulta: columnas del listado, resumen de facturas ya almacenado
+    # en el registro y nombre del líder anotado; con ?pagina= el total sale de
+    # una ventana sobre la misma consulta (o de un count() si la página pedida
+    # queda después de la última y no trae filas).
+    qs = qs.order_by('-fecha_creacion', '-id').annotate(
+        lider_nombre=Coalesce(
+            NullIf(Trim(Concat('lider__first_name', Value(' '), 'lider__last_name')), Value('')),
+            F('lider__username'),
+        ),
+    )
+    filas = qs
+    pagina = request.GET.get('pagina')
+    if pagina:
+        try:
+            pagina = max(int(pagina), 1)
+            por_pagina = min(max(int(request.GET.get('por_pagina', POR_PAGINA_REGISTROS)), 1), 200)
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Paginación inválida'}, status=400)
+        inicio = (pagina - 1) * por_pagina
+        filas = qs.annotate(total_filas=Window(Count('id')))[inicio:inicio + por_pagina]
+
     registros = []
-    for r in qs.order_by('-fecha_creacion'):
+    total = 0
+    for r in filas.values(*_CAMPOS_LISTADO, *(('total_filas',) if pagina else ())):
+        total = r.pop('total_filas', 0)
         registros.append({
-            'id': r.pk,
-            'tipo': r.tipo,
-            'tipo_display': r.get_tipo_display(),
-            'periodo_mes': r.periodo_mes,
-            'periodo_ano': r.periodo_ano,
-            'descripcion': r.descripcion,
-            'estado': r.estado,
-            'estado_display': _estado_display_efectivo(r),
-            'lider': r.lider.get_full_name() or r.lider.username,
-            'lider_id': r.lider_id,
-            'fecha_creacion': r.fecha_creacion.isoformat() if r.fecha_creacion else None,
-            'fecha_envio': r.fecha_envio.isoformat() if r.fecha_envio else None,
-            'valor_total': float(r.valor_total),
-            'total_documentos': r.total_documentos,
-            'registro_origen_id': r.registro_origen_id,
-            'es_derivado': r.registro_origen_id is not None,
-            'contratos': list(
-                r.facturas.exclude(tipo_contrato='')
-                           .values_list('tipo_contrato', flat=True)
-                           .distinct()
-            ),
+            'id': r['id'],
+            'tipo': r['tipo'],
+            'tipo_display': _TIPOS_DISPLAY.get(r['tipo'], r['tipo']),
+            'periodo_mes': r['periodo_mes'],
+            'periodo_ano': r['periodo_ano'],
+            'descripcion': r['descripcion'],
+            'estado': r['estado'],
+            'estado_display': _estado_display_valores(r['tipo'], r['estado']),
+            'lider': r['lider_nombre'],
+            'lider_id': r['lider_id'],
+            'fecha_creacion': r['fecha_creacion'].isoformat() if r['fecha_creacion'] else None,
+            'fecha_envio': r['fecha_envio'].isoformat() if r['fecha_envio'] else None,
+            'valor_total': float(r['valor_total']),
+            'total_documentos': r['num_facturas'],
+            'registro_origen_id': r['registro_origen_id'],
+            'es_derivado': r['registro_origen_id'] is not None,
+            'contratos': r['contratos'],
         })
 
+    if pagina:
+        if not registros and pagina > 1:
+            total = qs.count()
+        return JsonResponse({'success': True, 'data': registros, 'paginacion': {
+            'pagina': pagina,
+            'por_pagina': por_pagina,
+            'total': total,
+            'num_paginas': -(-total // por_pagina),
+            'has_next': inicio + len(registros) < total,
+            'has_previous': pagina > 1,
+        }})
     return JsonResponse({'success': True, 'data': registros})
 
 
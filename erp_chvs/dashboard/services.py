@@ -7,7 +7,6 @@ import google.generativeai as genai
 from django.utils import timezone
 
 from facturacion.models import ListadosFocalizacion
-from planeacion.models import SedesEducativas
 from principal.models import RegistroActividad
 
 logger = logging.getLogger(__name__)
@@ -65,19 +64,8 @@ def obtener_focalizaciones(programa_id):
 
 def obtener_sedes_mapa(programa_id, focalizacion=None):
     """Retorna {nombre_sede: cod_interprise}. Gemini nunca maneja códigos directamente."""
-    filtro = {'programa_id': programa_id}
-    if focalizacion:
-        filtro['focalizacion'] = focalizacion
-
-    nombres_sedes = list(
-        ListadosFocalizacion.objects
-        .filter(**filtro)
-        .values_list('sede', flat=True)
-        .distinct()
-    )
-
-    sedes_qs = SedesEducativas.objects.filter(
-        nombre_sede_educativa__in=nombres_sedes
+    sedes_qs = ListadosFocalizacion.sedes_con_registros(
+        programa_id, focalizacion
     ).values('nombre_sede_educativa', 'cod_interprise')
 
     return {s['nombre_sede_educativa']: s['cod_interprise'] for s in sedes_qs}
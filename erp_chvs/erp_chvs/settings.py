@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 import dj_database_url
 
@@ -210,10 +211,50 @@ else:
 
 # BD externa de empleados (read-only, usada por calidad/services.py)
 EMPLEADOS_DB_URL = os.environ.get('EMPLEADOS_DB_URL', '')
+EMPLEADOS_DB_POOL_MAX = int(os.environ.get('EMPLEADOS_DB_POOL_MAX', '5'))  # Conexiones por proceso
+EMPLEADOS_CACHE_TTL = int(os.environ.get('EMPLEADOS_CACHE_TTL', '300'))  # Segundos en caché por cédula
+# Consultar primero el espejo local (python manage.py sincronizar_empleados)
+EMPLEADOS_USAR_ESPEJO = os.environ.get('EMPLEADOS_USAR_ESPEJO', 'False') == 'True'
 
 # Clave compartida entre el ERP y el servicio apiw para el endpoint de WhatsApp
 CALIDAD_WA_API_KEY = os.environ.get('CALIDAD_WA_API_KEY', '')
 
+# Cargas de listados entre etapa 1 y 2 (facturacion/staging_service.py)
+FACTURACION_STAGING_DIR = os.environ.get('FACTURACION_STAGING_DIR', '')  # Vacío = <tmp>/erp_chvs_cargas
+FACTURACION_STAGING_TTL = int(os.environ.get('FACTURACION_STAGING_TTL', str(6 * 3600)))  # Segundos
+FACTURACION_COBERTURA_CACHE_TTL = int(os.environ.get('FACTURACION_COBERTURA_CACHE_TTL', '300'))  # Sedes faltantes por programa
+FACTURACION_LISTADOS_TOTAL_TTL = int(os.environ.get('FACTURACION_LISTADOS_TOTAL_TTL', '600'))  # Totales de lista_listados
+NUTRICION_MATCH_CACHE_TTL = int(os.environ.get('NUTRICION_MATCH_CACHE_TTL', '600'))  # Grilla del match ICBF → Compras
+NUTRICION_CATALOGO_EDITOR_CACHE_TTL = int(os.environ.get('NUTRICION_CATALOGO_EDITOR_CACHE_TTL', '86400'))  # Catálogos del editor de preparaciones
+AGENTE_CONTEXTO_CACHE_TTL = int(os.environ.get('AGENTE_CONTEXTO_CACHE_TTL', '3600'))  # Contexto por modalidad del agente
+AGENTE_POOL_CACHE_TTL = int(os.environ.get('AGENTE_POOL_CACHE_TTL', '30'))  # Conteo de borradores disponibles en el pool
+LOGISTICA_ORIGEN_RUTAS = os.environ.get('LOGISTICA_ORIGEN_RUTAS', '')  # "lat,lon" de la bodega; vacío = inicio libre
+LOGISTICA_FUENTE_DISTANCIAS = os.environ.get('LOGISTICA_FUENTE_DISTANCIAS', '')  # Ruta importable; vacío = haversine
+
+# Certificados de calidad en lote
+CALIDAD_MAX_LOTE = int(os.environ.get('CALIDAD_MAX_LOTE', '5000'))  # Cédulas / certificados por solicitud
+CALIDAD_PDF_WORKERS = int(os.environ.get('CALIDAD_PDF_WORKERS', '4'))  # Procesos para generar PDFs de un lote
+CALIDAD_PDF_CACHE_TTL = int(os.environ.get('CALIDAD_PDF_CACHE_TTL', '86400'))  # Segundos en caché por PDF
+
+# Caché: 'default' en memoria por proceso; 'pdfs' en disco, compartida entre
+# workers, para los PDFs ya generados (certificados, etc.); 'versiones' en
+# disco, compartida, para las versiones de las cachés locales que se
+# invalidan por señales (así la invalidación llega a todos los workers)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'versiones': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('VERSIONES_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'erp_chvs_versiones')),
+    },
+    'pdfs': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'erp_chvs_pdfs')),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -310,6 +351,11 @@ if DEBUG:
     logs_dir = os.path.join(BASE_DIR, 'logs')
     os.makedirs(logs_dir, exist_ok=True)
 
+# Instrumentación por request (principal.middleware.ResponseTimingMiddleware)
+PERF_UMBRAL_LENTO_MS = int(os.environ.get('PERF_UMBRAL_LENTO_MS', '1000'))  # Loguea WARNING sobre este tiempo
+PERF_UMBRAL_DUPLICADAS = int(os.environ.get('PERF_UMBRAL_DUPLICADAS', '5'))  # Repeticiones de una misma consulta = N+1
+PERF_STATS_VENTANA = int(os.environ.get('PERF_STATS_VENTANA', '500'))  # Muestras en memoria por vista
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
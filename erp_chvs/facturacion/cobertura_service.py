@@ -0,0 +1,112 @@
+"""
+Cobertura de listados por sede: qué sedes del catálogo del municipio de un
+programa no tienen listados en alguna de sus focalizaciones.
+
+Se calcula con una consulta agrupada de pares (sede, focalización) y una
+del catálogo, comparadas con conjuntos en memoria. El resultado se cachea
+por programa en la caché local del worker; las escrituras sobre listados
+invalidan la versión del programa y la global. Las versiones viven en la
+caché compartida 'versiones', así que una carga hecha en un worker
+invalida a todos. Otras vistas agregadas de listados reutilizan version()
+en sus claves.
+"""
+
+import uuid
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache, caches
+
+from planeacion.models import Programa, SedesEducativas
+
+from .models import ListadosFocalizacion
+
+_CACHE_PREFIJO = 'facturacion:cobertura:'
+
+
+class CoberturaSedesService:
+    """Sedes faltantes (sin listados) por programa y focalización."""
+
+    @staticmethod
+    def calcular(programa_id: int, focalizacion: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Args:
+            programa_id: ID del programa
+            focalizacion: Si se indica, solo se evalúa esa focalización; si no,
+                todas las focalizaciones que el programa tiene cargadas.
+
+        Returns:
+            Dict con focalizaciones_programa, sedes_faltantes
+            ([{sede, cod_interprise, focalizaciones_faltantes}]) y total_sedes_faltantes.
+        """
+        focalizaciones_programa = set()
+        focalizaciones_por_sede = {}
+        # Listados sin vincular a la FK: cuentan por nombre (ListadosFocalizacion.q_sede)
+        focalizaciones_por_nombre = {}
+        pares = ListadosFocalizacion.objects.filter(
+            programa_id=programa_id
+        ).values_list('sede_educativa_id', 'sede', 'focalizacion').distinct()
+        for cod_interprise, nombre, focal in pares:
+            focalizaciones_programa.add(focal)
+            if cod_interprise:
+                focalizaciones_por_sede.setdefault(cod_interprise, set()).add(focal)
+            else:
+                focalizaciones_por_nombre.setdefault(nombre, set()).add(focal)
+
+        esperadas = {focalizacion} if focalizacion else focalizaciones_programa
+        catalogo = SedesEducativas.objects.filter(
+            codigo_ie__id_municipios__in=Programa.objects.filter(id=programa_id).values('municipio')
+        ).order_by('nombre_sede_educativa').values_list('cod_interprise', 'nombre_sede_educativa')
+
+        sedes_faltantes = []
+        for cod_interprise, nombre in catalogo:
+            faltantes = (
+                esperadas
+                - focalizaciones_por_sede.get(cod_interprise, set())
+                - focalizaciones_por_nombre.get(nombre, set())
+            )
+            if faltantes:
+                sedes_faltantes.append({
+                    'sede': nombre,
+                    'cod_interprise': cod_interprise,
+                    'focalizaciones_faltantes': sorted(faltantes),
+                })
+
+        return {
+            'programa_id': int(programa_id),
+            'focalizacion': focalizacion or '',
+            'focalizaciones_programa': sorted(focalizaciones_programa),
+            'sedes_faltantes': sedes_faltantes,
+            'total_sedes_faltantes': len(sedes_faltantes),
+        }
+
+    @staticmethod
+    def _clave_version(programa_id) -> str:
+        return f'{_CACHE_PREFIJO}version:{programa_id or "todos"}'
+
+    @staticmethod
+    def version(programa_id: Optional[int] = None) -> str:
+        """
+        Versión de los listados del programa (o de todos, con None) para armar
+        claves de caché; cambia cada vez que se invalida.
+        """
+        return caches['versiones'].get_or_set(CoberturaSedesService._clave_version(programa_id), uuid.uuid4().hex, None)
+
+    @staticmethod
+    def sedes_faltantes(programa_id: int, focalizacion: Optional[str] = None) -> Dict[str, Any]:
+        """calcular() con caché (FACTURACION_COBERTURA_CACHE_TTL segundos)."""
+        version = CoberturaSedesService.version(programa_id)
+        clave = f'{_CACHE_PREFIJO}{programa_id}:{version}:{focalizacion or ""}'
+        datos = cache.get(clave)
+        if datos is None:
+            datos = CoberturaSedesService.calcular(programa_id, focalizacion)
+            cache.set(clave, datos, getattr(settings, 'FACTURACION_COBERTURA_CACHE_TTL', 300))
+        return datos
+
+    @staticmethod
+    def invalidar(programa_id) -> None:
+        """Descarta lo cacheado del programa y lo global (nueva versión de clave)."""
+        claves = [CoberturaSedesService._clave_version(None)]
+        if programa_id:
+            claves.append(CoberturaSedesService._clave_version(programa_id))
+        caches['versiones'].set_many({clave: uuid.uuid4().hex for clave in claves}, None)
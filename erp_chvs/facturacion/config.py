@@ -67,6 +67,17 @@ class ProcesamientoConfig:
         'FECHA_NACIMIENTO', 'GENERO', 'GRADO', 'TIPO_JORNADA',
     ]
 
+    # --- Lectura de archivos ---
+    # Columnas no obligatorias que el procesamiento o la persistencia usan si existen.
+    # Junto con las requeridas definen qué columnas se leen del archivo (el resto se ignora).
+    COLUMNAS_OPCIONALES_NUEVO_FORMATO = ['ETNIA']
+    COLUMNAS_OPCIONALES_ORIGINAL_FORMATO = []
+    COLUMNAS_OPCIONALES_SIMAT_6A = ['APELLIDO2', 'NOMBRE2', 'GRUPO', 'ETNIA', 'EDAD']
+
+    # Columnas que se leen como texto para no perder ceros a la izquierda ni
+    # convertir documentos a float cuando hay celdas vacías.
+    COLUMNAS_TEXTO_LECTURA = {'DOC', 'NRO_DOCUMENTO'}
+
     # Mapeo MUN_CODIGO (entero SIMAT) → nombre ETC interno del sistema
     MAPEO_MUNICIPIO_CODIGO = {
         892: 'YUMBO',
@@ -105,7 +116,9 @@ class ProcesamientoConfig:
     # Tipos MIME válidos para archivos Excel
     MIME_TYPES_VALIDOS = [
         'application/vnd.ms-excel',
-        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        'text/csv',
+        'application/csv',
     ]
     
     # Configuración de logging
@@ -113,7 +126,7 @@ class ProcesamientoConfig:
     LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     
     # Configuración de archivos
-    EXTENSIONES_PERMITIDAS = ['.xls', '.xlsx']
+    EXTENSIONES_PERMITIDAS = ['.xls', '.xlsx', '.csv']
     TAMANO_MAXIMO_ARCHIVO = 50 * 1024 * 1024  # 50MB
 
 # Configuración de focalizaciones
@@ -135,7 +148,7 @@ class MensajesConfig:
     VALIDACION_EXITOSA = "Validación exitosa"
     
     # Mensajes de error
-    ARCHIVO_INVALIDO = "Tipo de archivo inválido. Solo se permiten archivos Excel (.xls, .xlsx)"
+    ARCHIVO_INVALIDO = "Tipo de archivo inválido. Solo se permiten archivos Excel (.xls, .xlsx) o CSV"
     COLUMNAS_FALTANTES = "Columnas requeridas faltantes: {columnas}"
     NO_FILAS_LOTE_3 = "No se encontraron filas con LOTE == 3 en el archivo"
     NO_FILAS_VALIDAS = "No se encontraron filas válidas después del filtrado"
@@ -2,11 +2,16 @@
 Utilidades para el manejo de archivos Excel.
 """
 
+import csv
+
+import openpyxl
 import pandas as pd
 from django.core.files.uploadedfile import UploadedFile
-from typing import List, Tuple
+from pandas.io.parsers import TextParser
+from typing import List, Optional, Set, Tuple
 from .config import ProcesamientoConfig
 from .exceptions import ArchivoInvalidoException, ColumnasFaltantesException
+from .xlsx_stream import leer_hoja
 
 class ExcelProcessor:
     """Procesador de archivos Excel con validaciones y utilidades."""
@@ -41,42 +46,191 @@ class ExcelProcessor:
             return False
     
     @staticmethod
-    def leer_excel(archivo: UploadedFile) -> pd.DataFrame:
+    def columnas_lectura(tipo_procesamiento: str) -> Set[str]:
+        """
+        Columnas (normalizadas: strip + mayúsculas) que necesita cada formato:
+        las requeridas por su validación más las opcionales que usa el procesamiento.
+        """
+        if tipo_procesamiento == ProcesamientoConfig.TIPO_PROCESAMIENTO_NUEVO:
+            return set(ProcesamientoConfig.COLUMNAS_NUEVO_FORMATO) | set(ProcesamientoConfig.COLUMNAS_OPCIONALES_NUEVO_FORMATO)
+        if tipo_procesamiento == ProcesamientoConfig.TIPO_PROCESAMIENTO_SIMAT_6A:
+            return set(ProcesamientoConfig.COLUMNAS_SIMAT_6A) | set(ProcesamientoConfig.COLUMNAS_OPCIONALES_SIMAT_6A)
+        return set(ProcesamientoConfig.COLUMNAS_ORIGINAL_FORMATO) | set(ProcesamientoConfig.COLUMNAS_OPCIONALES_ORIGINAL_FORMATO)
+
+    @staticmethod
+    def _incluir_columna(nombre: str, columnas: Optional[Set[str]]) -> bool:
+        """True si la columna (o su alias del formato nuevo) está entre las pedidas."""
+        from .data_processors import DataTransformer
+
+        if columnas is None:
+            return True
+        nombre = nombre.upper()
+        return nombre in columnas or DataTransformer.ALIAS_COLUMNAS.get(nombre) in columnas
+
+    @staticmethod
+    def _limpiar_nombres_columnas(encabezado) -> List[str]:
+        """Quita espacios a los nombres y numera los duplicados (COL, COL_1, ...)."""
+        nuevas_columnas = []
+        conteos = {}
+        for idx, col in enumerate(encabezado):
+            nombre_limpio = str(col).strip() if col is not None else f"Unnamed: {idx}"
+            if nombre_limpio in conteos:
+                conteos[nombre_limpio] += 1
+                nuevas_columnas.append(f"{nombre_limpio}_{conteos[nombre_limpio]}")
+            else:
+                conteos[nombre_limpio] = 0
+                nuevas_columnas.append(nombre_limpio)
+        return nuevas_columnas
+
+    @staticmethod
+    def _es_csv(archivo: UploadedFile) -> bool:
+        return archivo.name.lower().endswith('.csv')
+
+    @staticmethod
+    def _es_xlsx(archivo: UploadedFile) -> bool:
+        return archivo.name.lower().endswith(('.xlsx', '.xlsm'))
+
+    @staticmethod
+    def _primera_linea_csv(archivo: UploadedFile) -> str:
+        archivo.seek(0)
+        linea = archivo.readline()
+        archivo.seek(0)
+        try:
+            return linea.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            return linea.decode('latin-1')  # Exportaciones de Excel en Windows
+
+    @staticmethod
+    def _separador_csv(primera_linea: str) -> str:
+        return max((';', ',', '\t'), key=primera_linea.count)
+
+    @staticmethod
+    def leer_encabezados(archivo: UploadedFile) -> List[str]:
+        """Nombres de columna del archivo (limpios) sin leer las filas de datos."""
+        if ExcelProcessor._es_csv(archivo):
+            primera_linea = ExcelProcessor._primera_linea_csv(archivo)
+            encabezado = next(csv.reader([primera_linea], delimiter=ExcelProcessor._separador_csv(primera_linea)), [])
+        elif ExcelProcessor._es_xlsx(archivo):
+            archivo.seek(0)
+            wb = openpyxl.load_workbook(archivo, read_only=True, data_only=True, keep_links=False)
+            try:
+                encabezado = next(wb.worksheets[0].iter_rows(max_row=1, values_only=True), ())
+            finally:
+                wb.close()
+                archivo.seek(0)
+        else:
+            archivo.seek(0)
+            encabezado = list(pd.read_excel(archivo, nrows=0).columns)
+            archivo.seek(0)
+        return ExcelProcessor._limpiar_nombres_columnas(encabezado)
+
+    @staticmethod
+    def _leer_xlsx_streaming(archivo: UploadedFile, columnas: Optional[Set[str]]) -> pd.DataFrame:
+        """
+        Lee la primera hoja en streaming (ver xlsx_stream) convirtiendo solo las
+        celdas de las columnas pedidas; los textos se limpian en el mismo paso.
+        TextParser aplica la misma inferencia de tipos que pd.read_excel.
+        """
+        seleccion = []
+
+        def seleccionar(encabezado):
+            nombres = ExcelProcessor._limpiar_nombres_columnas(encabezado)
+            indices = [i for i, nombre in enumerate(nombres) if ExcelProcessor._incluir_columna(nombre, columnas)]
+            seleccion.extend(nombres[i] for i in indices)
+            return indices
+
+        archivo.seek(0)
+        try:
+            encabezado, filas = leer_hoja(archivo, seleccionar)
+        finally:
+            archivo.seek(0)
+        if not encabezado:
+            raise ArchivoInvalidoException("El archivo Excel está vacío")
+
+        for fila in filas:
+            for i, v in enumerate(fila):
+                if v is None:
+                    fila[i] = ''
+                elif isinstance(v, str):
+                    fila[i] = v.strip()
+
+        dtypes = {
+            nombre: str for nombre in seleccion
+            if ExcelProcessor._incluir_columna(nombre, ProcesamientoConfig.COLUMNAS_TEXTO_LECTURA)
+        }
+        if not filas:
+            return pd.DataFrame(columns=seleccion)
+        return TextParser([seleccion] + filas, header=0, dtype=dtypes or None).read()
+
+    @staticmethod
+    def _leer_csv(archivo: UploadedFile, columnas: Optional[Set[str]]) -> pd.DataFrame:
+        primera_linea = ExcelProcessor._primera_linea_csv(archivo)
+        separador = ExcelProcessor._separador_csv(primera_linea)
+        encabezado = next(csv.reader([primera_linea], delimiter=separador), [])
+        nombres = ExcelProcessor._limpiar_nombres_columnas(encabezado)
+        indices = [i for i, nombre in enumerate(nombres) if ExcelProcessor._incluir_columna(nombre, columnas)]
+        dtypes = {
+            nombres[i]: str for i in indices
+            if ExcelProcessor._incluir_columna(nombres[i], ProcesamientoConfig.COLUMNAS_TEXTO_LECTURA)
+        }
+        for encoding in ('utf-8-sig', 'latin-1'):
+            archivo.seek(0)
+            try:
+                # archivo.file: pandas no reinicia bien su decodificador sobre el wrapper de Django
+                return pd.read_csv(
+                    archivo.file,
+                    sep=separador,
+                    header=0,
+                    names=nombres,
+                    usecols=indices,
+                    dtype=dtypes or None,
+                    encoding=encoding,
+                    skip_blank_lines=True,
+                )
+            except UnicodeDecodeError:
+                continue  # Exportaciones de Excel en Windows vienen en latin-1
+            finally:
+                archivo.seek(0)
+
+    @staticmethod
+    def _limpiar_espacios(df: pd.DataFrame) -> pd.DataFrame:
+        """Strip vectorizado en columnas de texto; las celdas no textuales se conservan."""
+        for col in df.select_dtypes(include=['object']).columns:
+            try:
+                df[col] = df[col].str.strip().fillna(df[col])
+            except AttributeError:
+                pass  # Columna object sin textos (fechas, etc.)
+        return df
+
+    @staticmethod
+    def leer_excel(archivo: UploadedFile, columnas: Optional[Set[str]] = None) -> pd.DataFrame:
         """
-        Lee un archivo Excel y retorna un DataFrame con limpieza de espacios.
+        Lee un archivo Excel (.xlsx/.xls) o CSV y retorna un DataFrame con limpieza de espacios.
         
         Args:
-            archivo: Archivo Excel subido
+            archivo: Archivo subido
+            columnas: Nombres normalizados a conservar (ver `columnas_lectura`).
+                None lee todas las columnas.
         
         Returns:
-            pd.DataFrame: DataFrame con los datos del Excel
+            pd.DataFrame: DataFrame con los datos del archivo
             
         Raises:
             ArchivoInvalidoException: Si hay error al leer el archivo
         """
         try:
-            # Leer el archivo Excel
-            df = pd.read_excel(archivo)
-
-            # --- LIMPIEZA DE ESPACIOS ---
-            # 1. Limpiar nombres de columnas y manejar duplicados
-            nuevas_columnas = []
-            conteos = {}
-            for col in df.columns:
-                nombre_limpio = str(col).strip()
-                if nombre_limpio in conteos:
-                    conteos[nombre_limpio] += 1
-                    nuevas_columnas.append(f"{nombre_limpio}_{conteos[nombre_limpio]}")
-                else:
-                    conteos[nombre_limpio] = 0
-                    nuevas_columnas.append(nombre_limpio)
-            
-            df.columns = nuevas_columnas
-
-            # 2. Limpiar espacios en celdas de tipo texto
-            # select_dtypes(include=['object']) selecciona solo las columnas que contienen strings
-            for col in df.select_dtypes(include=['object']):
-                df[col] = df[col].apply(lambda x: x.strip() if isinstance(x, str) else x)
+            if ExcelProcessor._es_csv(archivo):
+                df = ExcelProcessor._limpiar_espacios(ExcelProcessor._leer_csv(archivo, columnas))
+            elif ExcelProcessor._es_xlsx(archivo):
+                df = ExcelProcessor._leer_xlsx_streaming(archivo, columnas)
+            else:
+                # .xls (formato binario antiguo): pandas con el motor disponible
+                archivo.seek(0)
+                df = pd.read_excel(archivo)
+                df.columns = ExcelProcessor._limpiar_nombres_columnas(df.columns)
+                if columnas is not None:
+                    df = df[[c for c in df.columns if ExcelProcessor._incluir_columna(c, columnas)]]
+                df = ExcelProcessor._limpiar_espacios(df)
 
             # Validar que no esté vacío
             if df.empty:
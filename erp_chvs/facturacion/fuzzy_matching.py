@@ -10,6 +10,7 @@ from planeacion.models import SedesEducativas
 from .config import ProcesamientoConfig
 from .exceptions import SedesInvalidasException
 from .logging_config import FacturacionLogger
+from .utils import _indexar_sedes_por_nombre, _resolver_codigo_sede
 
 class FuzzyMatcher:
     """Clase para manejo de coincidencia difusa de sedes."""
@@ -344,3 +345,27 @@ class FuzzyMatcher:
         )
         
         return df_filtrado
+
+    @staticmethod
+    def resolver_codigos_sedes(
+        nombres: List[str],
+        municipio_id: Optional[int] = None
+    ) -> Dict[str, Optional[str]]:
+        """
+        Resuelve los nombres de sede (ya normalizados al catálogo por
+        validar_sedes_excel) a su cod_interprise con una sola consulta.
+
+        Args:
+            nombres: Nombres de sede tal como quedan en el DataFrame
+            municipio_id: Municipio del programa, para desempatar nombres repetidos
+
+        Returns:
+            Dict[str, Optional[str]]: {nombre: cod_interprise o None si no se pudo resolver}
+        """
+        nombres = {n for n in nombres if n}
+        indice = _indexar_sedes_por_nombre(
+            SedesEducativas.objects.filter(
+                nombre_sede_educativa__in=nombres
+            ).values_list('nombre_sede_educativa', 'cod_interprise', 'codigo_ie__id_municipios_id')
+        )
+        return {nombre: _resolver_codigo_sede(indice, nombre, municipio_id) for nombre in nombres}
@@ -0,0 +1,124 @@
+"""
+Management command: benchmark_lectura_listados
+
+Genera un Anexo 6A de SIMAT sintético (xlsx y csv) con N filas y mide la
+lectura: pd.read_excel completo + strip celda a celda (lector anterior)
+contra ExcelProcessor.leer_excel con las columnas del formato. Reporta
+tiempo y pico de memoria (tracemalloc) y verifica que las columnas
+requeridas salgan iguales. No toca la base de datos.
+
+Uso:
+    python manage.py benchmark_lectura_listados
+    python manage.py benchmark_lectura_listados --filas 60000 --columnas-extra 50
+"""
+
+import random
+import time
+import tracemalloc
+from io import BytesIO
+
+import openpyxl
+import pandas as pd
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+
+from facturacion.config import ProcesamientoConfig
+from facturacion.excel_utils import ExcelProcessor
+
+XLSX_MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _fila_simat(rng: random.Random, idx: int, extras: int) -> list:
+    return [
+        2026, 892, 176892000001 + idx % 13, 276892000001 + idx % 43, 17689200000101 + idx % 43,
+        rng.choice(['URBANA', 'RURAL']), rng.choice([2, 3]), f"{1000000000 + idx}",
+        f"  APELLIDO{idx % 500}  ", f"OTRO{idx % 300}", f"NOMBRE{idx % 400} ", f"SEGUNDO{idx % 200}",
+        f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(2008, 2020)}",
+        rng.choice(['F', 'M']), rng.choice([-1, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11]),
+        rng.choice([101, 102, 201]), rng.choice([2, 3, 6, 6, 6, 4]), rng.choice([0, 0, 0, 1, 2]),
+        rng.randint(5, 17),
+    ] + [f"dato {idx % 97}" for _ in range(extras)]
+
+
+COLUMNAS_SIMAT = [
+    'ANO_INF', 'MUN_CODIGO', 'CODIGO_DANE', 'DANE_ANTERIOR', 'CONS_SEDE', 'ZONA', 'TIPO_DOCUMENTO',
+    'NRO_DOCUMENTO', 'APELLIDO1', 'APELLIDO2', 'NOMBRE1', 'NOMBRE2', 'FECHA_NACIMIENTO', 'GENERO',
+    'GRADO', 'GRUPO', 'TIPO_JORNADA', 'ETNIA', 'EDAD',
+]
+
+
+def _leer_anterior(archivo) -> pd.DataFrame:
+    """Lector previo: todas las columnas y strip por celda."""
+    archivo.seek(0)
+    df = pd.read_excel(archivo)
+    df.columns = [str(c).strip() for c in df.columns]
+    for col in df.select_dtypes(include=['object']):
+        df[col] = df[col].apply(lambda x: x.strip() if isinstance(x, str) else x)
+    return df
+
+
+def _medir(funcion):
+    """Tiempo en una corrida limpia y pico de memoria en otra (tracemalloc distorsiona el tiempo)."""
+    t0 = time.perf_counter()
+    resultado = funcion()
+    segundos = time.perf_counter() - t0
+    tracemalloc.start()
+    funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, segundos, pico / (1024 * 1024)
+
+
+class Command(BaseCommand):
+    help = 'Compara el lector de listados anterior con el lector por columnas (xlsx y csv).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=60000, help='Filas del archivo sintético (default: 60000)')
+        parser.add_argument('--columnas-extra', type=int, default=45,
+                            help='Columnas que el procesamiento no usa (default: 45, como un 6A real)')
+        parser.add_argument('--semilla', type=int, default=6)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['semilla'])
+        extras = options['columnas_extra']
+        encabezado = COLUMNAS_SIMAT + [f'EXTRA_{i}' for i in range(extras)]
+        filas = [_fila_simat(rng, i, extras) for i in range(options['filas'])]
+
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(encabezado)
+        for fila in filas:
+            ws.append(fila)
+        buffer = BytesIO()
+        wb.save(buffer)
+        xlsx = SimpleUploadedFile('anexo6a.xlsx', buffer.getvalue(), content_type=XLSX_MIME)
+        csv_bytes = pd.DataFrame(filas, columns=encabezado).to_csv(index=False, sep=';').encode('utf-8')
+        csv = SimpleUploadedFile('anexo6a.csv', csv_bytes, content_type='text/csv')
+        self.stdout.write(
+            f"Archivo sintético: {options['filas']} filas × {len(encabezado)} columnas "
+            f"(xlsx {len(buffer.getvalue()) / 1e6:.1f} MB, csv {len(csv_bytes) / 1e6:.1f} MB)"
+        )
+
+        columnas = ExcelProcessor.columnas_lectura(ProcesamientoConfig.TIPO_PROCESAMIENTO_SIMAT_6A)
+        anterior, t_ant, mem_ant = _medir(lambda: _leer_anterior(xlsx))
+        nuevo, t_nuevo, mem_nuevo = _medir(lambda: ExcelProcessor.leer_excel(xlsx, columnas))
+        nuevo_csv, t_csv, mem_csv = _medir(lambda: ExcelProcessor.leer_excel(csv, columnas))
+
+        self.stdout.write(f"{'lector':32} {'segundos':>9} {'pico MB':>9}")
+        self.stdout.write(f"{'read_excel + apply(strip)':32} {t_ant:9.2f} {mem_ant:9.1f}")
+        self.stdout.write(f"{'leer_excel xlsx (columnas)':32} {t_nuevo:9.2f} {mem_nuevo:9.1f}")
+        self.stdout.write(f"{'leer_excel csv (columnas)':32} {t_csv:9.2f} {mem_csv:9.1f}")
+
+        diferencias = []
+        for col in ProcesamientoConfig.COLUMNAS_SIMAT_6A:
+            esperado = anterior[col].astype(str).tolist()
+            if col in ProcesamientoConfig.COLUMNAS_TEXTO_LECTURA:
+                # El lector anterior dejaba los documentos como enteros
+                esperado = [str(v) for v in anterior[col].tolist()]
+            for nombre, df in (('xlsx', nuevo), ('csv', nuevo_csv)):
+                if df[col].astype(str).tolist() != esperado:
+                    diferencias.append(f"{col} ({nombre})")
+        if diferencias:
+            self.stdout.write(self.style.WARNING(f"Columnas con diferencias: {', '.join(diferencias)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("✓ Columnas requeridas idénticas al lector anterior"))
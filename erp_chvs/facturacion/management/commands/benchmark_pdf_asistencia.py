@@ -0,0 +1,90 @@
+"""
+Management command: benchmark_pdf_asistencia
+
+Genera el formato de asistencia de una sede sintética (por defecto 2.000
+estudiantes, 80 páginas) dibujando cada página completa y con la plantilla
+de form XObjects, y reporta tiempo y tamaño del PDF de cada modo. Con
+--marcas simula el formato prediligenciado (puntos en los días marcados).
+No toca la base de datos salvo la tabla de géneros.
+
+Uso:
+    python manage.py benchmark_pdf_asistencia
+    python manage.py benchmark_pdf_asistencia --estudiantes 2000 --repeticiones 3 --marcas
+"""
+
+import random
+import time
+from io import BytesIO
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from facturacion.pdf_generator import DIAS_HABILES_POR_MES, crear_formato_asistencia
+
+
+def _estudiantes(cantidad: int, rng: random.Random) -> list:
+    return [
+        SimpleNamespace(
+            id_listados=f'BENCH_{i:05d}',
+            tipodoc='TI',
+            doc=str(1_100_000_000 + i),
+            nombre1=f'NOMBRE{i % 400}',
+            nombre2=rng.choice(['', f'SEGUNDO{i % 90}']),
+            apellido1=f'APELLIDO{i % 500}',
+            apellido2=f'OTRO{i % 300}',
+            fecha_nacimiento=f'{rng.randint(2008, 2020)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+            etnia='',
+            genero=rng.choice(['1', '2']),
+            grado_grupos=f'{rng.randint(0, 11)}-{rng.randint(1, 3):02d}',
+        )
+        for i in range(cantidad)
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Compara el PDF de asistencia dibujado página a página contra la plantilla con form XObjects.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--estudiantes', type=int, default=2000, help='Estudiantes de la sede (default: 2000)')
+        parser.add_argument('--repeticiones', type=int, default=3, help='Corridas por modo; se reporta la mejor')
+        parser.add_argument('--mes', default='MARZO')
+        parser.add_argument('--marcas', action='store_true', help='Incluir marcas de asistencia prediligenciadas')
+        parser.add_argument('--semilla', type=int, default=7)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['semilla'])
+        estudiantes = _estudiantes(options['estudiantes'], rng)
+        datos_encabezado = {
+            'departamento': 'VALLE DEL CAUCA', 'dane_departamento': '76',
+            'municipio': 'CALI', 'dane_municipio': '76001',
+            'institucion': 'INSTITUCION EDUCATIVA DE PRUEBA', 'dane_ie': '176001000001',
+            'operador': 'OPERADOR', 'contrato': 'CT-001', 'mes': options['mes'], 'ano': 2026,
+            'codigo_complemento': 'CAJMPS', 'ruta_logo': None,
+        }
+        if options['marcas']:
+            dias = DIAS_HABILES_POR_MES.get(options['mes'].upper()) or list(range(1, 23))
+            datos_encabezado['marcas_asistencia'] = {
+                e.id_listados: rng.sample(dias, k=len(dias) * 3 // 4) for e in estudiantes
+            }
+
+        self.stdout.write(f"{len(estudiantes)} estudiantes, mes {options['mes']}, "
+                          f"marcas={'sí' if options['marcas'] else 'no'}")
+        self.stdout.write(f"{'modo':22} {'segundos':>9} {'KB':>9}")
+
+        resultados = {}
+        for etiqueta, usar_plantilla in (('página completa', False), ('plantilla (XObject)', True)):
+            mejor = None
+            for _ in range(options['repeticiones']):
+                buffer = BytesIO()
+                t0 = time.perf_counter()
+                crear_formato_asistencia(buffer, dict(datos_encabezado), estudiantes, usar_plantilla=usar_plantilla)
+                segundos = time.perf_counter() - t0
+                mejor = segundos if mejor is None else min(mejor, segundos)
+            kb = len(buffer.getvalue()) / 1024
+            resultados[usar_plantilla] = (mejor, kb)
+            self.stdout.write(f"{etiqueta:22} {mejor:9.2f} {kb:9.1f}")
+
+        (t_ant, kb_ant), (t_nuevo, kb_nuevo) = resultados[False], resultados[True]
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Plantilla: {t_ant / t_nuevo:.1f}x más rápido, {kb_ant / kb_nuevo:.1f}x más pequeño"
+        ))
@@ -0,0 +1,31 @@
+"""
+Management command: limpiar_cargas_temporales
+
+Borra las cargas de listados (etapa 1) que nunca se guardaron y superaron el
+TTL (FACTURACION_STAGING_TTL). Cada carga nueva ya limpia las vencidas; este
+comando sirve para programarlo en cron cuando hay poca actividad.
+
+Uso:
+    python manage.py limpiar_cargas_temporales
+    python manage.py limpiar_cargas_temporales --ttl 3600
+"""
+
+from django.core.management.base import BaseCommand
+
+from facturacion.staging_service import StagingService
+
+
+class Command(BaseCommand):
+    help = 'Elimina las cargas temporales de listados vencidas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ttl',
+            type=int,
+            default=None,
+            help='Antigüedad máxima en segundos (default: FACTURACION_STAGING_TTL)',
+        )
+
+    def handle(self, *args, **options):
+        eliminados = StagingService.limpiar_vencidas(options['ttl'])
+        self.stdout.write(self.style.SUCCESS(f"✓ Archivos eliminados: {eliminados}"))
@@ -0,0 +1,49 @@
+"""
+Management command: rellenar_campos_grado
+
+Calcula grado_base, grado_orden y nivel_educativo de los listados de
+focalización cargados antes de que existieran esas columnas (o cuyos
+valores quedaron desactualizados). Los valores dependen solo de
+grado_grupos, que tiene pocos valores distintos, así que se emite un
+UPDATE por cada valor distinto en lugar de recorrer fila por fila.
+
+Uso:
+    python manage.py rellenar_campos_grado
+    python manage.py rellenar_campos_grado --programa 3 --dry-run
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from facturacion.models import ListadosFocalizacion
+from facturacion.utils import _calcular_campos_grado
+
+
+class Command(BaseCommand):
+    help = 'Rellena los campos de grado desnormalizados de ListadosFocalizacion.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--programa', type=int, default=None, help='Limitar a un programa (id)')
+        parser.add_argument('--dry-run', action='store_true', help='Solo contar los registros a actualizar')
+
+    def handle(self, *args, **options):
+        qs = ListadosFocalizacion.objects.all()
+        if options['programa']:
+            qs = qs.filter(programa_id=options['programa'])
+
+        valores = list(qs.values_list('grado_grupos', flat=True).distinct())
+        self.stdout.write(f"Valores distintos de grado_grupos: {len(valores)}")
+
+        total = 0
+        with transaction.atomic():
+            for grado_grupos in valores:
+                campos = _calcular_campos_grado(grado_grupos)
+                # Solo las filas cuyo valor actual difiere (re-ejecutar no reescribe nada)
+                pendientes = qs.filter(grado_grupos=grado_grupos).exclude(**campos)
+                if options['dry_run']:
+                    total += pendientes.count()
+                else:
+                    total += pendientes.update(**campos)
+
+        verbo = 'por actualizar' if options['dry_run'] else 'actualizados'
+        self.stdout.write(self.style.SUCCESS(f"✓ Registros {verbo}: {total}"))
@@ -0,0 +1,66 @@
+"""
+Management command: vincular_sedes_listados
+
+Asigna sede_educativa (FK a SedesEducativas) a los listados de focalización
+cargados antes de que existiera la columna, o cuya sede no se pudo resolver
+al cargar porque aún no estaba en el catálogo. La sede se resuelve por nombre
+exacto, prefiriendo el municipio del programa; se emite un UPDATE por cada
+(programa, sede) distinto en lugar de recorrer fila por fila.
+
+Uso:
+    python manage.py vincular_sedes_listados
+    python manage.py vincular_sedes_listados --programa 3 --dry-run
+    python manage.py vincular_sedes_listados --todos   # recalcula también los ya vinculados
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from facturacion.fuzzy_matching import FuzzyMatcher
+from facturacion.models import ListadosFocalizacion
+
+
+class Command(BaseCommand):
+    help = 'Vincula ListadosFocalizacion.sede_educativa según el nombre de la sede.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--programa', type=int, default=None, help='Limitar a un programa (id)')
+        parser.add_argument('--todos', action='store_true', help='Incluir registros que ya tienen sede vinculada')
+        parser.add_argument('--dry-run', action='store_true', help='Solo contar los registros a vincular')
+
+    def handle(self, *args, **options):
+        qs = ListadosFocalizacion.objects.all()
+        if options['programa']:
+            qs = qs.filter(programa_id=options['programa'])
+        if not options['todos']:
+            qs = qs.filter(sede_educativa__isnull=True)
+
+        grupos = list(qs.values_list('programa_id', 'programa__municipio_id', 'sede').distinct())
+        self.stdout.write(f"Combinaciones (programa, sede) distintas: {len(grupos)}")
+
+        codigos_por_municipio = {}
+        total = 0
+        sin_resolver = set()
+        with transaction.atomic():
+            for programa_id, municipio_id, sede in grupos:
+                if municipio_id not in codigos_por_municipio:
+                    nombres = [s for _, m, s in grupos if m == municipio_id]
+                    codigos_por_municipio[municipio_id] = FuzzyMatcher.resolver_codigos_sedes(nombres, municipio_id)
+                codigo = codigos_por_municipio[municipio_id].get(sede)
+                if not codigo:
+                    sin_resolver.add(sede)
+                    continue
+                # Solo las filas cuyo valor actual difiere (re-ejecutar no reescribe nada)
+                pendientes = qs.filter(programa_id=programa_id, sede=sede).exclude(sede_educativa_id=codigo)
+                if options['dry_run']:
+                    total += pendientes.count()
+                else:
+                    total += pendientes.update(sede_educativa_id=codigo)
+
+        verbo = 'por vincular' if options['dry_run'] else 'vinculados'
+        self.stdout.write(self.style.SUCCESS(f"✓ Registros {verbo}: {total}"))
+        if sin_resolver:
+            self.stdout.write(self.style.WARNING(
+                f"Sedes sin coincidencia única en el catálogo ({len(sin_resolver)}): "
+                f"{', '.join(sorted(s or '(vacía)' for s in sin_resolver)[:20])}"
+            ))
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+def rellenar_campos_grado(apps, schema_editor):
+    """Un UPDATE por valor distinto de grado_grupos (mismo criterio que rellenar_campos_grado)."""
+    from facturacion.utils import _calcular_campos_grado
+
+    ListadosFocalizacion = apps.get_model('facturacion', 'ListadosFocalizacion')
+    valores = ListadosFocalizacion.objects.values_list('grado_grupos', flat=True).distinct()
+    for grado_grupos in list(valores):
+        ListadosFocalizacion.objects.filter(grado_grupos=grado_grupos).update(
+            **_calcular_campos_grado(grado_grupos)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facturacion', '0006_rector_institucion'),
+        ('planeacion', '0005_add_tipo_programa_to_programa'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listadosfocalizacion',
+            name='grado_base',
+            field=models.CharField(blank=True, default='', max_length=20, verbose_name='Grado Base'),
+        ),
+        migrations.AddField(
+            model_name='listadosfocalizacion',
+            name='grado_orden',
+            field=models.SmallIntegerField(blank=True, null=True, verbose_name='Orden del Grado'),
+        ),
+        migrations.AddField(
+            model_name='listadosfocalizacion',
+            name='nivel_educativo',
+            field=models.CharField(blank=True, choices=[('preescolar', 'Preescolar'), ('primaria_1_3', 'Primaria 1-2-3'), ('primaria_4_5', 'Primaria 4-5'), ('secundaria', 'Secundaria'), ('media', 'Media')], default='', max_length=20, verbose_name='Nivel Educativo'),
+        ),
+        migrations.AddIndex(
+            model_name='listadosfocalizacion',
+            index=models.Index(fields=['programa', 'focalizacion', 'sede', 'grado_base'], name='listados_prog_focal_grado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listadosfocalizacion',
+            index=models.Index(fields=['programa', 'focalizacion', 'nivel_educativo'], name='listados_prog_focal_nivel_idx'),
+        ),
+        migrations.RunPython(rellenar_campos_grado, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-19 16:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def vincular_sedes(apps, schema_editor):
+    """Un UPDATE por (programa, sede) distinto (mismo criterio que vincular_sedes_listados)."""
+    from facturacion.utils import _indexar_sedes_por_nombre, _resolver_codigo_sede
+
+    ListadosFocalizacion = apps.get_model('facturacion', 'ListadosFocalizacion')
+    SedesEducativas = apps.get_model('planeacion', 'SedesEducativas')
+
+    grupos = list(
+        ListadosFocalizacion.objects.values_list('programa_id', 'programa__municipio_id', 'sede').distinct()
+    )
+    indice = _indexar_sedes_por_nombre(
+        SedesEducativas.objects.filter(
+            nombre_sede_educativa__in={sede for _, _, sede in grupos}
+        ).values_list('nombre_sede_educativa', 'cod_interprise', 'codigo_ie__id_municipios_id')
+    )
+    for programa_id, municipio_id, sede in grupos:
+        codigo = _resolver_codigo_sede(indice, sede, municipio_id)
+        if codigo:
+            ListadosFocalizacion.objects.filter(programa_id=programa_id, sede=sede).update(
+                sede_educativa_id=codigo
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facturacion', '0007_campos_grado_listados'),
+        ('planeacion', '0005_add_tipo_programa_to_programa'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listadosfocalizacion',
+            name='sede_educativa',
+            field=models.ForeignKey(blank=True, db_column='sede_educativa_id', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='listados', to='planeacion.sedeseducativas', verbose_name='Sede Educativa'),
+        ),
+        migrations.AddIndex(
+            model_name='listadosfocalizacion',
+            index=models.Index(fields=['programa', 'focalizacion', 'sede_educativa'], name='listados_prog_focal_sedefk_idx'),
+        ),
+        migrations.RunPython(vincular_sedes, migrations.RunPython.noop),
+    ]
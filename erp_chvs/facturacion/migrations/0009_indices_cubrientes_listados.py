@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-19 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facturacion', '0008_sede_educativa_listados'),
+        ('planeacion', '0005_add_tipo_programa_to_programa'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='listadosfocalizacion',
+            index=models.Index(fields=['programa', 'focalizacion', 'sede', 'grado_base'], include=('fecha_actualizacion',), name='listados_prog_focal_grado_cov'),
+        ),
+        migrations.AddIndex(
+            model_name='listadosfocalizacion',
+            index=models.Index(fields=['sede', 'grado_base', 'focalizacion'], include=('programa', 'fecha_actualizacion'), name='listados_sede_grado_cov_idx'),
+        ),
+        # El cubriente reemplaza al índice anterior (mismas columnas); se crea primero
+        migrations.RemoveIndex(
+            model_name='listadosfocalizacion',
+            name='listados_prog_focal_grado_idx',
+        ),
+    ]
@@ -2,6 +2,23 @@ from django.db import models
 from django.core.validators import MinValueValidator
 from planeacion.models import InstitucionesEducativas
 
+# Clasificación nutricional de 5 niveles (ver utils._determinar_nivel_educativo)
+NIVELES_EDUCATIVOS = [
+    ('preescolar', 'Preescolar'),
+    ('primaria_1_3', 'Primaria 1-2-3'),
+    ('primaria_4_5', 'Primaria 4-5'),
+    ('secundaria', 'Secundaria'),
+    ('media', 'Media'),
+]
+
+# Etiqueta de complementos_activos -> campo del modelo
+CAMPOS_COMPLEMENTO = {
+    'CAP AM': 'complemento_alimentario_preparado_am',
+    'CAP PM': 'complemento_alimentario_preparado_pm',
+    'Almuerzo JU': 'almuerzo_jornada_unica',
+    'Refuerzo': 'refuerzo_complemento_am_pm',
+}
+
 
 class ListadosFocalizacion(models.Model):
     """
@@ -101,6 +118,28 @@ class ListadosFocalizacion(models.Model):
         verbose_name="Grado y Grupos"
     )
 
+    # Campos derivados de grado_grupos (se calculan al guardar; ver calcular_campos_grado)
+    grado_base = models.CharField(
+        max_length=20,
+        blank=True,
+        default='',
+        verbose_name="Grado Base"
+    )
+
+    grado_orden = models.SmallIntegerField(
+        blank=True,
+        null=True,
+        verbose_name="Orden del Grado"
+    )
+
+    nivel_educativo = models.CharField(
+        max_length=20,
+        choices=NIVELES_EDUCATIVOS,
+        blank=True,
+        default='',
+        verbose_name="Nivel Educativo"
+    )
+
     # Campos de complementos alimentarios
     complemento_alimentario_preparado_am = models.CharField(
         max_length=10,
@@ -144,6 +183,17 @@ class ListadosFocalizacion(models.Model):
         verbose_name="Programa"
     )
 
+    # Sede del catálogo resuelta al cargar (el texto `sede` se conserva para mostrar)
+    sede_educativa = models.ForeignKey(
+        'planeacion.SedesEducativas',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_column='sede_educativa_id',
+        related_name='listados',
+        verbose_name="Sede Educativa"
+    )
+
     # Campos de auditoría
     fecha_creacion = models.DateTimeField(
         auto_now_add=True,
@@ -170,6 +220,13 @@ class ListadosFocalizacion(models.Model):
             models.Index(fields=['programa', 'focalizacion'], name='listados_prog_focal_idx'),
             models.Index(fields=['programa', 'focalizacion', 'sede'], name='listados_prog_focal_sede_idx'),
             models.Index(fields=['programa', 'sede'], name='listados_prog_sede_idx'),
+            # Cubrientes para el listado agrupado por (sede, grado_base) paginado por clave
+            models.Index(fields=['programa', 'focalizacion', 'sede', 'grado_base'],
+                         include=['fecha_actualizacion'], name='listados_prog_focal_grado_cov'),
+            models.Index(fields=['sede', 'grado_base', 'focalizacion'],
+                         include=['programa', 'fecha_actualizacion'], name='listados_sede_grado_cov_idx'),
+            models.Index(fields=['programa', 'focalizacion', 'nivel_educativo'], name='listados_prog_focal_nivel_idx'),
+            models.Index(fields=['programa', 'focalizacion', 'sede_educativa'], name='listados_prog_focal_sedefk_idx'),
         ]
         # constraints = [
         #     models.UniqueConstraint(
@@ -182,6 +239,56 @@ class ListadosFocalizacion(models.Model):
         """Representación string del modelo."""
         return f"{self.nombre1} {self.apellido1} - {self.focalizacion} ({self.ano})"
 
+    def save(self, *args, **kwargs):
+        self.calcular_campos_grado()
+        super().save(*args, **kwargs)
+
+    def calcular_campos_grado(self):
+        """
+        Rellena grado_base, grado_orden y nivel_educativo desde grado_grupos.
+        save() lo hace solo; las rutas con bulk_create deben llamarlo.
+        """
+        from .utils import _calcular_campos_grado
+
+        for campo, valor in _calcular_campos_grado(self.grado_grupos).items():
+            setattr(self, campo, valor)
+
+    @staticmethod
+    def q_complemento_activo(etiqueta):
+        """
+        Q que replica complementos_activos en SQL para una etiqueta
+        ("CAP AM", "CAP PM", "Almuerzo JU", "Refuerzo"): campo no nulo ni vacío.
+        """
+        campo = CAMPOS_COMPLEMENTO[etiqueta]
+        return models.Q(**{f'{campo}__isnull': False}) & ~models.Q(**{campo: ''})
+
+    @staticmethod
+    def q_sede(sede):
+        """
+        Q de los listados de una sede del catálogo: los vinculados por la FK y,
+        entre los que quedaron sin vincular (nombre ambiguo o sin coincidencia
+        en el catálogo), los que tienen el mismo nombre de sede.
+        """
+        return models.Q(sede_educativa=sede) | models.Q(
+            sede_educativa__isnull=True, sede=sede.nombre_sede_educativa
+        )
+
+    @classmethod
+    def sedes_con_registros(cls, programa_id, focalizacion=None):
+        """
+        QuerySet de SedesEducativas con al menos un listado del programa (y de
+        la focalización, si se indica). Semi-join por la FK sede_educativa; los
+        listados sin vincular cuentan por nombre, como q_sede().
+        """
+        listados = cls.objects.filter(programa_id=programa_id)
+        if focalizacion:
+            listados = listados.filter(focalizacion=focalizacion)
+        SedesEducativas = cls._meta.get_field('sede_educativa').related_model
+        return SedesEducativas.objects.filter(
+            models.Q(cod_interprise__in=listados.filter(sede_educativa__isnull=False).values('sede_educativa'))
+            | models.Q(nombre_sede_educativa__in=listados.filter(sede_educativa__isnull=True).values('sede'))
+        )
+
     def get_nombre_completo(self):
         """Retorna el nombre completo del titular de derecho."""
         nombres = [self.nombre1, self.nombre2]
@@ -71,8 +71,15 @@ DIAS_HABILES_POR_MES = {
     "DICIEMBRE": [1, 2, 3, 4, 7, 9, 10, 11, 14, 15, 16, 17, 18, 21, 22, 23, 24, 28, 29, 30, 31]
 }
 
+# Nombres de los form XObjects de la plantilla (ver AsistenciaPDFGenerator._definir_plantillas)
+FORM_PAGINA = 'asistencia_pagina'
+FORM_FILA = 'asistencia_fila'
+FORM_FILA_VACIA = 'asistencia_fila_vacia'
+FORM_MARCA = 'asistencia_marca'
+
+
 class AsistenciaPDFGenerator:
-    def __init__(self, buffer, datos_encabezado):
+    def __init__(self, buffer, datos_encabezado, usar_plantilla=True):
         self.buffer = buffer
         self.datos_encabezado = datos_encabezado
         self.c = canvas.Canvas(self.buffer, pagesize=landscape(A4))
@@ -82,10 +89,25 @@ class AsistenciaPDFGenerator:
         self.alto_fila = 11
         self.max_filas_por_pagina = 25
         self.y_inicio_filas = 0
+        self.ancho_total_dias = 25
         self.anchos_cols = self._calcular_anchos_columnas()
+        self.dias_habiles = self._obtener_dias_habiles()
+        self.casilla_ancho = (self.anchos_cols[12] - self.ancho_total_dias) / len(self.dias_habiles)
+        # Con plantilla, lo fijo de la página (encabezado, cabecera, pie) y la
+        # cuadrícula de una fila se dibujan una vez como form XObjects y cada
+        # página solo los estampa y escribe el texto variable.
+        self.usar_plantilla = usar_plantilla
         # Resolver el logo una sola vez por PDF (evita descargas por página)
         self.logo_fuente = self._resolver_fuente_logo(self.datos_encabezado.get('ruta_logo'))
 
+    def _obtener_dias_habiles(self):
+        """Días de las casillas: personalizados, los del mes o del 1 al 22 por defecto."""
+        dias_personalizados = self.datos_encabezado.get('dias_personalizados')
+        if dias_personalizados:
+            return dias_personalizados
+        mes_actual = self.datos_encabezado.get('mes', '').upper()
+        return DIAS_HABILES_POR_MES.get(mes_actual, []) or list(range(1, 23))
+
     def _calcular_anchos_columnas(self):
         ancho_total_tabla = self.width - 2 * self.margen
         # Aquí puedes ajustar el ancho relativo de cada columna.
@@ -311,7 +333,7 @@ class AsistenciaPDFGenerator:
 
         # --- Cabecera de la Columna 13 (Fechas) ---
         x_col13 = x
-        ancho_col13 = self._calcular_anchos_columnas()[12] # Usar el ancho calculado
+        ancho_col13 = self.anchos_cols[12]
 
         # 1. Título superior
         alto_titulo = 15
@@ -323,25 +345,11 @@ class AsistenciaPDFGenerator:
         # 2. Casillas de días (01-22) y Total
         alto_casillas = 20
         y_casillas = y_tabla_header + alto_tabla_header - alto_titulo - alto_casillas
-        ancho_total_dias_col = 25
-        ancho_disponible_dias = ancho_col13 - ancho_total_dias_col
-        
-
-        # Lógica para rellenar las casillas dinámicamente
-        mes_actual = self.datos_encabezado.get('mes', '').upper()
-        dias_personalizados = self.datos_encabezado.get('dias_personalizados')
-
-        if dias_personalizados:
-            dias_habiles = dias_personalizados
-        else:
-            dias_habiles = DIAS_HABILES_POR_MES.get(mes_actual, [])
-
-        # Si no hay días definidos, generar lista del 1 al 22 por defecto
-        if not dias_habiles:
-            dias_habiles = list(range(1, 23))  # Del 1 al 22
+        ancho_total_dias_col = self.ancho_total_dias
 
+        dias_habiles = self.dias_habiles
         num_dias = len(dias_habiles)
-        casilla_ancho = (ancho_disponible_dias / num_dias) if num_dias > 0 else 0
+        casilla_ancho = self.casilla_ancho
 
         # Reducir grosor de línea para las casillas de días
         c.setLineWidth(0.5)
@@ -390,20 +398,7 @@ class AsistenciaPDFGenerator:
         
         # 1. Calcular valores base
         pdf_codigo_complemento = self.datos_encabezado.get('codigo_complemento', '')
-        mes_actual = self.datos_encabezado.get('mes', '').upper()
-        dias_personalizados = self.datos_encabezado.get('dias_personalizados')
-
-        if dias_personalizados:
-            dias_habiles_del_mes = dias_personalizados
-        else:
-            dias_habiles_del_mes = DIAS_HABILES_POR_MES.get(mes_actual, [])
-
-        # Si no hay días definidos, generar lista del 1 al 22 por defecto
-        if not dias_habiles_del_mes:
-            dias_habiles_del_mes = list(range(1, 23))  # Del 1 al 22
-
-        num_dias_habiles = len(dias_habiles_del_mes)
-        raciones_mensuales = total_estudiantes * num_dias_habiles
+        raciones_mensuales = total_estudiantes * len(self.dias_habiles)
 
         # 2. Determinar en qué fila va el valor
         valor_cajm = 0
@@ -508,21 +503,8 @@ class AsistenciaPDFGenerator:
 
         # --- Fila 2: Raciones Mensuales ---
         y_resumen -= 15
-        
-        mes_actual = self.datos_encabezado.get('mes', '').upper()
-        dias_personalizados = self.datos_encabezado.get('dias_personalizados')
-
-        if dias_personalizados:
-            dias_habiles_del_mes = dias_personalizados
-        else:
-            dias_habiles_del_mes = DIAS_HABILES_POR_MES.get(mes_actual, [])
-
-        # Si no hay días definidos, generar lista del 1 al 22 por defecto
-        if not dias_habiles_del_mes:
-            dias_habiles_del_mes = list(range(1, 23))  # Del 1 al 22
 
-        num_dias_habiles = len(dias_habiles_del_mes)
-        raciones_mensuales = raciones_diarias * num_dias_habiles
+        raciones_mensuales = raciones_diarias * len(self.dias_habiles)
 
         texto1_mensual = f"RACIONES MENSUALES PROGRAMADAS {codigo_complemento}:"
         c.drawString(self.margen + 3, y_resumen, texto1_mensual)
@@ -671,6 +653,12 @@ class AsistenciaPDFGenerator:
         texto_certificacion = "LA INSTITUCION EDUCATIVA CON LA FIRMA CERTIFICA LA ENTREGA COMPLETA DE LOS ALIMENTOS A LOS ESTUDIANTES."
         self._dibujar_texto_centrado_en_celda(texto_certificacion, x_col2, y_caja_nota, ancho_col2, alto_nota_section)
 
+        # En la plantilla el número de página se escribe aparte en cada página
+        if pagina_actual is not None:
+            self._dibujar_numero_pagina(pagina_actual, total_paginas)
+
+    def _dibujar_numero_pagina(self, pagina_actual, total_paginas):
+        c = self.c
         c.setFont("Helvetica", 6)
         c.drawCentredString(self.width/2, self.margen - 8, f"Página {pagina_actual}/{total_paginas}")
 
@@ -722,6 +710,152 @@ class AsistenciaPDFGenerator:
             c.drawCentredString(x + ancho / 2, y_start, linea)
             y_start -= line_height
 
+    def _formatear_fecha_nacimiento(self, fecha_nac):
+        if not fecha_nac:
+            return ""
+        if isinstance(fecha_nac, datetime):
+            return fecha_nac.strftime('%Y-%m-%d')
+        if isinstance(fecha_nac, str):
+            try:
+                # Intentar convertir la cadena a fecha y luego formatear
+                fecha_obj = datetime.fromisoformat(fecha_nac.replace('Z', '+00:00').replace('.', ''))
+                return fecha_obj.strftime('%Y-%m-%d')
+            except (ValueError, TypeError):
+                # Fallback: intentar extraer fecha de diferentes formatos de cadena
+                fecha_nac_str = str(fecha_nac).split('T')[0].split(' ')[0]
+                return fecha_nac_str if len(fecha_nac_str) == 10 else ""  # Solo formato YYYY-MM-DD
+        if isinstance(fecha_nac, int):
+            # Manejar timestamp Unix (número entero)
+            try:
+                return datetime.fromtimestamp(fecha_nac).strftime('%Y-%m-%d')
+            except (ValueError, OSError):
+                return ""
+        # Para otros tipos, convertir a string y tomar primera parte
+        return str(fecha_nac).split('T')[0].split(' ')[0]
+
+    def _datos_fila(self, estudiante, numero, codigo_complemento):
+        return [
+            str(numero),
+            estudiante.tipodoc or '',
+            estudiante.doc or '',
+            estudiante.nombre1 or '',
+            estudiante.nombre2 or '',
+            estudiante.apellido1 or '',
+            estudiante.apellido2 or '',
+            self._formatear_fecha_nacimiento(estudiante.fecha_nacimiento),
+            estudiante.etnia or '',
+            # id_genero en lugar del código numérico
+            obtener_id_genero_por_codigo(estudiante.genero),
+            estudiante.grado_grupos or '',
+            codigo_complemento,
+        ]
+
+    def _dibujar_celdas_fila(self, y_fila):
+        """Bordes de las 12 columnas, casillas de días y total de una fila con estudiante."""
+        c = self.c
+        c.setStrokeColor(colors.black)
+        c.setLineWidth(1)
+        x = self.margen
+        for ancho in self.anchos_cols[:-1]:
+            c.rect(x, y_fila, ancho, self.alto_fila)
+            x += ancho
+
+        # Reducir grosor de línea para casillas de días
+        c.setLineWidth(0.5)
+        for k in range(len(self.dias_habiles)):
+            c.rect(x + k * self.casilla_ancho, y_fila, self.casilla_ancho, self.alto_fila)
+        c.rect(x + len(self.dias_habiles) * self.casilla_ancho, y_fila, self.ancho_total_dias, self.alto_fila)
+        c.setLineWidth(1)
+
+    def _dibujar_fila_vacia(self, y_fila):
+        """Fila sin estudiante: bordes y línea horizontal para indicar que no se puede diligenciar."""
+        c = self.c
+        c.setStrokeColor(colors.black)
+        c.setLineWidth(1)
+        x = self.margen
+        # Columnas 1 a 12 y la columna de asistencia (13) sin casillas
+        for ancho in self.anchos_cols:
+            c.rect(x, y_fila, ancho, self.alto_fila)
+            x += ancho
+
+        # Respetando los márgenes: desde margen_izq + 5 hasta margen_izq + ancho_tabla - 5
+        c.setStrokeColor(colors.gray)
+        c.setLineWidth(1.5)
+        y_centro_fila = y_fila + (self.alto_fila / 2)
+        c.line(self.margen + 5, y_centro_fila, self.margen + sum(self.anchos_cols) - 5, y_centro_fila)
+
+        # Restaurar color y grosor de línea normales
+        c.setStrokeColor(colors.black)
+        c.setLineWidth(1)
+
+    def _dibujar_textos_fila(self, y_fila, datos_fila):
+        c = self.c
+        x = self.margen
+        for ancho, dato in zip(self.anchos_cols, datos_fila):
+            c.drawString(x + 2, y_fila + 3, _safe_pdf_text(dato))
+            x += ancho
+
+    def _dibujar_punto_marca(self, x, y):
+        """Punto de referencia (gris translúcido) de un día marcado."""
+        c = self.c
+        gris = colors.Color(0.6, 0.6, 0.6, alpha=0.18)
+        c.saveState()
+        c.setLineWidth(0.5)
+        c.setStrokeColor(gris)
+        c.setFillColor(gris)
+        c.circle(x, y, 1.5, fill=1)
+        c.restoreState()
+
+    def _dibujar_marcas_fila(self, y_fila, dias_marcados):
+        """Marca los días del estudiante en sus casillas de asistencia."""
+        c = self.c
+        x_col13 = self.margen + sum(self.anchos_cols[:-1])
+        y_centro = y_fila + self.alto_fila/2
+        for k, dia in enumerate(self.dias_habiles):
+            if dia in dias_marcados:
+                x_centro = x_col13 + k * self.casilla_ancho + self.casilla_ancho/2
+                if self.usar_plantilla:
+                    c.saveState()
+                    c.translate(x_centro, y_centro)
+                    c.doForm(FORM_MARCA)
+                    c.restoreState()
+                else:
+                    self._dibujar_punto_marca(x_centro, y_centro)
+
+    def _definir_plantillas(self, total_paginas, total_estudiantes):
+        """
+        Dibuja una sola vez lo que se repite: la página sin filas ni número de
+        página, y la cuadrícula de una fila (con estudiante y vacía) en y=0.
+        """
+        c = self.c
+        c.beginForm(FORM_PAGINA)
+        self._dibujar_encabezado_pagina()
+        self._dibujar_cabecera_tabla()
+        self._dibujar_pie_pagina(None, total_paginas, total_estudiantes)
+        c.endForm()
+
+        # El BBox del form recorta: dejar holgura para el grosor de los bordes
+        caja_fila = dict(lowerx=0, lowery=-2, upperx=self.width, uppery=self.alto_fila + 2)
+        c.beginForm(FORM_FILA, **caja_fila)
+        self._dibujar_celdas_fila(0)
+        c.endForm()
+
+        c.beginForm(FORM_FILA_VACIA, **caja_fila)
+        self._dibujar_fila_vacia(0)
+        c.endForm()
+
+        if self.datos_encabezado.get('marcas_asistencia'):
+            c.beginForm(FORM_MARCA, lowerx=-3, lowery=-3, upperx=3, uppery=3)
+            self._dibujar_punto_marca(0, 0)
+            c.endForm()
+
+    def _estampar(self, nombre_form, y):
+        c = self.c
+        c.saveState()
+        c.translate(0, y)
+        c.doForm(nombre_form)
+        c.restoreState()
+
     def generar_pdf(self, lista_estudiantes):
         c = self.c
         total_estudiantes = len(lista_estudiantes)
@@ -735,164 +869,60 @@ class AsistenciaPDFGenerator:
             return
 
         total_paginas = (total_estudiantes + self.max_filas_por_pagina - 1) // self.max_filas_por_pagina
-        
+        codigo_complemento = self.datos_encabezado.get('codigo_complemento', '')
+        # Marcas de asistencia (formato prediligenciado): {id_listados: [dias_marcados]}
+        marcas_asistencia = self.datos_encabezado.get('marcas_asistencia') or {}
+
+        if self.usar_plantilla:
+            self._definir_plantillas(total_paginas, total_estudiantes)
+
         # Procesar página por página
         for pagina in range(total_paginas):
             if pagina > 0:
                 c.showPage()
-            
-            self._dibujar_encabezado_pagina()
-            self._dibujar_cabecera_tabla()
-            self._dibujar_pie_pagina(pagina + 1, total_paginas, total_estudiantes)
-            
+
+            if self.usar_plantilla:
+                c.doForm(FORM_PAGINA)
+                self._dibujar_numero_pagina(pagina + 1, total_paginas)
+            else:
+                self._dibujar_encabezado_pagina()
+                self._dibujar_cabecera_tabla()
+                self._dibujar_pie_pagina(pagina + 1, total_paginas, total_estudiantes)
+
             # Dibujar siempre las 25 filas (completas o vacías)
             inicio_estudiantes = pagina * self.max_filas_por_pagina
-            fin_estudiantes = min(inicio_estudiantes + self.max_filas_por_pagina, total_estudiantes)
-            
+            c.setFont("Helvetica", 5)
+
             for fila_en_pagina in range(self.max_filas_por_pagina):
                 y_fila = self.y_inicio_filas - (fila_en_pagina * self.alto_fila)
                 estudiante_index = inicio_estudiantes + fila_en_pagina
-                
-                if estudiante_index < total_estudiantes:
-                    # Fila con estudiante real
-                    estudiante = lista_estudiantes[estudiante_index]
-                    
-                    fecha_nac_str = ""
-                    fecha_nac = estudiante.fecha_nacimiento
-                    if fecha_nac:
-                        if isinstance(fecha_nac, datetime):
-                            fecha_nac_str = fecha_nac.strftime('%Y-%m-%d')
-                        elif isinstance(fecha_nac, str):
-                            try:
-                                # Intentar convertir la cadena a fecha y luego formatear
-                                fecha_obj = datetime.fromisoformat(fecha_nac.replace('Z', '+00:00').replace('.', ''))
-                                fecha_nac_str = fecha_obj.strftime('%Y-%m-%d')
-                            except (ValueError, TypeError):
-                                # Fallback: intentar extraer fecha de diferentes formatos de cadena
-                                fecha_nac_str = str(fecha_nac).split('T')[0].split(' ')[0]
-                                if len(fecha_nac_str) != 10:  # No es formato YYYY-MM-DD
-                                    fecha_nac_str = ""
-                        elif isinstance(fecha_nac, int):
-                            # Manejar timestamp Unix (número entero)
-                            try:
-                                fecha_obj = datetime.fromtimestamp(fecha_nac)
-                                fecha_nac_str = fecha_obj.strftime('%Y-%m-%d')
-                            except (ValueError, OSError):
-                                fecha_nac_str = ""
-                        else:
-                            # Para otros tipos, convertir a string y tomar primera parte
-                            fecha_nac_str = str(fecha_nac).split('T')[0].split(' ')[0]
-                    
-                    # Obtener id_genero en lugar del código numérico
-                    id_genero = obtener_id_genero_por_codigo(estudiante.genero)
-
-                    datos_fila = [
-                        str(estudiante_index + 1),
-                        estudiante.tipodoc or '',
-                        estudiante.doc or '',
-                        estudiante.nombre1 or '',
-                        estudiante.nombre2 or '',
-                        estudiante.apellido1 or '',
-                        estudiante.apellido2 or '',
-                        fecha_nac_str,
-                        estudiante.etnia or '',
-                        id_genero,
-                        estudiante.grado_grupos or '',
-                        self.datos_encabezado.get('codigo_complemento', '')
-                    ]
-
-                    # Dibujar fila normal con datos
-                    x = self.margen
-                    c.setFont("Helvetica", 5)
-                    for j, (ancho, dato) in enumerate(zip(self.anchos_cols, datos_fila)):
-                        c.rect(x, y_fila, ancho, self.alto_fila)
-                        c.drawString(x + 2, y_fila + 3, _safe_pdf_text(dato))
-                        x += ancho
-                    
-                    # Dibujar casillas de asistencia
-                    x_col13 = x
-                    ancho_total_dias = 25
-                    ancho_col13_fijo = self._calcular_anchos_columnas()[12]
-
-                    # Replicar la misma lógica dinámica para las filas de estudiantes
-                    mes_actual = self.datos_encabezado.get('mes', '').upper()
-                    dias_personalizados = self.datos_encabezado.get('dias_personalizados')
-
-                    if dias_personalizados:
-                        dias_habiles = dias_personalizados
-                    else:
-                        dias_habiles = DIAS_HABILES_POR_MES.get(mes_actual, [])
-
-                    # Si no hay días definidos, generar lista del 1 al 22 por defecto
-                    if not dias_habiles:
-                        dias_habiles = list(range(1, 23))  # Del 1 al 22
-
-                    num_dias = len(dias_habiles)
-                    casilla_ancho = (ancho_col13_fijo - ancho_total_dias) / num_dias if num_dias > 0 else 0
-
-                    # Reducir grosor de línea para casillas de días
-                    c.setLineWidth(0.5)
-
-                    # Obtener marcas de asistencia si existen
-                    marcas_asistencia = self.datos_encabezado.get('marcas_asistencia', {})
-                    dias_marcados = marcas_asistencia.get(estudiante.id_listados, [])
 
-                    for k in range(num_dias):
-                        c.rect(x_col13 + k * casilla_ancho, y_fila, casilla_ancho, self.alto_fila)
-
-                        # Si este estudiante tiene marca para este día, dibujar punto de referencia
-                        if dias_habiles and k < len(dias_habiles) and dias_habiles[k] in dias_marcados:
-                            # Dibujar un pequeño círculo como punto de referencia
-                            centro_x = x_col13 + k * casilla_ancho + casilla_ancho/2
-                            centro_y = y_fila + self.alto_fila/2
-                            radio = 1.5  # Radio pequeño para el punto
-
-                            c.setStrokeColor(colors.Color(0.6, 0.6, 0.6, alpha=0.18))
-                            c.setFillColor(colors.Color(0.6, 0.6, 0.6, alpha=0.18))
-                            c.circle(centro_x, centro_y, radio, fill=1)
-                            c.setStrokeColor(colors.black)
-                            c.setFillColor(colors.black)
-
-                    c.rect(x_col13 + num_dias * casilla_ancho, y_fila, ancho_total_dias, self.alto_fila)
+                if estudiante_index >= total_estudiantes:
+                    if self.usar_plantilla:
+                        self._estampar(FORM_FILA_VACIA, y_fila)
+                    else:
+                        self._dibujar_fila_vacia(y_fila)
+                    continue
 
-                    # Restaurar grosor de línea normal
-                    c.setLineWidth(1)
-                
+                estudiante = lista_estudiantes[estudiante_index]
+                if self.usar_plantilla:
+                    self._estampar(FORM_FILA, y_fila)
                 else:
-                    # Fila vacía - dibujar solo bordes y línea horizontal
-                    x = self.margen
-                    
-                    # Dibujar los bordes de las columnas vacías (primeras 12 columnas)
-                    for j, ancho in enumerate(self.anchos_cols[:-1]):  # Excluir la columna 13
-                        c.rect(x, y_fila, ancho, self.alto_fila)
-                        x += ancho
-                    
-                    # Dibujar columna de asistencia vacía (columna 13)
-                    ancho_col13_fijo = self.anchos_cols[-1]  # La última es la columna 13
-                    c.rect(x, y_fila, ancho_col13_fijo, self.alto_fila)
-                    
-                    # Calcular el ancho total real de la tabla
-                    ancho_total_tabla = sum(self.anchos_cols)
-                    
-                    # Dibujar línea horizontal para indicar que no se puede diligenciar
-                    # Respetando los márgenes: desde margen_izq + 5 hasta margen_izq + ancho_tabla - 5
-                    c.setStrokeColor(colors.gray)
-                    c.setLineWidth(1.5)
-                    y_centro_fila = y_fila + (self.alto_fila / 2)
-                    inicio_linea = self.margen + 5
-                    fin_linea = self.margen + ancho_total_tabla - 5
-                    c.line(inicio_linea, y_centro_fila, fin_linea, y_centro_fila)
-                    
-                    # Restaurar color y grosor de línea normales
-                    c.setStrokeColor(colors.black)
-                    c.setLineWidth(1)
+                    self._dibujar_celdas_fila(y_fila)
+                self._dibujar_textos_fila(
+                    y_fila, self._datos_fila(estudiante, estudiante_index + 1, codigo_complemento)
+                )
+
+                dias_marcados = marcas_asistencia.get(estudiante.id_listados)
+                if dias_marcados:
+                    self._dibujar_marcas_fila(y_fila, set(dias_marcados))
 
         c.save()
 
 
-def crear_formato_asistencia(buffer, datos_encabezado, lista_estudiantes):
+def crear_formato_asistencia(buffer, datos_encabezado, lista_estudiantes, usar_plantilla=True):
     """
     Función de envoltura para generar el formato de asistencia en PDF.
     """
-    pdf_generator = AsistenciaPDFGenerator(buffer, datos_encabezado)
+    pdf_generator = AsistenciaPDFGenerator(buffer, datos_encabezado, usar_plantilla=usar_plantilla)
     pdf_generator.generar_pdf(lista_estudiantes)
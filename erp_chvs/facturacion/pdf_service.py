@@ -4,16 +4,19 @@ import zipfile
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.conf import settings
+from django.db.models import F
 
 from .models import ListadosFocalizacion, RectorInstitucion
 from principal.models import PrincipalDepartamento, PrincipalMunicipio
 from planeacion.models import SedesEducativas, Programa
 from .pdf_generator import crear_formato_asistencia
-from .utils import _extraer_grado_base # Importar la función de ayuda
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Orden de los estudiantes en los formatos: por grado (no numéricos al final) y luego alfabético
+ORDEN_POR_GRADO = (F('grado_orden').asc(nulls_last=True), 'apellido1', 'apellido2', 'nombre1')
+
 class PDFAsistenciaService:
 
     @staticmethod
@@ -40,31 +43,17 @@ class PDFAsistenciaService:
 
             estudiantes_sede = ListadosFocalizacion.objects.filter(
 
-                programa=programa_obj,
+                ListadosFocalizacion.q_sede(sede_obj),
 
-                sede=sede_obj.nombre_sede_educativa,
+                programa=programa_obj,
 
                 focalizacion=focalizacion
 
-            ).order_by('apellido1', 'apellido2', 'nombre1')
-
-
-
-            def clave_ordenamiento_grado(estudiante):
-
-                grado_base_str = _extraer_grado_base(estudiante.grado_grupos)
-
-                try:
-
-                    return int(grado_base_str)
-
-                except (ValueError, TypeError):
-
-                    return float('inf')
+            ).order_by(*ORDEN_POR_GRADO)
 
 
 
-            estudiantes_sede_sorted = sorted(list(estudiantes_sede), key=clave_ordenamiento_grado)
+            estudiantes_sede_sorted = list(estudiantes_sede)
 
 
 
@@ -186,19 +175,9 @@ class PDFAsistenciaService:
 
             # Obtener todas las sedes que tienen estudiantes para este programa y focalización
 
-            sedes_con_registros_nombres = ListadosFocalizacion.objects.filter(
-
-                programa=programa_obj,
-
-                focalizacion=focalizacion
-
-            ).values_list('sede', flat=True).distinct()
-
+            sedes_del_programa = ListadosFocalizacion.sedes_con_registros(
 
-
-            sedes_del_programa = SedesEducativas.objects.filter(
-
-                nombre_sede_educativa__in=sedes_con_registros_nombres
+                programa_obj.id, focalizacion
 
             ).select_related('codigo_ie__id_municipios').order_by('nombre_generico_sede')
 
@@ -228,37 +207,21 @@ class PDFAsistenciaService:
 
                     estudiantes_sede = ListadosFocalizacion.objects.filter(
 
-                        programa=programa_obj,
+                        ListadosFocalizacion.q_sede(sede_obj),
 
-                        sede=sede_obj.nombre_sede_educativa,
+                        programa=programa_obj,
 
                         focalizacion=focalizacion
 
-                    ).order_by('apellido1', 'apellido2', 'nombre1')
-
-
-
-                    if not estudiantes_sede.exists():
-
-                        continue
+                    ).order_by(*ORDEN_POR_GRADO)
 
 
 
-                    def clave_ordenamiento_grado(estudiante):
+                    estudiantes_sede_sorted = list(estudiantes_sede)
 
-                        grado_base_str = _extraer_grado_base(estudiante.grado_grupos)
+                    if not estudiantes_sede_sorted:
 
-                        try:
-
-                            return int(grado_base_str)
-
-                        except (ValueError, TypeError):
-
-                            return float('inf')
-
-
-
-                    estudiantes_sede_sorted = sorted(list(estudiantes_sede), key=clave_ordenamiento_grado)
+                        continue
 
                     logger.info(f"   👥 {len(estudiantes_sede_sorted)} estudiante(s) encontrado(s)")
 
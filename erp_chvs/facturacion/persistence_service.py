@@ -9,9 +9,13 @@ from typing import Dict, List, Any, Optional, Tuple
 from django.db import transaction, IntegrityError
 from django.utils import timezone
 
+from planeacion.models import Programa
+
 from .models import ListadosFocalizacion
 from .config import ProcesamientoConfig
 from .exceptions import ProcesamientoException
+from .fuzzy_matching import FuzzyMatcher
+from .cobertura_service import CoberturaSedesService
 
 
 class PersistenceService:
@@ -37,31 +41,14 @@ class PersistenceService:
         try:
 
             # Preparar datos para inserción
-            registros_para_insertar = []
-            registros_error = []
-
-            for index, row in df.iterrows():
-                try:
-                    # Generar ID único para el listado
-                    id_listado = PersistenceService._generar_id_listado(row, index)
-
-                    # Crear objeto ListadosFocalizacion
-                    registro = PersistenceService._crear_registro_listado(row, id_listado, programa_id)
-
-                    registros_para_insertar.append(registro)
-
-                except Exception as e:
-                    registros_error.append({
-                        'fila': index,
-                        'error': str(e),
-                        'datos': row.to_dict()
-                    })
+            registros_para_insertar, registros_error = PersistenceService._construir_registros(df, programa_id)
 
             # Insertar en batch con transacción
             registros_guardados = PersistenceService._insertar_en_batch(
                 registros_para_insertar,
                 batch_size
             )
+            CoberturaSedesService.invalidar(programa_id)
 
             resultado = {
                 'success': True,
@@ -87,6 +74,155 @@ class PersistenceService:
                 'mensaje': f"Error al guardar listados: {str(e)}"
             }
 
+    @staticmethod
+    def sincronizar_listados_focalizacion(
+        df: pd.DataFrame,
+        programa_id: int,
+        focalizacion: str,
+        sedes: Optional[List[str]] = None,
+        focalizacion_origen: Optional[str] = None,
+        batch_size: int = 1000
+    ) -> Dict[str, Any]:
+        """
+        Recarga incremental de una focalización: compara el archivo con lo ya
+        guardado y aplica solo las diferencias, conservando el id_listados de
+        los titulares que siguen en el listado.
+
+        Los registros se emparejan por (tipodoc, doc) dentro del tramo
+        (programa, focalizacion_origen o focalizacion[, sedes]). Los nuevos se
+        insertan, los que cambiaron se actualizan y los que ya no vienen en el
+        archivo se eliminan, todo en una transacción.
+
+        Args:
+            df: DataFrame con los datos procesados
+            programa_id: ID del programa
+            focalizacion: Focalización con la que quedan los registros
+            sedes: Limitar el tramo a estas sedes (None = todo el programa/focalización)
+            focalizacion_origen: Focalización del tramo guardado, si difiere de la nueva
+            batch_size: Tamaño del lote para las operaciones en bloque
+
+        Returns:
+            Dict[str, Any]: Resultado con agregados, actualizados, eliminados y sin_cambios
+        """
+        try:
+            nuevos, registros_error = PersistenceService._construir_registros(df, programa_id)
+
+            campos = PersistenceService._campos_sincronizables()
+            attnames = [campo.attname for campo in campos]
+
+            tramo = ListadosFocalizacion.objects.filter(
+                programa_id=programa_id, focalizacion=focalizacion_origen or focalizacion
+            )
+            if sedes:
+                tramo = tramo.filter(sede__in=sedes)
+
+            # (tipodoc, doc) -> [(id_listados, valores)] de lo guardado, en una sola lectura
+            existentes: Dict[Tuple[str, str], List[Tuple[str, tuple]]] = {}
+            for fila in tramo.values_list('id_listados', 'tipodoc', 'doc', *attnames).iterator(chunk_size=batch_size):
+                existentes.setdefault((fila[1], fila[2]), []).append((fila[0], fila[3:]))
+
+            por_insertar, por_actualizar = [], []
+            sin_cambios = 0
+            for registro in nuevos:
+                clave = (registro.tipodoc, registro.doc)
+                candidatos = existentes.get(clave)
+                if not candidatos:
+                    por_insertar.append(registro)
+                    continue
+                id_listados, valores = candidatos.pop(0)
+                if not candidatos:
+                    del existentes[clave]
+                registro.id_listados = id_listados
+                if tuple(getattr(registro, attname) for attname in attnames) == valores:
+                    sin_cambios += 1
+                else:
+                    por_actualizar.append(registro)
+            por_eliminar = [id_listados for candidatos in existentes.values() for id_listados, _ in candidatos]
+
+            ahora = timezone.now()
+            with transaction.atomic():
+                for i in range(0, len(por_eliminar), batch_size):
+                    ListadosFocalizacion.objects.filter(id_listados__in=por_eliminar[i:i + batch_size]).delete()
+                for registro in por_actualizar:
+                    registro.fecha_actualizacion = ahora  # bulk_update no aplica auto_now
+                ListadosFocalizacion.objects.bulk_update(
+                    por_actualizar, [campo.name for campo in campos] + ['fecha_actualizacion'], batch_size=batch_size
+                )
+                agregados = PersistenceService._insertar_en_batch(por_insertar, batch_size)
+            CoberturaSedesService.invalidar(programa_id)
+
+            return {
+                'success': True,
+                'modo': 'sincronizar',
+                'total_procesados': len(df),
+                'agregados': agregados,
+                'actualizados': len(por_actualizar),
+                'eliminados': len(por_eliminar),
+                'sin_cambios': sin_cambios,
+                'registros_guardados': agregados + len(por_actualizar),
+                'registros_error': len(registros_error),
+                'duplicados_detectados': 0,
+                'errores_detalle': registros_error,
+                'mensaje': (
+                    f"Sincronización: {agregados} agregados, {len(por_actualizar)} actualizados, "
+                    f"{len(por_eliminar)} eliminados, {sin_cambios} sin cambios."
+                ),
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'modo': 'sincronizar',
+                'error': str(e),
+                'total_procesados': len(df) if df is not None else 0,
+                'agregados': 0,
+                'actualizados': 0,
+                'eliminados': 0,
+                'sin_cambios': 0,
+                'registros_guardados': 0,
+                'registros_error': 0,
+                'errores_detalle': [],
+                'mensaje': f"Error al sincronizar listados: {str(e)}"
+            }
+
+    @staticmethod
+    def _construir_registros(
+        df: pd.DataFrame,
+        programa_id: Optional[int] = None
+    ) -> Tuple[List[ListadosFocalizacion], List[Dict[str, Any]]]:
+        """
+        Objetos ListadosFocalizacion (sin guardar, con la sede ya vinculada) y
+        las filas que no se pudieron convertir.
+        """
+        registros = []
+        registros_error = []
+
+        for index, row in df.iterrows():
+            try:
+                # Generar ID único para el listado
+                id_listado = PersistenceService._generar_id_listado(row, index)
+
+                # Crear objeto ListadosFocalizacion
+                registros.append(PersistenceService._crear_registro_listado(row, id_listado, programa_id))
+
+            except Exception as e:
+                registros_error.append({
+                    'fila': index,
+                    'error': str(e),
+                    'datos': row.to_dict()
+                })
+
+        PersistenceService._vincular_sedes(registros, programa_id)
+        return registros, registros_error
+
+    @staticmethod
+    def _campos_sincronizables() -> list:
+        """Campos que la sincronización compara y actualiza (todo salvo llave, programa y auditoría)."""
+        return [
+            campo for campo in ListadosFocalizacion._meta.concrete_fields
+            if not campo.primary_key and campo.name not in ('programa', 'fecha_creacion', 'fecha_actualizacion')
+        ]
+
     @staticmethod
     def generar_id_listado_unico(registro) -> str:
         """
@@ -204,7 +340,7 @@ class PersistenceService:
         institucion = PersistenceService._truncate_field(str(row.get('INSTITUCION', row.get('institucion', ''))), 200)
         sede = PersistenceService._truncate_field(str(row.get('SEDE', row.get('sede', ''))), 200)
 
-        return ListadosFocalizacion(
+        registro = ListadosFocalizacion(
             id_listados=id_listado,
             ano=int(row.get('AÑO', row.get('ano', 2025))),
             etc=etc,
@@ -236,6 +372,23 @@ class PersistenceService:
             focalizacion=str(row.get('focalizacion', '')),
             programa_id=programa_id
         )
+        # bulk_create no pasa por save(): calcular aquí los campos de grado
+        registro.calcular_campos_grado()
+        return registro
+
+    @staticmethod
+    def _vincular_sedes(registros: List[ListadosFocalizacion], programa_id: Optional[int] = None) -> None:
+        """
+        Asigna sede_educativa a cada registro según su nombre de sede, con una
+        sola consulta al catálogo para todo el lote. Las sedes que no se puedan
+        resolver quedan en NULL (ver comando vincular_sedes_listados).
+        """
+        municipio_id = None
+        if programa_id:
+            municipio_id = Programa.objects.filter(id=programa_id).values_list('municipio_id', flat=True).first()
+        codigos = FuzzyMatcher.resolver_codigos_sedes([r.sede for r in registros], municipio_id)
+        for registro in registros:
+            registro.sede_educativa_id = codigos.get(registro.sede)
 
     @staticmethod
     def _safe_string(value) -> Optional[str]:
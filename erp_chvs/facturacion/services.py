@@ -4,14 +4,24 @@ Capa de servicios para orquestación de procesos complejos.
 
 import pandas as pd
 from typing import Dict, List, Any, Optional
+from django.conf import settings
+from django.core.cache import cache
 from django.core.files.uploadedfile import UploadedFile
+from django.db.models import CharField, Count, Max, Q, Value
+from django.db.models.functions import Coalesce, Concat
 import base64
+import hashlib
+import json
+
+from planeacion.models import SedesEducativas
 
 from .excel_utils import ExcelProcessor
 from .data_processors import DataTransformer
 from .fuzzy_matching import FuzzyMatcher
 from .validators import DataValidator
 from .persistence_service import PersistenceService
+from .cobertura_service import CoberturaSedesService
+from .models import CAMPOS_COMPLEMENTO, NIVELES_EDUCATIVOS, ListadosFocalizacion
 from .config import ProcesamientoConfig, MensajesConfig
 from .exceptions import (
     ArchivoInvalidoException, 
@@ -53,7 +63,9 @@ class ProcesamientoService:
                 raise ArchivoInvalidoException(MensajesConfig.ARCHIVO_INVALIDO)
             
             # 2. Leer archivo Excel
-            df = self.excel_processor.leer_excel(archivo)
+            df = self.excel_processor.leer_excel(
+                archivo, self.excel_processor.columnas_lectura(ProcesamientoConfig.TIPO_PROCESAMIENTO_NUEVO)
+            )
             
             # 2.1. Normalizar columnas (Alias y Mayúsculas)
             df = self.data_transformer.normalizar_columnas(df)
@@ -124,7 +136,9 @@ class ProcesamientoService:
                 raise ArchivoInvalidoException(MensajesConfig.ARCHIVO_INVALIDO)
             
             # 2. Leer archivo Excel
-            df = self.excel_processor.leer_excel(archivo)
+            df = self.excel_processor.leer_excel(
+                archivo, self.excel_processor.columnas_lectura(ProcesamientoConfig.TIPO_PROCESAMIENTO_ORIGINAL)
+            )
             
             # 3. Validar estructura del formato original
             es_valido, errores = self.excel_processor.validar_estructura_original_formato(df)
@@ -194,7 +208,9 @@ class ProcesamientoService:
                 raise ArchivoInvalidoException(MensajesConfig.ARCHIVO_INVALIDO)
 
             # 2. Leer archivo Excel
-            df = self.excel_processor.leer_excel(archivo)
+            df = self.excel_processor.leer_excel(
+                archivo, self.excel_processor.columnas_lectura(ProcesamientoConfig.TIPO_PROCESAMIENTO_SIMAT_6A)
+            )
 
             # 3. Validar estructura SIMAT
             es_valido, errores = self.excel_processor.validar_estructura_simat_6a(df)
@@ -540,3 +556,188 @@ class EstadisticasService:
                 'generales': {},
                 'niveles': {}
             }
+
+
+class ConteoEstudiantesService:
+    """Conteos de titulares por nivel educativo × complemento, agregados en SQL."""
+
+    @staticmethod
+    def _alias(etiqueta: str) -> str:
+        return 'c_' + etiqueta.lower().replace(' ', '_')
+
+    @staticmethod
+    def matriz_por_sede(
+        programa_id: int,
+        focalizacion: str,
+        sede: Optional[str] = None
+    ) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Una sola consulta agrupada por (sede, nivel_educativo) con un
+        Count(filter=...) por complemento.
+
+        Args:
+            programa_id: ID del programa
+            focalizacion: Focalización
+            sede: Limitar a una sede; None = todas las sedes del programa
+
+        Returns:
+            {sede: {complemento: {'total': n, 'por_nivel': {nivel: n}}}} con
+            todas las combinaciones presentes (en cero si no hay titulares).
+        """
+        qs = ListadosFocalizacion.objects.filter(programa_id=programa_id, focalizacion=focalizacion)
+        if sede:
+            qs = qs.filter(sede=sede)
+
+        conteos = qs.values('sede', 'nivel_educativo').annotate(**{
+            ConteoEstudiantesService._alias(etiqueta): Count(
+                'id_listados', filter=ListadosFocalizacion.q_complemento_activo(etiqueta)
+            )
+            for etiqueta in CAMPOS_COMPLEMENTO
+        }).order_by('sede')
+
+        niveles = [clave for clave, _ in NIVELES_EDUCATIVOS]
+        matriz: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for fila in conteos:
+            por_complemento = matriz.setdefault(fila['sede'], {
+                etiqueta: {'total': 0, 'por_nivel': dict.fromkeys(niveles, 0)}
+                for etiqueta in CAMPOS_COMPLEMENTO
+            })
+            for etiqueta in CAMPOS_COMPLEMENTO:
+                cantidad = fila[ConteoEstudiantesService._alias(etiqueta)]
+                por_complemento[etiqueta]['total'] += cantidad
+                if fila['nivel_educativo'] in por_complemento[etiqueta]['por_nivel']:
+                    por_complemento[etiqueta]['por_nivel'][fila['nivel_educativo']] += cantidad
+        return matriz
+
+
+class ListadosAgrupadosService:
+    """
+    Listado de focalización agrupado por (sede, grado_base, focalización,
+    programa) con paginación por clave (keyset): cada página busca a partir de
+    la última clave mostrada con LIMIT, sin OFFSET ni COUNT del agrupado.
+    """
+
+    # Orden y clave de paginación; programa_orden = programa_id sin NULL
+    CLAVE = ('sede', 'grado_base', 'focalizacion', 'programa_orden')
+    TAMANO_PAGINA = 20
+
+    @staticmethod
+    def filtrar(programa_id=None, sede_texto: str = '', focalizacion: str = ''):
+        """QuerySet de ListadosFocalizacion con los filtros de la vista."""
+        qs = ListadosFocalizacion.objects.all()
+        if programa_id:
+            qs = qs.filter(programa_id=programa_id)
+        if sede_texto:
+            # El texto se busca en el catálogo de sedes (pequeño) y los listados se
+            # filtran por la FK indexada, en lugar de un icontains sobre cada
+            # listado; solo los que quedaron sin vincular se buscan por nombre
+            qs = qs.filter(
+                Q(sede_educativa__in=SedesEducativas.objects.filter(
+                    nombre_sede_educativa__icontains=sede_texto
+                ).values('cod_interprise'))
+                | Q(sede_educativa__isnull=True, sede__icontains=sede_texto)
+            )
+        if focalizacion:
+            qs = qs.filter(focalizacion=focalizacion)
+        return qs
+
+    @staticmethod
+    def codificar_cursor(fila: Dict[str, Any]) -> str:
+        valores = [fila[campo] for campo in ListadosAgrupadosService.CLAVE]
+        return base64.urlsafe_b64encode(json.dumps(valores).encode('utf-8')).decode('ascii')
+
+    @staticmethod
+    def decodificar_cursor(cursor: str) -> Optional[list]:
+        """Clave del cursor, o None si falta o no es válido (se vuelve a la primera página)."""
+        if not cursor:
+            return None
+        try:
+            valores = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except (ValueError, TypeError):
+            return None
+        if (not isinstance(valores, list) or len(valores) != len(ListadosAgrupadosService.CLAVE)
+                or not all(isinstance(v, str) for v in valores[:3]) or not isinstance(valores[3], int)):
+            return None
+        return valores
+
+    @staticmethod
+    def _q_posterior(clave: list, hacia_atras: bool = False) -> Q:
+        """(sede, grado_base, focalizacion, programa_orden) > clave, o < con hacia_atras."""
+        op = 'lt' if hacia_atras else 'gt'
+        condicion = Q()
+        iguales = {}
+        for campo, valor in zip(ListadosAgrupadosService.CLAVE, clave):
+            condicion |= Q(**iguales, **{f'{campo}__{op}': valor})
+            iguales[campo] = valor
+        # Cota redundante sobre la primera columna para que el índice acote el rango
+        return Q(**{f'sede__{op}e': clave[0]}) & condicion
+
+    @staticmethod
+    def pagina(filtrados, cursor: str = '', direccion: str = 'siguiente',
+               tamano: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Una página del agrupado.
+
+        Args:
+            filtrados: QuerySet de filtrar()
+            cursor: Clave límite (codificar_cursor) de la página de la que se viene
+            direccion: 'siguiente' (después del cursor), 'anterior' (antes del
+                cursor) o 'ultima' (ignora el cursor)
+            tamano: Grupos por página (TAMANO_PAGINA por defecto)
+
+        Returns:
+            Dict con items, has_next, has_previous, cursor_siguiente y cursor_anterior.
+        """
+        tamano = tamano or ListadosAgrupadosService.TAMANO_PAGINA
+        clave = None if direccion == 'ultima' else ListadosAgrupadosService.decodificar_cursor(cursor)
+        hacia_atras = direccion == 'ultima' or (direccion == 'anterior' and clave is not None)
+
+        qs = filtrados.annotate(programa_orden=Coalesce('programa_id', Value(0)))
+        if clave is not None:
+            qs = qs.filter(ListadosAgrupadosService._q_posterior(clave, hacia_atras))
+        orden = [f'-{campo}' if hacia_atras else campo for campo in ListadosAgrupadosService.CLAVE]
+        filas = list(
+            qs.values(*ListadosAgrupadosService.CLAVE, 'programa__programa')
+            .annotate(total_raciones=Count('*'), ultima_subida=Max('fecha_actualizacion'))
+            .order_by(*orden)[:tamano + 1]
+        )
+        hay_mas = len(filas) > tamano
+        filas = filas[:tamano]
+        if hacia_atras:
+            filas.reverse()
+            has_previous, has_next = hay_mas, direccion == 'anterior'
+        else:
+            has_previous, has_next = clave is not None, hay_mas
+
+        return {
+            'items': filas,
+            'has_next': has_next,
+            'has_previous': has_previous,
+            'cursor_siguiente': ListadosAgrupadosService.codificar_cursor(filas[-1]) if filas else '',
+            'cursor_anterior': ListadosAgrupadosService.codificar_cursor(filas[0]) if filas else '',
+        }
+
+    @staticmethod
+    def totales(programa_id=None, sede_texto: str = '', focalizacion: str = '') -> Dict[str, int]:
+        """
+        total_raciones y total_grupos con los filtros dados, en un solo
+        recorrido y cacheados hasta la próxima escritura sobre los listados
+        (o FACTURACION_LISTADOS_TOTAL_TTL segundos).
+        """
+        filtros = hashlib.md5(f'{programa_id}|{sede_texto}|{focalizacion}'.encode('utf-8')).hexdigest()
+        clave = (f'facturacion:listados:totales:'
+                 f'{CoberturaSedesService.version(programa_id or None)}:{filtros}')
+        totales = cache.get(clave)
+        if totales is None:
+            totales = ListadosAgrupadosService.filtrar(programa_id, sede_texto, focalizacion).aggregate(
+                total_raciones=Count('*'),
+                total_grupos=Count(
+                    Concat('sede', Value('\x1f'), 'grado_base', Value('\x1f'),
+                           Coalesce('programa_id', Value(0)), Value('\x1f'), 'focalizacion',
+                           output_field=CharField()),
+                    distinct=True,
+                ),
+            )
+            cache.set(clave, totales, getattr(settings, 'FACTURACION_LISTADOS_TOTAL_TTL', 600))
+        return totales
+
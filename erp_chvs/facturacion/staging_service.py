@@ -0,0 +1,112 @@
+"""
+Almacén temporal de cargas de listados entre la etapa 1 (procesar) y la
+etapa 2 (guardar en BD).
+
+El DataFrame procesado y el archivo original se escriben en disco bajo un
+token; la sesión solo guarda el token. El DataFrame se guarda con pickle
+(bloques NumPy, protocolo 5), que conserva dtypes y se lee sin volver a
+parsear texto como hacía el JSON en sesión.
+"""
+
+import logging
+import os
+import re
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r'^[0-9a-f]{32}$')
+_EXT_DATAFRAME = '.pkl'
+_EXT_ARCHIVO = '.src'
+
+
+class StagingService:
+    """Guarda y recupera por token el resultado de la etapa 1 de carga."""
+
+    @staticmethod
+    def directorio() -> Path:
+        ruta = Path(getattr(settings, 'FACTURACION_STAGING_DIR', '') or
+                    os.path.join(tempfile.gettempdir(), 'erp_chvs_cargas'))
+        ruta.mkdir(parents=True, exist_ok=True)
+        return ruta
+
+    @staticmethod
+    def _ruta(token: str, extension: str) -> Optional[Path]:
+        # El token viene de la sesión, pero se valida para no abrir rutas arbitrarias.
+        if not token or not _TOKEN_RE.match(token):
+            return None
+        return StagingService.directorio() / f"{token}{extension}"
+
+    @staticmethod
+    def _escribir_atomico(ruta: Path, escribir) -> None:
+        tmp = ruta.with_suffix(ruta.suffix + '.tmp')
+        escribir(tmp)
+        os.replace(tmp, ruta)
+
+    @staticmethod
+    def guardar(df: Optional[pd.DataFrame], archivo_contenido: bytes) -> str:
+        """
+        Guarda el DataFrame procesado y el archivo original. Retorna el token.
+        Aprovecha para borrar cargas vencidas de otros usuarios.
+        """
+        StagingService.limpiar_vencidas()
+
+        token = uuid.uuid4().hex
+        if df is not None:
+            StagingService._escribir_atomico(
+                StagingService._ruta(token, _EXT_DATAFRAME),
+                lambda tmp: df.to_pickle(tmp, compression=None, protocol=5),
+            )
+        StagingService._escribir_atomico(
+            StagingService._ruta(token, _EXT_ARCHIVO),
+            lambda tmp: tmp.write_bytes(archivo_contenido),
+        )
+        return token
+
+    @staticmethod
+    def cargar_dataframe(token: str) -> Optional[pd.DataFrame]:
+        """DataFrame de la etapa 1, o None si no existe o ya venció."""
+        ruta = StagingService._ruta(token, _EXT_DATAFRAME)
+        if ruta is None or not ruta.exists():
+            return None
+        return pd.read_pickle(ruta, compression=None)
+
+    @staticmethod
+    def cargar_archivo(token: str) -> Optional[bytes]:
+        """Contenido del archivo original (respaldo para reprocesar)."""
+        ruta = StagingService._ruta(token, _EXT_ARCHIVO)
+        if ruta is None or not ruta.exists():
+            return None
+        return ruta.read_bytes()
+
+    @staticmethod
+    def eliminar(token: str) -> None:
+        for extension in (_EXT_DATAFRAME, _EXT_ARCHIVO):
+            ruta = StagingService._ruta(token, extension)
+            if ruta is not None:
+                ruta.unlink(missing_ok=True)
+
+    @staticmethod
+    def limpiar_vencidas(ttl_segundos: Optional[int] = None) -> int:
+        """Elimina los archivos con más de `ttl_segundos` (FACTURACION_STAGING_TTL). Retorna cuántos."""
+        if ttl_segundos is None:
+            ttl_segundos = getattr(settings, 'FACTURACION_STAGING_TTL', 6 * 3600)
+        limite = time.time() - ttl_segundos
+        eliminados = 0
+        for ruta in StagingService.directorio().iterdir():
+            try:
+                if ruta.is_file() and ruta.stat().st_mtime < limite:
+                    ruta.unlink()
+                    eliminados += 1
+            except FileNotFoundError:
+                pass  # Otro worker la borró primero
+        if eliminados:
+            logger.info(f"Cargas temporales vencidas eliminadas: {eliminados} archivo(s)")
+        return eliminados
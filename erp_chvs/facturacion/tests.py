@@ -56,3 +56,749 @@ class BasicTestCase(TestCase):
         resultado = matcher.normalizar_texto("  INSTITUCIÓN EDUCATIVA  ")
         esperado = "institucion educativa"
         self.assertEqual(resultado, esperado)
+
+
+class StagingServiceTests(TestCase):
+    """Carga temporal de la etapa 1 (DataFrame en disco, token en sesión)."""
+
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        ajustes = override_settings(FACTURACION_STAGING_DIR=self.tmp.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def test_guardar_y_cargar_conserva_tipos(self):
+        import pandas as pd
+        from .staging_service import StagingService
+
+        df = pd.DataFrame({'DOC': ['0012', '345'], 'EDAD': [7, 9], 'focalizacion': ['F1', 'F1']})
+        token = StagingService.guardar(df, b'contenido')
+
+        recuperado = StagingService.cargar_dataframe(token)
+
+        pd.testing.assert_frame_equal(recuperado, df)
+        self.assertEqual(StagingService.cargar_archivo(token), b'contenido')
+
+        StagingService.eliminar(token)
+        self.assertIsNone(StagingService.cargar_dataframe(token))
+
+    def test_token_invalido_no_abre_rutas(self):
+        from .staging_service import StagingService
+
+        self.assertIsNone(StagingService.cargar_dataframe('../../etc/passwd'))
+        self.assertIsNone(StagingService.cargar_archivo(''))
+
+    def test_limpiar_vencidas(self):
+        import os
+        import time
+        from .staging_service import StagingService
+
+        viejo = StagingService.guardar(None, b'viejo')
+        ruta = StagingService.directorio() / f"{viejo}.src"
+        hace_un_dia = time.time() - 86400
+        os.utime(ruta, (hace_un_dia, hace_un_dia))
+        nuevo = StagingService.guardar(None, b'nuevo')
+
+        self.assertIsNone(StagingService.cargar_archivo(viejo))
+        self.assertEqual(StagingService.cargar_archivo(nuevo), b'nuevo')
+
+
+class LecturaArchivosTests(TestCase):
+    """Lector de listados: columnas por formato, xlsx en streaming y CSV."""
+
+    XLSX_MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+    def _xlsx(self, filas):
+        import openpyxl
+        from io import BytesIO
+
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        for fila in filas:
+            ws.append(fila)
+        buffer = BytesIO()
+        wb.save(buffer)
+        return SimpleUploadedFile('listado.xlsx', buffer.getvalue(), content_type=self.XLSX_MIME)
+
+    def test_xlsx_solo_columnas_del_formato(self):
+        import datetime
+        from .config import ProcesamientoConfig
+        from .excel_utils import ExcelProcessor
+
+        archivo = self._xlsx([
+            [' TIPO_JORNADA ', 'DOCUMENTO', 'FECHA_NACIMIENTO', 'NOMBRE1', 'COLUMNA_SOBRANTE'],
+            [6, '0012345', datetime.datetime(2015, 3, 1), '  ANA ', 'x'],
+            [None, None, None, None, None],
+            [2.0, 98765, '01/02/2012', 'LUIS', 'y'],
+        ])
+
+        df = ExcelProcessor.leer_excel(
+            archivo, ExcelProcessor.columnas_lectura(ProcesamientoConfig.TIPO_PROCESAMIENTO_NUEVO)
+        )
+
+        self.assertEqual(list(df.columns), ['TIPO_JORNADA', 'DOCUMENTO', 'FECHA_NACIMIENTO', 'NOMBRE1'])
+        self.assertEqual(df['TIPO_JORNADA'].tolist(), [6, 2])
+        self.assertEqual(df['DOCUMENTO'].tolist(), ['0012345', '98765'])
+        self.assertEqual(df['FECHA_NACIMIENTO'].iloc[0], datetime.datetime(2015, 3, 1))
+        self.assertEqual(df['NOMBRE1'].iloc[0], 'ANA')
+
+    def test_sin_columnas_lee_todo(self):
+        from .excel_utils import ExcelProcessor
+
+        archivo = self._xlsx([['A', 'A', 'B'], [1, 2, ' z ']])
+
+        df = ExcelProcessor.leer_excel(archivo)
+
+        self.assertEqual(list(df.columns), ['A', 'A_1', 'B'])
+        self.assertEqual(df['B'].iloc[0], 'z')
+
+    def test_csv_punto_y_coma_latin1(self):
+        from .config import ProcesamientoConfig
+        from .excel_utils import ExcelProcessor
+
+        contenido = 'ANO_INF;NRO_DOCUMENTO;APELLIDO1;OTRA\n2026;0099;  MUÑOZ ;x\n'.encode('latin-1')
+        archivo = SimpleUploadedFile('anexo.csv', contenido, content_type='text/csv')
+
+        self.assertTrue(ExcelProcessor.validar_archivo_excel(archivo))
+        self.assertEqual(ExcelProcessor.leer_encabezados(archivo), ['ANO_INF', 'NRO_DOCUMENTO', 'APELLIDO1', 'OTRA'])
+        df = ExcelProcessor.leer_excel(
+            archivo, ExcelProcessor.columnas_lectura(ProcesamientoConfig.TIPO_PROCESAMIENTO_SIMAT_6A)
+        )
+
+        self.assertEqual(list(df.columns), ['ANO_INF', 'NRO_DOCUMENTO', 'APELLIDO1'])
+        self.assertEqual(df.iloc[0].tolist(), [2026, '0099', 'MUÑOZ'])
+
+
+class CamposGradoTests(TestCase):
+    """grado_base / grado_orden / nivel_educativo precalculados en ListadosFocalizacion."""
+
+    def _listado(self, id_listados, grado_grupos, **extra):
+        from .models import ListadosFocalizacion
+
+        datos = dict(
+            id_listados=id_listados, ano=2026, etc='CALI', institucion='IE', sede='SEDE A',
+            tipodoc='TI', doc=id_listados, nombre1='N', fecha_nacimiento='2015-01-01', edad=10,
+            genero='F', grado_grupos=grado_grupos, focalizacion='F1',
+        )
+        datos.update(extra)
+        return ListadosFocalizacion.objects.create(**datos)
+
+    def test_calculo_de_campos(self):
+        from .utils import _calcular_campos_grado
+
+        self.assertEqual(_calcular_campos_grado('10-1001'),
+                         {'grado_base': '10', 'grado_orden': 10, 'nivel_educativo': 'media'})
+        self.assertEqual(_calcular_campos_grado('-1-5'),
+                         {'grado_base': '-1', 'grado_orden': -1, 'nivel_educativo': 'preescolar'})
+        self.assertEqual(_calcular_campos_grado('-2--A')['grado_base'], '-2')
+        self.assertEqual(_calcular_campos_grado('4-2')['nivel_educativo'], 'primaria_4_5')
+        self.assertEqual(_calcular_campos_grado('ACELERACION')['grado_orden'], None)
+        self.assertEqual(_calcular_campos_grado('')['grado_base'], '')
+
+    def test_ingesta_rellena_campos(self):
+        import pandas as pd
+        from .persistence_service import PersistenceService
+
+        fila = pd.Series({'DOC': '1', 'NOMBRE1': 'ANA', 'grado_grupos': '7-2', 'focalizacion': 'F1'})
+
+        registro = PersistenceService._crear_registro_listado(fila, 'X1')
+
+        self.assertEqual((registro.grado_base, registro.grado_orden, registro.nivel_educativo),
+                         ('7', 7, 'secundaria'))
+
+    def test_comando_rellena_registros_antiguos(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import ListadosFocalizacion
+
+        self._listado('A1', '0-1')
+        self._listado('A2', '11-3')
+        # Simular registros cargados antes de existir las columnas
+        ListadosFocalizacion.objects.update(grado_base='', grado_orden=None, nivel_educativo='')
+
+        call_command('rellenar_campos_grado', stdout=StringIO())
+
+        self.assertEqual(
+            list(ListadosFocalizacion.objects.order_by('grado_orden')
+                 .values_list('grado_base', 'grado_orden', 'nivel_educativo')),
+            [('0', 0, 'preescolar'), ('11', 11, 'media')],
+        )
+
+    def test_filtro_complemento_en_sql_equivale_a_complementos_activos(self):
+        from .models import ListadosFocalizacion
+
+        self._listado('B1', '1-1', complemento_alimentario_preparado_am='x')
+        self._listado('B2', '1-1', complemento_alimentario_preparado_am='')
+        self._listado('B3', '2-1', complemento_alimentario_preparado_pm='X')
+
+        con_am = ListadosFocalizacion.objects.filter(ListadosFocalizacion.q_complemento_activo('CAP AM'))
+
+        self.assertEqual(
+            sorted(con_am.values_list('id_listados', flat=True)),
+            sorted(r.id_listados for r in ListadosFocalizacion.objects.all() if 'CAP AM' in r.complementos_activos),
+        )
+
+
+def _crear_programa(nombre='PAE PRUEBA'):
+    import datetime
+    from planeacion.models import Programa
+    from principal.models import PrincipalMunicipio
+
+    municipio = PrincipalMunicipio.objects.create(
+        codigo_municipio=1, nombre_municipio='CALI', codigo_departamento='76'
+    )
+    return Programa.objects.create(
+        programa=nombre, tipo_programa_id='pae', municipio=municipio,
+        fecha_inicial=datetime.date(2026, 1, 1), fecha_final=datetime.date(2026, 12, 31),
+    )
+
+
+class ConteoEstudiantesTests(TestCase):
+    """Matriz nivel × complemento agregada en SQL (ConteoEstudiantesService)."""
+
+    _listado = CamposGradoTests._listado
+
+    def setUp(self):
+        self.programa = _crear_programa()
+        self._listado('C1', '0-1', programa=self.programa, complemento_alimentario_preparado_am='x')
+        self._listado('C2', '4-1', programa=self.programa, complemento_alimentario_preparado_am='x')
+        self._listado('C3', '4-2', programa=self.programa, almuerzo_jornada_unica='x')
+        self._listado('C4', '9-1', programa=self.programa, sede='SEDE B', complemento_alimentario_preparado_pm='x')
+        self._listado('C5', '9-1', programa=self.programa, sede='SEDE B', focalizacion='F2',
+                      complemento_alimentario_preparado_pm='x')
+
+    def test_matriz_de_todo_el_programa_en_una_consulta(self):
+        from .services import ConteoEstudiantesService
+
+        with self.assertNumQueries(1):
+            matriz = ConteoEstudiantesService.matriz_por_sede(self.programa.id, 'F1')
+
+        self.assertEqual(sorted(matriz), ['SEDE A', 'SEDE B'])
+        self.assertEqual(matriz['SEDE A']['CAP AM']['total'], 2)
+        self.assertEqual(matriz['SEDE A']['CAP AM']['por_nivel']['preescolar'], 1)
+        self.assertEqual(matriz['SEDE A']['CAP AM']['por_nivel']['primaria_4_5'], 1)
+        self.assertEqual(matriz['SEDE A']['Almuerzo JU']['total'], 1)
+        self.assertEqual(matriz['SEDE A']['CAP PM']['total'], 0)
+        self.assertEqual(matriz['SEDE B']['CAP PM']['por_nivel']['secundaria'], 1)
+
+    def test_api_sede_y_complemento_conserva_formato(self):
+        usuario = User.objects.create_superuser('conteo', 'c@x.com', 'x')
+        self.client.force_login(usuario)
+        url = '/facturacion/api/conteo-estudiantes-por-nivel/'
+
+        resp = self.client.get(url, {
+            'programa_id': self.programa.id, 'focalizacion': 'F1',
+            'sede_nombre': 'SEDE A', 'complemento': 'CAP AM',
+        }, secure=True)
+        datos = resp.json()
+        self.assertEqual(datos['total'], 2)
+        self.assertEqual(datos['por_nivel']['primaria_4_5'], 1)
+
+        resp = self.client.get(url, {'programa_id': self.programa.id, 'focalizacion': 'F2'}, secure=True)
+        self.assertEqual(list(resp.json()['sedes']), ['SEDE B'])
+
+
+class SedeEducativaFKTests(TestCase):
+    """FK sede_educativa: resolución al cargar, backfill y consultas por join."""
+
+    _listado = CamposGradoTests._listado
+
+    def setUp(self):
+        from planeacion.models import InstitucionesEducativas, SedesEducativas
+        from principal.models import PrincipalMunicipio
+
+        self.programa = _crear_programa()
+        buga = PrincipalMunicipio.objects.create(
+            codigo_municipio=2, nombre_municipio='GUADALAJARA DE BUGA', codigo_departamento='76'
+        )
+        ie_cali = InstitucionesEducativas.objects.create(
+            codigo_ie='IE1', nombre_institucion='IE CALI', id_municipios=self.programa.municipio
+        )
+        ie_buga = InstitucionesEducativas.objects.create(
+            codigo_ie='IE2', nombre_institucion='IE BUGA', id_municipios=buga
+        )
+        comunes = dict(cod_dane=1, zona='U', preparado='SI', industrializado='NO')
+        # 'SEDE A' existe en los dos municipios; 'SEDE B' solo en Buga
+        SedesEducativas.objects.create(cod_interprise='S1', nombre_sede_educativa='SEDE A', codigo_ie=ie_cali, **comunes)
+        SedesEducativas.objects.create(cod_interprise='S2', nombre_sede_educativa='SEDE A', codigo_ie=ie_buga, **comunes)
+        SedesEducativas.objects.create(cod_interprise='S3', nombre_sede_educativa='SEDE B', codigo_ie=ie_buga, **comunes)
+
+    def test_resolver_prefiere_municipio_del_programa(self):
+        from .fuzzy_matching import FuzzyMatcher
+
+        codigos = FuzzyMatcher.resolver_codigos_sedes(['SEDE A', 'SEDE B', 'OTRA'], self.programa.municipio_id)
+        self.assertEqual(codigos, {'SEDE A': 'S1', 'SEDE B': 'S3', 'OTRA': None})
+        # Sin municipio el nombre repetido es ambiguo
+        self.assertIsNone(FuzzyMatcher.resolver_codigos_sedes(['SEDE A'])['SEDE A'])
+
+    def test_ingesta_vincula_sede(self):
+        import pandas as pd
+        from .models import ListadosFocalizacion
+        from .persistence_service import PersistenceService
+
+        df = pd.DataFrame([
+            {'DOC': '1', 'NOMBRE1': 'ANA', 'SEDE': 'SEDE A', 'grado_grupos': '3-1', 'focalizacion': 'F1'},
+            {'DOC': '2', 'NOMBRE1': 'LUIS', 'SEDE': 'SEDE B', 'grado_grupos': '3-1', 'focalizacion': 'F1'},
+        ])
+        resultado = PersistenceService.guardar_listados_focalizacion(df, programa_id=self.programa.id)
+
+        self.assertEqual(resultado['registros_guardados'], 2)
+        self.assertEqual(
+            dict(ListadosFocalizacion.objects.values_list('sede', 'sede_educativa_id')),
+            {'SEDE A': 'S1', 'SEDE B': 'S3'},
+        )
+
+    def test_comando_vincula_y_consultas_por_join(self):
+        from django.core.management import call_command
+        from io import StringIO
+        from .models import ListadosFocalizacion
+
+        self._listado('L1', '1-1', programa=self.programa)
+        self._listado('L2', '1-2', programa=self.programa)
+        self._listado('L3', '2-1', programa=self.programa, sede='SEDE B', focalizacion='F2')
+        self._listado('L4', '2-1', programa=self.programa, sede='SIN CATALOGO')
+
+        call_command('vincular_sedes_listados', stdout=StringIO())
+
+        self.assertEqual(
+            dict(ListadosFocalizacion.objects.values_list('id_listados', 'sede_educativa_id')),
+            {'L1': 'S1', 'L2': 'S1', 'L3': 'S3', 'L4': None},
+        )
+        self.assertEqual(
+            sorted(ListadosFocalizacion.sedes_con_registros(self.programa.id).values_list('pk', flat=True)),
+            ['S1', 'S3'],
+        )
+        self.assertEqual(
+            list(ListadosFocalizacion.sedes_con_registros(self.programa.id, 'F2').values_list('pk', flat=True)),
+            ['S3'],
+        )
+
+        usuario = User.objects.create_superuser('sedesfk', 's@x.com', 'x')
+        self.client.force_login(usuario)
+        resp = self.client.get('/facturacion/api/get-sedes-completas/',
+                               {'programa_id': self.programa.id}, secure=True)
+        self.assertEqual([s['cod_interprise'] for s in resp.json()['sedes']], ['S1', 'S3'])
+
+    def test_listados_sin_vincular_se_encuentran_por_nombre(self):
+        from unittest.mock import patch
+        from django.http import HttpResponse
+        from dashboard.services import obtener_sedes_mapa
+        from planeacion.models import SedesEducativas
+        from .cobertura_service import CoberturaSedesService
+        from .models import ListadosFocalizacion
+        from .pdf_service import PDFAsistenciaService
+        from .services import ListadosAgrupadosService
+
+        # 'SEDE A' está dos veces en el catálogo: la carga la deja sin FK
+        self._listado('L1', '1-1', programa=self.programa)
+        self._listado('L2', '2-1', programa=self.programa, sede='SEDE B', sede_educativa_id='S3')
+        sede_a = SedesEducativas.objects.get(pk='S1')
+
+        self.assertEqual(
+            list(ListadosFocalizacion.objects.filter(ListadosFocalizacion.q_sede(sede_a)).values_list('pk', flat=True)),
+            ['L1'],
+        )
+        self.assertEqual(
+            sorted(ListadosFocalizacion.sedes_con_registros(self.programa.id, 'F1').values_list('pk', flat=True)),
+            ['S1', 'S2', 'S3'],
+        )
+        self.assertEqual(obtener_sedes_mapa(self.programa.id)['SEDE B'], 'S3')
+        self.assertIn('SEDE A', obtener_sedes_mapa(self.programa.id))
+        self.assertEqual(
+            sorted(ListadosAgrupadosService.filtrar(sede_texto='sede').values_list('pk', flat=True)),
+            ['L1', 'L2'],
+        )
+        self.assertEqual(CoberturaSedesService.calcular(self.programa.id)['sedes_faltantes'], [])
+
+        with patch.object(PDFAsistenciaService, '_generar_zip_para_sede', return_value=HttpResponse('zip')) as zip_sede:
+            resp = PDFAsistenciaService.generar_pdf_asistencia(self.programa.id, 'S1', 'MARZO', 'F1')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([e.pk for e in zip_sede.call_args.args[0]], ['L1'])
+
+
+class CoberturaSedesTests(TestCase):
+    """Sedes faltantes por conjuntos (CoberturaSedesService) y su uso en lista_listados."""
+
+    _listado = CamposGradoTests._listado
+
+    def setUp(self):
+        from django.core.cache import cache
+        from planeacion.models import SedesEducativas
+
+        cache.clear()
+        SedeEducativaFKTests.setUp(self)  # S1 'SEDE A' en Cali; S2, S3 en Buga
+        self.ie_cali = SedesEducativas.objects.get(pk='S1').codigo_ie
+        self._sede('S4', 'SEDE C')
+        self._listado('L1', '1-1', programa=self.programa, sede_educativa_id='S1')
+        self._listado('L2', '1-1', programa=self.programa, sede_educativa_id='S1', focalizacion='F2')
+        self._listado('L3', '2-1', programa=self.programa, sede='SEDE C', sede_educativa_id='S4')
+
+    def _sede(self, cod_interprise, nombre):
+        from planeacion.models import SedesEducativas
+
+        return SedesEducativas.objects.create(
+            cod_interprise=cod_interprise, nombre_sede_educativa=nombre, codigo_ie=self.ie_cali,
+            cod_dane=1, zona='U', preparado='SI', industrializado='NO',
+        )
+
+    def test_calcular_por_conjuntos(self):
+        from .cobertura_service import CoberturaSedesService
+
+        with self.assertNumQueries(2):
+            cobertura = CoberturaSedesService.calcular(self.programa.id)
+        self.assertEqual(cobertura['focalizaciones_programa'], ['F1', 'F2'])
+        self.assertEqual(cobertura['sedes_faltantes'], [
+            {'sede': 'SEDE C', 'cod_interprise': 'S4', 'focalizaciones_faltantes': ['F2']},
+        ])
+        self.assertEqual(CoberturaSedesService.calcular(self.programa.id, 'F1')['total_sedes_faltantes'], 0)
+        self.assertEqual(CoberturaSedesService.calcular(self.programa.id, 'F3')['total_sedes_faltantes'], 2)
+
+    def test_cache_se_invalida_al_escribir(self):
+        from .cobertura_service import CoberturaSedesService
+
+        self.assertEqual(CoberturaSedesService.sedes_faltantes(self.programa.id)['total_sedes_faltantes'], 1)
+        with self.assertNumQueries(0):
+            CoberturaSedesService.sedes_faltantes(self.programa.id)
+
+        self._listado('L4', '2-1', programa=self.programa, sede='SEDE C', sede_educativa_id='S4', focalizacion='F2')
+        CoberturaSedesService.invalidar(self.programa.id)
+        self.assertEqual(CoberturaSedesService.sedes_faltantes(self.programa.id)['total_sedes_faltantes'], 0)
+
+    def test_api_y_lista_listados_en_consultas_constantes(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        usuario = User.objects.create_superuser('cobertura', 'c@x.com', 'x')
+        self.client.force_login(usuario)
+
+        resp = self.client.get('/facturacion/api/sedes-faltantes/', {'programa_id': self.programa.id}, secure=True)
+        self.assertEqual(resp.json()['total_sedes_faltantes'], 1)
+        self.assertEqual(self.client.get('/facturacion/api/sedes-faltantes/', secure=True).status_code, 400)
+
+        def consultas():
+            from django.core.cache import cache
+
+            cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.get('/facturacion/lista-listados/', {'programa': self.programa.id}, secure=True)
+            self.assertEqual(resp.status_code, 200)
+            return len(ctx.captured_queries), resp
+
+        antes, resp = consultas()
+        self.assertEqual(resp.context['total_raciones'], 3)
+        self.assertEqual(len(resp.context['listados']), 3)
+
+        for i in range(10):
+            self._sede(f'X{i}', f'SEDE EXTRA {i}')
+        despues, resp = consultas()
+        self.assertEqual(resp.context['total_sedes_faltantes'], 11)
+        self.assertEqual(antes, despues)
+
+    def test_invalidacion_llega_a_otros_workers(self):
+        from django.test import override_settings
+        from .cobertura_service import CoberturaSedesService
+        from .services import ListadosAgrupadosService
+
+        def worker(nombre):
+            # Caché local propia de cada worker; la de versiones es compartida
+            return override_settings(CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': nombre},
+                'versiones': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-versiones'},
+            })
+
+        with worker('worker-b'):
+            self.assertEqual(CoberturaSedesService.sedes_faltantes(self.programa.id)['total_sedes_faltantes'], 1)
+            self.assertEqual(ListadosAgrupadosService.totales(self.programa.id)['total_raciones'], 3)
+        with worker('worker-a'):
+            self._listado('L4', '2-1', programa=self.programa, sede='SEDE C', sede_educativa_id='S4', focalizacion='F2')
+            CoberturaSedesService.invalidar(self.programa.id)
+        with worker('worker-b'):
+            self.assertEqual(CoberturaSedesService.sedes_faltantes(self.programa.id)['total_sedes_faltantes'], 0)
+            self.assertEqual(ListadosAgrupadosService.totales(self.programa.id)['total_raciones'], 4)
+
+
+class ListadosAgrupadosTests(TestCase):
+    """Paginación por clave del listado agrupado (ListadosAgrupadosService)."""
+
+    _listado = CamposGradoTests._listado
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.programa = _crear_programa()
+        n = 0
+        # 5 sedes × 9 grados = 45 grupos; 2 titulares por grupo
+        for sede in ('SEDE A', 'SEDE B', 'SEDE C', 'SEDE D', 'SEDE E'):
+            for grado in range(1, 10):
+                for _ in range(2):
+                    n += 1
+                    self._listado(f'K{n}', f'{grado}-1', programa=self.programa, sede=sede)
+        self.esperado = [(s, str(g)) for s in ('SEDE A', 'SEDE B', 'SEDE C', 'SEDE D', 'SEDE E') for g in range(1, 10)]
+
+    def test_recorrido_adelante_y_atras(self):
+        from .services import ListadosAgrupadosService as S
+
+        filtrados = S.filtrar(self.programa.id)
+        vistos, paginas, cursor = [], [], ''
+        while True:
+            pagina = S.pagina(filtrados, cursor, tamano=20)
+            paginas.append(pagina)
+            vistos += [(f['sede'], f['grado_base']) for f in pagina['items']]
+            if not pagina['has_next']:
+                break
+            cursor = pagina['cursor_siguiente']
+        self.assertEqual(vistos, self.esperado)
+        self.assertEqual([len(p['items']) for p in paginas], [20, 20, 5])
+        self.assertFalse(paginas[0]['has_previous'])
+        self.assertEqual(paginas[0]['items'][0]['total_raciones'], 2)
+
+        # Desde la última página hacia atrás se obtienen las mismas páginas
+        anterior = S.pagina(filtrados, paginas[2]['cursor_anterior'], 'anterior', tamano=20)
+        self.assertEqual(anterior['items'], paginas[1]['items'])
+        self.assertTrue(anterior['has_next'] and anterior['has_previous'])
+        ultima = S.pagina(filtrados, '', 'ultima', tamano=20)
+        self.assertEqual(len(ultima['items']), 20)
+        self.assertEqual(ultima['items'][-1]['sede'], 'SEDE E')
+        self.assertFalse(ultima['has_next'])
+
+        # Cursor inválido: primera página
+        self.assertEqual(S.pagina(filtrados, 'no-es-cursor', tamano=20)['items'], paginas[0]['items'])
+
+    def test_vista_consultas_constantes_y_total_cacheado(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        usuario = User.objects.create_superuser('keyset', 'k@x.com', 'x')
+        self.client.force_login(usuario)
+        url = '/facturacion/lista-listados/'
+        params = {'programa': self.programa.id}
+
+        resp = self.client.get(url, params, secure=True)
+        self.assertEqual(resp.context['total_raciones'], 90)
+        self.assertEqual(resp.context['paginacion']['num_pages'], 3)
+
+        cursor = resp.context['paginacion']['cursor_siguiente']
+        with CaptureQueriesContext(connection) as primera:
+            self.client.get(url, params, secure=True)
+        with CaptureQueriesContext(connection) as segunda:
+            resp = self.client.get(url, {**params, 'cursor': cursor, 'pagina': 2}, secure=True)
+        self.assertEqual(resp.context['paginacion']['number'], 2)
+        self.assertEqual(resp.context['listados'][0]['sede'], 'SEDE C')
+        self.assertEqual(len(primera.captured_queries), len(segunda.captured_queries))
+        sql = ' '.join(q['sql'] for q in segunda.captured_queries)
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT(DISTINCT', sql)  # total servido desde caché
+
+        # Una escritura sobre los listados invalida el total
+        from .cobertura_service import CoberturaSedesService
+        self._listado('K999', '1-1', programa=self.programa, sede='SEDE A')
+        CoberturaSedesService.invalidar(self.programa.id)
+        resp = self.client.get(url, params, secure=True)
+        self.assertEqual(resp.context['total_raciones'], 91)
+
+
+class SincronizacionListadosTests(TestCase):
+    """Recarga incremental por (tipodoc, doc): PersistenceService.sincronizar_listados_focalizacion."""
+
+    def setUp(self):
+        self.programa = _crear_programa()
+
+    def _df(self, filas, focalizacion='F1'):
+        import pandas as pd
+
+        return pd.DataFrame([
+            {'TIPODOC': 'TI', 'DOC': doc, 'NOMBRE1': nombre, 'SEDE': 'SEDE A', 'EDAD': 9,
+             'grado_grupos': grado, 'focalizacion': focalizacion,
+             'COMPLEMENTO ALIMENTARIO PREPARADO AM': 'X'}
+            for doc, nombre, grado in filas
+        ])
+
+    def _ids(self):
+        from .models import ListadosFocalizacion
+
+        return dict(ListadosFocalizacion.objects.values_list('doc', 'id_listados'))
+
+    def test_aplica_solo_diferencias_y_conserva_ids(self):
+        from .models import ListadosFocalizacion
+        from .persistence_service import PersistenceService
+
+        PersistenceService.guardar_listados_focalizacion(
+            self._df([('1', 'ANA', '3-1'), ('2', 'LUIS', '4-1'), ('3', 'EVA', '5-1')]), programa_id=self.programa.id
+        )
+        ids_antes = self._ids()
+
+        resultado = PersistenceService.sincronizar_listados_focalizacion(
+            self._df([('1', 'ANA', '3-1'), ('2', 'LUIS', '5-2'), ('4', 'JUAN', '1-1')]),
+            programa_id=self.programa.id, focalizacion='F1',
+        )
+        self.assertTrue(resultado['success'], resultado.get('error'))
+        self.assertEqual(
+            [resultado[k] for k in ('agregados', 'actualizados', 'eliminados', 'sin_cambios')], [1, 1, 1, 1]
+        )
+        ids = self._ids()
+        self.assertEqual(sorted(ids), ['1', '2', '4'])
+        self.assertEqual(ids['1'], ids_antes['1'])
+        self.assertEqual(ids['2'], ids_antes['2'])
+        luis = ListadosFocalizacion.objects.get(doc='2')
+        self.assertEqual((luis.grado_grupos, luis.grado_base, luis.nivel_educativo), ('5-2', '5', 'primaria_4_5'))
+
+        # Volver a cargar el mismo archivo no cambia nada
+        resultado = PersistenceService.sincronizar_listados_focalizacion(
+            self._df([('1', 'ANA', '3-1'), ('2', 'LUIS', '5-2'), ('4', 'JUAN', '1-1')]),
+            programa_id=self.programa.id, focalizacion='F1',
+        )
+        self.assertEqual(
+            [resultado[k] for k in ('agregados', 'actualizados', 'eliminados', 'sin_cambios')], [0, 0, 0, 3]
+        )
+
+    def test_cambio_de_focalizacion_limitado_a_sedes(self):
+        from .models import ListadosFocalizacion
+        from .persistence_service import PersistenceService
+
+        PersistenceService.guardar_listados_focalizacion(
+            self._df([('1', 'ANA', '3-1'), ('2', 'LUIS', '4-1')]), programa_id=self.programa.id
+        )
+        otra_sede = self._df([('9', 'OTRA', '3-1')])
+        otra_sede['SEDE'] = 'SEDE B'
+        PersistenceService.guardar_listados_focalizacion(otra_sede, programa_id=self.programa.id)
+        id_ana = self._ids()['1']
+
+        resultado = PersistenceService.sincronizar_listados_focalizacion(
+            self._df([('1', 'ANA', '3-1')], focalizacion='F2'),
+            programa_id=self.programa.id, focalizacion='F2', sedes=['SEDE A'], focalizacion_origen='F1',
+        )
+        self.assertEqual([resultado[k] for k in ('agregados', 'actualizados', 'eliminados')], [0, 1, 1])
+        self.assertEqual(
+            sorted(ListadosFocalizacion.objects.values_list('doc', 'focalizacion')), [('1', 'F2'), ('9', 'F1')]
+        )
+        self.assertEqual(self._ids()['1'], id_ana)
+
+
+class MantenimientoListadosTests(TestCase):
+    """Transferir grados, grupos y cambio de complemento en un número fijo de sentencias."""
+
+    _listado = CamposGradoTests._listado
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        SedeEducativaFKTests.setUp(self)  # 'SEDE A' -> S1 (Cali, municipio del programa); 'SEDE B' -> S3
+        self.client.force_login(User.objects.create_superuser('mantenimiento', 'm@x.com', 'x'))
+        # Grado 3 pequeño y grado 5 grande, repartidos en dos subgrupos
+        self._crear_grado('3', 4)
+        self._crear_grado('5', 40)
+
+    def _crear_grado(self, grado, cantidad):
+        for i in range(cantidad):
+            self._listado(f'{grado}-{i}', f'{grado}-{i % 2 + 1}', programa=self.programa,
+                          sede_educativa_id='S1', complemento_alimentario_preparado_am='x')
+
+    def _post(self, url, datos):
+        import json
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post(url, json.dumps(datos), content_type='application/json', secure=True)
+        self.assertTrue(resp.json()['success'], resp.json().get('error'))
+        return resp.json(), len(ctx.captured_queries)
+
+    def _get(self, url, datos):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url, datos, secure=True)
+        self.assertTrue(resp.json()['success'], resp.json().get('error'))
+        return resp.json(), len(ctx.captured_queries)
+
+    def _transferir(self, grado):
+        return self._post('/facturacion/api/transferir-grados/', {
+            'sede_origen': 'SEDE A', 'sede_destino': 'SEDE B',
+            'grados_seleccionados': [grado], 'focalizacion': 'F1',
+        })
+
+    def test_transferir_grados_en_consultas_constantes(self):
+        from .models import ListadosFocalizacion
+
+        pequeno, consultas_pequeno = self._transferir('3')
+        grande, consultas_grande = self._transferir('5')
+        self.assertEqual((pequeno['registros_creados'], grande['registros_creados']), (4, 40))
+        self.assertEqual(consultas_pequeno, consultas_grande)
+
+        movidos = ListadosFocalizacion.objects.filter(sede='SEDE B')
+        self.assertEqual(movidos.count(), 44)
+        self.assertEqual(set(movidos.values_list('sede_educativa_id', flat=True)), {'S3'})
+
+    def test_sedes_con_grados_agrupa_en_una_consulta(self):
+        url = '/facturacion/api/obtener-sedes-con-grados/'
+        params = {'programa_id': self.programa.id, 'focalizacion': 'F1'}
+        datos, antes = self._get(url, params)
+        self.assertEqual(len(datos['sedes']), 1)
+
+        self._transferir('3')
+        datos, despues = self._get(url, params)
+        self.assertEqual(antes, despues)
+        niveles = {s['sede']: s['grados'] for s in datos['sedes']}
+        self.assertEqual(niveles['SEDE B'], [
+            {'nivel': 'Primaria', 'grados': [{'grado': '3', 'descripcion': '4 estudiantes (3-1, 3-2)'}]},
+        ])
+
+    def test_grupos_y_cambio_de_complemento_en_consultas_constantes(self):
+        url_grupos = '/facturacion/api/obtener-grupos-para-sede-grado/'
+        base = {'programa_id': self.programa.id, 'sede': 'SEDE A', 'focalizacion': 'F1'}
+
+        pequeno, consultas_pequeno = self._get(url_grupos, {**base, 'grado': '3'})
+        grande, consultas_grande = self._get(url_grupos, {**base, 'grado': '5'})
+        self.assertEqual(consultas_pequeno, consultas_grande)
+        self.assertEqual(grande['grupos'], [
+            {'grado_grupos': '5-1', 'total': 20, 'complemento_actual': 'am'},
+            {'grado_grupos': '5-2', 'total': 20, 'complemento_actual': 'am'},
+        ])
+
+        url_cambio = '/facturacion/api/cambiar-complemento/'
+        cambio = {**base, 'complemento_nuevo': 'pm'}
+        pequeno, consultas_pequeno = self._post(url_cambio, {**cambio, 'grado': '3'})
+        grande, consultas_grande = self._post(url_cambio, {**cambio, 'grado': '5', 'grupos_exactos': ['5-2']})
+        self.assertEqual((pequeno['total_actualizados'], grande['total_actualizados']), (4, 20))
+        self.assertEqual(consultas_pequeno, consultas_grande)
+
+        grupos, _ = self._get(url_grupos, {**base, 'grado': '5'})
+        self.assertEqual([g['complemento_actual'] for g in grupos['grupos']], ['am', 'pm'])
+
+
+class AsistenciaPDFPlantillaTests(TestCase):
+    """Formato de asistencia con la página y las filas como form XObjects."""
+
+    def _generar(self, estudiantes, usar_plantilla):
+        from io import BytesIO
+        from .pdf_generator import crear_formato_asistencia
+
+        buffer = BytesIO()
+        datos = {
+            'municipio': 'BUGA', 'mes': 'MARZO', 'codigo_complemento': 'CAJMPS',
+            'marcas_asistencia': {estudiantes[0].id_listados: [2, 3]},
+        }
+        crear_formato_asistencia(buffer, datos, estudiantes, usar_plantilla=usar_plantilla)
+        return buffer.getvalue()
+
+    def test_plantilla_reduce_tamano_con_mismas_paginas(self):
+        import random
+        from .management.commands.benchmark_pdf_asistencia import _estudiantes
+
+        estudiantes = _estudiantes(60, random.Random(1))
+
+        completo = self._generar(estudiantes, usar_plantilla=False)
+        plantilla = self._generar(estudiantes, usar_plantilla=True)
+
+        self.assertTrue(plantilla.startswith(b'%PDF'))
+        self.assertEqual(plantilla.count(b'/Type /Page\n'), 3)
+        self.assertEqual(completo.count(b'/Type /Page\n'), 3)
+        self.assertIn(b'/Subtype /Form', plantilla)
+        self.assertLess(len(plantilla), len(completo) / 2)
@@ -26,6 +26,7 @@ urlpatterns = [
     path('generar-asistencia-prediligenciada/', views.generar_pdf_asistencia_prediligenciada, name='generar_pdf_asistencia_prediligenciada'),
     path('api/conteo-estudiantes-por-nivel/', views.api_conteo_estudiantes_por_nivel, name='api_conteo_estudiantes_por_nivel'),
     path('api/get-sedes-completas/', views.api_get_sedes_completas, name='api_get_sedes_completas'),
+    path('api/sedes-faltantes/', views.api_sedes_faltantes, name='api_sedes_faltantes'),
 
     # APIs para gestión de listados focalización
     # Nota: La edición, visualización y eliminación individual se maneja vía archivos Excel
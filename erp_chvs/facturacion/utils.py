@@ -23,12 +23,14 @@ def _mapear_grado_a_nivel_manual(grado):
     except (ValueError, TypeError):
         return None
 
-def _recrear_archivo_desde_sesion(datos_sesion: dict) -> SimpleUploadedFile:
+def _recrear_archivo_desde_sesion(datos_sesion: dict, contenido: bytes = None) -> SimpleUploadedFile:
     """
     Reconstruye un archivo SimpleUploadedFile desde los datos guardados en la sesión.
 
     Args:
         datos_sesion: Diccionario con los datos del archivo de la sesión.
+        contenido: Bytes del archivo (carga temporal). Si no se indica, se usa
+            `archivo_contenido_b64` de la sesión (sesiones anteriores al spool).
 
     Returns:
         SimpleUploadedFile: El archivo reconstruido.
@@ -36,14 +38,15 @@ def _recrear_archivo_desde_sesion(datos_sesion: dict) -> SimpleUploadedFile:
     Raises:
         ValueError: Si faltan datos clave en la sesión.
     """
-    archivo_contenido_b64 = datos_sesion.get('archivo_contenido_b64')
+    if contenido is None and datos_sesion.get('archivo_contenido_b64'):
+        contenido = base64.b64decode(datos_sesion['archivo_contenido_b64'])
     archivo_name = datos_sesion.get('archivo_name')
     archivo_content_type = datos_sesion.get('archivo_content_type')
 
-    if not all([archivo_contenido_b64, archivo_name, archivo_content_type]):
+    if not all([contenido, archivo_name, archivo_content_type]):
         raise ValueError("No se pudo reconstruir el archivo desde la sesión. Faltan datos.")
 
-    return SimpleUploadedFile(archivo_name, base64.b64decode(archivo_contenido_b64), content_type=archivo_content_type)
+    return SimpleUploadedFile(archivo_name, contenido, content_type=archivo_content_type)
 
 def _extraer_grado_base(grado_grupos):
     """
@@ -54,12 +57,10 @@ def _extraer_grado_base(grado_grupos):
 
     grado_str = str(grado_grupos).strip()
 
-    if grado_str.startswith('-') and '--' in grado_str:
-        grado_base = grado_str.split('--')[0]
-        return grado_base
-
+    # Grados negativos (prejardín/jardín): "-1-5", "-1--A" o "-1" -> "-1"
     if grado_str.startswith('-'):
-        return grado_str
+        parte_grado = grado_str[1:].split('-')[0]
+        return f"-{parte_grado}" if parte_grado else grado_str
 
     if '-' in grado_str:
         parte_grado = grado_str.split('-')[0]
@@ -86,8 +87,11 @@ def _determinar_nivel_educativo(grado_grupos):
     Returns:
         String: 'preescolar', 'primaria_1_3', 'primaria_4_5', 'secundaria', o 'media'
     """
-    grado_base = _extraer_grado_base(grado_grupos)
+    return _nivel_desde_grado_base(_extraer_grado_base(grado_grupos))
+
 
+def _nivel_desde_grado_base(grado_base):
+    """Nivel educativo (5 niveles) a partir de un grado base ya extraído."""
     if not grado_base:
         return 'primaria_1_3'  # Default si no se puede determinar
 
@@ -112,4 +116,53 @@ def _determinar_nivel_educativo(grado_grupos):
             return 'primaria_1_3'  # Default
 
     except (ValueError, TypeError):
-        return 'primaria_1_3'  # Default si hay error en la conversión
\ No newline at end of file
+        return 'primaria_1_3'  # Default si hay error en la conversión
+
+def _calcular_campos_grado(grado_grupos):
+    """
+    Campos desnormalizados de grado para ListadosFocalizacion.
+
+    Returns:
+        dict: grado_base (str, '' si no hay grado), grado_orden (int o None si
+        el grado no es numérico) y nivel_educativo (ver _determinar_nivel_educativo).
+    """
+    grado_base = _extraer_grado_base(grado_grupos) or ''
+    try:
+        grado_orden = int(grado_base)
+    except ValueError:
+        grado_orden = None
+    return {
+        'grado_base': grado_base[:20],
+        'grado_orden': grado_orden,
+        'nivel_educativo': _nivel_desde_grado_base(grado_base),
+    }
+
+def _indexar_sedes_por_nombre(filas):
+    """
+    Agrupa sedes del catálogo por nombre.
+
+    Args:
+        filas: iterable de (nombre_sede_educativa, cod_interprise, municipio_id)
+
+    Returns:
+        dict: {nombre: [(cod_interprise, municipio_id), ...]}
+    """
+    indice = {}
+    for nombre, cod_interprise, municipio_id in filas:
+        indice.setdefault(nombre, []).append((cod_interprise, municipio_id))
+    return indice
+
+def _resolver_codigo_sede(indice, nombre, municipio_id=None):
+    """
+    cod_interprise de la sede con ese nombre exacto. Si el nombre se repite en
+    varios municipios se prefiere la del municipio del programa; si aun así
+    queda ambiguo (o no existe) retorna None y la fila queda sin vincular.
+    """
+    candidatas = indice.get(nombre, [])
+    if municipio_id is not None:
+        del_municipio = [cod for cod, municipio in candidatas if municipio == municipio_id]
+        if len(del_municipio) == 1:
+            return del_municipio[0]
+    if len(candidatas) == 1:
+        return candidatas[0][0]
+    return None
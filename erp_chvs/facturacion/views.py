@@ -9,26 +9,33 @@ from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.cache import cache_page
-from django.core.paginator import Paginator
 from django.db import IntegrityError, transaction
-import base64
-import pandas as pd
-from io import StringIO, BytesIO
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from io import BytesIO
+from urllib.parse import urlencode
 import json
 from datetime import datetime
 import os
 from threading import BoundedSemaphore
 
-from .models import ListadosFocalizacion, RectorInstitucion
+from .models import CAMPOS_COMPLEMENTO, NIVELES_EDUCATIVOS, ListadosFocalizacion, RectorInstitucion
 from principal.models import PrincipalDepartamento, PrincipalMunicipio, RegistroActividad
-from .services import ProcesamientoService, ValidacionService, EstadisticasService
+from .services import (
+    ProcesamientoService, ValidacionService, EstadisticasService, ConteoEstudiantesService,
+    ListadosAgrupadosService,
+)
 from .config import ProcesamientoConfig, FOCALIZACIONES_DISPONIBLES, MESES_ATENCION
 from .logging_config import FacturacionLogger
 from planeacion.models import SedesEducativas, Programa
-from .utils import _mapear_grado_a_nivel_manual, _extraer_grado_base, _recrear_archivo_desde_sesion, _determinar_nivel_educativo
+from .utils import _mapear_grado_a_nivel_manual, _recrear_archivo_desde_sesion
 from .persistence_service import PersistenceService
+from .fuzzy_matching import FuzzyMatcher
+from .staging_service import StagingService
+from .cobertura_service import CoberturaSedesService
 from .pdf_generator import crear_formato_asistencia
-from .pdf_service import PDFAsistenciaService
+from .pdf_service import ORDEN_POR_GRADO, PDFAsistenciaService
 import random
 import zipfile
 
@@ -160,8 +167,8 @@ def procesar_listados_view(request):
 
                 # Auto-detectar formato SIMAT Anexo 6A a partir de la firma de columnas
                 try:
-                    df_peek = pd.read_excel(archivo, nrows=0)
-                    cols_peek = set(df_peek.columns.str.strip().str.upper())
+                    encabezados = procesamiento_service.excel_processor.leer_encabezados(archivo)
+                    cols_peek = {c.upper() for c in encabezados}
                     if ProcesamientoConfig.COLUMNAS_FIRMA_SIMAT_6A.issubset(cols_peek):
                         tipo_procesamiento = ProcesamientoConfig.TIPO_PROCESAMIENTO_SIMAT_6A
                     archivo.seek(0)
@@ -188,13 +195,12 @@ def procesar_listados_view(request):
                         f"Archivo: {archivo.name} | Municipio: {municipio} | "
                         f"Focalización: {focalizacion} | Registros: {resultado.get('total_registros', 0)}"
                     )
-                    # Guardar datos en sesión para la etapa 2 (incluir DataFrame procesado)
-                    # Convertir DataFrame a JSON para almacenar en sesión
-                    df_procesado = resultado.get('dataframe')
-                    if df_procesado is not None:
-                        df_json = df_procesado.to_json(orient='records', date_format='iso')
-                    else:
-                        df_json = None
+                    # DataFrame procesado y archivo original van a disco; la sesión
+                    # solo guarda el token de la carga para la etapa 2.
+                    anterior = request.session.get('datos_etapa_1') or {}
+                    if anterior.get('carga_token'):
+                        StagingService.eliminar(anterior['carga_token'])
+                    carga_token = StagingService.guardar(resultado.get('dataframe'), archivo_contenido)
 
                     request.session['datos_etapa_1'] = {
                         'archivo_name': archivo.name,
@@ -203,8 +209,7 @@ def procesar_listados_view(request):
                         'municipio': municipio,
                         'tipo_procesamiento': tipo_procesamiento,
                         'total_registros': resultado.get('total_registros', 0),
-                        'dataframe_procesado_json': df_json,  # DataFrame ya procesado
-                        'archivo_contenido_b64': base64.b64encode(archivo_contenido).decode('utf-8'),  # Solo backup
+                        'carga_token': carga_token,
                         'archivo_content_type': archivo.content_type,
                         'agrupacion_sedes': resultado['agrupacion_sedes'],
                         'fecha_procesamiento': datetime.now().strftime('%d/%m/%Y %H:%M'),
@@ -251,20 +256,23 @@ def procesar_listados_view(request):
                 FacturacionLogger.log_procesamiento_inicio(archivo_name, f"etapa_2_{tipo_procesamiento}", focalizacion)
 
                 # Usar DataFrame ya procesado de la Etapa 1 (sin reprocesar)
-                df_json = datos_etapa_1.get('dataframe_procesado_json')
+                carga_token = datos_etapa_1.get('carga_token')
+                df_procesado = StagingService.cargar_dataframe(carga_token)
 
-                if df_json:
-                    # Debug: Log del DataFrame recuperado
+                if df_procesado is not None:
                     FacturacionLogger.log_procesamiento_inicio(
                         archivo_name, f"recuperando_dataframe_etapa_1", focalizacion
                     )
 
-                    # Reconstruir DataFrame desde JSON (usando StringIO para evitar deprecación)
-                    df_procesado = pd.read_json(StringIO(df_json), orient='records')
-
-                    # Guardar directamente en BD usando el DataFrame procesado
-                    
-                    resultado_persistencia = PersistenceService.guardar_listados_focalizacion(df_procesado, programa_id=programa_id)
+                    # Guardar directamente en BD usando el DataFrame procesado; con
+                    # modo_carga=sincronizar se aplican solo las diferencias contra lo ya
+                    # guardado para el programa y la focalización
+                    if request.POST.get('modo_carga') == 'sincronizar' and programa_id:
+                        resultado_persistencia = PersistenceService.sincronizar_listados_focalizacion(
+                            df_procesado, programa_id=programa_id, focalizacion=focalizacion
+                        )
+                    else:
+                        resultado_persistencia = PersistenceService.guardar_listados_focalizacion(df_procesado, programa_id=programa_id)
 
                     # Crear resultado compatible con el contexto
                     resultado = {
@@ -279,15 +287,18 @@ def procesar_listados_view(request):
                         resultado['advertencia_bd'] = resultado_persistencia.get('error')
                 else:
                     # Fallback: reprocesar si no hay DataFrame (no debería pasar)
-                    FacturacionLogger.log_procesamiento_error(archivo_name, "DataFrame no encontrado en sesión, reprocesando...")
+                    FacturacionLogger.log_procesamiento_error(archivo_name, "DataFrame no encontrado en la carga temporal, reprocesando...")
 
                     try:
-                        archivo_recreado = _recrear_archivo_desde_sesion(datos_etapa_1)
+                        archivo_recreado = _recrear_archivo_desde_sesion(
+                            datos_etapa_1, StagingService.cargar_archivo(carga_token)
+                        )
                     except ValueError as e:
                         contexto['error'] = str(e)
                         # Limpiar sesión para evitar bucles de error
                         if 'datos_etapa_1' in request.session:
                             del request.session['datos_etapa_1']
+                        StagingService.eliminar(carga_token)
                         return render(request, 'facturacion/procesar_listados.html', contexto)
 
                     resultado = procesamiento_service.procesar_y_guardar_excel(
@@ -307,9 +318,10 @@ def procesar_listados_view(request):
                     'archivo_procesado_exitosamente': True
                 })
 
-                # Limpiar sesión después del guardado
+                # Limpiar sesión y carga temporal después del guardado
                 if 'datos_etapa_1' in request.session:
                     del request.session['datos_etapa_1']
+                StagingService.eliminar(carga_token)
 
                 RegistroActividad.registrar(
                     request, 'facturacion', 'guardar_listados',
@@ -320,7 +332,10 @@ def procesar_listados_view(request):
                 )
 
                 # Mensaje de éxito para etapa 2
-                if contexto['registros_guardados_bd'] > 0:
+                persistencia = resultado.get('persistencia') or {}
+                if persistencia.get('modo') == 'sincronizar' and persistencia.get('success'):
+                    contexto['success_message'] = f"🎉 {persistencia['mensaje']}"
+                elif contexto['registros_guardados_bd'] > 0:
                     contexto['success_message'] = f"🎉 ¡Guardado exitoso! Se almacenaron {contexto['registros_guardados_bd']} registros en la base de datos."
                 else:
                     contexto['warning_message'] = "⚠️ No se guardaron registros nuevos. Posiblemente ya existían en la base de datos."
@@ -384,7 +399,9 @@ def validar_archivo_ajax(request):
             })
         
         # Leer y validar estructura
-        df = procesamiento_service.excel_processor.leer_excel(archivo)
+        df = procesamiento_service.excel_processor.leer_excel(
+            archivo, procesamiento_service.excel_processor.columnas_lectura(tipo_procesamiento)
+        )
         
         if tipo_procesamiento == ProcesamientoConfig.TIPO_PROCESAMIENTO_NUEVO:
             es_valido, errores = procesamiento_service.excel_processor.validar_estructura_nuevo_formato(df)
@@ -526,51 +543,29 @@ def lista_listados(request):
     sede_filter = request.GET.get('sede', '').strip()
     focalizacion_filter = request.GET.get('focalizacion', '').strip()
 
-    # Query base con agregación
-    from django.db.models import Count, Max, Func, CharField
-
-    # Función personalizada para extraer el grado base usando regex de PostgreSQL
-    # Ejemplo: "10-1001" -> "10", "-1-1" -> "-1"
-    class ExtractGradoBase(Func):
-        """Extrae el grado base (todo antes del último guión) usando regex de PostgreSQL"""
-        function = 'REGEXP_REPLACE'
-        template = "%(function)s(%(expressions)s, '-[^-]*$', '', 'g')"
-
-        def __init__(self, expression, **extra):
-            super().__init__(expression, output_field=CharField(), **extra)
-
-    listados_grouped = ListadosFocalizacion.objects.annotate(
-        grado_base=ExtractGradoBase('grado_grupos')
-    ).values('sede', 'grado_base', 'programa__programa', 'focalizacion').annotate(
-        total_raciones=Count('id_listados'),
-        ultima_subida=Max('fecha_actualizacion'),
-    ).order_by('sede', 'grado_base')
-
-    # Aplicar filtros a la consulta agrupada
-    if programa_filter_id:
-        listados_grouped = listados_grouped.filter(programa_id=programa_filter_id)
-
-    if sede_filter:
-        listados_grouped = listados_grouped.filter(sede__icontains=sede_filter)
-
-    if focalizacion_filter:
-        listados_grouped = listados_grouped.filter(focalizacion=focalizacion_filter)
-
-    # Calcular total de raciones (beneficiarios) con los filtros aplicados
-    total_raciones_query = ListadosFocalizacion.objects.all()
-    if programa_filter_id:
-        total_raciones_query = total_raciones_query.filter(programa_id=programa_filter_id)
-    if sede_filter:
-        total_raciones_query = total_raciones_query.filter(sede__icontains=sede_filter)
-    if focalizacion_filter:
-        total_raciones_query = total_raciones_query.filter(focalizacion=focalizacion_filter)
+    # Grupos (sede, grado_base, focalización, programa) paginados por clave:
+    # cada página es un LIMIT desde el cursor, sin OFFSET ni COUNT del agrupado
+    filtrados = ListadosAgrupadosService.filtrar(programa_filter_id, sede_filter, focalizacion_filter)
+    direccion = request.GET.get('dir', 'siguiente')
+    pagina = ListadosAgrupadosService.pagina(filtrados, request.GET.get('cursor', ''), direccion)
 
-    total_raciones = total_raciones_query.count()
-
-    # Paginación
-    paginator = Paginator(listados_grouped, 20)  # 20 grupos por página
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Totales cacheados hasta la próxima carga/transferencia/eliminación
+    totales = ListadosAgrupadosService.totales(programa_filter_id, sede_filter, focalizacion_filter)
+    total_raciones = totales['total_raciones']
+    num_paginas = max(1, -(-totales['total_grupos'] // ListadosAgrupadosService.TAMANO_PAGINA))
+    try:
+        numero_pagina = int(request.GET.get('pagina', 1))
+    except ValueError:
+        numero_pagina = 1
+    if direccion == 'ultima':
+        numero_pagina = num_paginas
+    elif not pagina['has_previous']:
+        numero_pagina = 1
+    pagina.update({
+        'number': min(max(numero_pagina, 1), num_paginas),
+        'num_pages': num_paginas,
+        'has_other_pages': pagina['has_next'] or pagina['has_previous'],
+    })
 
     # Obtener valores únicos para filtros
     programas = Programa.objects.all().order_by('municipio__nombre_municipio', 'programa')
@@ -605,54 +600,22 @@ def lista_listados(request):
         try:
             programa_seleccionado = Programa.objects.get(id=programa_filter_id)
             filtros_aplicados['programa_nombre'] = programa_seleccionado.programa
-            etc_filter = programa_seleccionado.municipio.nombre_municipio
 
-            # El resto de la lógica de sedes faltantes funciona con etc_filter
-            sedes_catalogo_etc = set(
-                SedesEducativas.objects.filter(
-                    codigo_ie__id_municipios__nombre_municipio__icontains=etc_filter
-                ).values_list('nombre_sede_educativa', flat=True).distinct()
-            )
-
-            if focalizacion_filter:
-                sedes_con_registros_etc = set(
-                    ListadosFocalizacion.objects.filter(
-                        programa_id=programa_filter_id,
-                        focalizacion=focalizacion_filter
-                    ).values_list('sede', flat=True).distinct()
-                )
-                sedes_sin_registros = list(sedes_catalogo_etc - sedes_con_registros_etc)
-                for sede in sedes_sin_registros:
-                    sedes_faltantes.append({
-                        'sede': sede,
-                        'focalizaciones_faltantes': [focalizacion_filter]
-                    })
-            else:
-                focalizaciones_existentes_programa = set(
-                    ListadosFocalizacion.objects.filter(
-                        programa_id=programa_filter_id
-                    ).values_list('focalizacion', flat=True).distinct()
-                )
-                for sede in sedes_catalogo_etc:
-                    focalizaciones_sede = set(
-                        ListadosFocalizacion.objects.filter(
-                            programa_id=programa_filter_id,
-                            sede=sede
-                        ).values_list('focalizacion', flat=True).distinct()
-                    )
-                    focalizaciones_faltantes = focalizaciones_existentes_programa - focalizaciones_sede
-                    if focalizaciones_faltantes:
-                        sedes_faltantes.append({
-                            'sede': sede,
-                            'focalizaciones_faltantes': sorted(list(focalizaciones_faltantes))
-                        })
-            total_sedes_faltantes = len(sedes_faltantes)
+            # Cobertura (sede × focalización) calculada por conjuntos y cacheada por programa
+            cobertura = CoberturaSedesService.sedes_faltantes(programa_seleccionado.id, focalizacion_filter or None)
+            sedes_faltantes = cobertura['sedes_faltantes']
+            total_sedes_faltantes = cobertura['total_sedes_faltantes']
 
         except Programa.DoesNotExist:
             pass # No hacer nada si el programa no existe
 
     context = {
-        'listados': page_obj,
+        'listados': pagina['items'],
+        'paginacion': pagina,
+        'filtros_querystring': urlencode({
+            clave: valor for clave, valor in filtros_aplicados.items()
+            if clave in ('programa', 'sede', 'focalizacion') and valor
+        }),
         'total_raciones': total_raciones,
         'programas': programas,
         'sede_values': sede_values,
@@ -873,7 +836,7 @@ def descargar_estadisticas_bd_excel(request):
         focalizacion=focalizacion,
     ).values(
         'sede',
-        'grado_grupos',
+        'nivel_educativo',
         'complemento_alimentario_preparado_am',
         'complemento_alimentario_preparado_pm',
         'almuerzo_jornada_unica',
@@ -882,7 +845,7 @@ def descargar_estadisticas_bd_excel(request):
 
     for r in registros:
         sede  = r['sede'] or ''
-        nivel = NIVEL_MAP.get(_determinar_nivel_educativo(r['grado_grupos'] or ''))
+        nivel = NIVEL_MAP.get(r['nivel_educativo'])
 
         modalidades = []
         if (r['complemento_alimentario_preparado_am'] or '').strip().lower() == 'x':
@@ -949,7 +912,6 @@ def descargar_estadisticas_bd_excel(request):
 # 3. Cargar nuevamente el archivo Excel con los datos corregidos
 
 @login_required
-@cache_page(60)
 def api_obtener_sedes_con_grados(request):
     """
     API para obtener sedes disponibles con sus grados para transferencia.
@@ -967,38 +929,24 @@ def api_obtener_sedes_con_grados(request):
                 'error': 'Parámetros incompletos. Se requiere programa_id y focalizacion'
             })
 
-        # Obtener todas las sedes del programa con esa focalización
-        sedes_query = ListadosFocalizacion.objects.filter(
+        # Una consulta agrupada por (sede, grado_base, grado_grupos) para todas las sedes
+        conteos = ListadosFocalizacion.objects.filter(
             programa_id=programa_id,
             focalizacion=focalizacion
-        ).values('sede').distinct()
+        ).exclude(grado_grupos='').exclude(grado_base='').values(
+            'sede', 'grado_base', 'grado_grupos'
+        ).annotate(total=Count('id_listados')).order_by('sede')
 
-        sedes_con_grados = []
+        grados_por_sede = {}
+        for fila in conteos:
+            grados_dict = grados_por_sede.setdefault(fila['sede'], {})
+            info = grados_dict.setdefault(fila['grado_base'], {'count': 0, 'grupos': set()})
+            info['count'] += fila['total']
+            info['grupos'].add(fila['grado_grupos'])
 
-        for sede_data in sedes_query:
-            sede_nombre = sede_data['sede']
-
-            # Obtener grados únicos de esta sede
-            grados_query = ListadosFocalizacion.objects.filter(
-                programa_id=programa_id,
-                focalizacion=focalizacion,
-                sede=sede_nombre
-            ).exclude(grado_grupos__isnull=True).exclude(grado_grupos='')
-
-            # Agrupar por grado base
-            grados_dict = {}
-            for registro in grados_query:
-                grado_base = _extraer_grado_base(registro.grado_grupos)
-                if grado_base:
-                    if grado_base not in grados_dict:
-                        grados_dict[grado_base] = {
-                            'grado': grado_base,
-                            'count': 0,
-                            'grupos': set()
-                        }
-                    grados_dict[grado_base]['count'] += 1
-                    grados_dict[grado_base]['grupos'].add(registro.grado_grupos)
+        sedes_con_grados = []
 
+        for sede_nombre, grados_dict in grados_por_sede.items():
             # Organizar grados por nivel educativo
             niveles = {
                 'Transición': [],
@@ -1082,22 +1030,25 @@ def api_transferir_grados(request):
 
             # Filtrar por grupos exactos (subgrupos como "1A", "1B") o por grado base
             if grupos_exactos:
-                registros_a_copiar = list(query_fuente.filter(grado_grupos__in=grupos_exactos))
+                query_fuente = query_fuente.filter(grado_grupos__in=grupos_exactos)
             else:
-                registros_a_copiar = []
-                for registro in query_fuente:
-                    if registro.grado_grupos:
-                        grado_base = _extraer_grado_base(str(registro.grado_grupos))
-                        if grado_base and grado_base in grados_seleccionados:
-                            registros_a_copiar.append(registro)
-
-            # MOVER registros a la sede destino (no copiar)
-            registros_movidos = 0
+                query_fuente = query_fuente.filter(grado_base__in=grados_seleccionados)
+
+            # MOVER registros a la sede destino (no copiar), con su FK al catálogo,
+            # en un solo UPDATE sin importar cuántos estudiantes tenga el grado
+            programas = dict(Programa.objects.filter(
+                id__in=query_fuente.values('programa_id')
+            ).values_list('id', 'municipio_id'))
+            municipio_id = next(iter(programas.values()), None)
+            codigo_destino = FuzzyMatcher.resolver_codigos_sedes([sede_destino], municipio_id).get(sede_destino)
             with transaction.atomic():
-                for registro in registros_a_copiar:
-                    registro.sede = sede_destino
-                    registro.save()
-                    registros_movidos += 1
+                registros_movidos = query_fuente.update(
+                    sede=sede_destino,
+                    sede_educativa_id=codigo_destino,
+                    fecha_actualizacion=timezone.now(),  # update() no aplica auto_now
+                )
+            for programa_id in programas:
+                CoberturaSedesService.invalidar(programa_id)
 
             detalle_grados = ', '.join(grupos_exactos) if grupos_exactos else ', '.join(grados_seleccionados)
             RegistroActividad.registrar(
@@ -1121,8 +1072,6 @@ def api_obtener_grupos_para_sede_grado(request):
     Devuelve los subgrupos exactos (grado_grupos) disponibles en una sede para un grado base,
     programa y focalización dados. Ej: grado "1" → ["1A", "1B"] con conteos.
     """
-    from django.db.models import Count, Func, CharField
-
     try:
         programa_id = request.GET.get('programa_id')
         sede = request.GET.get('sede')
@@ -1132,45 +1081,38 @@ def api_obtener_grupos_para_sede_grado(request):
         if not all([programa_id, sede, grado, focalizacion]):
             return JsonResponse({'success': False, 'error': 'Parámetros incompletos: programa_id, sede, grado y focalizacion son requeridos'})
 
-        class ExtractGradoBase(Func):
-            function = 'REGEXP_REPLACE'
-            template = "%(function)s(%(expressions)s, '-[^-]*$', '', 'g')"
-            def __init__(self, expression, **extra):
-                super().__init__(expression, output_field=CharField(), **extra)
-
+        # Una fila por subgrupo: el primer registro (por id, como .first()) con el
+        # total del subgrupo, ambos calculados con funciones de ventana
+        por_grupo = Window(Count('id_listados'), partition_by=[F('grado_grupos')])
         grupos = (
             ListadosFocalizacion.objects
-            .filter(programa_id=programa_id, focalizacion=focalizacion, sede=sede)
-            .exclude(grado_grupos__isnull=True).exclude(grado_grupos='')
-            .annotate(grado_base=ExtractGradoBase('grado_grupos'))
-            .filter(grado_base=grado)
-            .values('grado_grupos')
-            .annotate(total=Count('id_listados'))
+            .filter(programa_id=programa_id, focalizacion=focalizacion, sede=sede, grado_base=grado)
+            .exclude(grado_grupos='')
+            .annotate(
+                total=por_grupo,
+                fila=Window(RowNumber(), partition_by=[F('grado_grupos')], order_by=F('id_listados').asc()),
+            )
+            .filter(fila=1)
             .order_by('grado_grupos')
+            .values('grado_grupos', 'total', *CAMPOS_COMPLEMENTO.values())
         )
 
         def _detectar_complemento(registro):
-            if registro and (registro.complemento_alimentario_preparado_am or '').strip().lower() == 'x':
+            if (registro['complemento_alimentario_preparado_am'] or '').strip().lower() == 'x':
                 return 'am'
-            if registro and (registro.complemento_alimentario_preparado_pm or '').strip().lower() == 'x':
+            if (registro['complemento_alimentario_preparado_pm'] or '').strip().lower() == 'x':
                 return 'pm'
-            if registro and (registro.almuerzo_jornada_unica or '').strip().lower() == 'x':
+            if (registro['almuerzo_jornada_unica'] or '').strip().lower() == 'x':
                 return 'almuerzo_ju'
-            if registro and (registro.refuerzo_complemento_am_pm or '').strip().lower() == 'x':
+            if (registro['refuerzo_complemento_am_pm'] or '').strip().lower() == 'x':
                 return 'refuerzo'
             return None
 
-        resultado = []
-        for g in grupos:
-            primer_reg = ListadosFocalizacion.objects.filter(
-                programa_id=programa_id, focalizacion=focalizacion,
-                sede=sede, grado_grupos=g['grado_grupos']
-            ).first()
-            resultado.append({
-                'grado_grupos': g['grado_grupos'],
-                'total': g['total'],
-                'complemento_actual': _detectar_complemento(primer_reg)
-            })
+        resultado = [{
+            'grado_grupos': g['grado_grupos'],
+            'total': g['total'],
+            'complemento_actual': _detectar_complemento(g)
+        } for g in grupos]
 
         return JsonResponse({'success': True, 'grupos': resultado})
 
@@ -1187,8 +1129,6 @@ def api_cambiar_complemento(request):
     Body JSON: {programa_id, sede, grado, focalizacion, complemento_nuevo, grupos_exactos[]}
     grupos_exactos vacío = todos los subgrupos del grado base.
     """
-    from django.db.models import Func, CharField
-
     COMPLEMENTO_MAP = {
         'am': 'complemento_alimentario_preparado_am',
         'pm': 'complemento_alimentario_preparado_pm',
@@ -1214,27 +1154,14 @@ def api_cambiar_complemento(request):
         if complemento_nuevo not in COMPLEMENTO_MAP:
             return JsonResponse({'success': False, 'error': f'Complemento inválido. Opciones: {list(COMPLEMENTO_MAP.keys())}'})
 
-        class ExtractGradoBase(Func):
-            function = 'REGEXP_REPLACE'
-            template = "%(function)s(%(expressions)s, '-[^-]*$', '', 'g')"
-            def __init__(self, expression, **extra):
-                super().__init__(expression, output_field=CharField(), **extra)
-
         base_qs = ListadosFocalizacion.objects.filter(
             programa_id=programa_id, sede=sede, focalizacion=focalizacion
         )
 
         if grupos_exactos:
-            ids = list(base_qs.filter(grado_grupos__in=grupos_exactos).values_list('id_listados', flat=True))
+            registros = base_qs.filter(grado_grupos__in=grupos_exactos)
         else:
-            ids = list(
-                base_qs.annotate(grado_base=ExtractGradoBase('grado_grupos'))
-                .filter(grado_base=grado)
-                .values_list('id_listados', flat=True)
-            )
-
-        if not ids:
-            return JsonResponse({'success': False, 'error': 'No se encontraron registros para actualizar'})
+            registros = base_qs.filter(grado_base=grado)
 
         update_values = {
             'complemento_alimentario_preparado_am': None,
@@ -1242,10 +1169,15 @@ def api_cambiar_complemento(request):
             'almuerzo_jornada_unica': None,
             'refuerzo_complemento_am_pm': None,
             COMPLEMENTO_MAP[complemento_nuevo]: 'x',
+            'fecha_actualizacion': timezone.now(),  # update() no aplica auto_now
         }
 
+        # Un solo UPDATE sobre el queryset (sin traer los ids a Python)
         with transaction.atomic():
-            total_actualizados = ListadosFocalizacion.objects.filter(id_listados__in=ids).update(**update_values)
+            total_actualizados = registros.update(**update_values)
+
+        if not total_actualizados:
+            return JsonResponse({'success': False, 'error': 'No se encontraron registros para actualizar'})
 
         detalle = ', '.join(grupos_exactos) if grupos_exactos else f'Grado {grado} (todos)'
         RegistroActividad.registrar(
@@ -1319,15 +1251,9 @@ def reportes_asistencia_view(request):
             programa_seleccionado = get_object_or_404(Programa, id=programa_id)
             context['filtros_aplicados']['programa'] = programa_seleccionado
 
-            # 1. Obtener las sedes que tienen registros en ListadosFocalizacion para este programa
-            sedes_con_registros_nombres = ListadosFocalizacion.objects \
-                .filter(programa=programa_seleccionado) \
-                .values_list('sede', flat=True).distinct()
-
-            # Obtener los objetos SedesEducativas completos
-            sedes = SedesEducativas.objects.filter(
-                nombre_sede_educativa__in=sedes_con_registros_nombres
-            ).select_related('codigo_ie__id_municipios').order_by('nombre_sede_educativa')
+            # 1. Sedes que tienen registros en ListadosFocalizacion para este programa
+            sedes = ListadosFocalizacion.sedes_con_registros(programa_seleccionado.id) \
+                .select_related('codigo_ie__id_municipios').order_by('nombre_sede_educativa')
             
             context['sedes'] = sedes
 
@@ -1475,6 +1401,10 @@ def get_sedes_for_programa_focalizacion(request):
 def reemplazar_focalizacion_sedes(request):
     """
     Vista para reemplazar la focalización de una o varias sedes de un programa.
+
+    Por defecto (modo=incremental) solo aplica las diferencias entre el archivo
+    y lo guardado, conservando los id_listados; modo=completo elimina y vuelve
+    a insertar todo el tramo.
     """
     try:
         programa_id = request.POST.get('programa')
@@ -1482,17 +1412,19 @@ def reemplazar_focalizacion_sedes(request):
         sedes = request.POST.getlist('sedes')
         focalizacion_nueva = request.POST.get('focalizacion_nueva')
         archivo_excel = request.FILES.get('archivo_excel')
+        modo = request.POST.get('modo', 'incremental')
 
         if not all([programa_id, focalizacion_origen, sedes, focalizacion_nueva, archivo_excel]):
             return JsonResponse({'success': False, 'error': 'Parámetros incompletos'}, status=400)
 
         with transaction.atomic():
-            # 1. Eliminar registros existentes
-            ListadosFocalizacion.objects.filter(
-                programa_id=programa_id,
-                focalizacion=focalizacion_origen,
-                sede__in=sedes
-            ).delete()
+            # 1. Eliminar registros existentes (solo en modo completo)
+            if modo == 'completo':
+                ListadosFocalizacion.objects.filter(
+                    programa_id=programa_id,
+                    focalizacion=focalizacion_origen,
+                    sede__in=sedes
+                ).delete()
 
             # 2. Procesar el nuevo archivo
             programa = Programa.objects.get(id=programa_id)
@@ -1519,11 +1451,20 @@ def reemplazar_focalizacion_sedes(request):
             if not all(sede in sedes for sede in sedes_en_archivo):
                 raise Exception("El archivo contiene sedes que no fueron seleccionadas para el reemplazo.")
 
-            # 4. Guardar nuevos registros
-            resultado_persistencia = PersistenceService.guardar_listados_focalizacion(
-                df_para_guardar,
-                programa_id=programa_id
-            )
+            # 4. Guardar: diferencias contra el tramo guardado, o todo de nuevo
+            if modo == 'completo':
+                resultado_persistencia = PersistenceService.guardar_listados_focalizacion(
+                    df_para_guardar,
+                    programa_id=programa_id
+                )
+            else:
+                resultado_persistencia = PersistenceService.sincronizar_listados_focalizacion(
+                    df_para_guardar,
+                    programa_id=programa_id,
+                    focalizacion=focalizacion_nueva,
+                    sedes=sedes,
+                    focalizacion_origen=focalizacion_origen,
+                )
 
             if not resultado_persistencia['success']:
                 raise Exception(resultado_persistencia['error'])
@@ -1531,9 +1472,15 @@ def reemplazar_focalizacion_sedes(request):
         RegistroActividad.registrar(
             request, 'facturacion', 'reemplazar_focalizacion',
             f"Programa ID: {programa_id} | Sedes: {', '.join(sedes)} | "
-            f"{focalizacion_origen} → {focalizacion_nueva}"
+            f"{focalizacion_origen} → {focalizacion_nueva} | {resultado_persistencia['mensaje']}"
         )
-        return JsonResponse({'success': True, 'message': 'Focalización reemplazada exitosamente'})
+        return JsonResponse({
+            'success': True,
+            'message': f"Focalización reemplazada exitosamente. {resultado_persistencia['mensaje']}",
+            'agregados': resultado_persistencia.get('agregados', resultado_persistencia['registros_guardados']),
+            'actualizados': resultado_persistencia.get('actualizados', 0),
+            'eliminados': resultado_persistencia.get('eliminados', 0),
+        })
 
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
@@ -1569,23 +1516,15 @@ def api_get_sedes_completas(request):
                 'error': 'Programa no encontrado'
             }, status=404)
 
-        # Obtener sedes que tienen registros en ListadosFocalizacion para este programa
-        sedes_con_registros_nombres = ListadosFocalizacion.objects.filter(
-            programa=programa_obj
-        ).values_list('sede', flat=True).distinct()
-
-        # Obtener los objetos SedesEducativas completos
-        sedes = SedesEducativas.objects.filter(
-            nombre_sede_educativa__in=sedes_con_registros_nombres
-        ).select_related('codigo_ie__id_municipios').order_by('nombre_sede_educativa')
+        # Sedes que tienen registros en ListadosFocalizacion para este programa
+        sedes = ListadosFocalizacion.sedes_con_registros(programa_obj.id) \
+            .order_by('nombre_sede_educativa').values('nombre_sede_educativa', 'cod_interprise')
 
         # Construir respuesta
-        sedes_data = []
-        for sede in sedes:
-            sedes_data.append({
-                'nombre': sede.nombre_sede_educativa,
-                'cod_interprise': sede.cod_interprise
-            })
+        sedes_data = [
+            {'nombre': sede['nombre_sede_educativa'], 'cod_interprise': sede['cod_interprise']}
+            for sede in sedes
+        ]
 
         return JsonResponse({
             'success': True,
@@ -1603,17 +1542,55 @@ def api_get_sedes_completas(request):
 
 @login_required
 @require_http_methods(["GET"])
-@cache_page(60)
+def api_sedes_faltantes(request):
+    """
+    API con las sedes del catálogo del municipio del programa que no tienen
+    listados en alguna focalización (CoberturaSedesService, cacheado).
+
+    Parámetros GET: programa_id (requerido) y focalizacion (opcional; sin ella
+    se evalúan todas las focalizaciones cargadas del programa).
+
+    Returns:
+        JsonResponse con sedes_faltantes [{sede, cod_interprise,
+        focalizaciones_faltantes}], total_sedes_faltantes y focalizaciones_programa.
+    """
+    programa_id = request.GET.get('programa_id', '').strip()
+    focalizacion = request.GET.get('focalizacion', '').strip() or None
+
+    if not programa_id.isdigit():
+        return JsonResponse({
+            'success': False,
+            'error': 'Falta el parámetro programa_id'
+        }, status=400)
+
+    try:
+        cobertura = CoberturaSedesService.sedes_faltantes(int(programa_id), focalizacion)
+        return JsonResponse({'success': True, **cobertura})
+
+    except Exception as e:
+        FacturacionLogger.log_procesamiento_error(
+            "api_sedes_faltantes", str(e)
+        )
+        return JsonResponse({
+            'success': False,
+            'error': f'Error al calcular sedes faltantes: {str(e)}'
+        }, status=500)
+
+@login_required
+@require_http_methods(["GET"])
 def api_conteo_estudiantes_por_nivel(request):
     """
-    API para obtener el conteo de estudiantes agrupados por nivel educativo
-    para una sede, programa, focalización y complemento específicos.
+    API para obtener el conteo de estudiantes por nivel educativo × complemento
+    (ConteoEstudiantesService, una consulta agregada).
+
+    Parámetros GET: programa_id y focalizacion (requeridos); sede_nombre y
+    complemento (opcionales).
 
     Returns:
         JsonResponse con:
-        - total: Total de estudiantes
-        - por_nivel: Dict con conteos por nivel (transicion, primaria, secundaria, media)
-        - por_complemento: Dict con conteos por tipo de complemento
+        - Con sede_nombre y complemento: total, por_nivel y complemento.
+        - En otro caso: sedes = {sede: {complemento: {total, por_nivel}}}
+          para la sede indicada o para todas las sedes del programa.
     """
     try:
         programa_id = request.GET.get('programa_id')
@@ -1621,45 +1598,32 @@ def api_conteo_estudiantes_por_nivel(request):
         focalizacion = request.GET.get('focalizacion')
         complemento = request.GET.get('complemento')  # "CAP AM", "CAP PM", "Almuerzo JU", "Refuerzo"
 
-        if not all([programa_id, sede_nombre, focalizacion, complemento]):
+        if not all([programa_id, focalizacion]):
             return JsonResponse({
                 'success': False,
                 'error': 'Parámetros incompletos'
             }, status=400)
 
-        # Obtener estudiantes de la sede con el complemento específico
-        estudiantes = ListadosFocalizacion.objects.filter(
-            programa_id=programa_id,
-            sede=sede_nombre,
-            focalizacion=focalizacion
-        )
+        if complemento and complemento not in CAMPOS_COMPLEMENTO:
+            return JsonResponse({
+                'success': False,
+                'error': f'Complemento inválido. Opciones: {list(CAMPOS_COMPLEMENTO)}'
+            }, status=400)
 
-        # Filtrar por complemento activo
-        estudiantes_con_complemento = []
-        for est in estudiantes:
-            if complemento in est.complementos_activos:
-                estudiantes_con_complemento.append(est)
-
-        # Agrupar por nivel educativo (5 niveles)
-        conteo_por_nivel = {
-            'preescolar': 0,
-            'primaria_1_3': 0,
-            'primaria_4_5': 0,
-            'secundaria': 0,
-            'media': 0
-        }
+        matriz = ConteoEstudiantesService.matriz_por_sede(programa_id, focalizacion, sede_nombre or None)
 
-        for est in estudiantes_con_complemento:
-            nivel = _determinar_nivel_educativo(est.grado_grupos)
-            if nivel in conteo_por_nivel:
-                conteo_por_nivel[nivel] += 1
+        if sede_nombre and complemento:
+            conteo = matriz.get(sede_nombre, {}).get(complemento) or {
+                'total': 0, 'por_nivel': {clave: 0 for clave, _ in NIVELES_EDUCATIVOS}
+            }
+            return JsonResponse({
+                'success': True,
+                'total': conteo['total'],
+                'por_nivel': conteo['por_nivel'],
+                'complemento': complemento
+            })
 
-        return JsonResponse({
-            'success': True,
-            'total': len(estudiantes_con_complemento),
-            'por_nivel': conteo_por_nivel,
-            'complemento': complemento
-        })
+        return JsonResponse({'success': True, 'sedes': matriz})
 
     except Exception as e:
         FacturacionLogger.log_procesamiento_error(
@@ -1717,35 +1681,26 @@ def generar_pdf_asistencia_prediligenciada(request):
             cod_interprise=sede_cod_interprise
         )
 
-        # Obtener estudiantes de la sede con el complemento específico
-        estudiantes_sede = ListadosFocalizacion.objects.filter(
+        if complemento not in CAMPOS_COMPLEMENTO:
+            return JsonResponse({
+                'success': False,
+                'error': f'Complemento inválido. Opciones: {list(CAMPOS_COMPLEMENTO)}'
+            }, status=400)
+
+        # Estudiantes de la sede con el complemento activo, ordenados por grado en SQL
+        estudiantes_ordenados = list(ListadosFocalizacion.objects.filter(
+            ListadosFocalizacion.q_complemento_activo(complemento),
             programa=programa_obj,
             sede=sede_nombre,
             focalizacion=focalizacion
-        ).order_by('apellido1', 'apellido2', 'nombre1')
-
-        # Filtrar solo estudiantes con el complemento activo
-        estudiantes_con_complemento = []
-        for est in estudiantes_sede:
-            if complemento in est.complementos_activos:
-                estudiantes_con_complemento.append(est)
+        ).order_by(*ORDEN_POR_GRADO))
 
-        if not estudiantes_con_complemento:
+        if not estudiantes_ordenados:
             return HttpResponse(
                 f"No se encontraron estudiantes con el complemento '{complemento}' en la sede {sede_nombre}",
                 status=404
             )
 
-        # Ordenar por grado
-        def clave_ordenamiento_grado(estudiante):
-            grado_base_str = _extraer_grado_base(estudiante.grado_grupos)
-            try:
-                return int(grado_base_str)
-            except (ValueError, TypeError):
-                return float('inf')
-
-        estudiantes_ordenados = sorted(estudiantes_con_complemento, key=clave_ordenamiento_grado)
-
         # Agrupar estudiantes por nivel educativo (5 niveles)
         estudiantes_por_nivel = {
             'preescolar': [],
@@ -1756,9 +1711,8 @@ def generar_pdf_asistencia_prediligenciada(request):
         }
 
         for est in estudiantes_ordenados:
-            nivel = _determinar_nivel_educativo(est.grado_grupos)
-            if nivel in estudiantes_por_nivel:
-                estudiantes_por_nivel[nivel].append(est)
+            if est.nivel_educativo in estudiantes_por_nivel:
+                estudiantes_por_nivel[est.nivel_educativo].append(est)
 
         # Generar marcas de asistencia aleatorias según configuración
         marcas_asistencia = {}  # {id_listados: [dias_marcados]}
@@ -1919,7 +1873,7 @@ def api_obtener_sedes_con_grado_especifico(request):
     Usado en el modal de transferencia específica (desde tabla).
     Retorna solo las sedes que tienen registros para un programa, grado y focalización específicos.
     """
-    from django.db.models import Count, Func, CharField
+    from django.db.models import Count
 
     try:
         programa_id = request.GET.get('programa_id')
@@ -1932,22 +1886,10 @@ def api_obtener_sedes_con_grado_especifico(request):
                 'error': 'Parámetros incompletos. Se requiere programa_id, grado y focalizacion'
             })
 
-        # Función personalizada para extraer el grado base usando regex de PostgreSQL
-        class ExtractGradoBase(Func):
-            """Extrae el grado base (todo antes del último guión) usando regex de PostgreSQL"""
-            function = 'REGEXP_REPLACE'
-            template = "%(function)s(%(expressions)s, '-[^-]*$', '', 'g')"
-
-            def __init__(self, expression, **extra):
-                super().__init__(expression, output_field=CharField(), **extra)
-
         # Obtener sedes que tienen este grado específico
         sedes_query = ListadosFocalizacion.objects.filter(
             programa_id=programa_id,
-            focalizacion=focalizacion
-        ).annotate(
-            grado_base=ExtractGradoBase('grado_grupos')
-        ).filter(
+            focalizacion=focalizacion,
             grado_base=grado
         ).values('sede').annotate(
             total_estudiantes=Count('id_listados')
@@ -2142,6 +2084,7 @@ def api_eliminar_carga_listados(request):
             programa_id=programa_id,
             focalizacion=focalizacion
         ).delete()
+        CoberturaSedesService.invalidar(programa_id)
 
         RegistroActividad.registrar(
             request, 'facturacion', 'eliminar_carga',
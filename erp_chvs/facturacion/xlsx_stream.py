@@ -0,0 +1,186 @@
+"""
+Lectura por streaming de la primera hoja de un .xlsx.
+
+openpyxl (incluso en modo read-only) construye un objeto por cada celda y
+recorre la hoja dos veces para calcular dimensiones; con anexos SIMAT de
+60 columnas y decenas de miles de filas eso domina el tiempo de carga.
+Aquí se recorre el XML de la hoja una sola vez con iterparse y solo se
+convierten las celdas de las columnas pedidas. Los formatos de fecha y la
+conversión de seriales se delegan en las utilidades de openpyxl.
+"""
+
+import posixpath
+import zipfile
+from typing import Callable, Iterable, List, Optional, Tuple
+from xml.etree.ElementTree import iterparse
+
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils.cell import column_index_from_string
+from openpyxl.utils.datetime import MAC_EPOCH, WINDOWS_EPOCH, from_excel, from_ISO8601
+
+_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_NS_PKG_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+_ROW = f'{_NS}row'
+_C = f'{_NS}c'
+_V = f'{_NS}v'
+_T = f'{_NS}t'
+_IS = f'{_NS}is'
+_SI = f'{_NS}si'
+
+
+def _ruta_primera_hoja(zf: zipfile.ZipFile) -> str:
+    """Ruta dentro del zip de la primera hoja declarada en workbook.xml."""
+    with zf.open('xl/workbook.xml') as fh:
+        rel_id = None
+        for _, elem in iterparse(fh):
+            if elem.tag == f'{_NS}sheet':
+                rel_id = elem.get(f'{_NS_REL}id')
+                break
+    with zf.open('xl/_rels/workbook.xml.rels') as fh:
+        for _, elem in iterparse(fh):
+            if elem.tag == f'{_NS_PKG_REL}Relationship' and elem.get('Id') == rel_id:
+                destino = elem.get('Target')
+                if destino.startswith('/'):
+                    return destino.lstrip('/')
+                return posixpath.normpath(posixpath.join('xl', destino))
+    return 'xl/worksheets/sheet1.xml'
+
+
+def _texto(elem) -> str:
+    """Texto de un <si>/<is>, concatenando los runs con formato (<r><t>)."""
+    return ''.join(t.text or '' for t in elem.iter(_T))
+
+
+def _cadenas_compartidas(zf: zipfile.ZipFile) -> List[str]:
+    if 'xl/sharedStrings.xml' not in zf.namelist():
+        return []
+    cadenas = []
+    with zf.open('xl/sharedStrings.xml') as fh:
+        for _, elem in iterparse(fh):
+            if elem.tag == _SI:
+                cadenas.append(_texto(elem))
+                elem.clear()
+    return cadenas
+
+
+def _estilos_fecha(zf: zipfile.ZipFile) -> set:
+    """Índices de cellXfs cuyo formato numérico es de fecha/hora."""
+    if 'xl/styles.xml' not in zf.namelist():
+        return set()
+    formatos = dict(BUILTIN_FORMATS)
+    fechas = set()
+    with zf.open('xl/styles.xml') as fh:
+        en_cell_xfs = False
+        indice = 0
+        for evento, elem in iterparse(fh, events=('start', 'end')):
+            if elem.tag == f'{_NS}numFmt' and evento == 'end':
+                formatos[int(elem.get('numFmtId'))] = elem.get('formatCode', '')
+            elif elem.tag == f'{_NS}cellXfs':
+                en_cell_xfs = evento == 'start'
+            elif elem.tag == f'{_NS}xf' and en_cell_xfs and evento == 'end':
+                if is_date_format(formatos.get(int(elem.get('numFmtId', 0)), '')):
+                    fechas.add(indice)
+                indice += 1
+    return fechas
+
+
+def _valor_numerico(texto: str):
+    if '.' in texto or 'E' in texto or 'e' in texto:
+        valor = float(texto)
+        return int(valor) if valor.is_integer() else valor  # Igual que pandas: 3.0 -> 3
+    return int(texto)
+
+
+def leer_hoja(
+    archivo,
+    seleccionar: Callable[[List], Iterable[int]],
+) -> Tuple[List, List[List]]:
+    """
+    Lee la primera hoja. `seleccionar` recibe la fila de encabezado (lista de
+    valores) y retorna los índices de columna a conservar.
+
+    Retorna (encabezado completo, filas) donde cada fila solo trae las columnas
+    seleccionadas, en ese orden. Celdas vacías -> None; las filas sin datos
+    en las columnas seleccionadas se omiten.
+    """
+    with zipfile.ZipFile(archivo) as zf:
+        ruta = _ruta_primera_hoja(zf)
+        compartidas = _cadenas_compartidas(zf)
+        estilos_fecha = _estilos_fecha(zf)
+        epoch = WINDOWS_EPOCH
+        with zf.open('xl/workbook.xml') as fh:
+            for _, elem in iterparse(fh):
+                if elem.tag == f'{_NS}workbookPr':
+                    if elem.get('date1904') in ('1', 'true'):
+                        epoch = MAC_EPOCH
+                    break
+
+        cache_columnas = {}
+        encabezado: Optional[List] = None
+        posiciones = {}
+        filas = []
+
+        with zf.open(ruta) as fh:
+            contexto = iterparse(fh, events=('end',))
+            for _, elem in contexto:
+                if elem.tag != _ROW:
+                    continue
+
+                es_encabezado = encabezado is None
+                valores = {} if es_encabezado else [None] * len(posiciones)
+                siguiente = 0
+                for c in elem.iter(_C):
+                    ref = c.get('r')
+                    if ref:
+                        letras = ref.rstrip('0123456789')
+                        col = cache_columnas.get(letras)
+                        if col is None:
+                            col = cache_columnas[letras] = column_index_from_string(letras) - 1
+                    else:
+                        col = siguiente
+                    siguiente = col + 1
+
+                    if not es_encabezado:
+                        pos = posiciones.get(col)
+                        if pos is None:
+                            continue  # Columna no pedida: no se convierte
+
+                    tipo = c.get('t', 'n')
+                    if tipo == 'inlineStr':
+                        nodo = c.find(_IS)
+                        valor = _texto(nodo) if nodo is not None else None
+                    else:
+                        v = c.find(_V)
+                        if v is None or v.text is None:
+                            valor = None
+                        elif tipo == 's':
+                            valor = compartidas[int(v.text)]
+                        elif tipo == 'n':
+                            valor = _valor_numerico(v.text)
+                            if estilos_fecha and c.get('s') and int(c.get('s')) in estilos_fecha:
+                                valor = from_excel(valor, epoch)
+                        elif tipo == 'b':
+                            valor = v.text == '1'
+                        elif tipo == 'd':
+                            valor = from_ISO8601(v.text)
+                        elif tipo == 'e':
+                            valor = None
+                        else:  # 'str' (resultado de fórmula)
+                            valor = v.text
+
+                    if es_encabezado:
+                        valores[col] = valor
+                    else:
+                        valores[pos] = valor
+                elem.clear()
+
+                if es_encabezado:
+                    ancho = max(valores) + 1 if valores else 0
+                    encabezado = [valores.get(i) for i in range(ancho)]
+                    posiciones = {col: pos for pos, col in enumerate(seleccionar(encabezado))}
+                elif any(v is not None and v != '' for v in valores):
+                    filas.append(valores)
+
+    return encabezado or [], filas
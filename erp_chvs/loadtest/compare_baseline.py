@@ -0,0 +1,194 @@
+"""
+Compara los percentiles de una corrida de Locust contra una línea base guardada.
+
+Lee el archivo `<prefijo>_stats.csv` que genera Locust con `--csv` y compara
+p50/p95/p99 por endpoint contra `loadtest/baselines/<suite>.json`. Sale con
+código 1 si algún endpoint empeora más allá de la tolerancia.
+
+Uso (desde erp_chvs/):
+    python loadtest/compare_baseline.py loadtest/reports/local/core_stats.csv --suite core
+    python loadtest/compare_baseline.py loadtest/reports/local/core_stats.csv --suite core --actualizar
+"""
+
+import argparse
+import csv
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+BASELINES_DIR = Path(__file__).resolve().parent / "baselines"
+
+PERCENTILES = {
+    "p50": "50%",
+    "p95": "95%",
+    "p99": "99%",
+}
+
+DEFAULT_TOLERANCIA = 0.20
+DEFAULT_MIN_DELTA_MS = 25.0
+DEFAULT_MAX_DELTA_ERROR = 0.01
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def leer_stats_locust(path: Path) -> Dict[str, Dict]:
+    """Convierte el `_stats.csv` de Locust en {nombre_endpoint: métricas}."""
+    endpoints = {}
+    with open(path, newline="", encoding="utf-8") as fh:
+        for row in csv.DictReader(fh):
+            nombre = row.get("Name") or ""
+            if not nombre:
+                continue
+            requests_count = int(_to_float(row.get("Request Count")))
+            failures = int(_to_float(row.get("Failure Count")))
+            metricas = {key: _to_float(row.get(col)) for key, col in PERCENTILES.items()}
+            metricas["requests"] = requests_count
+            metricas["error_rate"] = (failures / requests_count) if requests_count else 0.0
+            endpoints[nombre] = metricas
+    return endpoints
+
+
+def cargar_baseline(suite: str, baselines_dir: Path = BASELINES_DIR) -> Dict:
+    path = baselines_dir / f"{suite}.json"
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def guardar_baseline(suite: str, endpoints: Dict[str, Dict], baselines_dir: Path = BASELINES_DIR) -> Path:
+    baselines_dir.mkdir(parents=True, exist_ok=True)
+    path = baselines_dir / f"{suite}.json"
+    payload = {
+        "suite": suite,
+        "generado": datetime.now().isoformat(timespec="seconds"),
+        "endpoints": endpoints,
+    }
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(payload, fh, indent=2, sort_keys=True, ensure_ascii=False)
+        fh.write("\n")
+    return path
+
+
+def comparar(
+    actual: Dict[str, Dict],
+    baseline: Dict[str, Dict],
+    tolerancia: float = DEFAULT_TOLERANCIA,
+    min_delta_ms: float = DEFAULT_MIN_DELTA_MS,
+    max_delta_error: float = DEFAULT_MAX_DELTA_ERROR,
+) -> List[Dict]:
+    """
+    Retorna la lista de regresiones encontradas.
+
+    Un percentil es regresión si supera la base en más de `tolerancia` (relativo)
+    y además en más de `min_delta_ms` (absoluto), para no fallar por ruido en
+    endpoints de pocos milisegundos.
+    """
+    regresiones = []
+    for nombre, base in baseline.items():
+        metricas = actual.get(nombre)
+        if not metricas or not metricas.get("requests"):
+            continue
+        for key in PERCENTILES:
+            valor_base = base.get(key, 0.0)
+            valor_actual = metricas.get(key, 0.0)
+            if valor_base <= 0:
+                continue
+            delta = valor_actual - valor_base
+            if delta > min_delta_ms and valor_actual > valor_base * (1 + tolerancia):
+                regresiones.append({
+                    "endpoint": nombre,
+                    "metrica": key,
+                    "base": valor_base,
+                    "actual": valor_actual,
+                    "variacion": delta / valor_base,
+                })
+        delta_error = metricas.get("error_rate", 0.0) - base.get("error_rate", 0.0)
+        if delta_error > max_delta_error:
+            regresiones.append({
+                "endpoint": nombre,
+                "metrica": "error_rate",
+                "base": base.get("error_rate", 0.0),
+                "actual": metricas.get("error_rate", 0.0),
+                "variacion": delta_error,
+            })
+    return regresiones
+
+
+def imprimir_reporte(suite: str, actual: Dict[str, Dict], baseline: Dict[str, Dict], regresiones: List[Dict]) -> None:
+    print(f"== Suite {suite}: {len(actual)} endpoints medidos, {len(baseline)} en línea base")
+    print(f"{'endpoint':45} {'p50':>14} {'p95':>14} {'p99':>14}")
+    for nombre in sorted(actual):
+        base = baseline.get(nombre, {})
+        celdas = []
+        for key in PERCENTILES:
+            valor = actual[nombre].get(key, 0.0)
+            if base.get(key):
+                celdas.append(f"{valor:6.0f}/{base[key]:<6.0f}")
+            else:
+                celdas.append(f"{valor:6.0f}/{'-':<6}")
+        print(f"{nombre[:45]:45} {celdas[0]:>14} {celdas[1]:>14} {celdas[2]:>14}")
+
+    nuevos = sorted(set(actual) - set(baseline))
+    if baseline and nuevos:
+        print(f"Endpoints sin línea base: {', '.join(nuevos)}")
+
+    if regresiones:
+        print(f"\n{len(regresiones)} regresión(es):")
+        for reg in regresiones:
+            print(
+                f"  - {reg['endpoint']} {reg['metrica']}: "
+                f"{reg['base']:.3f} -> {reg['actual']:.3f} ({reg['variacion']:+.0%})"
+            )
+    else:
+        print("\nSin regresiones.")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compara p50/p95/p99 de Locust contra una línea base.")
+    parser.add_argument("stats_csv", type=Path, help="Archivo <prefijo>_stats.csv generado por Locust.")
+    parser.add_argument("--suite", required=True, help="Nombre de la suite (core, heavy, ...).")
+    parser.add_argument("--baselines-dir", type=Path, default=BASELINES_DIR)
+    parser.add_argument("--tolerancia", type=float, default=DEFAULT_TOLERANCIA,
+                        help="Empeoramiento relativo permitido (default: 0.20 = 20%%).")
+    parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS,
+                        help="Empeoramiento absoluto mínimo para contar como regresión (default: 25ms).")
+    parser.add_argument("--actualizar", action="store_true",
+                        help="Guarda la corrida actual como nueva línea base.")
+    args = parser.parse_args(argv)
+
+    actual = leer_stats_locust(args.stats_csv)
+    if not actual:
+        print(f"No hay métricas en {args.stats_csv}", file=sys.stderr)
+        return 2
+
+    if args.actualizar:
+        path = guardar_baseline(args.suite, actual, args.baselines_dir)
+        print(f"Línea base actualizada: {path}")
+        return 0
+
+    baseline = cargar_baseline(args.suite, args.baselines_dir).get("endpoints", {})
+    if not baseline:
+        path = guardar_baseline(args.suite, actual, args.baselines_dir)
+        print(f"No existía línea base para '{args.suite}'; se creó {path}")
+        return 0
+
+    regresiones = comparar(
+        actual,
+        baseline,
+        tolerancia=args.tolerancia,
+        min_delta_ms=args.min_delta_ms,
+    )
+    imprimir_reporte(args.suite, actual, baseline, regresiones)
+    return 1 if regresiones else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
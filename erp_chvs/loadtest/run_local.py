@@ -0,0 +1,172 @@
+"""
+Suite de rendimiento offline: levanta el ERP en local contra una BD sembrada,
+corre las suites Locust en modo headless y compara contra la línea base.
+
+Pasos:
+1. (opcional) `migrate` + `sembrar_datos_carga` sobre la BD configurada.
+2. Arranca `manage.py runserver --noreload` (o gunicorn) en 127.0.0.1.
+3. Ejecuta Locust por suite (`core`, `heavy`) con el usuario sembrado.
+4. Compara p50/p95/p99 con `loadtest/baselines/<suite>.json`.
+
+Sale con código 1 si alguna suite presenta regresiones.
+
+Uso (desde erp_chvs/):
+    python loadtest/run_local.py --sembrar
+    python loadtest/run_local.py --suites core --usuarios 20 --duracion 2m
+    python loadtest/run_local.py --suites core heavy --actualizar-baseline
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+LOADTEST_DIR = Path(__file__).resolve().parent
+PROJECT_DIR = LOADTEST_DIR.parent
+
+sys.path.insert(0, str(LOADTEST_DIR))
+import compare_baseline  # noqa: E402
+
+SUITES = {
+    # suite: (usuarios, spawn rate, duración)
+    "core": (20, 5, "2m"),
+    "heavy": (3, 1, "2m"),
+}
+
+
+def _manage(*args, env=None):
+    cmd = [sys.executable, str(PROJECT_DIR / "manage.py"), *args]
+    print(f"$ {' '.join(cmd[1:])}")
+    subprocess.run(cmd, cwd=PROJECT_DIR, env=env, check=True)
+
+
+def _arrancar_servidor(port: int, servidor: str, env) -> subprocess.Popen:
+    if servidor == "gunicorn":
+        cmd = [
+            sys.executable, "-m", "gunicorn", "erp_chvs.wsgi:application",
+            "--bind", f"127.0.0.1:{port}", "--workers", "3", "--timeout", "120",
+        ]
+    else:
+        cmd = [sys.executable, "manage.py", "runserver", f"127.0.0.1:{port}", "--noreload"]
+    print(f"$ {' '.join(cmd[1:])}")
+    return subprocess.Popen(cmd, cwd=PROJECT_DIR, env=env)
+
+
+def _esperar_servidor(host: str, proceso: subprocess.Popen, timeout: float = 60.0) -> None:
+    limite = time.monotonic() + timeout
+    url = f"{host}/accounts/login/"
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"El servidor terminó antes de estar listo (código {proceso.returncode}).")
+        try:
+            with urllib.request.urlopen(url, timeout=2) as resp:
+                if resp.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError, TimeoutError):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"El servidor no respondió en {timeout:.0f}s ({url}).")
+
+
+def _correr_suite(suite: str, host: str, run_dir: Path, usuarios: int, spawn: int, duracion: str, env) -> Path:
+    prefijo = run_dir / suite
+    suite_env = dict(env, LT_SUITE=suite)
+    cmd = [
+        sys.executable, "-m", "locust",
+        "-f", str(LOADTEST_DIR / "locustfile.py"),
+        "--headless",
+        "--host", host,
+        "-u", str(usuarios),
+        "-r", str(spawn),
+        "--run-time", duracion,
+        "--tags", suite,
+        "--only-summary",
+        "--html", f"{prefijo}.html",
+        "--csv", str(prefijo),
+    ]
+    print(f"==> Suite {suite} (users={usuarios}, runtime={duracion})")
+    # Locust sale con 1 si hubo fallos de requests; el veredicto lo da la comparación.
+    subprocess.run(cmd, cwd=PROJECT_DIR, env=suite_env, check=False)
+    return Path(f"{prefijo}_stats.csv")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Pruebas de carga locales contra una BD sembrada.")
+    parser.add_argument("--suites", nargs="+", default=list(SUITES), choices=list(SUITES))
+    parser.add_argument("--port", type=int, default=int(os.getenv("LT_LOCAL_PORT", "8765")))
+    parser.add_argument("--servidor", choices=["runserver", "gunicorn"], default="runserver")
+    parser.add_argument("--usuarios", type=int, default=None, help="Sobrescribe los usuarios de cada suite.")
+    parser.add_argument("--duracion", type=str, default=None, help="Sobrescribe la duración (ej: 90s, 3m).")
+    parser.add_argument("--sembrar", action="store_true", help="Corre migrate + sembrar_datos_carga antes.")
+    parser.add_argument("--listados", type=int, default=100_000, help="Listados a sembrar (con --sembrar).")
+    parser.add_argument("--tolerancia", type=float, default=compare_baseline.DEFAULT_TOLERANCIA)
+    parser.add_argument("--actualizar-baseline", action="store_true",
+                        help="Guarda esta corrida como línea base en lugar de comparar.")
+    parser.add_argument("--out-dir", type=Path, default=LOADTEST_DIR / "reports" / "local")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ)
+    env.setdefault("LT_USER", "loadtest")
+    env.setdefault("LT_PASSWORD", "loadtest-local")
+    env.setdefault("LT_VERIFY_SSL", "false")
+    # Con DEBUG=False el ERP fuerza HTTPS y cookies seguras; en local se sirve por HTTP.
+    env.setdefault("DJANGO_DEBUG", "True")
+
+    if args.sembrar:
+        _manage("migrate", "--noinput", env=env)
+        _manage(
+            "sembrar_datos_carga",
+            "--listados", str(args.listados),
+            "--usuario", env["LT_USER"],
+            "--password", env["LT_PASSWORD"],
+            env=env,
+        )
+
+    run_dir = args.out_dir / datetime.now().strftime("%Y%m%d-%H%M%S")
+    run_dir.mkdir(parents=True, exist_ok=True)
+    host = f"http://127.0.0.1:{args.port}"
+
+    proceso = _arrancar_servidor(args.port, args.servidor, env)
+    resultados = {}
+    try:
+        _esperar_servidor(host, proceso)
+        for suite in args.suites:
+            usuarios, spawn, duracion = SUITES[suite]
+            resultados[suite] = _correr_suite(
+                suite,
+                host,
+                run_dir,
+                args.usuarios or usuarios,
+                spawn,
+                args.duracion or duracion,
+                env,
+            )
+    finally:
+        proceso.terminate()
+        try:
+            proceso.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proceso.kill()
+
+    codigo = 0
+    for suite, stats_csv in resultados.items():
+        if not stats_csv.exists():
+            print(f"Suite {suite}: Locust no generó {stats_csv}", file=sys.stderr)
+            codigo = 1
+            continue
+        cmp_args = [str(stats_csv), "--suite", suite, "--tolerancia", str(args.tolerancia)]
+        if args.actualizar_baseline:
+            cmp_args.append("--actualizar")
+        codigo = max(codigo, compare_baseline.main(cmp_args))
+
+    print(f"Reportes en: {run_dir}")
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""
+Management command: optimizar_rutas
+
+Recalcula el orden de visita de las rutas (vecino más cercano + 2-opt
+sobre las coordenadas de las sedes) y lo guarda con un bulk_update.
+Sin argumentos procesa todas las rutas activas.
+
+Uso:
+    python manage.py optimizar_rutas --programa 3
+    python manage.py optimizar_rutas --ruta 12
+    python manage.py optimizar_rutas
+"""
+
+from django.core.management.base import BaseCommand
+
+from logistica.models import Ruta
+from logistica.services import optimizar_rutas
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el orden de visita de las rutas de entrega.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--programa', type=int, default=None, help='Solo las rutas activas de un programa (id)')
+        parser.add_argument('--ruta', type=int, default=None, help='Solo una ruta (id)')
+
+    def handle(self, *args, **options):
+        rutas = Ruta.objects.filter(activa=True)
+        if options['programa']:
+            rutas = rutas.filter(id_programa_id=options['programa'])
+        if options['ruta']:
+            rutas = Ruta.objects.filter(pk=options['ruta'])
+
+        resumen = optimizar_rutas(rutas)
+        for r in resumen:
+            self.stdout.write(
+                f"{r['nombre_ruta']}: {r['sedes']} sedes ({r['sin_coordenadas']} sin coordenadas) | "
+                f"{r['distancia_antes']} km → {r['distancia_despues']} km"
+            )
+        self.stdout.write(self.style.SUCCESS(f"✓ Rutas procesadas: {len(resumen)}"))
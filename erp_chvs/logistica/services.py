@@ -0,0 +1,216 @@
+"""
+Asignación de sedes a rutas y orden de visita.
+
+El orden de visita se calcula sobre una matriz de distancias entre las
+sedes de la ruta: vecino más cercano como solución inicial y 2-opt para
+eliminar cruces. Las distancias salen por defecto de las coordenadas de
+las sedes (haversine); LOGISTICA_FUENTE_DISTANCIAS permite enchufar otra
+fuente (p. ej. un servicio de ruteo por vías) con la misma firma que
+matriz_haversine. Si LOGISTICA_ORIGEN_RUTAS tiene coordenadas, el
+recorrido sale de ese punto (la bodega); si no, el inicio es libre.
+"""
+
+import math
+from collections import defaultdict
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from planeacion.models import SedesEducativas
+
+from .models import Ruta, RutaSedes
+
+Punto = Tuple[float, float]
+FuenteDistancias = Callable[[Sequence[Punto]], List[List[float]]]
+
+RADIO_TIERRA_KM = 6371.0
+
+
+# ===================== ASIGNACIÓN =====================
+
+def asignar_sedes_ruta(ruta: Ruta, codigos: Sequence[str]) -> dict:
+    """
+    Agrega las sedes a la ruta a continuación del último orden de visita.
+    Una consulta para las sedes, una para lo ya asignado y un bulk_create.
+
+    Retorna {'creadas': [nombres], 'omitidas': [motivos]}.
+    """
+    sedes = SedesEducativas.objects.in_bulk(set(codigos))
+    asignadas = dict(
+        RutaSedes.objects.filter(id_ruta=ruta).values_list('sede_educativa_id', 'orden_visita')
+    )
+    orden_actual = max(asignadas.values(), default=0) + 1
+
+    nuevas, creadas, omitidas = [], [], []
+    for cod in codigos:
+        sede = sedes.get(cod)
+        if sede is None:
+            omitidas.append(f'Sede {cod} no encontrada')
+            continue
+        if cod in asignadas:
+            omitidas.append(sede.nombre_sede_educativa)
+            continue
+        asignadas[cod] = orden_actual
+        nuevas.append(RutaSedes(id_ruta=ruta, sede_educativa=sede, orden_visita=orden_actual))
+        creadas.append(sede.nombre_sede_educativa)
+        orden_actual += 1
+
+    RutaSedes.objects.bulk_create(nuevas)
+    return {'creadas': creadas, 'omitidas': omitidas}
+
+
+# ===================== DISTANCIAS =====================
+
+def distancia_haversine(a: Punto, b: Punto) -> float:
+    """Distancia en km sobre la esfera entre dos puntos (lat, lon)."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * math.asin(math.sqrt(h))
+
+
+def matriz_haversine(puntos: Sequence[Punto]) -> List[List[float]]:
+    n = len(puntos)
+    matriz = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1, n):
+            matriz[i][j] = matriz[j][i] = distancia_haversine(puntos[i], puntos[j])
+    return matriz
+
+
+def _fuente_configurada() -> FuenteDistancias:
+    ruta = settings.LOGISTICA_FUENTE_DISTANCIAS
+    return import_string(ruta) if ruta else matriz_haversine
+
+
+# ===================== HEURÍSTICA =====================
+
+def _longitud(matriz, orden) -> float:
+    return sum(matriz[a][b] for a, b in zip(orden, orden[1:]))
+
+
+def ordenar_visitas(matriz: List[List[float]]) -> List[int]:
+    """
+    Orden de visita de un recorrido abierto que sale del nodo 0.
+
+    Vecino más cercano desde 0 y luego 2-opt: invertir el tramo i..j
+    cuando reconectar (i-1, j) y (i, j+1) acorta el recorrido. El nodo 0
+    queda fijo al inicio; el último tramo no tiene arista de regreso.
+    Retorna la permutación de índices empezando por 0.
+    """
+    n = len(matriz)
+    if n <= 2:
+        return list(range(n))
+
+    orden = [0]
+    pendientes = set(range(1, n))
+    while pendientes:
+        actual = orden[-1]
+        siguiente = min(pendientes, key=lambda j: (matriz[actual][j], j))
+        orden.append(siguiente)
+        pendientes.remove(siguiente)
+
+    mejora = True
+    while mejora:
+        mejora = False
+        for i in range(1, n - 1):
+            for j in range(i + 1, n):
+                a, b = orden[i - 1], orden[i]
+                c = orden[j]
+                antes = matriz[a][b]
+                despues = matriz[a][c]
+                if j + 1 < n:
+                    d = orden[j + 1]
+                    antes += matriz[c][d]
+                    despues += matriz[b][d]
+                if despues < antes - 1e-9:
+                    orden[i:j + 1] = reversed(orden[i:j + 1])
+                    mejora = True
+    return orden
+
+
+def _origen_configurado() -> Optional[Punto]:
+    origen = settings.LOGISTICA_ORIGEN_RUTAS
+    if not origen:
+        return None
+    lat, lon = (float(v) for v in origen.split(','))
+    return lat, lon
+
+
+def _ordenar_ruta(filas: list, fuente: FuenteDistancias, origen: Optional[Punto]) -> dict:
+    """
+    Calcula el nuevo orden de las filas (RutaSedes con la sede cargada, en
+    el orden de visita vigente) y lo asigna en memoria. Las sedes sin
+    coordenadas van al final, en el orden que ya tenían.
+    """
+    con_coordenadas, sin_coordenadas = [], []
+    for fila in filas:
+        sede = fila.sede_educativa
+        (con_coordenadas if sede.latitud is not None and sede.longitud is not None else sin_coordenadas).append(fila)
+    puntos = [(float(f.sede_educativa.latitud), float(f.sede_educativa.longitud)) for f in con_coordenadas]
+
+    if origen is not None:
+        matriz = fuente([origen] + puntos)
+    else:
+        # Nodo 0 ficticio a distancia cero de todas: el recorrido empieza donde convenga
+        sub = fuente(puntos) if puntos else []
+        matriz = [[0.0] * (len(puntos) + 1)] + [[0.0] + fila for fila in sub]
+
+    actual = list(range(len(puntos) + 1))  # Las filas llegan en el orden de visita vigente
+    nuevo = ordenar_visitas(matriz)
+
+    cambiadas = []
+    for posicion, fila in enumerate([con_coordenadas[i - 1] for i in nuevo[1:]] + sin_coordenadas, start=1):
+        if fila.orden_visita != posicion:
+            fila.orden_visita = posicion
+            cambiadas.append(fila)
+
+    return {
+        'sedes': len(filas),
+        'sin_coordenadas': len(sin_coordenadas),
+        'distancia_antes': round(_longitud(matriz, actual), 3),
+        'distancia_despues': round(_longitud(matriz, nuevo), 3),
+        'cambiadas': cambiadas,
+    }
+
+
+# ===================== OPTIMIZACIÓN =====================
+
+def optimizar_rutas(rutas, fuente: Optional[FuenteDistancias] = None) -> List[dict]:
+    """
+    Reordena las visitas de las rutas indicadas (queryset o lista de ids).
+    Una consulta para todas las sedes y un bulk_update con los órdenes que
+    cambiaron. Retorna un resumen por ruta.
+    """
+    fuente = fuente or _fuente_configurada()
+    origen = _origen_configurado()
+
+    por_ruta = defaultdict(list)
+    filas = (
+        RutaSedes.objects
+        .filter(id_ruta__in=rutas)
+        .select_related('id_ruta', 'sede_educativa')
+        .order_by('id_ruta__nombre_ruta', 'id_ruta_id', 'orden_visita', 'id')
+    )
+    for fila in filas:
+        por_ruta[fila.id_ruta].append(fila)
+
+    resumen, cambiadas = [], []
+    for ruta, filas_ruta in por_ruta.items():
+        resultado = _ordenar_ruta(filas_ruta, fuente, origen)
+        cambiadas.extend(resultado.pop('cambiadas'))
+        resumen.append({'id_ruta': ruta.id, 'nombre_ruta': ruta.nombre_ruta, **resultado})
+
+    RutaSedes.objects.bulk_update(cambiadas, ['orden_visita'], batch_size=500)
+    return resumen
+
+
+def optimizar_ruta(ruta_id: int, fuente: Optional[FuenteDistancias] = None) -> Optional[dict]:
+    """Reordena una ruta. Retorna su resumen o None si no tiene sedes."""
+    resumen = optimizar_rutas([ruta_id], fuente)
+    return resumen[0] if resumen else None
+
+
+def optimizar_rutas_programa(programa_id: int, fuente: Optional[FuenteDistancias] = None) -> List[dict]:
+    """Modo lote: reordena todas las rutas activas del programa."""
+    return optimizar_rutas(Ruta.objects.filter(id_programa_id=programa_id, activa=True), fuente)
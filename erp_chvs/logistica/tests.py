@@ -1,3 +1,126 @@
-from django.test import TestCase
+import json
+import math
+import random
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from planeacion.models import InstitucionesEducativas, Programa, SedesEducativas
+from principal.models import PrincipalMunicipio
+
+from .models import Ruta, RutaSedes, TipoRuta
+from .services import asignar_sedes_ruta, matriz_haversine, optimizar_rutas_programa, ordenar_visitas
+
+
+class OrdenarVisitasTests(TestCase):
+    def test_vecino_mas_cercano_y_2opt(self):
+        # Puntos sobre una recta: el recorrido óptimo desde 0 los visita en orden
+        posiciones = [0, 5, 1, 4, 2, 3]
+        matriz = [[abs(a - b) for b in posiciones] for a in posiciones]
+        orden = ordenar_visitas(matriz)
+        self.assertEqual([posiciones[i] for i in orden], [0, 1, 2, 3, 4, 5])
+
+    def test_resultado_sin_mejoras_2opt_pendientes(self):
+        aleatorio = random.Random(7)
+        puntos = [(aleatorio.random(), aleatorio.random()) for _ in range(12)]
+        matriz = [[math.dist(a, b) for b in puntos] for a in puntos]
+
+        def longitud(orden):
+            return sum(matriz[a][b] for a, b in zip(orden, orden[1:]))
+
+        orden = ordenar_visitas(matriz)
+        self.assertEqual((orden[0], sorted(orden)), (0, list(range(12))))
+        # Ninguna inversión de tramo (con el origen fijo) acorta el recorrido
+        for i in range(1, 11):
+            for j in range(i + 1, 12):
+                invertido = orden[:i] + orden[i:j + 1][::-1] + orden[j + 1:]
+                self.assertGreaterEqual(longitud(invertido), longitud(orden) - 1e-9)
+
+    def test_matriz_haversine(self):
+        matriz = matriz_haversine([(3.4516, -76.5320), (3.5833, -76.4917)])
+        self.assertAlmostEqual(matriz[0][1], 15.3, delta=0.5)
+        self.assertEqual(matriz[0][1], matriz[1][0])
+
+
+class RutasSedesServiceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        municipio = PrincipalMunicipio.objects.create(
+            codigo_municipio=55555, nombre_municipio='Municipio LG', codigo_departamento='76'
+        )
+        cls.programa = Programa.objects.create(
+            programa='Programa LG', contrato='CT-LG', municipio=municipio, tipo_programa_id='pae',
+            fecha_inicial=date(2026, 1, 1), fecha_final=date(2026, 12, 31), estado='activo',
+        )
+        ie = InstitucionesEducativas.objects.create(codigo_ie='IELG', nombre_institucion='IE LG', id_municipios=municipio)
+        tipo = TipoRuta.objects.create(tipo='Víveres')
+        cls.rutas = [
+            Ruta.objects.create(nombre_ruta=f'Ruta {i}', id_tipo_ruta=tipo, id_programa=cls.programa)
+            for i in range(2)
+        ]
+        # Sedes sobre un meridiano, separadas ~1.1 km; la última sin coordenadas
+        cls.sedes = [
+            SedesEducativas.objects.create(
+                cod_interprise=f'LG{i}', cod_dane=i, nombre_sede_educativa=f'Sede {i}', zona='U',
+                preparado='SI', industrializado='NO', codigo_ie=ie,
+                latitud=Decimal('3.40') + Decimal('0.01') * i if i < 6 else None,
+                longitud=Decimal('-76.50') if i < 6 else None,
+            )
+            for i in range(7)
+        ]
+
+    def test_asignacion_en_bloque(self):
+        ruta = self.rutas[0]
+        RutaSedes.objects.create(id_ruta=ruta, sede_educativa=self.sedes[0], orden_visita=4)
+        codigos = ['LG0', 'LG1', 'NOEXISTE', 'LG2', 'LG1']
+        with self.assertNumQueries(3):
+            resultado = asignar_sedes_ruta(ruta, codigos)
+        self.assertEqual(resultado['creadas'], ['Sede 1', 'Sede 2'])
+        self.assertEqual(resultado['omitidas'], ['Sede 0', 'Sede NOEXISTE no encontrada', 'Sede 1'])
+        self.assertEqual(
+            list(RutaSedes.objects.filter(id_ruta=ruta).values_list('sede_educativa_id', 'orden_visita')),
+            [('LG0', 4), ('LG1', 5), ('LG2', 6)],
+        )
+
+    def test_optimiza_todas_las_rutas_del_programa(self):
+        desordenadas = {0: ['LG3', 'LG0', 'LG5', 'LG6', 'LG1', 'LG4', 'LG2'], 1: ['LG2', 'LG0', 'LG1']}
+        for indice, codigos in desordenadas.items():
+            RutaSedes.objects.bulk_create([
+                RutaSedes(id_ruta=self.rutas[indice], sede_educativa_id=cod, orden_visita=orden)
+                for orden, cod in enumerate(codigos, start=1)
+            ])
+
+        with self.assertNumQueries(2):  # sedes de todas las rutas + un UPDATE
+            resumen = optimizar_rutas_programa(self.programa.id)
+
+        self.assertEqual([r['nombre_ruta'] for r in resumen], ['Ruta 0', 'Ruta 1'])
+        self.assertEqual(resumen[0]['sin_coordenadas'], 1)
+        self.assertLess(resumen[0]['distancia_despues'], resumen[0]['distancia_antes'])
+        orden = list(
+            RutaSedes.objects.filter(id_ruta=self.rutas[0]).order_by('orden_visita').values_list('sede_educativa_id', flat=True)
+        )
+        # Inicio libre: recorre el meridiano de un extremo al otro; la sede sin coordenadas al final
+        self.assertIn(orden[:6], [[f'LG{i}' for i in range(6)], [f'LG{i}' for i in range(5, -1, -1)]])
+        self.assertEqual(orden[6], 'LG6')
+
+    @override_settings(LOGISTICA_ORIGEN_RUTAS='3.46,-76.50')
+    def test_origen_configurado_y_api(self):
+        RutaSedes.objects.bulk_create([
+            RutaSedes(id_ruta=self.rutas[0], sede_educativa_id=f'LG{i}', orden_visita=i + 1) for i in range(6)
+        ])
+        self.client.force_login(User.objects.create_superuser('logistica', 'l@x.com', 'x'))
+        resp = self.client.post(f'/logistica/api/rutas/{self.rutas[0].id}/optimizar/', secure=True)
+        self.assertTrue(resp.json()['success'])
+        orden = list(
+            RutaSedes.objects.filter(id_ruta=self.rutas[0]).order_by('orden_visita').values_list('sede_educativa_id', flat=True)
+        )
+        # Desde la bodega (a la altura de LG6) baja hasta LG0
+        self.assertEqual(orden, [f'LG{i}' for i in range(5, -1, -1)])
+
+        resp = self.client.post(
+            '/logistica/api/ruta-sedes/bulk/', json.dumps({'id_ruta': self.rutas[1].id, 'sedes': ['LG0', 'LG1']}),
+            content_type='application/json', secure=True,
+        )
+        self.assertEqual(resp.json()['creadas'], 2)
@@ -23,6 +23,10 @@ urlpatterns = [
     path('api/ruta-sedes/bulk/', views.api_ruta_sedes_bulk, name='api_ruta_sedes_bulk'),
     path('api/ruta-sedes/<int:pk>/', views.api_ruta_sede_detail, name='api_ruta_sede_detail'),
 
+    # API: Orden de visita
+    path('api/rutas/<int:pk>/optimizar/', views.api_optimizar_ruta, name='api_optimizar_ruta'),
+    path('api/rutas/optimizar-programa/', views.api_optimizar_rutas_programa, name='api_optimizar_rutas_programa'),
+
     # API auxiliares (para poblar selects)
     path('api/programas/', views.api_programas_list, name='api_programas_list'),
     path('api/sedes/', views.api_sedes_list, name='api_sedes_list'),
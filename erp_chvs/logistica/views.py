@@ -4,11 +4,11 @@ from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.db import IntegrityError
-from django.db.models import Max
 from django.db.models.deletion import ProtectedError
 import json
 
 from .models import TipoRuta, Ruta, RutaSedes
+from .services import asignar_sedes_ruta, optimizar_ruta, optimizar_rutas_programa
 from planeacion.models import Programa, SedesEducativas
 from principal.models import RegistroActividad
 
@@ -400,34 +400,8 @@ def api_ruta_sedes_bulk(request):
             return JsonResponse({'success': False, 'error': 'Ruta y al menos una sede son obligatorias'})
 
         ruta = Ruta.objects.get(pk=id_ruta)
-
-        max_orden = RutaSedes.objects.filter(id_ruta=ruta).aggregate(
-            Max('orden_visita')
-        )['orden_visita__max'] or 0
-
-        ya_asignadas = set(
-            RutaSedes.objects.filter(id_ruta=ruta).values_list('sede_educativa_id', flat=True)
-        )
-
-        creadas = []
-        omitidas = []
-        orden_actual = max_orden + 1
-
-        for cod in sedes_cod:
-            try:
-                sede = SedesEducativas.objects.get(cod_interprise=cod)
-                if sede.cod_interprise in ya_asignadas:
-                    omitidas.append(sede.nombre_sede_educativa)
-                    continue
-                RutaSedes.objects.create(
-                    id_ruta=ruta,
-                    sede_educativa=sede,
-                    orden_visita=orden_actual
-                )
-                creadas.append(sede.nombre_sede_educativa)
-                orden_actual += 1
-            except SedesEducativas.DoesNotExist:
-                omitidas.append(f'Sede {cod} no encontrada')
+        resultado = asignar_sedes_ruta(ruta, sedes_cod)
+        creadas, omitidas = resultado['creadas'], resultado['omitidas']
 
         if not creadas:
             return JsonResponse({
@@ -457,6 +431,57 @@ def api_ruta_sedes_bulk(request):
         return JsonResponse({'success': False, 'error': f'Error inesperado: {str(e)}'})
 
 
+@login_required
+@csrf_exempt
+def api_optimizar_ruta(request, pk):
+    """API para recalcular el orden de visita de una ruta."""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+
+    try:
+        ruta = Ruta.objects.get(pk=pk)
+    except Ruta.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Ruta no encontrada'}, status=404)
+
+    try:
+        resumen = optimizar_ruta(ruta.id)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': f'Error al optimizar: {str(e)}'})
+
+    if resumen is None:
+        return JsonResponse({'success': False, 'error': 'La ruta no tiene sedes asignadas'})
+
+    RegistroActividad.registrar(
+        request, 'logistica', 'optimizar_ruta',
+        f"Ruta: {ruta.nombre_ruta} | Sedes: {resumen['sedes']} | "
+        f"Km: {resumen['distancia_antes']} → {resumen['distancia_despues']}"
+    )
+    return JsonResponse({'success': True, 'ruta': resumen})
+
+
+@login_required
+@csrf_exempt
+def api_optimizar_rutas_programa(request):
+    """API para recalcular el orden de visita de todas las rutas activas de un programa."""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+        programa = Programa.objects.get(pk=data.get('id_programa'))
+        resumen = optimizar_rutas_programa(programa.id)
+    except Programa.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Programa no encontrado'})
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': f'Error al optimizar: {str(e)}'})
+
+    RegistroActividad.registrar(
+        request, 'logistica', 'optimizar_rutas_programa',
+        f"Programa: {programa.programa} | Rutas: {len(resumen)}"
+    )
+    return JsonResponse({'success': True, 'rutas': resumen})
+
+
 @login_required
 @csrf_exempt
 def api_ruta_sede_detail(request, pk):
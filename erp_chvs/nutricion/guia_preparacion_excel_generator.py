@@ -6,6 +6,11 @@ Estructura funcional equivalente al formato solicitado:
 - Bloque administrativo por hoja.
 - Tabla por preparacion con filas de ingredientes.
 - Columnas por nivel: peso bruto, peso neto y peso servido.
+
+Los datos de todos los menus se cargan antes de dibujar (una consulta por
+tabla, sin importar cuantos menus tenga el libro), los estilos se
+registran una vez por libro como estilos con nombre y las imagenes (logo y
+firmas) se leen una sola vez aunque se inserten en todas las hojas.
 """
 
 import io
@@ -17,18 +22,18 @@ from typing import Dict, List, Optional, Tuple
 from urllib.parse import urlparse
 
 from openpyxl import Workbook
+from openpyxl.cell.cell import MergedCell
 from openpyxl.drawing.image import Image
-from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.styles import DEFAULT_FONT, Alignment, Border, Font, NamedStyle, PatternFill, Side
 from openpyxl.utils import get_column_letter
 
 from principal.models import TablaGradosEscolaresUapa
 
-from fuzzywuzzy import fuzz
+from fuzzywuzzy import fuzz, utils as fuzz_utils
 
 from .models import (
     FirmaNutricionalContrato,
     ProcedimientoPreparacion,
-    TablaAnalisisNutricionalMenu,
     TablaIngredientesPorNivel,
     TablaMenus,
     TablaPreparacionIngredientes,
@@ -58,24 +63,60 @@ NIVELES_LABEL = {
     "general": "COMEDORES COMUNITARIOS",
 }
 
+# Estilos compartidos por todas las hojas
+_LADO = Side(style="thin", color="000000")
+BORDE = Border(left=_LADO, right=_LADO, top=_LADO, bottom=_LADO)
+RELLENO_ENCABEZADO = PatternFill(start_color="D9EAD3", end_color="D9EAD3", fill_type="solid")
+CENTRO = Alignment(horizontal="center", vertical="center", wrap_text=True)
+IZQUIERDA = Alignment(horizontal="left", vertical="center", wrap_text=True)
+NEGRITA = Font(bold=True)
+
+# Combinaciones usadas en la guia; todas llevan borde. Asignar un estilo con
+# nombre copia sus indices, mientras que asignar font/fill/border/alignment
+# por separado obliga a openpyxl a buscar cada objeto en el libro.
+ESTILOS = {
+    "guia_borde": {},
+    "guia_banda": {"fill": RELLENO_ENCABEZADO},
+    "guia_encabezado": {"fill": RELLENO_ENCABEZADO, "alignment": CENTRO},
+    "guia_encabezado_negrita": {"font": NEGRITA, "fill": RELLENO_ENCABEZADO, "alignment": CENTRO},
+    "guia_titulo": {"font": Font(bold=True, size=11), "fill": RELLENO_ENCABEZADO, "alignment": CENTRO},
+    "guia_marca": {"font": Font(bold=True, size=13), "fill": RELLENO_ENCABEZADO, "alignment": CENTRO},
+    "guia_encabezado_peso": {"font": Font(bold=True, size=9), "fill": RELLENO_ENCABEZADO, "alignment": CENTRO},
+    "guia_texto": {"alignment": IZQUIERDA},
+    "guia_numero": {"alignment": CENTRO},
+    "guia_preparacion": {"font": NEGRITA, "alignment": CENTRO},
+    "guia_firma_etiqueta": {"font": NEGRITA, "fill": RELLENO_ENCABEZADO, "alignment": IZQUIERDA},
+    "guia_firma_texto": {"fill": RELLENO_ENCABEZADO, "alignment": IZQUIERDA},
+}
+
 
 class GuiaPreparacionExcelGenerator:
     def __init__(self):
-        side = Side(style="thin", color="000000")
-        self.border = Border(left=side, right=side, top=side, bottom=side)
-        self.header_fill = PatternFill(start_color="D9EAD3", end_color="D9EAD3", fill_type="solid")
-        self.center = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        self.left = Alignment(horizontal="left", vertical="center", wrap_text=True)
+        self.border = BORDE
+        self.header_fill = RELLENO_ENCABEZADO
+        self.center = CENTRO
+        self.left = IZQUIERDA
         # Configuración dinámica de niveles; sobreescrita en generate()
         self.niveles_orden: List[str] = list(NIVELES_ORDEN_PAE)
         self.col_proc: int = 18  # columna de PROCEDIMIENTO (PAE default)
+        self._niveles_por_columna: List[Tuple[str, Optional[str]]] = []
+        self._procedimientos_resueltos: Dict[str, str] = {}
+        self._imagenes: Dict[str, Optional[bytes]] = {}
 
-    def _cargar_catalogo(self) -> List[Tuple[str, str]]:
-        """Carga el catálogo activo de procedimientos: [(nombre_normalizado, procedimiento)]."""
-        return [
-            (self._normalizar(p.nombre), p.procedimiento)
-            for p in ProcedimientoPreparacion.objects.filter(activo=True)
-        ]
+    def _cargar_catalogo(self) -> Dict[str, str]:
+        """
+        Catálogo activo de procedimientos indexado por nombre normalizado:
+        {clave: procedimiento}. Ante nombres repetidos gana el primero en el
+        orden del catálogo, igual que en el recorrido de _buscar_procedimiento.
+        """
+        catalogo: Dict[str, str] = {}
+        for nombre, procedimiento in (
+            ProcedimientoPreparacion.objects.filter(activo=True).values_list("nombre", "procedimiento")
+        ):
+            clave = self._clave_procedimiento(nombre)
+            if clave:
+                catalogo.setdefault(clave, procedimiento)
+        return catalogo
 
     @staticmethod
     def _normalizar(texto: str) -> str:
@@ -83,19 +124,34 @@ class GuiaPreparacionExcelGenerator:
         texto = "".join(ch for ch in texto if not unicodedata.combining(ch))
         return texto.lower().strip()
 
-    def _buscar_procedimiento(self, nombre_prep: str, catalogo: List[Tuple[str, str]]) -> str:
-        """Retorna el procedimiento con mayor coincidencia, o '' si no supera el umbral."""
-        if not catalogo:
+    @classmethod
+    def _clave_procedimiento(cls, nombre: str) -> str:
+        """Nombre sin tildes ni signos y con las palabras ordenadas (lo que compara token_sort_ratio)."""
+        return " ".join(sorted(fuzz_utils.full_process(cls._normalizar(nombre), force_ascii=True).split()))
+
+    def _buscar_procedimiento(self, nombre_prep: str, catalogo: Dict[str, str]) -> str:
+        """
+        Retorna el procedimiento con mayor coincidencia, o '' si no supera el umbral.
+
+        Un nombre que coincide exactamente con una clave del catálogo se
+        resuelve con el índice; los demás se comparan con fuzzy matching
+        una sola vez por nombre (los menús repiten preparaciones).
+        """
+        clave = self._clave_procedimiento(nombre_prep)
+        if not clave or not catalogo:
             return ""
-        nombre_norm = self._normalizar(nombre_prep)
-        mejor_score = 0
-        mejor_texto = ""
-        for nombre_cat, procedimiento in catalogo:
-            score = fuzz.token_sort_ratio(nombre_norm, nombre_cat)
-            if score > mejor_score:
-                mejor_score = score
-                mejor_texto = procedimiento
-        return mejor_texto if mejor_score >= UMBRAL_COINCIDENCIA else ""
+        if clave in catalogo:
+            return catalogo[clave]
+        if clave not in self._procedimientos_resueltos:
+            mejor_score = 0
+            mejor_texto = ""
+            for clave_cat, procedimiento in catalogo.items():
+                score = fuzz.ratio(clave, clave_cat)
+                if score > mejor_score:
+                    mejor_score = score
+                    mejor_texto = procedimiento
+            self._procedimientos_resueltos[clave] = mejor_texto if mejor_score >= UMBRAL_COINCIDENCIA else ""
+        return self._procedimientos_resueltos[clave]
 
     def generate(self, programa_id: int, modalidad_id: str) -> io.BytesIO:
         # Determinar si el programa usa niveles educativos (PAE) o es un programa sin niveles
@@ -109,6 +165,8 @@ class GuiaPreparacionExcelGenerator:
 
         self.niveles_orden = list(NIVELES_ORDEN_PAE) if tiene_niveles else ['general']
         self.col_proc = 2 + len(self.niveles_orden) * 3 + 1
+        self._procedimientos_resueltos = {}
+        self._imagenes = {}
 
         menus = list(
             TablaMenus.objects.filter(
@@ -130,24 +188,85 @@ class GuiaPreparacionExcelGenerator:
             stream.seek(0)
             return stream
 
+        self._registrar_estilos(wb)
         catalogo = self._cargar_catalogo()
+        self._niveles_por_columna = self._get_niveles_por_columna()
+        datos_por_menu = self._cargar_datos_menus(menus)
+        firma_cfg = FirmaNutricionalContrato.objects.filter(programa_id=programa_id).first()
 
         for menu in menus:
             ws = wb.create_sheet(title=f"Menu {menu.menu}"[:31])
-            self._build_sheet(ws, menu, catalogo)
+            self._build_sheet(ws, menu, catalogo, datos_por_menu[menu.id_menu], firma_cfg)
 
         stream = io.BytesIO()
         wb.save(stream)
         stream.seek(0)
         return stream
 
-    def _build_sheet(self, ws, menu: TablaMenus, catalogo: List[Tuple[str, str]]) -> None:
+    @staticmethod
+    def _registrar_estilos(wb: Workbook) -> None:
+        for nombre, estilo in ESTILOS.items():
+            wb.add_named_style(NamedStyle(
+                name=nombre,
+                font=estilo.get("font", DEFAULT_FONT),
+                fill=estilo.get("fill"),
+                border=BORDE,
+                alignment=estilo.get("alignment"),
+            ))
+
+    def _cargar_datos_menus(self, menus: List[TablaMenus]) -> Dict[int, dict]:
+        """
+        Preparaciones, ingredientes y pesos guardados de todos los menús en
+        tres consultas.
+
+        Retorna {id_menu: {'preparaciones': [...] (ya ordenadas por componente),
+        'ingredientes': {id_preparacion: [relaciones]}, 'pesos': índice de
+        _build_index con los análisis de ese menú}}.
+        """
+        from nutricion.utils.orden_componentes import sort_preparaciones_objetos
+
+        datos = {menu.id_menu: {"preparaciones": [], "ingredientes": {}, "pesos": []} for menu in menus}
+        for prep in TablaPreparaciones.objects.filter(id_menu__in=menus).select_related('id_componente'):
+            datos[prep.id_menu_id]["preparaciones"].append(prep)
+
+        menu_por_prep = {}
+        for menu in menus:
+            preps = sort_preparaciones_objetos(datos[menu.id_menu]["preparaciones"], menu.id_modalidad_id)
+            datos[menu.id_menu]["preparaciones"] = preps
+            for prep in preps:
+                menu_por_prep[prep.id_preparacion] = menu.id_menu
+
+        rels = (
+            TablaPreparacionIngredientes.objects.filter(id_preparacion__in=list(menu_por_prep))
+            .select_related("id_ingrediente_siesa")
+            .order_by("id_preparacion__preparacion", "id_ingrediente_siesa__nombre_del_alimento")
+        )
+        for rel in rels:
+            menu_id = menu_por_prep[rel.id_preparacion_id]
+            datos[menu_id]["ingredientes"].setdefault(rel.id_preparacion_id, []).append(rel)
+
+        guardados = (
+            TablaIngredientesPorNivel.objects.filter(
+                id_analisis__id_menu__in=menus,
+                id_preparacion__in=list(menu_por_prep),
+            )
+            .select_related("id_analisis")
+        )
+        for item in guardados:
+            datos[item.id_analisis.id_menu_id]["pesos"].append(item)
+
+        for datos_menu in datos.values():
+            datos_menu["pesos"] = self._build_index(datos_menu["pesos"])
+        return datos
+
+    def _build_sheet(self, ws, menu: TablaMenus, catalogo: Dict[str, str], datos: dict,
+                     firma_cfg: Optional[FirmaNutricionalContrato]) -> None:
         self._set_columns(ws)
         table_start_row = self._draw_top(ws, menu)
         row = self._draw_table_header(ws, table_start_row)
         ws.freeze_panes = f"C{row}"  # congela encima de la primera fila de datos
-        row_end = self._draw_table_body(ws, row, menu, catalogo)
-        self._draw_signature_block(ws, row_end, menu)
+        row_end = self._draw_table_body(ws, row, menu, catalogo, datos)
+        self._draw_signature_block(ws, row_end, firma_cfg)
         self._apply_all_borders(ws)
 
     @staticmethod
@@ -165,14 +284,19 @@ class GuiaPreparacionExcelGenerator:
             ws.column_dimensions[get_column_letter(col_idx)].width = 9
         ws.column_dimensions[get_column_letter(self.col_proc)].width = 42  # procedimiento
 
+    @staticmethod
+    def _celda(ws, coord: str, valor, estilo: str) -> None:
+        """Escribe una celda del encabezado (las celdas combinadas se combinan antes de darles estilo)."""
+        ws[coord] = valor
+        ws[coord].style = estilo
+
     def _draw_top(self, ws, menu: TablaMenus) -> int:
         """Dibuja el bloque superior y retorna la fila donde debe empezar la tabla de ingredientes."""
         lc = get_column_letter(self.col_proc)  # última columna (ej: "R" para PAE, "F" para Comedores)
         ws.row_dimensions[1].height = 38
         ws.row_dimensions[2].height = 38
         ws.merge_cells(f"A1:{lc}2")
-        ws["A1"].fill = self.header_fill
-        ws["A1"].border = self.border
+        ws["A1"].style = "guia_banda"
 
         # Logo programa (si existe)
         if menu.id_contrato and menu.id_contrato.imagen:
@@ -181,142 +305,60 @@ class GuiaPreparacionExcelGenerator:
             self._insert_image_field(ws, menu.id_contrato.imagen, f"{logo_col}1", max_w=180, max_h=60)
 
         ws.merge_cells(f"A3:{lc}3")
-        ws["A3"] = "GUIA DE PREPARACION DE ALIMENTOS Y ESTANDARIZACION DE RECETAS"
-        ws["A3"].font = Font(bold=True, size=11)
-        ws["A3"].alignment = self.center
-        ws["A3"].fill = self.header_fill
-        ws["A3"].border = self.border
+        self._celda(ws, "A3", "GUIA DE PREPARACION DE ALIMENTOS Y ESTANDARIZACION DE RECETAS", "guia_titulo")
 
         es_comedores = len(self.niveles_orden) == 1
         fila4_texto = "RACIONES PARA PREPARAR EN SITIO" if es_comedores else "COMPLEMENTO ALIMENTARIO JORNADA AM/PM PREPARADO EN SITIO"
         ws.merge_cells(f"A4:{lc}4")
-        ws["A4"] = fila4_texto
-        ws["A4"].font = Font(bold=True, size=11)
-        ws["A4"].alignment = self.center
-        ws["A4"].fill = self.header_fill
-        ws["A4"].border = self.border
+        self._celda(ws, "A4", fila4_texto, "guia_titulo")
 
         if not es_comedores:
             # --- Layout PAE: filas 5-7 con sub-divisiones por escolaridad y grupo étnico ---
             ws.merge_cells("B5:D5")
-            ws["B5"] = "PREESCOLAR - MEDIA Y CICLO COMPLEMENTARIO"
-            ws["B5"].alignment = self.center
-            ws["B5"].font = Font(bold=True)
-            ws["B5"].fill = self.header_fill
-            ws["B5"].border = self.border
-
+            self._celda(ws, "B5", "PREESCOLAR - MEDIA Y CICLO COMPLEMENTARIO", "guia_encabezado_negrita")
             ws.merge_cells("E5:G5")
-            ws["E5"] = "OPERADOR"
-            ws["E5"].alignment = self.center
-            ws["E5"].font = Font(bold=True)
-            ws["E5"].fill = self.header_fill
-            ws["E5"].border = self.border
-
+            self._celda(ws, "E5", "OPERADOR", "guia_encabezado_negrita")
             ws.merge_cells(f"H5:{lc}5")
-            ws["H5"] = str(menu.id_contrato.programa).upper()
-            ws["H5"].alignment = self.center
-            ws["H5"].font = Font(bold=True)
-            ws["H5"].fill = self.header_fill
-            ws["H5"].border = self.border
+            self._celda(ws, "H5", str(menu.id_contrato.programa).upper(), "guia_encabezado_negrita")
 
             # Fila 6
-            ws["A6"] = "ESCOLARIDAD"
-            ws["A6"].font = Font(bold=True)
-            ws["A6"].alignment = self.center
-            ws["A6"].fill = self.header_fill
-            ws["A6"].border = self.border
-
-            ws["B6"] = "INDÍGENA"
-            ws["B6"].alignment = self.center
-            ws["B6"].fill = self.header_fill
-            ws["B6"].border = self.border
-
+            self._celda(ws, "A6", "ESCOLARIDAD", "guia_encabezado_negrita")
+            self._celda(ws, "B6", "INDÍGENA", "guia_encabezado")
             ws.merge_cells("D6:E6")
-            ws["D6"] = "COMUNIDAD / PUEBLO INDÍGENA"
-            ws["D6"].alignment = self.center
-            ws["D6"].fill = self.header_fill
-            ws["D6"].border = self.border
-
+            self._celda(ws, "D6", "COMUNIDAD / PUEBLO INDÍGENA", "guia_encabezado")
             ws.merge_cells("F6:G6")
-            ws["F6"] = ""
-            ws["F6"].alignment = self.center
-            ws["F6"].fill = self.header_fill
-            ws["F6"].border = self.border
-
+            self._celda(ws, "F6", "", "guia_encabezado")
             ws.merge_cells("H6:I6")
-            ws["H6"] = "AFROCOLOMBIANO / PALENQUEROS"
-            ws["H6"].alignment = self.center
-            ws["H6"].fill = self.header_fill
-            ws["H6"].border = self.border
-
+            self._celda(ws, "H6", "AFROCOLOMBIANO / PALENQUEROS", "guia_encabezado")
             if self.col_proc >= 10:
                 ws.merge_cells(f"J6:{lc}6")
-                ws["J6"] = ""
-                ws["J6"].alignment = self.center
-                ws["J6"].fill = self.header_fill
-                ws["J6"].border = self.border
+                self._celda(ws, "J6", "", "guia_encabezado")
 
             # Fila 7
-            ws["A7"] = "GRUPO ETNICO"
-            ws["A7"].alignment = self.center
-            ws["A7"].font = Font(bold=True)
-            ws["A7"].fill = self.header_fill
-            ws["A7"].border = self.border
-
-            ws["B7"] = "RAIZAL"
-            ws["B7"].alignment = self.center
-            ws["B7"].fill = self.header_fill
-            ws["B7"].border = self.border
-
+            self._celda(ws, "A7", "GRUPO ETNICO", "guia_encabezado_negrita")
+            self._celda(ws, "B7", "RAIZAL", "guia_encabezado")
             ws.merge_cells("D7:E7")
-            ws["D7"] = "ROM"
-            ws["D7"].alignment = self.center
-            ws["D7"].fill = self.header_fill
-            ws["D7"].border = self.border
-
+            self._celda(ws, "D7", "ROM", "guia_encabezado")
             ws.merge_cells("F7:G7")
-            ws["F7"] = ""
-            ws["F7"].alignment = self.center
-            ws["F7"].fill = self.header_fill
-            ws["F7"].border = self.border
-
+            self._celda(ws, "F7", "", "guia_encabezado")
             ws.merge_cells("H7:I7")
-            ws["H7"] = "SIN PERTENENCIA ÉTNICA"
-            ws["H7"].alignment = self.center
-            ws["H7"].fill = self.header_fill
-            ws["H7"].border = self.border
-
+            self._celda(ws, "H7", "SIN PERTENENCIA ÉTNICA", "guia_encabezado")
             if self.col_proc >= 10:
                 ws.merge_cells(f"J7:{lc}7")
-                ws["J7"] = "X"
-                ws["J7"].alignment = self.center
-                ws["J7"].font = Font(bold=True, size=13)
-                ws["J7"].fill = self.header_fill
-                ws["J7"].border = self.border
+                self._celda(ws, "J7", "X", "guia_marca")
 
         else:
             # --- Layout Comedores: solo fila 5 (nombre programa) + fila 6 (Menú N) ---
             ws.merge_cells(f"A5:{lc}5")
-            ws["A5"] = str(menu.id_contrato.programa).upper() if menu.id_contrato else ""
-            ws["A5"].alignment = self.center
-            ws["A5"].font = Font(bold=True)
-            ws["A5"].fill = self.header_fill
-            ws["A5"].border = self.border
-
+            self._celda(
+                ws, "A5", str(menu.id_contrato.programa).upper() if menu.id_contrato else "", "guia_encabezado_negrita"
+            )
             ws.merge_cells(f"A6:{lc}6")
-            ws["A6"] = f"Menu {menu.menu}"
-            ws["A6"].font = Font(bold=True)
-            ws["A6"].alignment = self.center
-            ws["A6"].fill = self.header_fill
-            ws["A6"].border = self.border
+            self._celda(ws, "A6", f"Menu {menu.menu}", "guia_encabezado_negrita")
             return 7  # tabla empieza en fila 7
 
         ws.merge_cells(f"A8:{lc}8")
-        ws["A8"] = f"Menu {menu.menu}"
-        ws["A8"].font = Font(bold=True)
-        ws["A8"].alignment = self.center
-        ws["A8"].fill = self.header_fill
-        ws["A8"].border = self.border
+        self._celda(ws, "A8", f"Menu {menu.menu}", "guia_encabezado_negrita")
         return 9  # tabla empieza en fila 9 (PAE)
 
     def _draw_table_header(self, ws, start_row: int) -> int:
@@ -324,43 +366,23 @@ class GuiaPreparacionExcelGenerator:
         row2 = start_row + 1
 
         ws.merge_cells(start_row=row1, start_column=1, end_row=row2, end_column=1)
-        ws.cell(row=row1, column=1, value="PREPARACION")
-        ws.cell(row=row1, column=1).font = Font(bold=True)
-        ws.cell(row=row1, column=1).alignment = self.center
-        ws.cell(row=row1, column=1).fill = self.header_fill
+        ws.cell(row=row1, column=1, value="PREPARACION").style = "guia_encabezado_negrita"
 
         ws.merge_cells(start_row=row1, start_column=2, end_row=row2, end_column=2)
-        ws.cell(row=row1, column=2, value="NOMBRE DEL ALIMENTO\n(Ingredientes)")
-        ws.cell(row=row1, column=2).font = Font(bold=True)
-        ws.cell(row=row1, column=2).alignment = self.center
-        ws.cell(row=row1, column=2).fill = self.header_fill
+        ws.cell(row=row1, column=2, value="NOMBRE DEL ALIMENTO\n(Ingredientes)").style = "guia_encabezado_negrita"
 
         col = 3
         for nivel_id in self.niveles_orden:
             ws.merge_cells(start_row=row1, start_column=col, end_row=row1, end_column=col + 2)
-            ws.cell(row=row1, column=col, value=NIVELES_LABEL.get(nivel_id, nivel_id.upper()))
-            ws.cell(row=row1, column=col).font = Font(bold=True)
-            ws.cell(row=row1, column=col).alignment = self.center
-            ws.cell(row=row1, column=col).fill = self.header_fill
-
-            ws.cell(row=row2, column=col, value="PESO\nBRUTO (g)")
-            ws.cell(row=row2, column=col + 1, value="PESO\nNETO (g)")
-            ws.cell(row=row2, column=col + 2, value="PESO\nSERVIDO (g)")
-            for c in range(col, col + 3):
-                ws.cell(row=row2, column=c).font = Font(bold=True, size=9)
-                ws.cell(row=row2, column=c).alignment = self.center
-                ws.cell(row=row2, column=c).fill = self.header_fill
+            ws.cell(row=row1, column=col, value=NIVELES_LABEL.get(nivel_id, nivel_id.upper())).style = "guia_encabezado_negrita"
+
+            ws.cell(row=row2, column=col, value="PESO\nBRUTO (g)").style = "guia_encabezado_peso"
+            ws.cell(row=row2, column=col + 1, value="PESO\nNETO (g)").style = "guia_encabezado_peso"
+            ws.cell(row=row2, column=col + 2, value="PESO\nSERVIDO (g)").style = "guia_encabezado_peso"
             col += 3
 
         ws.merge_cells(start_row=row1, start_column=self.col_proc, end_row=row2, end_column=self.col_proc)
-        ws.cell(row=row1, column=self.col_proc, value="PROCEDIMIENTO DE PREPARACION")
-        ws.cell(row=row1, column=self.col_proc).font = Font(bold=True)
-        ws.cell(row=row1, column=self.col_proc).alignment = self.center
-        ws.cell(row=row1, column=self.col_proc).fill = self.header_fill
-
-        for r in (row1, row2):
-            for c in range(1, self.col_proc + 1):
-                ws.cell(row=r, column=c).border = self.border
+        ws.cell(row=row1, column=self.col_proc, value="PROCEDIMIENTO DE PREPARACION").style = "guia_encabezado_negrita"
 
         return row2 + 1
 
@@ -369,37 +391,14 @@ class GuiaPreparacionExcelGenerator:
     # Modalidades industrializadas: no aplica la porción fija de 200g
     _MODALIDADES_INDUSTRIALIZADAS = {'020511', '20502'}
 
-    def _draw_table_body(self, ws, start_row: int, menu: TablaMenus, catalogo: List[Tuple[str, str]]) -> int:
-        niveles_por_columna = self._get_niveles_por_columna()
+    def _draw_table_body(self, ws, start_row: int, menu: TablaMenus, catalogo: Dict[str, str], datos: dict) -> int:
+        niveles_por_columna = self._niveles_por_columna
         modalidad_id = str(menu.id_modalidad_id or '').strip()
         es_industrializado = modalidad_id in self._MODALIDADES_INDUSTRIALIZADAS
 
-        from nutricion.utils.orden_componentes import sort_preparaciones_objetos
-        preps_qs = list(
-            TablaPreparaciones.objects.filter(id_menu=menu).select_related('id_componente')
-        )
-        preps = sort_preparaciones_objetos(preps_qs, menu.id_modalidad_id)
-        rels = list(
-            TablaPreparacionIngredientes.objects.filter(id_preparacion__in=preps)
-            .select_related("id_preparacion", "id_ingrediente_siesa")
-            .order_by("id_preparacion__preparacion", "id_ingrediente_siesa__nombre_del_alimento")
-        )
-
-        analisis_por_nivel = {
-            a.id_nivel_escolar_uapa_id: a
-            for a in TablaAnalisisNutricionalMenu.objects.filter(id_menu=menu)
-        }
-        ings_guardados = list(
-            TablaIngredientesPorNivel.objects.filter(
-                id_analisis__in=list(analisis_por_nivel.values()),
-                id_preparacion__in=preps,
-            )
-        )
-        idx = self._build_index(ings_guardados)
-
-        rels_by_prep: Dict[int, List[TablaPreparacionIngredientes]] = {}
-        for rel in rels:
-            rels_by_prep.setdefault(rel.id_preparacion_id, []).append(rel)
+        preps = datos["preparaciones"]
+        rels_by_prep: Dict[int, List[TablaPreparacionIngredientes]] = datos["ingredientes"]
+        idx = datos["pesos"]
 
         row = start_row
         for prep in preps:
@@ -424,40 +423,28 @@ class GuiaPreparacionExcelGenerator:
                 else:
                     total = Decimal("0")
                     for rel in prep_rels:
-                        _, neto = self._get_bruto_neto(rel, prep.id_preparacion, nivel_id, idx, analisis_por_nivel)
+                        _, neto = self._get_bruto_neto(rel, prep.id_preparacion, nivel_id, idx)
                         fc = Decimal(str(rel.id_ingrediente_siesa.factor_coccion or 1))
                         total += neto * fc
                     peso_servido_by_nivel[nivel_id] = total
 
+            # Las columnas de peso servido y procedimiento se escriben en la
+            # primera fila tras combinar las celdas de la preparación
             prep_start = row
             for rel in prep_rels:
-                ws.cell(row=row, column=2, value=rel.id_ingrediente_siesa.nombre_del_alimento)
-                ws.cell(row=row, column=2).alignment = self.left
-                ws.cell(row=row, column=2).border = self.border
+                ws.cell(row=row, column=2, value=rel.id_ingrediente_siesa.nombre_del_alimento).style = "guia_texto"
 
                 col = 3
                 for _, nivel_id in niveles_por_columna:
-                    bruto, neto = self._get_bruto_neto(rel, prep.id_preparacion, nivel_id, idx, analisis_por_nivel)
-
-                    ws.cell(row=row, column=col, value=float(round(bruto, 2)))
-                    ws.cell(row=row, column=col + 1, value=float(round(neto, 2)))
-                    ws.cell(row=row, column=col + 2, value="")
-                    for c in (col, col + 1, col + 2):
-                        ws.cell(row=row, column=c).alignment = self.center
-                        ws.cell(row=row, column=c).border = self.border
+                    bruto, neto = self._get_bruto_neto(rel, prep.id_preparacion, nivel_id, idx)
+                    ws.cell(row=row, column=col, value=float(round(bruto, 2))).style = "guia_numero"
+                    ws.cell(row=row, column=col + 1, value=float(round(neto, 2))).style = "guia_numero"
                     col += 3
-
-                ws.cell(row=row, column=self.col_proc, value="")
-                ws.cell(row=row, column=self.col_proc).alignment = self.left
-                ws.cell(row=row, column=self.col_proc).border = self.border
                 row += 1
 
             prep_end = row - 1
             ws.merge_cells(start_row=prep_start, start_column=1, end_row=prep_end, end_column=1)
-            ws.cell(row=prep_start, column=1, value=prep.preparacion.upper())
-            ws.cell(row=prep_start, column=1).font = Font(bold=True)
-            ws.cell(row=prep_start, column=1).alignment = self.center
-            ws.cell(row=prep_start, column=1).border = self.border
+            ws.cell(row=prep_start, column=1, value=prep.preparacion.upper()).style = "guia_preparacion"
 
             # Peso servido combinado por preparacion (una sola celda vertical por nivel)
             col = 3
@@ -471,21 +458,12 @@ class GuiaPreparacionExcelGenerator:
                         end_row=prep_end,
                         end_column=servido_col,
                     )
-                ws.cell(row=prep_start, column=servido_col, value=float(round(servido, 2)))
-                ws.cell(row=prep_start, column=servido_col).alignment = self.center
-                ws.cell(row=prep_start, column=servido_col).border = self.border
+                ws.cell(row=prep_start, column=servido_col, value=float(round(servido, 2))).style = "guia_numero"
                 col += 3
 
             # Procedimiento: texto del catálogo (o en blanco si no hubo match)
             ws.merge_cells(start_row=prep_start, start_column=self.col_proc, end_row=prep_end, end_column=self.col_proc)
-            ws.cell(row=prep_start, column=self.col_proc, value=procedimiento_texto)
-            ws.cell(row=prep_start, column=self.col_proc).alignment = self.left
-            ws.cell(row=prep_start, column=self.col_proc).border = self.border
-
-            # borde columna A y columna procedimiento en filas internas de merge
-            for r in range(prep_start, prep_end + 1):
-                ws.cell(row=r, column=1).border = self.border
-                ws.cell(row=r, column=self.col_proc).border = self.border
+            ws.cell(row=prep_start, column=self.col_proc, value=procedimiento_texto).style = "guia_texto"
 
         return row
 
@@ -533,7 +511,6 @@ class GuiaPreparacionExcelGenerator:
         prep_id: int,
         nivel_id: Optional[str],
         idx: Dict[Tuple[str, int, str], TablaIngredientesPorNivel],
-        analisis_por_nivel: Dict[str, TablaAnalisisNutricionalMenu],
     ) -> Tuple[Decimal, Decimal]:
         guardado = None
         if nivel_id:
@@ -551,18 +528,16 @@ class GuiaPreparacionExcelGenerator:
         bruto = (neto * Decimal("100")) / parte_comestible
         return bruto, neto
 
-    def _draw_signature_block(self, ws, start_row: int, menu: TablaMenus) -> None:
+    def _draw_signature_block(self, ws, start_row: int, firma_cfg: Optional[FirmaNutricionalContrato]) -> None:
         """
-        Bloque inferior de firmas usando nutricion_firma_nutricional_contrato.
+        Bloque inferior de firmas usando nutricion_firma_nutricional_contrato
+        (firma_cfg se consulta una vez por libro en generate()).
         """
         ws.row_dimensions[start_row].height = 50
         ws.row_dimensions[start_row + 1].height = 50
-        firma_cfg = FirmaNutricionalContrato.objects.filter(programa=menu.id_contrato).first()
         elabora_nombre = (firma_cfg.elabora_nombre if firma_cfg else "") or ""
-        elabora_matricula = (firma_cfg.elabora_matricula if firma_cfg else "") or ""
         elabora_firma_texto = (firma_cfg.elabora_firma_texto if firma_cfg else "") or ""
         aprueba_nombre = (firma_cfg.aprueba_nombre if firma_cfg else "") or ""
-        aprueba_matricula = (firma_cfg.aprueba_matricula if firma_cfg else "") or ""
         aprueba_firma_texto = (firma_cfg.aprueba_firma_texto if firma_cfg else "") or ""
 
         elabora_img = None
@@ -571,13 +546,6 @@ class GuiaPreparacionExcelGenerator:
             elabora_img = self._get_image_source(firma_cfg.elabora_firma_imagen)
             aprueba_img = self._get_image_source(firma_cfg.aprueba_firma_imagen)
 
-        rows = [start_row, start_row + 1]
-        for r in rows:
-            for c in range(1, self.col_proc + 1):
-                ws.cell(row=r, column=c).border = self.border
-                ws.cell(row=r, column=c).alignment = self.center
-                ws.cell(row=r, column=c).fill = self.header_fill
-
         # Dividir el espacio disponible en 4 zonas: etiqueta, nombre, matrícula label, matrícula valor+firma
         # Para PAE (18 cols): etiqueta=1-4, nombre=5-8, mat_label=9-11, mat_val=12-13, firma_label=14, firma=15-18
         # Para Comedores (6 cols): se ajusta proporcionalmente
@@ -590,43 +558,24 @@ class GuiaPreparacionExcelGenerator:
         firma_col = z2_end + 1
         firma_anchor = get_column_letter(firma_col)
 
-        # Fila 1 (elabora)
-        ws.merge_cells(start_row=start_row, start_column=1, end_row=start_row, end_column=z1_end)
-        ws.cell(row=start_row, column=1, value="NOMBRE NUTRICIONISTA - DIETISTA POR PARTE DEL OPERADOR")
-        ws.cell(row=start_row, column=1).alignment = self.left
-        ws.cell(row=start_row, column=1).font = Font(bold=True)
-
-        ws.merge_cells(start_row=start_row, start_column=z1_end + 1, end_row=start_row, end_column=z2_end)
-        ws.cell(row=start_row, column=z1_end + 1, value=elabora_nombre)
-        ws.cell(row=start_row, column=z1_end + 1).font = Font(bold=True)
-
-        ws.merge_cells(start_row=start_row, start_column=firma_col, end_row=start_row, end_column=cp)
-        if elabora_img:
-            self._insert_signature_image(ws, elabora_img, f"{firma_anchor}{start_row}")
-        else:
-            ws.cell(row=start_row, column=firma_col, value=elabora_firma_texto)
-            ws.cell(row=start_row, column=firma_col).alignment = self.left
-
-        # Fila 2 (aprueba)
-        ws.merge_cells(start_row=start_row + 1, start_column=1, end_row=start_row + 1, end_column=z1_end)
-        ws.cell(
-            row=start_row + 1,
-            column=1,
-            value="NOMBRE NUTRICIONISTA - DIETISTA QUE APRUEBA LA GUIA POR PARTE DEL PAE SEM"
+        filas = (
+            (start_row, "NOMBRE NUTRICIONISTA - DIETISTA POR PARTE DEL OPERADOR",
+             elabora_nombre, elabora_img, elabora_firma_texto),
+            (start_row + 1, "NOMBRE NUTRICIONISTA - DIETISTA QUE APRUEBA LA GUIA POR PARTE DEL PAE SEM",
+             aprueba_nombre, aprueba_img, aprueba_firma_texto),
         )
-        ws.cell(row=start_row + 1, column=1).alignment = self.left
-        ws.cell(row=start_row + 1, column=1).font = Font(bold=True)
-
-        ws.merge_cells(start_row=start_row + 1, start_column=z1_end + 1, end_row=start_row + 1, end_column=z2_end)
-        ws.cell(row=start_row + 1, column=z1_end + 1, value=aprueba_nombre)
-        ws.cell(row=start_row + 1, column=z1_end + 1).font = Font(bold=True)
-
-        ws.merge_cells(start_row=start_row + 1, start_column=firma_col, end_row=start_row + 1, end_column=cp)
-        if aprueba_img:
-            self._insert_signature_image(ws, aprueba_img, f"{firma_anchor}{start_row + 1}")
-        else:
-            ws.cell(row=start_row + 1, column=firma_col, value=aprueba_firma_texto)
-            ws.cell(row=start_row + 1, column=firma_col).alignment = self.left
+        for r, etiqueta, nombre, imagen, firma_texto in filas:
+            ws.merge_cells(start_row=r, start_column=1, end_row=r, end_column=z1_end)
+            ws.merge_cells(start_row=r, start_column=z1_end + 1, end_row=r, end_column=z2_end)
+            ws.merge_cells(start_row=r, start_column=firma_col, end_row=r, end_column=cp)
+
+            ws.cell(row=r, column=1, value=etiqueta).style = "guia_firma_etiqueta"
+            ws.cell(row=r, column=z1_end + 1, value=nombre).style = "guia_encabezado_negrita"
+            if imagen:
+                ws.cell(row=r, column=firma_col).style = "guia_encabezado"
+                self._insert_signature_image(ws, imagen, f"{firma_anchor}{r}")
+            else:
+                ws.cell(row=r, column=firma_col, value=firma_texto).style = "guia_firma_texto"
 
     @staticmethod
     def _get_image_source(field) -> str | None:
@@ -647,21 +596,32 @@ class GuiaPreparacionExcelGenerator:
         source = self._get_image_source(field)
         self._insert_signature_image(ws, source, anchor_cell, max_w=max_w, max_h=max_h)
 
-    @staticmethod
-    def _insert_signature_image(ws, image_source: str | None, anchor_cell: str, max_w: int = 240, max_h: int = 70) -> None:
+    def _leer_imagen(self, image_source: str) -> Optional[bytes]:
+        """Contenido de la imagen (path local o URL), leído una sola vez por libro."""
+        source = str(image_source).strip()
+        if source not in self._imagenes:
+            try:
+                if urlparse(source).scheme in ('http', 'https'):
+                    with urllib.request.urlopen(source) as resp:
+                        self._imagenes[source] = resp.read()
+                else:
+                    with open(source, 'rb') as archivo:
+                        self._imagenes[source] = archivo.read()
+            except Exception:
+                self._imagenes[source] = None
+        return self._imagenes[source]
+
+    def _insert_signature_image(self, ws, image_source: str | None, anchor_cell: str, max_w: int = 240, max_h: int = 70) -> None:
         """Inserta imagen en Excel desde path local o URL remota (Cloudinary).
-        Usa BytesIO para URLs: openpyxl 3.1+ lee todo en __init__ y no necesita el archivo al guardar."""
+        Cada hoja necesita su propio Image (el ancla va en el objeto), pero
+        todos se construyen desde los mismos bytes en memoria."""
         if not image_source:
             return
+        contenido = self._leer_imagen(image_source)
+        if contenido is None:
+            return
         try:
-            source = str(image_source).strip()
-            parsed = urlparse(source)
-            if parsed.scheme in ('http', 'https'):
-                with urllib.request.urlopen(source) as resp:
-                    img_source = io.BytesIO(resp.read())
-            else:
-                img_source = source
-            img = Image(img_source)
+            img = Image(io.BytesIO(contenido))
             img.width = min(img.width, max_w)
             img.height = min(img.height, max_h)
             ws.add_image(img, anchor_cell)
@@ -669,7 +629,8 @@ class GuiaPreparacionExcelGenerator:
             return
 
     def _apply_all_borders(self, ws) -> None:
-        max_row = ws.max_row
-        for row in range(1, max_row + 1):
-            for col in range(1, self.col_proc + 1):
-                ws.cell(row=row, column=col).border = self.border
+        """Borde en todas las celdas sin estilo propio (celdas vacías y combinadas)."""
+        for row in ws.iter_rows(min_row=1, max_row=ws.max_row, min_col=1, max_col=self.col_proc):
+            for cell in row:
+                if isinstance(cell, MergedCell) or not cell.has_style:
+                    cell.style = "guia_borde"
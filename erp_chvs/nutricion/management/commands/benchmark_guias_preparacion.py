@@ -0,0 +1,217 @@
+"""
+Management command: benchmark_guias_preparacion
+
+Siembra un programa PAE sintético (por defecto 20 menús con 6
+preparaciones de 5 ingredientes, análisis por los 5 niveles, catálogo de
+procedimientos y firmas con imagen), genera el Excel de guías de
+preparación y reporta tiempo, consultas a la BD y tamaño del archivo.
+Todo corre dentro de una transacción que se revierte al terminar; las
+imágenes de firma se escriben en un directorio temporal.
+
+Uso:
+    python manage.py benchmark_guias_preparacion
+    python manage.py benchmark_guias_preparacion --menus 20 --repeticiones 3 --guardar /tmp/guias.xlsx
+"""
+
+import random
+import tempfile
+import time
+from datetime import date
+from decimal import Decimal
+from io import BytesIO
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from nutricion.guia_preparacion_excel_generator import NIVELES_ORDEN_PAE, GuiaPreparacionExcelGenerator
+from nutricion.models import (
+    ComponentesAlimentos,
+    FirmaNutricionalContrato,
+    GruposAlimentos,
+    ProcedimientoPreparacion,
+    TablaAlimentos2018Icbf,
+    TablaAnalisisNutricionalMenu,
+    TablaIngredientesPorNivel,
+    TablaMenus,
+    TablaPreparacionIngredientes,
+    TablaPreparaciones,
+)
+from planeacion.models import Programa
+from principal.models import ModalidadesDeConsumo, PrincipalMunicipio, TablaGradosEscolaresUapa
+
+# Componentes en el orden de la modalidad 20501 (com1 es bebida: porción fija)
+COMPONENTES = ['com1', 'com2', 'com3', 'com12', 'com4', 'com9']
+PLATOS = [
+    'Arroz con pollo', 'Crema de ahuyama', 'Jugo de guayaba', 'Pasta en salsa napolitana',
+    'Lentejas guisadas', 'Ensalada de repollo y zanahoria', 'Arepa con queso', 'Huevo perico',
+    'Sopa de verduras', 'Carne en bistec', 'Colada de avena', 'Fríjoles rojos',
+]
+
+
+class _Revertir(Exception):
+    pass
+
+
+def _png(color) -> bytes:
+    from PIL import Image as PILImage
+
+    buffer = BytesIO()
+    PILImage.new('RGB', (480, 140), color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = 'Mide la generación del Excel de guías de preparación sobre un programa sintético.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--menus', type=int, default=20, help='Menús (hojas) del libro (default: 20)')
+        parser.add_argument('--preparaciones', type=int, default=6, help='Preparaciones por menú (default: 6)')
+        parser.add_argument('--ingredientes', type=int, default=5, help='Ingredientes por preparación (default: 5)')
+        parser.add_argument('--procedimientos', type=int, default=120, help='Tamaño del catálogo de procedimientos')
+        parser.add_argument('--repeticiones', type=int, default=3, help='Corridas; se reporta la mejor')
+        parser.add_argument('--guardar', help='Ruta donde dejar el último libro generado')
+        parser.add_argument('--semilla', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as media, override_settings(
+            MEDIA_ROOT=media,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+            },
+        ):
+            try:
+                with transaction.atomic():
+                    self._medir(options, Path(media))
+                    raise _Revertir
+            except _Revertir:
+                pass
+
+    def _medir(self, options, media: Path):
+        rng = random.Random(options['semilla'])
+        programa, modalidad = self._sembrar(options, rng, media)
+        generator_args = (programa.id, modalidad.id_modalidades)
+
+        self.stdout.write(
+            f"{options['menus']} menús × {options['preparaciones']} preparaciones × "
+            f"{options['ingredientes']} ingredientes, {options['procedimientos']} procedimientos"
+        )
+        mejor, consultas, stream = None, 0, None
+        for _ in range(options['repeticiones']):
+            with CaptureQueriesContext(connection) as ctx:
+                t0 = time.perf_counter()
+                stream = GuiaPreparacionExcelGenerator().generate(*generator_args)
+                segundos = time.perf_counter() - t0
+            mejor = segundos if mejor is None else min(mejor, segundos)
+            consultas = len(ctx.captured_queries)
+
+        contenido = stream.getvalue()
+        self.stdout.write(f"{'segundos':>9} {'consultas':>10} {'KB':>9}")
+        self.stdout.write(f"{mejor:9.2f} {consultas:10d} {len(contenido) / 1024:9.1f}")
+        if options['guardar']:
+            Path(options['guardar']).write_bytes(contenido)
+            self.stdout.write(self.style.SUCCESS(f"✓ Libro guardado en {options['guardar']}"))
+
+    def _sembrar(self, options, rng, media: Path):
+        municipio = PrincipalMunicipio.objects.create(
+            codigo_municipio=99_901, nombre_municipio='Municipio Benchmark', codigo_departamento='76'
+        )
+        programa = Programa.objects.create(
+            programa='Programa Benchmark', contrato='CT-BENCH', municipio=municipio, tipo_programa_id='pae',
+            fecha_inicial=date(2026, 1, 1), fecha_final=date(2026, 12, 31), estado='activo',
+        )
+        modalidad, _ = ModalidadesDeConsumo.objects.get_or_create(
+            id_modalidades='20501', defaults={'modalidad': 'COMPLEMENTO AM/PM PREPARADO', 'cod_modalidad': 'CAJM'}
+        )
+        niveles = [
+            TablaGradosEscolaresUapa.objects.get_or_create(
+                id_grado_escolar_uapa=slot, defaults={'nivel_escolar_uapa': slot}
+            )[0]
+            for slot in NIVELES_ORDEN_PAE
+        ]
+
+        grupo, _ = GruposAlimentos.objects.get_or_create(
+            id_grupo_alimentos='grp_bench', defaults={'grupo_alimentos': 'Benchmark'}
+        )
+        for id_componente in COMPONENTES:
+            ComponentesAlimentos.objects.get_or_create(
+                id_componente=id_componente,
+                defaults={'componente': f'Componente {id_componente}', 'id_grupo_alimentos': grupo},
+            )
+
+        alimentos = TablaAlimentos2018Icbf.objects.bulk_create([
+            TablaAlimentos2018Icbf(
+                codigo=f'BENCH{i:03d}', nombre_del_alimento=f'Alimento benchmark {i:03d}', humedad_g=Decimal('80'),
+                energia_kcal=100, energia_kj=418, proteina_g=Decimal('3'), lipidos_g=Decimal('3'),
+                carbohidratos_totales_g=Decimal('10'), calcio_mg=100, hierro_mg=Decimal('1'), sodio_mg=50,
+                parte_comestible_field=Decimal(rng.choice(['100', '85', '72'])),
+                factor_coccion=Decimal(rng.choice(['1.00', '2.40', '0.90'])),
+            )
+            for i in range(120)
+        ])
+
+        ProcedimientoPreparacion.objects.bulk_create([
+            ProcedimientoPreparacion(
+                nombre=PLATOS[i % len(PLATOS)] if i < len(PLATOS) else f'Preparación de catálogo {i}',
+                procedimiento=f'Paso a paso {i}: lavar, porcionar, cocinar y servir.',
+            )
+            for i in range(options['procedimientos'])
+        ])
+
+        menus = TablaMenus.objects.bulk_create([
+            TablaMenus(menu=str(n), id_modalidad=modalidad, id_contrato=programa)
+            for n in range(1, options['menus'] + 1)
+        ])
+        preparaciones = TablaPreparaciones.objects.bulk_create([
+            TablaPreparaciones(
+                # Nombres del catálogo, con el orden de las palabras cambiado o sin coincidencia
+                preparacion=rng.choice([
+                    PLATOS[(n + p) % len(PLATOS)],
+                    ' '.join(reversed(PLATOS[(n + p) % len(PLATOS)].split())),
+                    f'Preparación especial {n}-{p}',
+                ]),
+                id_menu=menu, id_componente_id=COMPONENTES[p % len(COMPONENTES)],
+            )
+            for n, menu in enumerate(menus)
+            for p in range(options['preparaciones'])
+        ])
+        relaciones = TablaPreparacionIngredientes.objects.bulk_create([
+            TablaPreparacionIngredientes(
+                id_preparacion=prep, id_ingrediente_siesa=alimento, gramaje=Decimal(rng.randint(5, 120)),
+            )
+            for prep in preparaciones
+            for alimento in rng.sample(alimentos, options['ingredientes'])
+        ])
+        analisis = TablaAnalisisNutricionalMenu.objects.bulk_create([
+            TablaAnalisisNutricionalMenu(id_menu=menu, id_nivel_escolar_uapa=nivel)
+            for menu in menus
+            for nivel in niveles
+        ])
+        analisis_por_menu = {}
+        for a in analisis:
+            analisis_por_menu.setdefault(a.id_menu_id, []).append(a)
+        menu_de_prep = {prep.id_preparacion: prep.id_menu_id for prep in preparaciones}
+        TablaIngredientesPorNivel.objects.bulk_create([
+            TablaIngredientesPorNivel(
+                id_analisis=a, id_preparacion_id=rel.id_preparacion_id, id_preparacion_ingrediente=rel,
+                id_ingrediente_siesa_id=rel.id_ingrediente_siesa_id, codigo_icbf=rel.id_ingrediente_siesa_id,
+                peso_neto=Decimal(rng.randint(5, 120)), peso_bruto=Decimal(rng.randint(5, 140)),
+            )
+            for rel in relaciones
+            for a in analisis_por_menu[menu_de_prep[rel.id_preparacion_id]]
+        ], batch_size=2000)
+
+        carpeta = media / 'firmas_nutricion'
+        carpeta.mkdir()
+        for nombre, color in (('elabora.png', 'navy'), ('aprueba.png', 'darkgreen')):
+            (carpeta / nombre).write_bytes(_png(color))
+        FirmaNutricionalContrato.objects.create(
+            programa=programa,
+            elabora_nombre='Dietista Elabora', elabora_matricula='MAT-1',
+            elabora_firma_imagen='firmas_nutricion/elabora.png',
+            aprueba_nombre='Dietista Aprueba', aprueba_matricula='MAT-2',
+            aprueba_firma_imagen='firmas_nutricion/aprueba.png',
+        )
+        return programa, modalidad
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+# Columnas del typeahead de ingredientes del editor (services/catalogo_editor_service.py)
+TABLA = 'nutricion_tabla_alimentos_2018_icb'
+COLUMNAS = ['codigo', 'nombre_del_alimento']
+
+
+def _nombre(columna):
+    return f'{TABLA}_{columna}_trgm_idx'
+
+
+def crear_indices_trigram(apps, schema_editor):
+    """
+    Índices GIN trigram para los UPPER(col) LIKE de la búsqueda de
+    ingredientes. Solo si el servidor ofrece pg_trgm; sin la extensión la
+    búsqueda funciona sin índice.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for columna in COLUMNAS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {_nombre(columna)} ON {TABLA} '
+            f'USING gin (UPPER({columna}::text) gin_trgm_ops)'
+        )
+
+
+def eliminar_indices_trigram(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for columna in COLUMNAS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {_nombre(columna)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutricion', '0044_nullable_micros_requerimientos_comedores'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices_trigram, eliminar_indices_trigram),
+    ]
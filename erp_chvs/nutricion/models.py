@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.core.validators import MinValueValidator, MaxValueValidator
 from principal.models import ModalidadesDeConsumo, TablaGradosEscolaresUapa
 from planeacion.models import Programa
@@ -1498,3 +1500,61 @@ class EquivalenciaICBFCompras(models.Model):
             f"{self.id_ingrediente_compras.nombre_ingrediente} "
             f"[Menú {self.id_menu.menu} · {self.id_programa.programa}]"
         )
+
+
+# ===== Invalidación de la grilla cacheada del match ICBF → Compras =====
+
+def _invalidar_match_programa(programa_id):
+    """Invalida al confirmar la transacción; programa None = todos los programas."""
+    from .services.match_icbf_service import invalidar_dashboard_match
+
+    transaction.on_commit(lambda: invalidar_dashboard_match(programa_id))
+
+
+@receiver([post_save, post_delete], sender=EquivalenciaICBFCompras)
+def _match_cambio_equivalencia(sender, instance, **kwargs):
+    _invalidar_match_programa(instance.id_programa_id)
+
+
+@receiver([post_save, post_delete], sender=TablaMenus)
+def _match_cambio_menu(sender, instance, **kwargs):
+    _invalidar_match_programa(instance.id_contrato_id)
+
+
+@receiver([post_save, post_delete], sender=TablaPreparaciones)
+def _match_cambio_preparacion(sender, instance, **kwargs):
+    _invalidar_match_programa(
+        TablaMenus.objects.filter(id_menu=instance.id_menu_id).values_list('id_contrato_id', flat=True).first()
+    )
+
+
+@receiver([post_save, post_delete], sender=TablaPreparacionIngredientes)
+def _match_cambio_ingrediente_preparacion(sender, instance, **kwargs):
+    _invalidar_match_programa(
+        TablaPreparaciones.objects.filter(id_preparacion=instance.id_preparacion_id)
+        .values_list('id_menu__id_contrato_id', flat=True).first()
+    )
+
+
+@receiver([post_save, post_delete], sender=TablaAlimentos2018Icbf)
+@receiver([post_save, post_delete], sender=TablaIngredientesSiesa)
+def _match_cambio_catalogo(sender, instance, **kwargs):
+    _invalidar_match_programa(None)
+
+
+# ===== Invalidación de los catálogos cacheados del editor de preparaciones =====
+
+def _invalidar_catalogo_editor(nombre):
+    from .services.catalogo_editor_service import invalidar_catalogo
+
+    transaction.on_commit(lambda: invalidar_catalogo(nombre))
+
+
+@receiver([post_save, post_delete], sender=TablaAlimentos2018Icbf)
+def _catalogo_editor_cambio_alimento(sender, instance, **kwargs):
+    _invalidar_catalogo_editor('ingredientes')
+
+
+@receiver([post_save, post_delete], sender=ComponentesAlimentos)
+def _catalogo_editor_cambio_componente(sender, instance, **kwargs):
+    _invalidar_catalogo_editor('componentes')
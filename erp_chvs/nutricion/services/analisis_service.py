@@ -5,6 +5,7 @@ Orquesta la lógica completa del análisis nutricional de menús.
 """
 
 import copy
+from decimal import ROUND_HALF_UP, Decimal
 from typing import Dict, List, Optional
 from django.db.models import QuerySet
 
@@ -63,6 +64,35 @@ from ..models import (
 from .calculo_service import CalculoService
 
 
+_CAMPOS_TOTALES = ('calorias', 'proteina', 'grasa', 'cho', 'calcio', 'hierro', 'sodio', 'peso_neto', 'peso_bruto')
+_CAMPOS_PORCENTAJES = ('calorias', 'proteina', 'grasa', 'cho', 'calcio', 'hierro', 'sodio')
+_CAMPOS_ANALISIS = (
+    [f'total_{c}' for c in _CAMPOS_TOTALES]
+    + [f'porcentaje_{c}' for c in _CAMPOS_PORCENTAJES]
+    + ['usuario_modificacion', 'fecha_actualizacion']
+)
+_CAMPOS_INGREDIENTE_NIVEL = (
+    'peso_neto', 'peso_bruto', 'calorias', 'proteina', 'grasa', 'cho', 'calcio', 'hierro', 'sodio'
+)
+
+
+def _entero(valor) -> Optional[int]:
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _codigo_ingrediente(ing_data: Dict) -> str:
+    """Código del producto: id_ingrediente_siesa o, en datos antiguos, id_ingrediente (ICBF)."""
+    return str(ing_data.get('id_ingrediente_siesa') or ing_data.get('id_ingrediente') or '')
+
+
+def _decimal_2(valor) -> Decimal:
+    """Valor redondeado a 2 decimales, como queda en las columnas numeric(10, 2)."""
+    return Decimal(str(valor or 0)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
 class AnalisisNutricionalService:
     """
     Servicio principal para análisis nutricional de menús.
@@ -614,7 +644,7 @@ class AnalisisNutricionalService:
         usuario: str = 'sistema'
     ) -> Dict:
         """
-        Guarda el análisis nutricional en la base de datos.
+        Guarda el análisis nutricional de un nivel escolar en la base de datos.
 
         Args:
             id_menu: ID del menú
@@ -627,112 +657,185 @@ class AnalisisNutricionalService:
         Returns:
             Dict con resultado del guardado
         """
+        resultado = AnalisisNutricionalService.guardar_analisis_menu(
+            id_menu,
+            [{
+                'id_nivel_escolar': id_nivel_escolar,
+                'totales': totales,
+                'porcentajes': porcentajes,
+                'ingredientes': ingredientes,
+            }],
+            usuario=usuario,
+        )
+        nivel = resultado['niveles'][0]
+        return {
+            'success': True,
+            'message': 'Análisis nutricional guardado exitosamente',
+            'analisis_id': nivel['analisis_id'],
+            'ingredientes_guardados': nivel['ingredientes_guardados'],
+            'created': nivel['created']
+        }
+
+    @staticmethod
+    def guardar_analisis_menu(id_menu: int, niveles: List[Dict], usuario: str = 'sistema') -> Dict:
+        """
+        Guarda en bloque el análisis de uno o varios niveles escolares de un menú.
+
+        Preparaciones, productos, relaciones preparación-ingrediente e
+        ingredientes ya guardados se leen con unas pocas consultas IN; se
+        calcula la diferencia contra lo existente (clave: análisis + relación
+        preparación-ingrediente) y se escribe con delete/bulk_update/bulk_create,
+        una sola ronda de escrituras para todo el menú. Como antes, se omiten
+        los ingredientes sin preparación, producto o relación.
+
+        Args:
+            id_menu: ID del menú
+            niveles: Lista de dicts con id_nivel_escolar, totales, porcentajes e ingredientes
+            usuario: Usuario que realiza el guardado
+
+        Returns:
+            Dict con el resultado por nivel y los conteos de la diferencia aplicada
+        """
         from django.db import transaction
+        from django.utils import timezone
         from principal.models import TablaGradosEscolaresUapa
 
-        # Validar menú existe
         menu = TablaMenus.objects.get(id_menu=id_menu)
 
-        # Validar nivel escolar existe
-        nivel_escolar = TablaGradosEscolaresUapa.objects.get(
-            id_grado_escolar_uapa=id_nivel_escolar
-        )
+        ids_nivel = [datos['id_nivel_escolar'] for datos in niveles]
+        niveles_escolares = TablaGradosEscolaresUapa.objects.in_bulk(ids_nivel)
+        faltantes = set(ids_nivel) - set(niveles_escolares)
+        if faltantes:
+            raise TablaGradosEscolaresUapa.DoesNotExist(
+                f"Nivel escolar no encontrado: {', '.join(sorted(map(str, faltantes)))}"
+            )
 
-        with transaction.atomic():
-            # Crear o actualizar análisis
-            analisis, created = TablaAnalisisNutricionalMenu.objects.get_or_create(
-                id_menu=menu,
-                id_nivel_escolar_uapa=nivel_escolar,
-                defaults={'usuario_modificacion': usuario}
+        # ---- Lecturas: una consulta IN por tabla referenciada ----
+        todos = [ing for datos in niveles for ing in datos.get('ingredientes', [])]
+        ids_preparacion = {_entero(ing.get('id_preparacion')) for ing in todos} - {None}
+        codigos = {_codigo_ingrediente(ing) for ing in todos} - {''}
+
+        preparaciones = TablaPreparaciones.objects.in_bulk(ids_preparacion)
+        productos = TablaIngredientesSiesa.objects.in_bulk(codigos)
+        # Compatibilidad: si el producto no existe en SIESA, se crea a partir de ICBF
+        productos_nuevos = []
+        if codigos - set(productos):
+            productos_nuevos = [
+                TablaIngredientesSiesa(id_ingrediente_siesa=codigo, nombre_ingrediente=nombre)
+                for codigo, nombre in TablaAlimentos2018Icbf.objects.filter(
+                    codigo__in=codigos - set(productos)
+                ).values_list('codigo', 'nombre_del_alimento')
+            ]
+        relaciones = {
+            (rel.id_preparacion_id, rel.id_ingrediente_siesa_id): rel
+            for rel in TablaPreparacionIngredientes.objects.filter(
+                id_preparacion_id__in=preparaciones, id_ingrediente_siesa_id__in=codigos
             )
+        }
 
-            print(f"[DEBUG] Guardando análisis - Menu ID: {id_menu}, Nivel: {id_nivel_escolar}, Created: {created}")
-            print(f"[DEBUG] Totales recibidos: {totales}")
-            print(f"[DEBUG] Porcentajes recibidos: {porcentajes}")
-            print(f"[DEBUG] Total ingredientes: {len(ingredientes)}")
-
-            # Actualizar totales
-            analisis.total_calorias = totales.get('calorias', 0)
-            analisis.total_proteina = totales.get('proteina', 0)
-            analisis.total_grasa = totales.get('grasa', 0)
-            analisis.total_cho = totales.get('cho', 0)
-            analisis.total_calcio = totales.get('calcio', 0)
-            analisis.total_hierro = totales.get('hierro', 0)
-            analisis.total_sodio = totales.get('sodio', 0)
-            analisis.total_peso_neto = totales.get('peso_neto', 0)
-            analisis.total_peso_bruto = totales.get('peso_bruto', 0)
-
-            # Actualizar porcentajes
-            analisis.porcentaje_calorias = porcentajes.get('calorias', 0)
-            analisis.porcentaje_proteina = porcentajes.get('proteina', 0)
-            analisis.porcentaje_grasa = porcentajes.get('grasa', 0)
-            analisis.porcentaje_cho = porcentajes.get('cho', 0)
-            analisis.porcentaje_calcio = porcentajes.get('calcio', 0)
-            analisis.porcentaje_hierro = porcentajes.get('hierro', 0)
-            analisis.porcentaje_sodio = porcentajes.get('sodio', 0)
-
-            analisis.usuario_modificacion = usuario
-            analisis.save()
-
-            # Eliminar ingredientes anteriores y crear nuevos
-            TablaIngredientesPorNivel.objects.filter(id_analisis=analisis).delete()
-
-            ingredientes_guardados = 0
-            for ing_data in ingredientes:
-                try:
-                    preparacion = TablaPreparaciones.objects.get(
-                        id_preparacion=ing_data['id_preparacion']
+        with transaction.atomic():
+            if productos_nuevos:
+                TablaIngredientesSiesa.objects.bulk_create(productos_nuevos, ignore_conflicts=True)
+                productos.update({p.pk: p for p in productos_nuevos})
+
+            # ---- Análisis por nivel: crear los que faltan, actualizar el resto ----
+            analisis_por_nivel = {
+                a.id_nivel_escolar_uapa_id: a
+                for a in TablaAnalisisNutricionalMenu.objects.select_for_update().filter(
+                    id_menu=menu, id_nivel_escolar_uapa_id__in=ids_nivel
+                )
+            }
+            existentes = list(analisis_por_nivel.values())
+            nuevos = []
+            ahora = timezone.now()
+            for datos in niveles:
+                analisis = analisis_por_nivel.get(datos['id_nivel_escolar'])
+                if analisis is None:
+                    analisis = TablaAnalisisNutricionalMenu(
+                        id_menu=menu, id_nivel_escolar_uapa=niveles_escolares[datos['id_nivel_escolar']]
                     )
-                    ingrediente_codigo = ing_data.get('id_ingrediente_siesa') or ing_data.get('id_ingrediente')
-                    ingrediente = TablaIngredientesSiesa.objects.filter(
-                        id_ingrediente_siesa=ingrediente_codigo
-                    ).first()
-
-                    # Compatibilidad: si no existe en SIESA, crearlo a partir de ICBF
-                    if not ingrediente and ingrediente_codigo:
-                        alimento_icbf = TablaAlimentos2018Icbf.objects.filter(codigo=ingrediente_codigo).first()
-                        if alimento_icbf:
-                            ingrediente, _ = TablaIngredientesSiesa.objects.get_or_create(
-                                id_ingrediente_siesa=alimento_icbf.codigo,
-                                defaults={'nombre_ingrediente': alimento_icbf.nombre_del_alimento}
-                            )
-                    if not ingrediente:
-                        continue
-
-                    preparacion_ingrediente = TablaPreparacionIngredientes.objects.filter(
-                        id_preparacion=preparacion,
-                        id_ingrediente_siesa_id=ingrediente_codigo
-                    ).first()
-                    if not preparacion_ingrediente:
+                    analisis_por_nivel[datos['id_nivel_escolar']] = analisis
+                    nuevos.append(analisis)
+                for campo in _CAMPOS_TOTALES:
+                    setattr(analisis, f'total_{campo}', datos['totales'].get(campo, 0))
+                for campo in _CAMPOS_PORCENTAJES:
+                    setattr(analisis, f'porcentaje_{campo}', datos['porcentajes'].get(campo, 0))
+                analisis.usuario_modificacion = usuario
+                analisis.fecha_actualizacion = ahora  # bulk_update no aplica auto_now
+
+            if existentes:
+                TablaAnalisisNutricionalMenu.objects.bulk_update(existentes, _CAMPOS_ANALISIS)
+            TablaAnalisisNutricionalMenu.objects.bulk_create(nuevos)
+
+            # ---- Ingredientes: diferencia contra lo guardado ----
+            actuales, sobrantes = {}, []
+            for fila in TablaIngredientesPorNivel.objects.filter(id_analisis__in=existentes):
+                clave = (fila.id_analisis_id, fila.id_preparacion_ingrediente_id)
+                if clave in actuales:
+                    sobrantes.append(fila.pk)  # Duplicados que dejaba el guardado anterior
+                else:
+                    actuales[clave] = fila
+
+            deseados = {}
+            guardados_por_nivel = {}
+            for datos in niveles:
+                analisis = analisis_por_nivel[datos['id_nivel_escolar']]
+                for ing_data in datos.get('ingredientes', []):
+                    preparacion = preparaciones.get(_entero(ing_data.get('id_preparacion')))
+                    codigo = _codigo_ingrediente(ing_data)
+                    producto = productos.get(codigo)
+                    relacion = relaciones.get((preparacion.pk, codigo)) if preparacion else None
+                    if not producto or not relacion:
                         continue
+                    valores = {campo: _decimal_2(ing_data.get(campo, 0)) for campo in _CAMPOS_INGREDIENTE_NIVEL}
+                    valores.update(id_ingrediente_siesa_id=producto.pk, codigo_icbf=codigo)
+                    deseados[(analisis.pk, relacion.pk)] = (analisis, preparacion, relacion, valores)
+                    guardados_por_nivel[analisis.pk] = guardados_por_nivel.get(analisis.pk, 0) + 1
+
+            por_crear, por_actualizar, sin_cambios = [], [], 0
+            for clave, (analisis, preparacion, relacion, valores) in deseados.items():
+                fila = actuales.pop(clave, None)
+                if fila is None:
+                    por_crear.append(TablaIngredientesPorNivel(
+                        id_analisis=analisis, id_preparacion=preparacion,
+                        id_preparacion_ingrediente=relacion, **valores
+                    ))
+                elif any(getattr(fila, campo) != valor for campo, valor in valores.items()):
+                    for campo, valor in valores.items():
+                        setattr(fila, campo, valor)
+                    por_actualizar.append(fila)
+                else:
+                    sin_cambios += 1
+
+            # Lo que quedó en `actuales` ya no viene en el análisis
+            sobrantes.extend(fila.pk for fila in actuales.values())
+            if sobrantes:
+                TablaIngredientesPorNivel.objects.filter(pk__in=sobrantes).delete()
+            if por_actualizar:
+                TablaIngredientesPorNivel.objects.bulk_update(
+                    por_actualizar, _CAMPOS_INGREDIENTE_NIVEL + ('id_ingrediente_siesa', 'codigo_icbf'),
+                    batch_size=500
+                )
+            TablaIngredientesPorNivel.objects.bulk_create(por_crear, batch_size=500)
 
-                    TablaIngredientesPorNivel.objects.create(
-                        id_analisis=analisis,
-                        id_preparacion=preparacion,
-                        id_preparacion_ingrediente=preparacion_ingrediente,
-                        id_ingrediente_siesa=ingrediente,
-                        peso_neto=ing_data.get('peso_neto', 0),
-                        peso_bruto=ing_data.get('peso_bruto', 0),
-                        calorias=ing_data.get('calorias', 0),
-                        proteina=ing_data.get('proteina', 0),
-                        grasa=ing_data.get('grasa', 0),
-                        cho=ing_data.get('cho', 0),
-                        calcio=ing_data.get('calcio', 0),
-                        hierro=ing_data.get('hierro', 0),
-                        sodio=ing_data.get('sodio', 0)
-                    )
-                    ingredientes_guardados += 1
-
-                except (TablaPreparaciones.DoesNotExist, TablaIngredientesSiesa.DoesNotExist):
-                    continue
+        creados = {id(a) for a in nuevos}
+        resultado_niveles = [{
+            'id_nivel_escolar': datos['id_nivel_escolar'],
+            'analisis_id': analisis_por_nivel[datos['id_nivel_escolar']].id_analisis,
+            'ingredientes_guardados': guardados_por_nivel.get(analisis_por_nivel[datos['id_nivel_escolar']].pk, 0),
+            'created': id(analisis_por_nivel[datos['id_nivel_escolar']]) in creados,
+        } for datos in niveles]
 
-            return {
-                'success': True,
-                'message': 'Análisis nutricional guardado exitosamente',
-                'analisis_id': analisis.id_analisis,
-                'ingredientes_guardados': ingredientes_guardados,
-                'created': created
-            }
+        return {
+            'success': True,
+            'message': 'Análisis nutricional guardado exitosamente',
+            'niveles': resultado_niveles,
+            'ingredientes_guardados': sum(n['ingredientes_guardados'] for n in resultado_niveles),
+            'creados': len(por_crear),
+            'actualizados': len(por_actualizar),
+            'eliminados': len(sobrantes),
+            'sin_cambios': sin_cambios,
+        }
 
     @staticmethod
     def obtener_analisis_masivo_por_modalidad(programa_id: int, modalidad_id: int) -> Dict:
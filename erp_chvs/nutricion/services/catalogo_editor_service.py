@@ -0,0 +1,114 @@
+"""
+Catálogos estáticos del editor de preparaciones.
+
+El editor ya no incrusta en cada página la tabla ICBF ni los componentes:
+los pide a un endpoint aparte. Cada catálogo se serializa una sola vez y
+se cachea con su ETag (hash del contenido) en la caché local del worker,
+bajo una versión que cambia cuando se modifica la tabla de origen (señales
+en nutricion.models). Las versiones viven en la caché compartida
+'versiones', así que un cambio hecho en un worker invalida el catálogo de
+todos. La página enlaza el catálogo con ?v=<etag> para que el navegador
+lo guarde como inmutable; al cambiar el contenido cambia la URL.
+
+Los ingredientes se buscan en el servidor (typeahead) en lugar de
+filtrarse en el navegador sobre el catálogo completo.
+"""
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Upper
+
+from ..models import ComponentesAlimentos, TablaAlimentos2018Icbf
+
+_CACHE_PREFIJO = 'nutricion:catalogo_editor:'
+LIMITE_BUSQUEDA = 20
+LIMITE_BUSQUEDA_MAX = 50
+
+
+def _catalogo_ingredientes():
+    return list(
+        TablaAlimentos2018Icbf.objects.values('codigo', 'nombre_del_alimento').order_by('nombre_del_alimento')
+    )
+
+
+def _catalogo_componentes():
+    return list(
+        ComponentesAlimentos.objects.values('id_componente', 'componente').order_by('componente')
+    )
+
+
+CATALOGOS = {
+    'ingredientes': _catalogo_ingredientes,
+    'componentes': _catalogo_componentes,
+}
+
+
+def _clave_version(nombre) -> str:
+    return f'{_CACHE_PREFIJO}version:{nombre}'
+
+
+def version_catalogo(nombre) -> str:
+    """Versión del catálogo; cambia al invalidar."""
+    return caches['versiones'].get_or_set(_clave_version(nombre), uuid.uuid4().hex, None)
+
+
+def invalidar_catalogo(nombre) -> None:
+    caches['versiones'].set(_clave_version(nombre), uuid.uuid4().hex, None)
+
+
+def obtener_catalogo(nombre) -> dict:
+    """
+    Catálogo serializado con caché (NUTRICION_CATALOGO_EDITOR_CACHE_TTL segundos).
+
+    Returns:
+        {'contenido': bytes JSON, 'etag': hash corto del contenido}
+    """
+    clave = f'{_CACHE_PREFIJO}{nombre}:{version_catalogo(nombre)}'
+    catalogo = cache.get(clave)
+    if catalogo is None:
+        contenido = json.dumps(CATALOGOS[nombre](), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        catalogo = {'contenido': contenido, 'etag': hashlib.sha256(contenido).hexdigest()[:16]}
+        cache.set(clave, catalogo, getattr(settings, 'NUTRICION_CATALOGO_EDITOR_CACHE_TTL', 86400))
+    return catalogo
+
+
+def buscar_ingredientes(q, limite=LIMITE_BUSQUEDA):
+    """
+    Ingredientes ICBF para el typeahead del editor.
+
+    Coinciden los que empiezan por el código buscado o contienen en el
+    nombre todas las palabras de la búsqueda (en cualquier orden). Primero
+    los de código con ese prefijo, luego los de nombre con ese prefijo y
+    después el resto, cada grupo por nombre. Las búsquedas UPPER(...) LIKE
+    usan los índices trigram de la migración 0045.
+    """
+    q = (q or '').strip()
+    tokens = q.upper().split()
+    if not tokens:
+        return []
+    limite = max(1, min(int(limite), LIMITE_BUSQUEDA_MAX))
+
+    q_upper = ' '.join(tokens)
+    condicion = Q(codigo_upper__startswith=q_upper)
+    por_nombre = Q()
+    for token in tokens:
+        por_nombre &= Q(nombre_upper__contains=token)
+    condicion |= por_nombre
+
+    return list(
+        TablaAlimentos2018Icbf.objects
+        .annotate(codigo_upper=Upper('codigo'), nombre_upper=Upper('nombre_del_alimento'))
+        .filter(condicion)
+        .annotate(prioridad=Case(
+            When(codigo_upper__startswith=q_upper, then=Value(0)),
+            When(nombre_upper__startswith=q_upper, then=Value(1)),
+            default=Value(2),
+            output_field=IntegerField(),
+        ))
+        .order_by('prioridad', 'nombre_del_alimento')
+        .values('codigo', 'nombre_del_alimento')[:limite]
+    )
@@ -2,139 +2,291 @@
 Servicio para el match ICBF → Compras.
 
 Granularidad: (ingrediente_icbf, programa, menú) → 1 producto de compras.
+
+La grilla del dashboard se cachea por programa en la caché local del
+worker; las escrituras sobre preparaciones, ingredientes, menús y matches
+cambian la versión del programa (señales en nutricion.models). Las
+versiones viven en la caché compartida 'versiones', así que un cambio
+hecho en un worker invalida la grilla de todos.
 """
+import uuid
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.db.models import F
+
 from ..models import (
+    TablaAlimentos2018Icbf,
+    TablaIngredientesSiesa,
     TablaPreparacionIngredientes,
     EquivalenciaICBFCompras,
 )
 
+_CACHE_PREFIJO = 'nutricion:match_icbf:'
+TAMANO_PAGINA_DASHBOARD = 25
+
 
-def obtener_dashboard_match(programa_id):
+def asignar_productos_masivo(programa_id, asignaciones, usuario=None, solo_sin_asignar=False):
     """
-    Devuelve el contexto necesario para renderizar el dashboard de match.
+    Asigna productos de compras a varios ingredientes ICBF de un programa a la vez.
+
+    Cada asignación (codigo_icbf → codigo_siesa) se aplica a todos los menús
+    del programa donde aparece el ingrediente. Alimentos, productos, menús y
+    matches existentes se leen con una consulta cada uno y todo se escribe con
+    un solo bulk_create(update_conflicts=True) sobre
+    (id_alimento_icbf, id_programa, id_menu).
+
+    Args:
+        programa_id: ID del programa
+        asignaciones: {codigo_icbf: codigo_siesa}
+        usuario: Usuario que realiza la asignación
+        solo_sin_asignar: True = no sobreescribe los menús que ya tienen match activo
 
     Returns:
         {
-            'filas': [...],     # Lista de ingredientes con sus menús y matches
-            'total': int,       # Total de ingredientes únicos
-            'con_match': int,   # Ingredientes con todos los menús asignados
-            'sin_match': int,   # Ingredientes con al menos un menú sin asignar
+            'creados': int,
+            'actualizados': int,
+            'matches': {codigo_icbf: [{'id', 'menu_id', 'menu_num', 'codigo_siesa', ...}]},
+            'errores': [{'codigo_icbf', 'error'}],
         }
     """
-    ingredientes_data = _obtener_ingredientes_programa(programa_id)
-
-    # Índice de matches por (codigo_icbf, menu_id)
-    matches_dict = {
-        (eq.id_alimento_icbf_id, eq.id_menu_id): eq
-        for eq in EquivalenciaICBFCompras.objects.filter(
-            id_programa_id=programa_id, activo=True
-        ).select_related('id_ingrediente_compras', 'id_menu')
-    }
+    codigos = list(asignaciones)
+    alimentos = dict(
+        TablaAlimentos2018Icbf.objects.filter(codigo__in=codigos).values_list('codigo', 'nombre_del_alimento')
+    )
+    productos = TablaIngredientesSiesa.objects.in_bulk(set(asignaciones.values()))
 
-    filas = []
-    total_ingredientes = 0
-    total_asignados_completos = 0
-
-    for datos in ingredientes_data:
-        alimento = datos['alimento']
-        menus_filas = []
-        asignados = 0
-
-        for menu_data in datos['menus']:
-            match = matches_dict.get((alimento.codigo, menu_data['menu_id']))
-            if match:
-                asignados += 1
-            menus_filas.append({
-                'menu_id':       menu_data['menu_id'],
-                'menu_num':      menu_data['menu_num'],
-                'modalidad':     menu_data['modalidad'],
-                'preparaciones': menu_data['preparaciones'],
-                'match':         match,
-            })
+    menus_por_alimento = {}
+    for codigo, menu_id, menu_num in (
+        TablaPreparacionIngredientes.objects
+        .filter(id_preparacion__id_menu__id_contrato_id=programa_id, id_ingrediente_siesa_id__in=alimentos)
+        .values_list('id_ingrediente_siesa_id', 'id_preparacion__id_menu_id', 'id_preparacion__id_menu__menu')
+        .distinct()
+    ):
+        menus_por_alimento.setdefault(codigo, {})[menu_id] = menu_num
 
-        total_menus = len(menus_filas)
-        completo = (asignados == total_menus)
+    existentes = {
+        (codigo, menu_id): activo
+        for codigo, menu_id, activo in EquivalenciaICBFCompras.objects.filter(
+            id_programa_id=programa_id, id_alimento_icbf_id__in=menus_por_alimento
+        ).values_list('id_alimento_icbf_id', 'id_menu_id', 'activo')
+    }
 
-        total_ingredientes += 1
-        if completo:
-            total_asignados_completos += 1
+    errores, filas = [], []
+    for codigo_icbf, codigo_siesa in asignaciones.items():
+        if codigo_icbf not in alimentos:
+            errores.append({'codigo_icbf': codigo_icbf, 'error': 'Alimento ICBF no encontrado'})
+        elif codigo_siesa not in productos:
+            errores.append({'codigo_icbf': codigo_icbf, 'error': 'Producto Siesa no encontrado'})
+        elif codigo_icbf not in menus_por_alimento:
+            errores.append({'codigo_icbf': codigo_icbf, 'error': 'El ingrediente no aparece en ningún menú del programa'})
+        else:
+            for menu_id, menu_num in sorted(menus_por_alimento[codigo_icbf].items(), key=lambda m: m[1]):
+                if solo_sin_asignar and existentes.get((codigo_icbf, menu_id)):
+                    continue
+                filas.append((codigo_icbf, menu_num, EquivalenciaICBFCompras(
+                    id_alimento_icbf_id=codigo_icbf,
+                    id_programa_id=programa_id,
+                    id_menu_id=menu_id,
+                    id_ingrediente_compras=productos[codigo_siesa],
+                    activo=True,
+                    usuario=usuario,
+                )))
 
-        filas.append({
-            'alimento':    alimento,
-            'menus':       menus_filas,
-            'total_menus': total_menus,
-            'asignados':   asignados,
-            'tiene_match': asignados > 0,
-            'completo':    completo,
+    with transaction.atomic():
+        EquivalenciaICBFCompras.objects.bulk_create(
+            [eq for _, _, eq in filas],
+            update_conflicts=True,
+            unique_fields=['id_alimento_icbf', 'id_programa', 'id_menu'],
+            update_fields=['id_ingrediente_compras', 'activo', 'usuario', 'fecha_actualizacion'],
+        )
+        if filas:
+            transaction.on_commit(lambda: invalidar_dashboard_match(programa_id))
+
+    matches = {}
+    for codigo_icbf, menu_num, eq in filas:
+        producto = eq.id_ingrediente_compras
+        matches.setdefault(codigo_icbf, []).append({
+            'id':               eq.id,
+            'menu_id':          eq.id_menu_id,
+            'menu_num':         menu_num,
+            'codigo_siesa':     producto.id_ingrediente_siesa,
+            'nombre_siesa':     producto.nombre_ingrediente,
+            'presentacion':     producto.presentacion or '',
+            'contenido_gramos': str(producto.contenido_gramos) if producto.contenido_gramos else '',
         })
 
+    actualizados = sum(1 for codigo_icbf, _, eq in filas if (codigo_icbf, eq.id_menu_id) in existentes)
+    return {
+        'creados':      len(filas) - actualizados,
+        'actualizados': actualizados,
+        'matches':      matches,
+        'errores':      errores,
+    }
+
+
+def _clave_version(programa_id) -> str:
+    return f'{_CACHE_PREFIJO}version:{programa_id or "todos"}'
+
+
+def version_dashboard(programa_id=None) -> str:
+    """Versión de la grilla del programa (o de todos, con None); cambia al invalidar."""
+    return caches['versiones'].get_or_set(_clave_version(programa_id), uuid.uuid4().hex, None)
+
+
+def invalidar_dashboard_match(programa_id=None) -> None:
+    """
+    Descarta la grilla cacheada del programa; sin programa, la de todos
+    (cambios de catálogo que no se pueden atribuir a un programa).
+    """
+    caches['versiones'].set(_clave_version(programa_id), uuid.uuid4().hex, None)
+
+
+def obtener_grilla_match(programa_id):
+    """_construir_grilla() con caché por programa (NUTRICION_MATCH_CACHE_TTL segundos)."""
+    clave = f'{_CACHE_PREFIJO}{programa_id}:{version_dashboard()}:{version_dashboard(programa_id)}'
+    filas = cache.get(clave)
+    if filas is None:
+        filas = _construir_grilla(programa_id)
+        cache.set(clave, filas, getattr(settings, 'NUTRICION_MATCH_CACHE_TTL', 600))
+    return filas
+
+
+def obtener_dashboard_match(programa_id, estado='todos', q='', pagina=1, tamano=None):
+    """
+    Devuelve el contexto necesario para renderizar el dashboard de match.
+
+    La grilla completa sale de la caché; el filtro y la página se aplican
+    sobre ella sin volver a consultar.
+
+    Args:
+        programa_id: ID del programa
+        estado: 'todos', 'pendientes' (algún menú sin asignar) o 'completos'
+        q: Texto a buscar en el nombre o código del alimento
+        pagina: Número de página (desde 1)
+        tamano: Ingredientes por página; None = todos
+
+    Returns:
+        {
+            'filas': [...],     # Ingredientes de la página con sus menús y matches
+            'total': int,       # Total de ingredientes únicos del programa
+            'con_match': int,   # Ingredientes con todos los menús asignados
+            'sin_match': int,   # Ingredientes con al menos un menú sin asignar
+            'paginacion': {...},
+        }
+    """
+    filas = obtener_grilla_match(programa_id)
+    con_match = sum(1 for fila in filas if fila['completo'])
+
+    filtradas = filas
+    if estado == 'pendientes':
+        filtradas = [fila for fila in filtradas if not fila['completo']]
+    elif estado == 'completos':
+        filtradas = [fila for fila in filtradas if fila['completo']]
+    q = (q or '').strip().lower()
+    if q:
+        filtradas = [
+            fila for fila in filtradas
+            if q in fila['alimento']['nombre_del_alimento'].lower() or q in fila['alimento']['codigo'].lower()
+        ]
+
+    total_filtradas = len(filtradas)
+    tamano = tamano or max(total_filtradas, 1)
+    num_paginas = max((total_filtradas + tamano - 1) // tamano, 1)
+    pagina = min(max(int(pagina or 1), 1), num_paginas)
+    inicio = (pagina - 1) * tamano
+
     return {
-        'filas':     filas,
-        'total':     total_ingredientes,
-        'con_match': total_asignados_completos,
-        'sin_match': total_ingredientes - total_asignados_completos,
+        'filas':     filtradas[inicio:inicio + tamano],
+        'total':     len(filas),
+        'con_match': con_match,
+        'sin_match': len(filas) - con_match,
+        'paginacion': {
+            'pagina':          pagina,
+            'num_paginas':     num_paginas,
+            'total_filtradas': total_filtradas,
+            'has_previous':    pagina > 1,
+            'has_next':        pagina < num_paginas,
+            'anterior':        pagina - 1,
+            'siguiente':       pagina + 1,
+        },
     }
 
 
-def _obtener_ingredientes_programa(programa_id):
+def _construir_grilla(programa_id):
     """
-    Devuelve los ingredientes ICBF usados en el programa, agrupados por alimento.
-    Cada entrada incluye la lista de menús donde aparece (deduplicada).
+    Grilla ingrediente × menú del programa con el match de cada celda.
+
+    Una consulta agrupada por (alimento, menú) con las preparaciones en un
+    ARRAY_AGG y otra con los matches activos, ambas con .values(); el
+    resultado son dicts (cacheables) con la forma que usa la plantilla.
 
     Returns:
-        [{'alimento': TablaAlimentos2018Icbf,
-          'menus': [{'menu_id', 'menu_num', 'preparaciones': [str]}, ...]}, ...]
+        [{'alimento': {'codigo', 'nombre_del_alimento', 'id_componente': {'componente'}},
+          'menus': [{'menu_id', 'menu_num', 'modalidad', 'preparaciones', 'match'}],
+          'total_menus', 'asignados', 'tiene_match', 'completo'}, ...]
     """
-    usos_qs = (
+    usos = (
         TablaPreparacionIngredientes.objects
         .filter(id_preparacion__id_menu__id_contrato_id=programa_id)
-        .select_related(
-            'id_ingrediente_siesa',
-            'id_ingrediente_siesa__id_componente',
-            'id_preparacion',
-            'id_preparacion__id_menu',
-            'id_preparacion__id_menu__id_modalidad',
-        )
-        .order_by(
-            'id_ingrediente_siesa__nombre_del_alimento',
-            'id_preparacion__id_menu__menu',
-            'id_preparacion__preparacion',
+        .values(
+            codigo=F('id_ingrediente_siesa_id'),
+            nombre=F('id_ingrediente_siesa__nombre_del_alimento'),
+            componente=F('id_ingrediente_siesa__id_componente__componente'),
+            menu_id=F('id_preparacion__id_menu_id'),
+            menu_num=F('id_preparacion__id_menu__menu'),
+            modalidad=F('id_preparacion__id_menu__id_modalidad__modalidad'),
         )
+        .annotate(preparaciones=ArrayAgg(
+            'id_preparacion__preparacion', distinct=True, order_by='id_preparacion__preparacion'
+        ))
+        .order_by('nombre', 'codigo', 'menu_num')
     )
 
-    # grupos: {codigo: {'alimento': obj, 'menus': {menu_id: {'menu_num', 'preps': set()}}}}
-    grupos = {}
-    for uso in usos_qs:
-        alimento = uso.id_ingrediente_siesa
-        if not alimento:
-            continue
-        codigo = alimento.codigo
-        if codigo not in grupos:
-            grupos[codigo] = {'alimento': alimento, 'menus': {}}
-        menu = uso.id_preparacion.id_menu
-        if menu.id_menu not in grupos[codigo]['menus']:
-            grupos[codigo]['menus'][menu.id_menu] = {
-                'menu_id':   menu.id_menu,
-                'menu_num':  menu.menu,
-                'modalidad': menu.id_modalidad.modalidad,
-                'preps':     set(),
-            }
-        grupos[codigo]['menus'][menu.id_menu]['preps'].add(uso.id_preparacion.preparacion)
-
-    resultado = []
-    for datos in sorted(grupos.values(), key=lambda x: x['alimento'].nombre_del_alimento):
-        menus = sorted(
-            [
-                {
-                    'menu_id':       m['menu_id'],
-                    'menu_num':      m['menu_num'],
-                    'modalidad':     m['modalidad'],
-                    'preparaciones': sorted(m['preps']),
-                }
-                for m in datos['menus'].values()
-            ],
-            key=lambda m: m['menu_num']
+    matches = {
+        (m['id_alimento_icbf_id'], m['id_menu_id']): {
+            'id': m['id'],
+            'id_ingrediente_compras': {
+                'id_ingrediente_siesa': m['id_ingrediente_compras_id'],
+                'nombre_ingrediente':   m['id_ingrediente_compras__nombre_ingrediente'],
+                'presentacion':         m['id_ingrediente_compras__presentacion'],
+                'contenido_gramos':     m['id_ingrediente_compras__contenido_gramos'],
+            },
+        }
+        for m in EquivalenciaICBFCompras.objects.filter(id_programa_id=programa_id, activo=True).values(
+            'id', 'id_alimento_icbf_id', 'id_menu_id', 'id_ingrediente_compras_id',
+            'id_ingrediente_compras__nombre_ingrediente', 'id_ingrediente_compras__presentacion',
+            'id_ingrediente_compras__contenido_gramos',
         )
-        resultado.append({'alimento': datos['alimento'], 'menus': menus})
+    }
 
-    return resultado
+    filas = []
+    for uso in usos:
+        if not filas or filas[-1]['alimento']['codigo'] != uso['codigo']:
+            filas.append({
+                'alimento': {
+                    'codigo':              uso['codigo'],
+                    'nombre_del_alimento': uso['nombre'],
+                    'id_componente':       {'componente': uso['componente']} if uso['componente'] else None,
+                },
+                'menus': [],
+            })
+        filas[-1]['menus'].append({
+            'menu_id':       uso['menu_id'],
+            'menu_num':      uso['menu_num'],
+            'modalidad':     uso['modalidad'],
+            'preparaciones': uso['preparaciones'],
+            'match':         matches.get((uso['codigo'], uso['menu_id'])),
+        })
+
+    for fila in filas:
+        asignados = sum(1 for menu in fila['menus'] if menu['match'])
+        fila.update({
+            'total_menus': len(fila['menus']),
+            'asignados':   asignados,
+            'tiene_match': asignados > 0,
+            'completo':    asignados == len(fila['menus']),
+        })
+    return filas
@@ -0,0 +1,120 @@
+"""
+Tests de los catálogos del editor de preparaciones.
+
+Cubre:
+- Endpoint de catálogos: ETag, 304 y Cache-Control según la versión pedida
+- Invalidación al modificar la tabla de origen
+- Typeahead de ingredientes: prefijo de código, palabras en cualquier orden y prioridad
+- La página del editor ya no incrusta los catálogos
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from planeacion.models import Programa
+from principal.models import ModalidadesDeConsumo, PrincipalMunicipio
+
+from .models import ComponentesAlimentos, GruposAlimentos, TablaAlimentos2018Icbf, TablaMenus
+from .services.catalogo_editor_service import buscar_ingredientes, obtener_catalogo
+
+
+def _alimento(codigo, nombre):
+    return TablaAlimentos2018Icbf.objects.create(
+        codigo=codigo, nombre_del_alimento=nombre, humedad_g=Decimal('80'),
+        energia_kcal=100, energia_kj=418, proteina_g=Decimal('3'), lipidos_g=Decimal('3'),
+        carbohidratos_totales_g=Decimal('10'), calcio_mg=100, hierro_mg=Decimal('1'), sodio_mg=50,
+    )
+
+
+class CatalogoEditorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('editor', 'e@x.com', 'x')
+        grupo = GruposAlimentos.objects.create(id_grupo_alimentos='grp_ced', grupo_alimentos='Cereales')
+        ComponentesAlimentos.objects.create(id_componente='ced0', componente='Cereal', id_grupo_alimentos=grupo)
+        _alimento('A001', 'Arroz blanco cocido')
+        _alimento('B010', 'Leche entera en polvo')
+        _alimento('C100', 'Polvo de hornear')
+        _alimento('A002', 'Leche de arroz')
+
+        modalidad = ModalidadesDeConsumo.objects.create(id_modalidades='modced', modalidad='ALMUERZO', cod_modalidad='ALM')
+        municipio = PrincipalMunicipio.objects.create(
+            codigo_municipio=66666, nombre_municipio='Municipio CED', codigo_departamento='76'
+        )
+        programa = Programa.objects.create(
+            programa='Programa CED', contrato='CT-CED', municipio=municipio, tipo_programa_id='pae',
+            fecha_inicial=date(2026, 1, 1), fecha_final=date(2026, 12, 31), estado='activo',
+        )
+        cls.menu = TablaMenus.objects.create(menu='1', id_modalidad=modalidad, id_contrato=programa)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def test_etag_304_y_cache_control(self):
+        url = '/nutricion/api/editor/catalogos/componentes/'
+        resp = self.client.get(url, secure=True)
+        self.assertEqual(resp.json(), [{'id_componente': 'ced0', 'componente': 'Cereal'}])
+        self.assertIn('no-cache', resp['Cache-Control'])
+        etag = resp['ETag']
+
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag, secure=True)
+        self.assertEqual(resp.status_code, 304)
+
+        # Con la versión vigente en la URL el navegador no vuelve a preguntar
+        resp = self.client.get(url, {'v': etag.strip('"')}, secure=True)
+        self.assertIn('immutable', resp['Cache-Control'])
+        self.assertIn('max-age=31536000', resp['Cache-Control'])
+
+        self.assertEqual(self.client.get('/nutricion/api/editor/catalogos/otro/', secure=True).status_code, 404)
+
+    def test_catalogo_cacheado_e_invalidado(self):
+        antes = obtener_catalogo('ingredientes')
+        with self.assertNumQueries(0):
+            self.assertEqual(obtener_catalogo('ingredientes'), antes)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            _alimento('D200', 'Zanahoria')
+        despues = obtener_catalogo('ingredientes')
+        self.assertNotEqual(despues['etag'], antes['etag'])
+        self.assertIn(b'Zanahoria', despues['contenido'])
+        # El catálogo de componentes no se ve afectado
+        self.assertEqual(obtener_catalogo('componentes'), obtener_catalogo('componentes'))
+
+    def test_invalidacion_llega_a_otros_workers(self):
+        def worker(nombre):
+            # Caché local propia de cada worker; la de versiones es compartida
+            return override_settings(CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': nombre},
+                'versiones': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-versiones'},
+            })
+
+        with worker('worker-b'):
+            self.assertNotIn(b'Zanahoria', obtener_catalogo('ingredientes')['contenido'])
+        with worker('worker-a'), self.captureOnCommitCallbacks(execute=True):
+            _alimento('D200', 'Zanahoria')
+        with worker('worker-b'):
+            self.assertIn(b'Zanahoria', obtener_catalogo('ingredientes')['contenido'])
+
+    def test_busqueda_ingredientes(self):
+        self.assertEqual([i['codigo'] for i in buscar_ingredientes('a00')], ['A001', 'A002'])
+        # Todas las palabras, en cualquier orden; primero las que empiezan por el texto
+        self.assertEqual([i['codigo'] for i in buscar_ingredientes('polvo')], ['C100', 'B010'])
+        self.assertEqual([i['codigo'] for i in buscar_ingredientes('arroz leche')], ['A002'])
+        self.assertEqual(buscar_ingredientes('  '), [])
+
+        datos = self.client.get('/nutricion/api/editor/ingredientes/buscar/', {'q': 'leche', 'limite': 1}, secure=True).json()
+        self.assertEqual(datos, {'success': True, 'ingredientes': [{'codigo': 'A002', 'nombre_del_alimento': 'Leche de arroz'}]})
+
+    def test_pagina_editor_sin_catalogos_incrustados(self):
+        resp = self.client.get(f'/nutricion/menus/{self.menu.id_menu}/preparaciones-editor/', secure=True)
+        self.assertEqual(resp.status_code, 200)
+        contenido = resp.content.decode()
+        self.assertNotIn('Arroz blanco cocido', contenido)
+        self.assertNotIn('ingredientes-catalogo', contenido)
+        etag = obtener_catalogo('componentes')['etag']
+        self.assertIn(f'/nutricion/api/editor/catalogos/componentes/?v={etag}', contenido)
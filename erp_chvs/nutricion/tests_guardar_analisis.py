@@ -0,0 +1,139 @@
+"""
+Tests del guardado en bloque del análisis nutricional por nivel.
+
+Cubre:
+- Guardar todos los niveles de un menú en una ronda de escrituras
+- Diferencia contra lo guardado (sin cambios, actualizados, eliminados)
+- Creación del producto SIESA a partir de ICBF cuando no existe
+- Número de consultas independiente de niveles e ingredientes
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from planeacion.models import Programa
+from principal.models import ModalidadesDeConsumo, PrincipalMunicipio, TablaGradosEscolaresUapa
+
+from .models import (
+    TablaAlimentos2018Icbf,
+    TablaAnalisisNutricionalMenu,
+    TablaIngredientesPorNivel,
+    TablaIngredientesSiesa,
+    TablaMenus,
+    TablaPreparacionIngredientes,
+    TablaPreparaciones,
+)
+from .services.analisis_service import AnalisisNutricionalService
+
+
+def _alimento(codigo, nombre):
+    return TablaAlimentos2018Icbf.objects.create(
+        codigo=codigo, nombre_del_alimento=nombre, humedad_g=Decimal('80'), energia_kcal=100,
+        energia_kj=418, proteina_g=Decimal('3'), lipidos_g=Decimal('3'),
+        carbohidratos_totales_g=Decimal('10'), calcio_mg=100, hierro_mg=Decimal('1'),
+        sodio_mg=50, parte_comestible_field=100,
+    )
+
+
+class GuardarAnalisisMenuTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.niveles = [
+            TablaGradosEscolaresUapa.objects.create(id_grado_escolar_uapa=f'nivel_ga_{i}', nivel_escolar_uapa=f'Nivel {i}')
+            for i in range(4)
+        ]
+        modalidad = ModalidadesDeConsumo.objects.create(id_modalidades='modga', modalidad='CAJM AM', cod_modalidad='CAJM')
+        municipio = PrincipalMunicipio.objects.create(
+            codigo_municipio=22222, nombre_municipio='Municipio GA', codigo_departamento='76'
+        )
+        programa = Programa.objects.create(
+            programa='Programa GA', contrato='CT-GA-001', municipio=municipio, tipo_programa_id='pae',
+            fecha_inicial=date(2026, 1, 1), fecha_final=date(2026, 12, 31), estado='activo',
+        )
+        cls.menu = TablaMenus.objects.create(menu='1', id_modalidad=modalidad, id_contrato=programa)
+
+        # Cuatro alimentos; solo los dos primeros tienen producto SIESA
+        cls.alimentos = [_alimento(f'GA{i}', f'Alimento {i}') for i in range(4)]
+        for alimento in cls.alimentos[:2]:
+            TablaIngredientesSiesa.objects.create(
+                id_ingrediente_siesa=alimento.codigo, nombre_ingrediente=alimento.nombre_del_alimento
+            )
+        cls.preparaciones = [
+            TablaPreparaciones.objects.create(preparacion=f'Preparación {i}', id_menu=cls.menu) for i in range(2)
+        ]
+        for preparacion in cls.preparaciones:
+            for alimento in cls.alimentos:
+                TablaPreparacionIngredientes.objects.create(id_preparacion=preparacion, id_ingrediente_siesa=alimento)
+
+    def _nivel(self, nivel, cantidad, peso=100):
+        """Datos de un nivel con los primeros `cantidad` pares preparación-alimento."""
+        pares = [(p, a) for p in self.preparaciones for a in self.alimentos][:cantidad]
+        return {
+            'id_nivel_escolar': nivel.id_grado_escolar_uapa,
+            'totales': {'calorias': 500, 'peso_neto': peso * cantidad},
+            'porcentajes': {'calorias': 95.5},
+            'ingredientes': [
+                {'id_preparacion': p.id_preparacion, 'id_ingrediente_siesa': a.codigo,
+                 'peso_neto': peso, 'peso_bruto': peso, 'calorias': 12.345}
+                for p, a in pares
+            ],
+        }
+
+    def _guardar(self, niveles):
+        with CaptureQueriesContext(connection) as ctx:
+            resultado = AnalisisNutricionalService.guardar_analisis_menu(self.menu.id_menu, niveles, usuario='prueba')
+        return resultado, len(ctx.captured_queries)
+
+    def test_guarda_todos_los_niveles_en_bloque(self):
+        resultado, _ = self._guardar([self._nivel(nivel, 8) for nivel in self.niveles[:2]])
+
+        self.assertTrue(resultado['success'])
+        self.assertEqual([n['created'] for n in resultado['niveles']], [True, True])
+        self.assertEqual((resultado['ingredientes_guardados'], resultado['creados']), (16, 16))
+        self.assertEqual(TablaAnalisisNutricionalMenu.objects.filter(id_menu=self.menu).count(), 2)
+        # Los alimentos sin producto SIESA se crean desde ICBF
+        self.assertTrue(TablaIngredientesSiesa.objects.filter(id_ingrediente_siesa='GA3').exists())
+
+        fila = TablaIngredientesPorNivel.objects.filter(codigo_icbf='GA0').first()
+        self.assertEqual((fila.peso_neto, fila.calorias), (Decimal('100.00'), Decimal('12.35')))
+        analisis = TablaAnalisisNutricionalMenu.objects.get(id_analisis=resultado['niveles'][0]['analisis_id'])
+        self.assertEqual((analisis.total_calorias, analisis.porcentaje_calorias), (Decimal('500.00'), Decimal('95.50')))
+
+    def test_aplica_solo_la_diferencia(self):
+        self._guardar([self._nivel(self.niveles[0], 8)])
+        ids_antes = set(TablaIngredientesPorNivel.objects.values_list('pk', flat=True))
+
+        resultado, _ = self._guardar([self._nivel(self.niveles[0], 8)])
+        self.assertEqual([resultado[k] for k in ('creados', 'actualizados', 'eliminados', 'sin_cambios')], [0, 0, 0, 8])
+        self.assertFalse(resultado['niveles'][0]['created'])
+
+        datos = self._nivel(self.niveles[0], 6)
+        datos['ingredientes'][0]['peso_neto'] = 80
+        resultado, _ = self._guardar([datos])
+        self.assertEqual([resultado[k] for k in ('creados', 'actualizados', 'eliminados', 'sin_cambios')], [0, 1, 2, 5])
+        ids = set(TablaIngredientesPorNivel.objects.values_list('pk', flat=True))
+        self.assertTrue(ids < ids_antes)
+
+    def test_consultas_no_crecen_con_niveles_e_ingredientes(self):
+        self._guardar([self._nivel(nivel, 8) for nivel in self.niveles])
+
+        resultado, pocas = self._guardar([self._nivel(self.niveles[0], 8, peso=90)])
+        self.assertEqual(resultado['actualizados'], 8)
+        resultado, muchas = self._guardar([self._nivel(nivel, 8, peso=80) for nivel in self.niveles])
+        self.assertEqual(resultado['actualizados'], 32)
+        self.assertEqual(pocas, muchas)
+
+    def test_guardar_analisis_un_nivel_conserva_respuesta(self):
+        datos = self._nivel(self.niveles[0], 3)
+        resultado = AnalisisNutricionalService.guardar_analisis(
+            self.menu.id_menu, datos['id_nivel_escolar'], datos['totales'], datos['porcentajes'], datos['ingredientes']
+        )
+        self.assertEqual(
+            {k: resultado[k] for k in ('success', 'ingredientes_guardados', 'created')},
+            {'success': True, 'ingredientes_guardados': 3, 'created': True},
+        )
+        self.assertIn('analisis_id', resultado)
@@ -0,0 +1,211 @@
+"""
+Tests de la asignación masiva del match ICBF → Compras.
+
+Cubre:
+- asignar_productos_masivo: todos los menús de cada ingrediente en un bulk_create
+- Sobreescritura vs solo_sin_asignar
+- Errores por asignación sin detener las demás
+- Endpoints por ingrediente y por programa completo
+- Grilla del dashboard: caché por programa, invalidación, filtro y paginación
+"""
+
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from planeacion.models import Programa
+from principal.models import ModalidadesDeConsumo, PrincipalMunicipio
+
+from .models import (
+    EquivalenciaICBFCompras,
+    TablaAlimentos2018Icbf,
+    TablaIngredientesSiesa,
+    TablaMenus,
+    TablaPreparacionIngredientes,
+    TablaPreparaciones,
+)
+from .services.match_icbf_service import asignar_productos_masivo
+
+
+class AsignacionMasivaMatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        modalidad = ModalidadesDeConsumo.objects.create(id_modalidades='modmt', modalidad='CAJM AM', cod_modalidad='CAJM')
+        municipio = PrincipalMunicipio.objects.create(
+            codigo_municipio=33333, nombre_municipio='Municipio MT', codigo_departamento='76'
+        )
+        cls.programa = Programa.objects.create(
+            programa='Programa MT', contrato='CT-MT-001', municipio=municipio, tipo_programa_id='pae',
+            fecha_inicial=date(2026, 1, 1), fecha_final=date(2026, 12, 31), estado='activo',
+        )
+        cls.alimentos = [
+            TablaAlimentos2018Icbf.objects.create(
+                codigo=f'MT{i}', nombre_del_alimento=f'Alimento {i}', humedad_g=Decimal('80'), energia_kcal=100,
+                energia_kj=418, proteina_g=Decimal('3'), lipidos_g=Decimal('3'),
+                carbohidratos_totales_g=Decimal('10'), calcio_mg=100, hierro_mg=Decimal('1'), sodio_mg=50,
+            )
+            for i in range(3)
+        ]
+        cls.productos = [
+            TablaIngredientesSiesa.objects.create(id_ingrediente_siesa=f'P{i}', nombre_ingrediente=f'Producto {i}')
+            for i in range(2)
+        ]
+        # Cinco menús; cada uno con dos preparaciones que usan todos los alimentos
+        cls.menus = []
+        for numero in range(1, 6):
+            menu = TablaMenus.objects.create(menu=str(numero), id_modalidad=modalidad, id_contrato=cls.programa)
+            cls.menus.append(menu)
+            for nombre in ('Sopa', 'Seco'):
+                preparacion = TablaPreparaciones.objects.create(preparacion=nombre, id_menu=menu)
+                for alimento in cls.alimentos:
+                    TablaPreparacionIngredientes.objects.create(id_preparacion=preparacion, id_ingrediente_siesa=alimento)
+
+    def test_asigna_todos_los_menus_en_consultas_constantes(self):
+        with CaptureQueriesContext(connection) as uno:
+            resultado = asignar_productos_masivo(self.programa.id, {'MT0': 'P0'}, usuario='prueba')
+        self.assertEqual((resultado['creados'], resultado['actualizados']), (5, 0))
+        self.assertEqual([m['menu_num'] for m in resultado['matches']['MT0']], ['1', '2', '3', '4', '5'])
+        self.assertTrue(all(m['id'] for m in resultado['matches']['MT0']))
+
+        with CaptureQueriesContext(connection) as varios:
+            resultado = asignar_productos_masivo(
+                self.programa.id, {'MT0': 'P1', 'MT1': 'P1', 'MT2': 'P0'}, usuario='prueba'
+            )
+        self.assertEqual((resultado['creados'], resultado['actualizados']), (10, 5))
+        self.assertEqual(len(uno.captured_queries), len(varios.captured_queries))
+        self.assertEqual(
+            set(EquivalenciaICBFCompras.objects.filter(id_alimento_icbf='MT0').values_list('id_ingrediente_compras', flat=True)),
+            {'P1'},
+        )
+        self.assertEqual(EquivalenciaICBFCompras.objects.count(), 15)
+
+    def test_solo_sin_asignar_y_errores(self):
+        menu = self.menus[0]
+        EquivalenciaICBFCompras.objects.create(
+            id_alimento_icbf=self.alimentos[0], id_programa=self.programa, id_menu=menu,
+            id_ingrediente_compras=self.productos[1],
+        )
+        resultado = asignar_productos_masivo(
+            self.programa.id, {'MT0': 'P0', 'NOEXISTE': 'P0', 'MT1': 'NOEXISTE'}, solo_sin_asignar=True
+        )
+        self.assertEqual((resultado['creados'], resultado['actualizados']), (4, 0))
+        self.assertEqual(
+            EquivalenciaICBFCompras.objects.get(id_alimento_icbf='MT0', id_menu=menu).id_ingrediente_compras_id, 'P1'
+        )
+        self.assertEqual(
+            [e['codigo_icbf'] for e in resultado['errores']], ['NOEXISTE', 'MT1']
+        )
+
+    def test_endpoints(self):
+        self.client.force_login(User.objects.create_superuser('match', 'm@x.com', 'x'))
+
+        resp = self.client.post('/nutricion/api/match/guardar/bulk/', json.dumps({
+            'programa_id': self.programa.id, 'codigo_icbf': 'MT0', 'codigo_siesa': 'P0',
+        }), content_type='application/json', secure=True)
+        datos = resp.json()
+        self.assertEqual((datos['creados'], datos['actualizados'], len(datos['matches'])), (5, 0, 5))
+        self.assertEqual(
+            set(datos['matches'][0]),
+            {'id', 'menu_id', 'menu_num', 'codigo_siesa', 'nombre_siesa', 'presentacion', 'contenido_gramos'},
+        )
+
+        resp = self.client.post('/nutricion/api/match/guardar/programa/', json.dumps({
+            'programa_id': self.programa.id,
+            'asignaciones': [{'codigo_icbf': 'MT0', 'codigo_siesa': 'P1'}, {'codigo_icbf': 'MT1', 'codigo_siesa': 'P1'}],
+            'solo_sin_asignar': True,
+        }), content_type='application/json', secure=True)
+        datos = resp.json()
+        self.assertTrue(datos['success'])
+        self.assertEqual((datos['creados'], datos['actualizados']), (5, 0))
+        self.assertEqual(list(datos['matches']), ['MT1'])
+
+        resp = self.client.post('/nutricion/api/match/guardar/programa/', json.dumps({
+            'programa_id': self.programa.id, 'asignaciones': [],
+        }), content_type='application/json', secure=True)
+        self.assertEqual(resp.status_code, 400)
+
+
+class DashboardMatchCacheTests(TestCase):
+    """Grilla del dashboard desde .values(), cacheada por programa e invalidada al escribir."""
+
+    setUpTestData = classmethod(AsignacionMasivaMatchTests.setUpTestData.__func__)
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+
+    def test_grilla_agrupada_y_cacheada(self):
+        from .services.match_icbf_service import obtener_dashboard_match
+
+        with self.assertNumQueries(2):
+            datos = obtener_dashboard_match(self.programa.id, estado='todos')
+        self.assertEqual((datos['total'], datos['con_match'], datos['sin_match']), (3, 0, 3))
+        fila = datos['filas'][0]
+        self.assertEqual(fila['alimento']['codigo'], 'MT0')
+        self.assertEqual(fila['total_menus'], 5)
+        self.assertEqual(fila['menus'][0]['preparaciones'], ['Seco', 'Sopa'])
+
+        with self.assertNumQueries(0):
+            obtener_dashboard_match(self.programa.id, estado='pendientes', q='alimento 1')
+
+    def test_escrituras_invalidan_la_grilla(self):
+        from .services.match_icbf_service import obtener_dashboard_match
+
+        obtener_dashboard_match(self.programa.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            asignar_productos_masivo(self.programa.id, {'MT0': 'P0'})
+        datos = obtener_dashboard_match(self.programa.id, estado='completos')
+        self.assertEqual([f['alimento']['codigo'] for f in datos['filas']], ['MT0'])
+        self.assertEqual(datos['filas'][0]['menus'][0]['match']['id_ingrediente_compras']['nombre_ingrediente'], 'Producto 0')
+
+        # Una preparación nueva con el alimento deja el ingrediente incompleto
+        with self.captureOnCommitCallbacks(execute=True):
+            preparacion = TablaPreparaciones.objects.create(preparacion='Postre', id_menu=self.menus[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            TablaPreparacionIngredientes.objects.create(id_preparacion=preparacion, id_ingrediente_siesa=self.alimentos[0])
+        datos = obtener_dashboard_match(self.programa.id, estado='todos')
+        self.assertEqual(datos['filas'][0]['menus'][0]['preparaciones'], ['Postre', 'Seco', 'Sopa'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            EquivalenciaICBFCompras.objects.filter(id_alimento_icbf='MT0').first().delete()
+        self.assertEqual(obtener_dashboard_match(self.programa.id)['con_match'], 0)
+
+    def test_invalidacion_llega_a_otros_workers(self):
+        from .services.match_icbf_service import obtener_dashboard_match
+
+        def worker(nombre):
+            # Caché local propia de cada worker; la de versiones es compartida
+            return override_settings(CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': nombre},
+                'versiones': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-versiones'},
+            })
+
+        with worker('worker-b'):
+            self.assertEqual(obtener_dashboard_match(self.programa.id)['con_match'], 0)
+        with worker('worker-a'), self.captureOnCommitCallbacks(execute=True):
+            asignar_productos_masivo(self.programa.id, {'MT0': 'P0'})
+        with worker('worker-b'):
+            self.assertEqual(obtener_dashboard_match(self.programa.id)['con_match'], 1)
+
+    def test_filtro_y_paginacion(self):
+        from .services.match_icbf_service import obtener_dashboard_match
+
+        asignar_productos_masivo(self.programa.id, {'MT1': 'P0'})
+        datos = obtener_dashboard_match(self.programa.id, estado='pendientes', pagina=2, tamano=1)
+        self.assertEqual([f['alimento']['codigo'] for f in datos['filas']], ['MT2'])
+        self.assertEqual(
+            {k: datos['paginacion'][k] for k in ('pagina', 'num_paginas', 'total_filtradas', 'has_next')},
+            {'pagina': 2, 'num_paginas': 2, 'total_filtradas': 2, 'has_next': False},
+        )
+        self.assertEqual(obtener_dashboard_match(self.programa.id, q='mt0')['paginacion']['total_filtradas'], 1)
+
+        self.client.force_login(User.objects.create_superuser('dashboard', 'd@x.com', 'x'))
+        resp = self.client.get('/nutricion/match-icbf/', {'programa': self.programa.id}, secure=True)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([f['alimento']['codigo'] for f in resp.context['filas']], ['MT0', 'MT2'])
@@ -35,6 +35,8 @@ urlpatterns = [
     path('api/menus/<int:id_menu>/', views.api_menu_detail, name='api_menu_detail'),
     path('api/menus/<int:id_menu>/rango-ingrediente/', views.api_rango_ingrediente_preparacion, name='api_rango_ingrediente_preparacion'),
     path('api/menus/<int:id_menu>/guardar-preparaciones-editor/', views.api_guardar_preparaciones_editor, name='api_guardar_preparaciones_editor'),
+    path('api/editor/catalogos/<str:catalogo>/', views.api_catalogo_editor, name='api_catalogo_editor'),
+    path('api/editor/ingredientes/buscar/', views.api_buscar_ingredientes_editor, name='api_buscar_ingredientes_editor'),
     path('api/programas-por-municipio/', views.api_programas_por_municipio, name='api_programas_por_municipio'),
     path('api/modalidades-por-programa/', views.api_modalidades_por_programa, name='api_modalidades_por_programa'),
     path('api/generar-menus-automaticos/', views.api_generar_menus_automaticos, name='api_generar_menus_automaticos'),
@@ -93,6 +95,7 @@ path('api/menus/<int:id_menu>/guardar-ingredientes-por-nivel/', views.api_guarda
     path('api/match/productos/', views.api_productos_siesa, name='api_match_productos'),
     path('api/match/guardar/', views.api_guardar_match, name='api_match_guardar'),
     path('api/match/guardar/bulk/', views.api_guardar_match_bulk, name='api_match_guardar_bulk'),
+    path('api/match/guardar/programa/', views.api_guardar_match_programa, name='api_match_guardar_programa'),
     path('api/match/catalogo/', views.api_productos_siesa_crud, name='api_match_catalogo'),
     path('api/match/catalogo/<str:codigo>/', views.api_producto_siesa_detail, name='api_match_catalogo_detail'),
     path('api/match/<int:match_id>/', views.api_eliminar_match, name='api_match_eliminar'),
@@ -7,6 +7,8 @@ from .core import (
 )
 from .preparaciones_editor import (
     vista_preparaciones_editor,
+    api_catalogo_editor,
+    api_buscar_ingredientes_editor,
     api_rango_ingrediente_preparacion,
     api_guardar_preparaciones_editor,
 )
@@ -78,6 +80,7 @@ from .match_icbf import (
     api_productos_siesa,
     api_guardar_match,
     api_guardar_match_bulk,
+    api_guardar_match_programa,
     api_eliminar_match,
     api_productos_siesa_crud,
     api_producto_siesa_detail,
@@ -47,6 +47,9 @@ def api_analisis_nutricional_menu(request, id_menu):
 def guardar_analisis_nutricional(request):
     """
     API para guardar automáticamente el análisis nutricional editado por el usuario.
+
+    Acepta un nivel (id_nivel_escolar, totales, porcentajes, ingredientes) o
+    todos los niveles del menú a la vez en `niveles`.
     """
     if request.method != 'POST':
         return JsonResponse({'error': 'Método no permitido'}, status=405)
@@ -54,8 +57,16 @@ def guardar_analisis_nutricional(request):
     try:
         data = json.loads(request.body)
 
-        print(f"[DEBUG] Datos recibidos: {data}")
-        print(f"[DEBUG] Claves disponibles: {list(data.keys())}")
+        usuario = request.user.username if hasattr(request.user, 'username') else 'sistema'
+        if 'niveles' in data:
+            resultado = AnalisisNutricionalService.guardar_analisis_menu(
+                id_menu=data['id_menu'], niveles=data['niveles'], usuario=usuario
+            )
+            RegistroActividad.registrar(
+                request, 'nutricion', 'guardar_analisis',
+                f"Menú ID: {data['id_menu']} | Niveles: {len(data['niveles'])}"
+            )
+            return JsonResponse(resultado)
 
         resultado = AnalisisNutricionalService.guardar_analisis(
             id_menu=data['id_menu'],
@@ -63,7 +74,7 @@ def guardar_analisis_nutricional(request):
             totales=data['totales'],
             porcentajes=data['porcentajes'],
             ingredientes=data['ingredientes'],
-            usuario=request.user.username if hasattr(request.user, 'username') else 'sistema'
+            usuario=usuario
         )
         if resultado.get('success'):
             RegistroActividad.registrar(
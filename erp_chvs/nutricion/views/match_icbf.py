@@ -11,6 +11,7 @@ SIMULACRO: el catálogo de compras usa TablaIngredientesSiesa.
 """
 import json
 import logging
+from urllib.parse import urlencode
 
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
@@ -22,9 +23,12 @@ from ..models import (
     TablaMenus,
     TablaIngredientesSiesa,
     EquivalenciaICBFCompras,
-    TablaPreparacionIngredientes,
 )
-from ..services.match_icbf_service import obtener_dashboard_match
+from ..services.match_icbf_service import (
+    TAMANO_PAGINA_DASHBOARD,
+    asignar_productos_masivo,
+    obtener_dashboard_match,
+)
 from principal.models import PrincipalMunicipio, RegistroActividad
 from planeacion.models import Programa
 
@@ -37,6 +41,7 @@ def vista_match_icbf(request):
     Página principal del match ICBF → Compras.
     Tarjetas por ingrediente; dentro de cada tarjeta, tabla de menús
     con el producto de compras asignado a cada uno.
+    Filtros GET: estado (todos|pendientes|completos), q y pagina.
     """
     municipios = PrincipalMunicipio.objects.filter(
         programa__estado='activo'
@@ -44,11 +49,19 @@ def vista_match_icbf(request):
 
     municipio_id = request.GET.get('municipio')
     programa_id  = request.GET.get('programa')
+    estado       = request.GET.get('estado', 'pendientes')
+    q            = request.GET.get('q', '').strip()
+    pagina       = request.GET.get('pagina', '1')
 
     context = {
         'municipios': municipios,
         'municipio_seleccionado': municipio_id,
         'programa_seleccionado': programa_id,
+        'estado': estado,
+        'q': q,
+        'filtros_querystring': urlencode({
+            'municipio': municipio_id or '', 'programa': programa_id or '', 'estado': estado, 'q': q,
+        }),
     }
 
     if municipio_id:
@@ -60,7 +73,11 @@ def vista_match_icbf(request):
         try:
             programa = Programa.objects.get(id=programa_id)
             context['programa_obj'] = programa
-            context.update(obtener_dashboard_match(programa_id))
+            context.update(obtener_dashboard_match(
+                programa.id, estado=estado, q=q,
+                pagina=int(pagina) if pagina.isdigit() else 1,
+                tamano=TAMANO_PAGINA_DASHBOARD,
+            ))
         except Programa.DoesNotExist:
             context['error'] = 'Programa no encontrado.'
         except Exception as e:
@@ -192,31 +209,15 @@ def api_guardar_match_bulk(request):
         programa = Programa.objects.get(id=programa_id)
         producto = TablaIngredientesSiesa.objects.get(id_ingrediente_siesa=codigo_siesa)
 
-        menu_ids = list(
-            TablaPreparacionIngredientes.objects
-            .filter(
-                id_preparacion__id_menu__id_contrato_id=programa_id,
-                id_ingrediente_siesa=alimento,
-            )
-            .values_list('id_preparacion__id_menu_id', flat=True)
-            .distinct()
+        resultado = asignar_productos_masivo(
+            programa.id, {alimento.codigo: producto.id_ingrediente_siesa},
+            usuario=request.user.username, solo_sin_asignar=solo_sin_asignar,
         )
+        if resultado['errores']:
+            return JsonResponse({'error': resultado['errores'][0]['error']}, status=400)
 
-        if not menu_ids:
-            return JsonResponse({'error': 'El ingrediente no aparece en ningún menú del programa'}, status=400)
-
-        if solo_sin_asignar:
-            ya_asignados = set(
-                EquivalenciaICBFCompras.objects.filter(
-                    id_alimento_icbf=alimento,
-                    id_programa=programa,
-                    id_menu_id__in=menu_ids,
-                    activo=True,
-                ).values_list('id_menu_id', flat=True)
-            )
-            menu_ids = [m for m in menu_ids if m not in ya_asignados]
-
-        if not menu_ids:
+        creados, actualizados = resultado['creados'], resultado['actualizados']
+        if not creados and not actualizados:
             return JsonResponse({
                 'success': True,
                 'creados': 0,
@@ -224,35 +225,6 @@ def api_guardar_match_bulk(request):
                 'mensaje': 'Todos los menús ya tienen producto asignado.',
             })
 
-        creados = actualizados = 0
-        matches_resultado = []
-
-        for menu_id in menu_ids:
-            menu = TablaMenus.objects.get(id_menu=menu_id)
-            eq, created = EquivalenciaICBFCompras.objects.update_or_create(
-                id_alimento_icbf=alimento,
-                id_programa=programa,
-                id_menu=menu,
-                defaults={
-                    'id_ingrediente_compras': producto,
-                    'activo': True,
-                    'usuario': request.user.username,
-                }
-            )
-            if created:
-                creados += 1
-            else:
-                actualizados += 1
-            matches_resultado.append({
-                'id':               eq.id,
-                'menu_id':          menu_id,
-                'menu_num':         menu.menu,
-                'codigo_siesa':     producto.id_ingrediente_siesa,
-                'nombre_siesa':     producto.nombre_ingrediente,
-                'presentacion':     producto.presentacion or '',
-                'contenido_gramos': str(producto.contenido_gramos) if producto.contenido_gramos else '',
-            })
-
         RegistroActividad.registrar(
             request, 'nutricion', 'crear_match_icbf_bulk',
             f"Programa:{programa_id} | ICBF:{alimento.nombre_del_alimento} → "
@@ -263,7 +235,7 @@ def api_guardar_match_bulk(request):
             'success':      True,
             'creados':      creados,
             'actualizados': actualizados,
-            'matches':      matches_resultado,
+            'matches':      resultado['matches'][alimento.codigo],
         })
 
     except TablaAlimentos2018Icbf.DoesNotExist:
@@ -276,6 +248,49 @@ def api_guardar_match_bulk(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@login_required
+@require_http_methods(['POST'])
+def api_guardar_match_programa(request):
+    """
+    Asignación masiva de varios ingredientes del programa en una sola petición.
+    POST /nutricion/api/match/guardar/programa/
+    Body: {programa_id, asignaciones: [{codigo_icbf, codigo_siesa}, ...], solo_sin_asignar: bool}
+    Cada ingrediente se asigna en todos los menús del programa donde aparece;
+    los que no se pueden asignar se reportan en `errores` sin detener el resto.
+    """
+    try:
+        data             = json.loads(request.body)
+        programa_id      = data.get('programa_id')
+        asignaciones     = data.get('asignaciones') or []
+        solo_sin_asignar = data.get('solo_sin_asignar', False)
+
+        if not programa_id or not asignaciones:
+            return JsonResponse({'error': 'Faltan parámetros'}, status=400)
+        if not all(a.get('codigo_icbf') and a.get('codigo_siesa') for a in asignaciones):
+            return JsonResponse({'error': 'Cada asignación requiere codigo_icbf y codigo_siesa'}, status=400)
+
+        programa = Programa.objects.get(id=programa_id)
+        resultado = asignar_productos_masivo(
+            programa.id,
+            {a['codigo_icbf']: a['codigo_siesa'] for a in asignaciones},
+            usuario=request.user.username,
+            solo_sin_asignar=solo_sin_asignar,
+        )
+
+        RegistroActividad.registrar(
+            request, 'nutricion', 'crear_match_icbf_programa',
+            f"Programa:{programa_id} | Ingredientes:{len(asignaciones)} | "
+            f"{resultado['creados']} creados, {resultado['actualizados']} actualizados, "
+            f"{len(resultado['errores'])} con error"
+        )
+        return JsonResponse({'success': True, **resultado})
+
+    except Programa.DoesNotExist:
+        return JsonResponse({'error': 'Programa no encontrado'}, status=404)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
 @login_required
 @require_http_methods(['DELETE'])
 def api_eliminar_match(request, match_id):
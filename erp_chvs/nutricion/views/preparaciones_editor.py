@@ -4,9 +4,13 @@ import json
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
 from django.db.models import Max, Min
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse
 from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
 
 from principal.models import TablaGradosEscolaresUapa
 from nutricion.services.analisis_service import _obtener_niveles_programa, _tipo_programa_id
@@ -25,6 +29,7 @@ from ..models import (
     TablaPreparaciones,
     TablaRequerimientosNutricionales,
 )
+from ..services import catalogo_editor_service
 from ..services.calculo_service import CalculoService
 
 
@@ -557,9 +562,6 @@ def vista_preparaciones_editor(request, id_menu):
             'id_analisis': analisis.id_analisis if analisis else None
         })
 
-    ingredientes_catalogo = list(
-        TablaAlimentos2018Icbf.objects.values('codigo', 'nombre_del_alimento').order_by('nombre_del_alimento')
-    )
     preparaciones_catalogo = [
         {
             'id_preparacion': p.id_preparacion,
@@ -568,9 +570,6 @@ def vista_preparaciones_editor(request, id_menu):
         }
         for p in preparaciones
     ]
-    componentes_catalogo = list(
-        ComponentesAlimentos.objects.values('id_componente', 'componente').order_by('componente')
-    )
 
     # Catálogos de grupos y componentes por modalidad y tipo_programa
     _minuta_rows_qs = MinutaPatronMeta.objects.filter(
@@ -613,9 +612,12 @@ def vista_preparaciones_editor(request, id_menu):
         'niveles_data': niveles_data,
         'preparaciones_vacias': preparaciones_vacias,
         'niveles_json': json.dumps(niveles_data, default=str),
-        'ingredientes_json': json.dumps(ingredientes_catalogo),
         'preparaciones_json': json.dumps(preparaciones_catalogo),
-        'componentes_json': json.dumps(componentes_catalogo),
+        # Catálogos compartidos: se piden aparte y el navegador los cachea por versión
+        'url_catalogo_componentes': '{}?v={}'.format(
+            reverse('nutricion:api_catalogo_editor', args=['componentes']),
+            catalogo_editor_service.obtener_catalogo('componentes')['etag'],
+        ),
         'grupos_json': json.dumps(grupos_catalogo),
         'componentes_por_grupo_json': json.dumps(componentes_por_grupo),
         # Indica si el programa maneja niveles escolares (PAE) o nivel único (general)
@@ -624,6 +626,45 @@ def vista_preparaciones_editor(request, id_menu):
     return render(request, 'nutricion/preparaciones_editor.html', context)
 
 
+@login_required
+@require_GET
+def api_catalogo_editor(request, catalogo):
+    """
+    Catálogo estático del editor (ingredientes o componentes) con ETag.
+
+    Con ?v=<etag vigente> la respuesta se cachea como inmutable (la página
+    cambia la URL cuando cambia el catálogo); sin versión, o con una
+    vieja, el navegador revalida y recibe 304 si no hubo cambios.
+    """
+    if catalogo not in catalogo_editor_service.CATALOGOS:
+        raise Http404('Catálogo no encontrado')
+
+    datos = catalogo_editor_service.obtener_catalogo(catalogo)
+    etag = f'"{datos["etag"]}"'
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(datos['contenido'], content_type='application/json')
+    response['ETag'] = etag
+    if request.GET.get('v') == datos['etag']:
+        patch_cache_control(response, private=True, max_age=31536000, immutable=True)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
+@require_GET
+def api_buscar_ingredientes_editor(request):
+    """Typeahead de ingredientes ICBF para el editor (?q=texto&limite=N)."""
+    try:
+        limite = int(request.GET.get('limite', catalogo_editor_service.LIMITE_BUSQUEDA))
+    except ValueError:
+        limite = catalogo_editor_service.LIMITE_BUSQUEDA
+    ingredientes = catalogo_editor_service.buscar_ingredientes(request.GET.get('q', ''), limite)
+    return JsonResponse({'success': True, 'ingredientes': ingredientes})
+
+
 @login_required
 def api_rango_ingrediente_preparacion(request, id_menu):
     """Retorna grupo y rango permitido para una combinaciÃ³n preparaciÃ³n + ingrediente."""
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-19 16:45
+
+from django.db import migrations
+
+INDICE = 'sedes_nombre_trgm_idx'
+
+
+def crear_indice_trigram(apps, schema_editor):
+    """
+    Índice GIN trigram para los icontains sobre el nombre de la sede (Django
+    los traduce a UPPER(col::text) LIKE UPPER(...)). Solo si el servidor
+    ofrece pg_trgm; sin la extensión la búsqueda sigue funcionando sin índice.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDICE} ON sedes_educativas '
+        f'USING gin (UPPER(nombre_sede_educativa::text) gin_trgm_ops)'
+    )
+
+
+def eliminar_indice_trigram(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDICE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planeacion', '0005_add_tipo_programa_to_programa'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice_trigram, eliminar_indice_trigram),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 13:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planeacion', '0006_sedes_nombre_trgm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sedeseducativas',
+            name='latitud',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='Latitud'),
+        ),
+        migrations.AddField(
+            model_name='sedeseducativas',
+            name='longitud',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='Longitud'),
+        ),
+    ]
@@ -55,6 +55,10 @@ class SedesEducativas(models.Model):
     # Ítem (número de referencia numérica)
     item = models.IntegerField(blank=True, null=True, verbose_name="Ítem")
 
+    # Coordenadas (WGS84) para ordenar las rutas de entrega
+    latitud = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True, verbose_name="Latitud")
+    longitud = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True, verbose_name="Longitud")
+
     # Relación con institución educativa (FK)
     codigo_ie = models.ForeignKey(
         InstitucionesEducativas,
@@ -13,7 +13,7 @@ from .forms import ProgramaForm
 from principal.models import PrincipalMunicipio, NivelGradoEscolar, RegistroActividad
 from facturacion.models import ListadosFocalizacion
 from facturacion.config import FOCALIZACIONES_DISPONIBLES
-from facturacion.utils import _extraer_grado_base, _mapear_grado_a_nivel_manual
+from facturacion.utils import _mapear_grado_a_nivel_manual
 
 
 @login_required
@@ -172,12 +172,17 @@ def inicializar_ciclos_menus(request):
             'cap_am': 0, 'cap_pm': 0, 'almuerzo_ju': 0, 'refuerzo': 0, 'grados': set()
         }))
 
-        for listado in listados:
-            sede_nombre = listado.sede
-            grado_base = _extraer_grado_base(listado.grado_grupos)
+        # Conteos por sede y grado base en SQL (una fila por combinación, no por estudiante)
+        conteos = listados.exclude(grado_base='').values('sede', 'grado_base').annotate(
+            cap_am=Count('id_listados', filter=ListadosFocalizacion.q_complemento_activo('CAP AM')),
+            cap_pm=Count('id_listados', filter=ListadosFocalizacion.q_complemento_activo('CAP PM')),
+            almuerzo_ju=Count('id_listados', filter=ListadosFocalizacion.q_complemento_activo('Almuerzo JU')),
+            refuerzo=Count('id_listados', filter=ListadosFocalizacion.q_complemento_activo('Refuerzo')),
+        ).order_by()
 
-            if not grado_base:
-                continue
+        for fila in conteos:
+            sede_nombre = fila['sede']
+            grado_base = fila['grado_base']
 
             # Buscar nivel escolar en el mapeo
             nivel_obj = mapeo_grado_a_nivel_obj.get(grado_base)
@@ -202,15 +207,9 @@ def inicializar_ciclos_menus(request):
             sedes_dict[sede_nombre][nivel_key]['grados'].add(grado_base)
             sedes_dict[sede_nombre][nivel_key]['nivel_obj'] = nivel_obj  # Guardar referencia al objeto
 
-            # Contar por tipo de complemento
-            if listado.complemento_alimentario_preparado_am:
-                sedes_dict[sede_nombre][nivel_key]['cap_am'] += 1
-            if listado.complemento_alimentario_preparado_pm:
-                sedes_dict[sede_nombre][nivel_key]['cap_pm'] += 1
-            if listado.almuerzo_jornada_unica:
-                sedes_dict[sede_nombre][nivel_key]['almuerzo_ju'] += 1
-            if listado.refuerzo_complemento_am_pm:
-                sedes_dict[sede_nombre][nivel_key]['refuerzo'] += 1
+            # Sumar por tipo de complemento
+            for clave in ('cap_am', 'cap_pm', 'almuerzo_ju', 'refuerzo'):
+                sedes_dict[sede_nombre][nivel_key][clave] += fila[clave]
 
         # Verificar si ya existen registros para esta combinación
         registros_existentes = PlanificacionRaciones.objects.filter(
@@ -456,20 +455,12 @@ def _obtener_datos_planificacion(municipio_obj, focalizacion, ano):
 
     for plan in planificaciones:
         # Obtener todos los grados únicos para esta sede y focalización
-        grados_listados = ListadosFocalizacion.objects.filter(
+        # Grados de la sede que pertenecen a este nivel (grados_sedes del nivel actual)
+        grados_del_nivel = set(ListadosFocalizacion.objects.filter(
             sede=plan.sede_educativa.nombre_sede_educativa,
-            focalizacion=focalizacion
-        ).values_list('grado_grupos', flat=True).distinct()
-
-        # Filtrar grados que pertenecen a este nivel
-        # Comparar con grados_sedes del nivel actual
-        grados_del_nivel = set()
-        for grado_grupo in grados_listados:
-            grado_base = _extraer_grado_base(grado_grupo)
-            if grado_base:
-                # Verificar si este grado pertenece al nivel actual
-                if grado_base == plan.nivel_escolar.grados_sedes:
-                    grados_del_nivel.add(grado_base)
+            focalizacion=focalizacion,
+            grado_base=plan.nivel_escolar.grados_sedes
+        ).exclude(grado_base='').values_list('grado_base', flat=True).distinct())
 
         sedes_dict[plan.sede_educativa.nombre_sede_educativa].append({
             'id': plan.id,
@@ -0,0 +1,307 @@
+"""
+Management command: sembrar_datos_carga
+
+Siembra un dataset sintético y reproducible para las pruebas de carga locales
+(loadtest/run_local.py). Crea programas, instituciones, sedes, listados de
+focalización, menús y registros contables, más un usuario de pruebas con
+acceso a todos los módulos.
+
+Todos los registros sembrados usan el prefijo LT para poder limpiarlos con
+--limpiar sin tocar datos reales.
+
+Uso:
+    python manage.py sembrar_datos_carga
+    python manage.py sembrar_datos_carga --listados 100000 --registros 500
+    python manage.py sembrar_datos_carga --limpiar
+"""
+
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+PREFIJO = 'LT'
+CODIGO_MUNICIPIO_LT = 99001
+
+GRADOS = ['-2', '-1', '0', '1', '2', '3', '4', '5', '6', '7', '8', '9', '10', '11']
+NOMBRES = ['ANA', 'LUIS', 'MARIA', 'JUAN', 'SOFIA', 'CARLOS', 'VALENTINA', 'ANDRES', 'CAMILA', 'JOSE']
+APELLIDOS = ['GOMEZ', 'RODRIGUEZ', 'LOPEZ', 'MARTINEZ', 'GARCIA', 'PEREZ', 'SANCHEZ', 'RAMIREZ', 'TORRES', 'DIAZ']
+
+MODALIDADES_LT = [
+    ('20501', 'COMPLEMENTO ALIMENTARIO PREPARADO AM', '20501'),
+    ('20502', 'COMPLEMENTO ALIMENTARIO PREPARADO PM', '20502'),
+    ('20503', 'ALMUERZO JORNADA UNICA', '20503'),
+]
+
+GRUPOS_USUARIO_LT = ['ADMINISTRACION', 'GERENCIA']
+
+
+class Command(BaseCommand):
+    help = 'Siembra un dataset sintético y reproducible para pruebas de carga locales.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--programas', type=int, default=2, help='Programas a crear (default: 2)')
+        parser.add_argument('--instituciones', type=int, default=20, help='Instituciones por sembrar (default: 20)')
+        parser.add_argument('--sedes-por-ie', type=int, default=5, dest='sedes_por_ie',
+                            help='Sedes por institución (default: 5)')
+        parser.add_argument('--listados', type=int, default=100_000,
+                            help='Estudiantes de focalización a crear (default: 100000)')
+        parser.add_argument('--registros', type=int, default=500,
+                            help='Registros contables a crear (default: 500)')
+        parser.add_argument('--semilla', type=int, default=2026,
+                            help='Semilla aleatoria para reproducibilidad (default: 2026)')
+        parser.add_argument('--usuario', type=str, default='loadtest', help='Usuario de pruebas (default: loadtest)')
+        parser.add_argument('--password', type=str, default='loadtest-local',
+                            help='Contraseña del usuario de pruebas (default: loadtest-local)')
+        parser.add_argument('--lote', type=int, default=5000, help='Tamaño de lote para bulk_create (default: 5000)')
+        parser.add_argument('--limpiar', action='store_true',
+                            help='Elimina los datos sembrados previamente (prefijo LT) y termina.')
+
+    def handle(self, *args, **options):
+        if options['limpiar']:
+            self._limpiar()
+            return
+
+        rng = random.Random(options['semilla'])
+        lote = options['lote']
+
+        with transaction.atomic():
+            self._limpiar()
+            usuario = self._sembrar_usuario(options['usuario'], options['password'])
+            municipio = self._sembrar_municipio()
+            programas = self._sembrar_programas(options['programas'], municipio)
+            sedes = self._sembrar_sedes(options['instituciones'], options['sedes_por_ie'], municipio)
+            self._sembrar_menus(programas)
+
+        # Los volúmenes grandes van fuera de la transacción principal, en lotes.
+        self._sembrar_listados(options['listados'], programas, sedes, rng, lote)
+        self._sembrar_registros_contables(options['registros'], usuario, rng, lote)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Dataset sembrado — Programas: {len(programas)} | Sedes: {len(sedes)} | "
+            f"Listados: {options['listados']} | Registros contables: {options['registros']}"
+        ))
+        self.stdout.write(f"Usuario de pruebas: {usuario.username} (LT_USER / LT_PASSWORD)")
+
+    # ------------------------------------------------------------------
+    # Limpieza
+    # ------------------------------------------------------------------
+
+    def _limpiar(self):
+        from contabilidad.models import RegistroContable
+        from facturacion.models import ListadosFocalizacion
+        from nutricion.models import TablaMenus
+        from planeacion.models import InstitucionesEducativas, Programa, SedesEducativas
+
+        programas = Programa.objects.filter(contrato__startswith=f'{PREFIJO}-')
+        ListadosFocalizacion.objects.filter(id_listados__startswith=f'{PREFIJO}-').delete()
+        TablaMenus.objects.filter(id_contrato__in=programas).delete()
+        RegistroContable.objects.filter(descripcion__startswith=f'[{PREFIJO}]').delete()
+        SedesEducativas.objects.filter(cod_interprise__startswith=PREFIJO).delete()
+        InstitucionesEducativas.objects.filter(codigo_ie__startswith=f'{PREFIJO}-').delete()
+        programas.delete()
+        self.stdout.write('Datos de carga previos eliminados.')
+
+    # ------------------------------------------------------------------
+    # Catálogos base
+    # ------------------------------------------------------------------
+
+    def _sembrar_usuario(self, username, password):
+        usuario, _ = User.objects.get_or_create(username=username)
+        usuario.set_password(password)
+        usuario.first_name = 'Carga'
+        usuario.last_name = 'Local'
+        usuario.save()
+        for nombre in GRUPOS_USUARIO_LT:
+            grupo, _ = Group.objects.get_or_create(name=nombre)
+            usuario.groups.add(grupo)
+        return usuario
+
+    def _sembrar_municipio(self):
+        from principal.models import PrincipalDepartamento, PrincipalMunicipio
+
+        PrincipalDepartamento.objects.get_or_create(
+            codigo_departamento='99', defaults={'nombre_departamento': 'DEPARTAMENTO CARGA'}
+        )
+        municipio = PrincipalMunicipio.objects.filter(codigo_municipio=CODIGO_MUNICIPIO_LT).first()
+        if municipio is None:
+            municipio = PrincipalMunicipio.objects.create(
+                codigo_municipio=CODIGO_MUNICIPIO_LT,
+                nombre_municipio='MUNICIPIO CARGA',
+                codigo_departamento='99',
+            )
+        return municipio
+
+    def _sembrar_programas(self, cantidad, municipio):
+        from planeacion.models import Programa, ProgramaModalidades
+        from principal.models import ModalidadesDeConsumo, TipoPrograma
+
+        tipo, _ = TipoPrograma.objects.get_or_create(
+            id_tipo_programa='PAE', defaults={'nombre': 'Programa de Alimentación Escolar'}
+        )
+        modalidades = []
+        for id_modalidad, nombre, codigo in MODALIDADES_LT:
+            modalidad, _ = ModalidadesDeConsumo.objects.get_or_create(
+                id_modalidades=id_modalidad,
+                defaults={'modalidad': nombre, 'cod_modalidad': codigo},
+            )
+            modalidades.append(modalidad)
+
+        hoy = date.today()
+        programas = []
+        for i in range(1, cantidad + 1):
+            programa = Programa.objects.create(
+                programa=f'PROGRAMA CARGA {i}',
+                tipo_programa=tipo,
+                fecha_inicial=hoy.replace(month=1, day=1),
+                fecha_final=hoy.replace(month=12, day=31),
+                estado='activo',
+                contrato=f'{PREFIJO}-{i:03d}',
+                municipio=municipio,
+            )
+            ProgramaModalidades.objects.bulk_create([
+                ProgramaModalidades(programa=programa, modalidad=m) for m in modalidades
+            ])
+            programas.append(programa)
+        return programas
+
+    def _sembrar_sedes(self, n_instituciones, sedes_por_ie, municipio):
+        from planeacion.models import InstitucionesEducativas, SedesEducativas
+
+        instituciones = InstitucionesEducativas.objects.bulk_create([
+            InstitucionesEducativas(
+                codigo_ie=f'{PREFIJO}-IE-{i:03d}',
+                nombre_institucion=f'IE CARGA {i:03d}',
+                id_municipios=municipio,
+            )
+            for i in range(1, n_instituciones + 1)
+        ])
+
+        sedes = []
+        consecutivo = 1
+        for ie in instituciones:
+            for j in range(1, sedes_por_ie + 1):
+                sedes.append(SedesEducativas(
+                    cod_interprise=f'{PREFIJO}{consecutivo:05d}',
+                    cod_dane=990010000000 + consecutivo,
+                    nombre_sede_educativa=f'SEDE CARGA {consecutivo:04d}',
+                    nombre_generico_sede=f'SEDE {j}',
+                    zona='U' if consecutivo % 4 else 'R',
+                    direccion=f'CALLE {consecutivo} # {j}-00',
+                    preparado='SI',
+                    industrializado='NO',
+                    item=consecutivo,
+                    codigo_ie=ie,
+                ))
+                consecutivo += 1
+        return SedesEducativas.objects.bulk_create(sedes)
+
+    def _sembrar_menus(self, programas):
+        from nutricion.models import TablaMenus
+        from principal.models import ModalidadesDeConsumo
+
+        modalidades = list(ModalidadesDeConsumo.objects.filter(
+            id_modalidades__in=[m[0] for m in MODALIDADES_LT]
+        ))
+        menus = []
+        for programa in programas:
+            for modalidad in modalidades:
+                for num in range(1, 21):
+                    # bulk_create no pasa por TablaMenus.save(): se calcula la semana aquí.
+                    menus.append(TablaMenus(
+                        menu=str(num),
+                        id_modalidad=modalidad,
+                        id_contrato=programa,
+                        semana=((num - 1) // 5) + 1,
+                    ))
+        TablaMenus.objects.bulk_create(menus)
+
+    # ------------------------------------------------------------------
+    # Volúmenes grandes
+    # ------------------------------------------------------------------
+
+    def _sembrar_listados(self, cantidad, programas, sedes, rng, lote):
+        from facturacion.models import ListadosFocalizacion
+
+        ano = date.today().year
+        focalizaciones = ['F1', 'F2']
+        buffer = []
+        for n in range(1, cantidad + 1):
+            sede = sedes[n % len(sedes)]
+            programa = programas[n % len(programas)]
+            grado = rng.choice(GRADOS)
+            edad = max(4, int(grado) + 6) if not grado.startswith('-') else 4
+            jornada_unica = rng.random() < 0.2
+            listado = ListadosFocalizacion(
+                id_listados=f'{PREFIJO}-{n:07d}',
+                ano=ano,
+                etc='MUNICIPIO CARGA',
+                institucion=sede.codigo_ie.nombre_institucion,
+                sede=sede.nombre_sede_educativa,
+                sede_educativa=sede,
+                tipodoc='TI',
+                doc=str(1_000_000_000 + n),
+                apellido1=rng.choice(APELLIDOS),
+                apellido2=rng.choice(APELLIDOS),
+                nombre1=rng.choice(NOMBRES),
+                nombre2=None,
+                fecha_nacimiento=f'{ano - edad}-01-01',
+                edad=edad,
+                etnia=None,
+                genero=rng.choice(['M', 'F']),
+                grado_grupos=f'{grado}-{rng.randint(1, 3):02d}',
+                complemento_alimentario_preparado_am='X' if not jornada_unica and n % 2 else None,
+                complemento_alimentario_preparado_pm='X' if not jornada_unica and not n % 2 else None,
+                almuerzo_jornada_unica='X' if jornada_unica else None,
+                refuerzo_complemento_am_pm=None,
+                focalizacion=focalizaciones[(n // len(sedes)) % len(focalizaciones)],
+                programa=programa,
+            )
+            listado.calcular_campos_grado()
+            buffer.append(listado)
+            if len(buffer) >= lote:
+                ListadosFocalizacion.objects.bulk_create(buffer)
+                buffer = []
+                self.stdout.write(f'  Listados: {n}/{cantidad}')
+        if buffer:
+            ListadosFocalizacion.objects.bulk_create(buffer)
+
+    def _sembrar_registros_contables(self, cantidad, usuario, rng, lote):
+        from contabilidad.models import Factura, RegistroContable
+        from contabilidad.services import ContabilidadService
+
+        estados = [e for e, _ in RegistroContable.ESTADO_CHOICES]
+        tipos = [t for t, _ in RegistroContable.TIPO_CHOICES]
+        hoy = date.today()
+
+        registros = RegistroContable.objects.bulk_create([
+            RegistroContable(
+                tipo=rng.choice(tipos),
+                periodo_mes=rng.randint(1, 12),
+                periodo_ano=hoy.year,
+                lider=usuario,
+                estado=rng.choice(estados),
+                descripcion=f'[{PREFIJO}] Registro de carga {i}',
+            )
+            for i in range(1, cantidad + 1)
+        ], batch_size=lote)
+
+        facturas = []
+        for registro in registros:
+            for k in range(rng.randint(1, 5)):
+                facturas.append(Factura(
+                    registro=registro,
+                    numero_factura=f'{PREFIJO}-{registro.pk}-{k + 1}',
+                    proveedor=f'PROVEEDOR CARGA {rng.randint(1, 40)}',
+                    concepto='Compra sintética para pruebas de carga',
+                    valor=Decimal(rng.randint(50_000, 5_000_000)),
+                    fecha_factura=hoy - timedelta(days=rng.randint(0, 60)),
+                    tipo_contrato=rng.choice(['', f'{PREFIJO}-001', f'{PREFIJO}-002']),
+                ))
+        Factura.objects.bulk_create(facturas, batch_size=lote)
+        for i in range(0, len(registros), lote):
+            with transaction.atomic():
+                ContabilidadService.actualizar_resumen(*registros[i:i + lote])
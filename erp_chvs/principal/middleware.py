@@ -1,30 +1,88 @@
+import json
 import time
 import logging
 
+from django.conf import settings
 from django.contrib import messages
+from django.db import connection
 from django.shortcuts import redirect
 from django.urls import resolve
 
+from principal.perf_stats import ColectorConsultas, registro_rendimiento
+
 logger = logging.getLogger('timing')
 
 
 class ResponseTimingMiddleware:
+    """
+    Mide cada request dinámico: tiempo total, consultas SQL, tiempo en BD,
+    consultas repetidas (N+1) y tamaño de respuesta.
+
+    Cada request se loguea como una línea JSON en el logger `timing` y se
+    acumula en `registro_rendimiento`, consultable en /principal/api/rendimiento/.
+    """
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.umbral_lento_ms = getattr(settings, 'PERF_UMBRAL_LENTO_MS', 1000)
+        self.umbral_duplicadas = getattr(settings, 'PERF_UMBRAL_DUPLICADAS', 5)
+        registro_rendimiento.ventana = getattr(settings, 'PERF_STATS_VENTANA', 500)
 
     def __call__(self, request):
+        path = request.path
+        # Solo medir vistas dinámicas (no estáticos)
+        if path.startswith('/static/') or path.startswith('/favicon'):
+            return self.get_response(request)
+
+        colector = ColectorConsultas()
         t0 = time.monotonic()
-        response = self.get_response(request)
+        with connection.execute_wrapper(colector):
+            response = self.get_response(request)
         ms = (time.monotonic() - t0) * 1000
 
-        # Solo loguear vistas dinámicas (no estáticos)
-        path = request.path
-        if not path.startswith('/static/') and not path.startswith('/favicon'):
-            nivel = logging.WARNING if ms > 1000 else logging.INFO
-            logger.log(nivel, f"[{ms:7.1f}ms] {request.method} {path} → {response.status_code}")
+        vista = self._nombre_vista(request)
+        bytes_respuesta = None if response.streaming else len(response.content)
+        duplicadas = colector.duplicadas(umbral=self.umbral_duplicadas)
+
+        registro_rendimiento.registrar(
+            vista,
+            ms=ms,
+            consultas=colector.total,
+            db_ms=colector.tiempo_ms,
+            duplicadas=colector.total_duplicadas,
+            bytes_respuesta=bytes_respuesta,
+            status=response.status_code,
+            sql_repetida=duplicadas[0] if duplicadas else None,
+        )
+
+        evento = {
+            'evento': 'request',
+            'metodo': request.method,
+            'path': path,
+            'vista': vista,
+            'status': response.status_code,
+            'ms': round(ms, 1),
+            'consultas': colector.total,
+            'db_ms': round(colector.tiempo_ms, 1),
+            'duplicadas': colector.total_duplicadas,
+            'bytes': bytes_respuesta,
+        }
+        if duplicadas:
+            evento['n_mas_1'] = [{'sql': sql[:200], 'veces': n} for sql, n in duplicadas[:3]]
+
+        nivel = logging.WARNING if ms > self.umbral_lento_ms or duplicadas else logging.INFO
+        logger.log(nivel, json.dumps(evento, ensure_ascii=False))
 
         return response
 
+    @staticmethod
+    def _nombre_vista(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            # Rutas no resueltas (404) se agrupan para no crecer sin límite.
+            return '<sin-ruta>'
+        return match.view_name or match._func_path
+
 
 class RoleAccessMiddleware:
     def __init__(self, get_response):
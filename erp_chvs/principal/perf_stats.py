@@ -0,0 +1,124 @@
+"""
+Instrumentación de rendimiento por request.
+
+- `ColectorConsultas`: se instala con `connection.execute_wrapper` y cuenta las
+  consultas SQL, el tiempo en BD y las sentencias repetidas (patrón N+1).
+- `RegistroRendimiento`: histograma en memoria, por nombre de URL, con las
+  últimas N muestras de cada vista. Es por proceso (cada worker de gunicorn
+  mantiene el suyo) y se pierde al reiniciar.
+"""
+
+import threading
+import time
+from collections import Counter, deque
+
+# Límites (ms) de los buckets del histograma de latencia.
+BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def _percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return 0.0
+    idx = min(len(valores_ordenados) - 1, int(round(p / 100 * (len(valores_ordenados) - 1))))
+    return valores_ordenados[idx]
+
+
+class ColectorConsultas:
+    """Wrapper de ejecución SQL que acumula métricas de un request."""
+
+    def __init__(self):
+        self.total = 0
+        self.tiempo_ms = 0.0
+        self.sentencias = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        t0 = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo_ms += (time.monotonic() - t0) * 1000
+            self.total += 1
+            # El SQL de Django viene parametrizado (%s): misma sentencia con distintos
+            # parámetros cuenta como repetida.
+            self.sentencias[sql] += 1
+
+    def duplicadas(self, umbral=2):
+        """Sentencias ejecutadas `umbral` o más veces, de la más repetida a la menos."""
+        return [(sql, n) for sql, n in self.sentencias.most_common() if n >= umbral]
+
+    @property
+    def total_duplicadas(self):
+        return sum(n - 1 for n in self.sentencias.values() if n > 1)
+
+
+class RegistroRendimiento:
+    """Ventana deslizante de muestras por vista, segura entre hilos."""
+
+    def __init__(self, ventana=500):
+        self.ventana = ventana
+        self._muestras = {}
+        self._peor_sql = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, vista, ms, consultas, db_ms, duplicadas, bytes_respuesta, status, sql_repetida=None):
+        muestra = (ms, consultas, db_ms, duplicadas, bytes_respuesta or 0, status)
+        with self._lock:
+            cola = self._muestras.get(vista)
+            if cola is None:
+                cola = self._muestras[vista] = deque(maxlen=self.ventana)
+            cola.append(muestra)
+            if sql_repetida:
+                sql, veces = sql_repetida
+                anterior = self._peor_sql.get(vista)
+                if anterior is None or veces >= anterior[1]:
+                    self._peor_sql[vista] = (sql[:500], veces)
+
+    def limpiar(self):
+        with self._lock:
+            self._muestras.clear()
+            self._peor_sql.clear()
+
+    def _resumen_vista(self, vista, muestras):
+        latencias = sorted(m[0] for m in muestras)
+        n = len(muestras)
+        histograma = {f'<={limite}ms': 0 for limite in BUCKETS_MS}
+        histograma[f'>{BUCKETS_MS[-1]}ms'] = 0
+        for ms in latencias:
+            for limite in BUCKETS_MS:
+                if ms <= limite:
+                    histograma[f'<={limite}ms'] += 1
+                    break
+            else:
+                histograma[f'>{BUCKETS_MS[-1]}ms'] += 1
+
+        peor_sql = self._peor_sql.get(vista)
+        return {
+            'vista': vista,
+            'muestras': n,
+            'p50_ms': round(_percentil(latencias, 50), 1),
+            'p95_ms': round(_percentil(latencias, 95), 1),
+            'p99_ms': round(_percentil(latencias, 99), 1),
+            'max_ms': round(latencias[-1], 1),
+            'consultas_prom': round(sum(m[1] for m in muestras) / n, 1),
+            'db_ms_prom': round(sum(m[2] for m in muestras) / n, 1),
+            'duplicadas_prom': round(sum(m[3] for m in muestras) / n, 1),
+            'bytes_prom': int(sum(m[4] for m in muestras) / n),
+            'errores_5xx': sum(1 for m in muestras if m[5] >= 500),
+            'histograma': histograma,
+            'sql_mas_repetida': {'sql': peor_sql[0], 'veces': peor_sql[1]} if peor_sql else None,
+        }
+
+    def resumen(self):
+        with self._lock:
+            copia = {vista: list(cola) for vista, cola in self._muestras.items()}
+        return [self._resumen_vista(vista, muestras) for vista, muestras in copia.items() if muestras]
+
+    def vistas_lentas(self, limite=20):
+        return sorted(self.resumen(), key=lambda r: r['p95_ms'], reverse=True)[:limite]
+
+    def ofensores_n_mas_1(self, limite=20):
+        candidatos = [r for r in self.resumen() if r['duplicadas_prom'] > 0]
+        return sorted(candidatos, key=lambda r: r['duplicadas_prom'], reverse=True)[:limite]
+
+
+registro_rendimiento = RegistroRendimiento()
@@ -1,11 +1,15 @@
+import json
+from io import StringIO
 from unittest.mock import patch
 
 from django.contrib.auth.models import Group, User
+from django.core.management import call_command
 from django.http import HttpResponse
 from django.test import RequestFactory, TestCase
-from django.urls import reverse
+from django.urls import resolve, reverse
 
-from principal.middleware import RoleAccessMiddleware
+from principal.middleware import ResponseTimingMiddleware, RoleAccessMiddleware
+from principal.perf_stats import registro_rendimiento
 from principal.templatetags.group_tags import has_group
 
 
@@ -86,3 +90,98 @@ class PrincipalApiAuthTests(TestCase):
     def test_api_nivel_grado_detail_requiere_login(self):
         response = self.client.get(reverse("principal:api_nivel_grado_detail", args=["NOEXISTE"]))
         self.assertEqual(response.status_code, 302)
+
+
+class SembrarDatosCargaCommandTests(TestCase):
+    def _sembrar(self, **kwargs):
+        opciones = dict(programas=1, instituciones=2, sedes_por_ie=2, listados=40, registros=5, stdout=StringIO())
+        opciones.update(kwargs)
+        call_command("sembrar_datos_carga", **opciones)
+
+    def test_siembra_volumenes_solicitados(self):
+        from contabilidad.models import RegistroContable
+        from facturacion.models import ListadosFocalizacion
+        from nutricion.models import TablaMenus
+        from planeacion.models import SedesEducativas
+
+        self._sembrar()
+
+        self.assertEqual(SedesEducativas.objects.filter(cod_interprise__startswith="LT").count(), 4)
+        self.assertEqual(ListadosFocalizacion.objects.filter(id_listados__startswith="LT-").count(), 40)
+        self.assertEqual(RegistroContable.objects.filter(descripcion__startswith="[LT]").count(), 5)
+        self.assertEqual(TablaMenus.objects.filter(id_contrato__contrato="LT-001").count(), 60)
+        usuario = User.objects.get(username="loadtest")
+        self.assertTrue(usuario.check_password("loadtest-local"))
+        self.assertTrue(usuario.groups.filter(name="ADMINISTRACION").exists())
+
+    def test_resembrar_es_reproducible(self):
+        from facturacion.models import ListadosFocalizacion
+
+        self._sembrar()
+        primera = list(ListadosFocalizacion.objects.order_by("id_listados").values_list("grado_grupos", "sede"))
+        self._sembrar()
+        segunda = list(ListadosFocalizacion.objects.order_by("id_listados").values_list("grado_grupos", "sede"))
+
+        self.assertEqual(primera, segunda)
+
+
+class ResponseTimingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        registro_rendimiento.limpiar()
+        self.addCleanup(registro_rendimiento.limpiar)
+
+    def _vista_con_n_mas_1(self, request):
+        request.resolver_match = resolve("/principal/")
+        for pk in range(6):
+            User.objects.filter(pk=pk).exists()
+        return HttpResponse("x" * 128)
+
+    def test_registra_consultas_duplicadas_y_tamano(self):
+        middleware = ResponseTimingMiddleware(self._vista_con_n_mas_1)
+
+        with self.assertLogs("timing", level="INFO") as logs:
+            middleware(self.factory.get("/principal/"))
+
+        evento = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(evento["vista"], "principal:principal_index")
+        self.assertEqual(evento["consultas"], 6)
+        self.assertEqual(evento["duplicadas"], 5)
+        self.assertEqual(evento["bytes"], 128)
+        self.assertEqual(evento["n_mas_1"][0]["veces"], 6)
+
+        resumen = registro_rendimiento.ofensores_n_mas_1()
+        self.assertEqual(resumen[0]["vista"], "principal:principal_index")
+        self.assertEqual(resumen[0]["consultas_prom"], 6)
+
+    def test_ignora_estaticos(self):
+        middleware = ResponseTimingMiddleware(lambda request: HttpResponse("ok"))
+
+        middleware(self.factory.get("/static/app.css"))
+
+        self.assertEqual(registro_rendimiento.resumen(), [])
+
+
+class ApiRendimientoTests(TestCase):
+    def setUp(self):
+        registro_rendimiento.limpiar()
+
+    def test_requiere_superusuario(self):
+        user = User.objects.create_user(username="normal", password="test123")
+        user.groups.add(Group.objects.create(name="ADMINISTRACION"))
+        self.client.force_login(user)
+
+        response = self.client.get(reverse("principal:api_rendimiento"), secure=True)
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_superusuario_ve_vistas_lentas(self):
+        admin = User.objects.create_superuser(username="root", password="test123")
+        self.client.force_login(admin)
+
+        self.client.get(reverse("principal:principal_index"), secure=True)
+        response = self.client.get(reverse("principal:api_rendimiento"), secure=True)
+
+        self.assertEqual(response.status_code, 200)
+        vistas = [v["vista"] for v in response.json()["vistas_lentas"]]
+        self.assertIn("principal:principal_index", vistas)
@@ -47,4 +47,7 @@ urlpatterns = [
     # Modalidades por Programa
     path('programa-modalidades/', views.programa_modalidades, name='programa_modalidades'),
     path('api/programa-modalidades/guardar/', views.api_guardar_programa_modalidades, name='api_guardar_programa_modalidades'),
+
+    # Instrumentación de rendimiento (solo superusuarios)
+    path('api/rendimiento/', views.api_rendimiento, name='api_rendimiento'),
 ]
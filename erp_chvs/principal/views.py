@@ -11,6 +11,7 @@ from .models import PrincipalDepartamento, PrincipalMunicipio, TipoDocumento, Ti
 from planeacion.models import InstitucionesEducativas, SedesEducativas, Programa, ProgramaModalidades
 from Api.models import SiesaProyecto, SiesaCentroCosto
 from django.db.models import Count
+from .perf_stats import registro_rendimiento
 
 def home(request):
     # Si el usuario ya está autenticado, redirigirlo al dashboard
@@ -968,3 +969,33 @@ def api_guardar_programa_modalidades(request):
         return JsonResponse({'success': False, 'error': 'Modalidad no encontrada'}, status=404)
     except Exception as e:
         return JsonResponse({'success': False, 'error': f'Error al guardar: {str(e)}'}, status=500)
+
+
+@login_required
+def api_rendimiento(request):
+    """
+    GET  — Vistas más lentas (p95) y ofensores N+1 del proceso actual.
+    POST — Reinicia las estadísticas acumuladas.
+    Solo superusuarios.
+    """
+    if not request.user.is_superuser:
+        return JsonResponse({'success': False, 'error': 'Solo administradores'}, status=403)
+
+    if request.method == 'POST':
+        registro_rendimiento.limpiar()
+        return JsonResponse({'success': True})
+
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
+
+    try:
+        limite = max(1, min(int(request.GET.get('limite', 20)), 200))
+    except ValueError:
+        limite = 20
+
+    return JsonResponse({
+        'success': True,
+        'ventana': registro_rendimiento.ventana,
+        'vistas_lentas': registro_rendimiento.vistas_lentas(limite),
+        'n_mas_1': registro_rendimiento.ofensores_n_mas_1(limite),
+    })
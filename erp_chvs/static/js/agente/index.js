@@ -117,36 +117,49 @@
         if (msg) { errorText.textContent = msg; errorBox.classList.add('active'); }
     }
 
-    // ── Poll live generation ───────────────────────────────────────────────
+    // ── Wait for live generation (long-poll) ───────────────────────────────
 
-    function _pollGeneracion(id, cycleTimer) {
-        let attempts = 0;
-        const poll = setInterval(function () {
-            attempts++;
-            fetch('/agente/api/generar/' + id + '/estado/')
+    function _esperarGeneracion(id, cycleTimer) {
+        const limite = Date.now() + 180000;
+        let firma = '';
+
+        function _terminar(msg) {
+            clearInterval(cycleTimer);
+            _restoreForm(msg);
+        }
+
+        function _esperar() {
+            if (Date.now() > limite) {
+                _terminar('La generación tardó demasiado. Intenta de nuevo.');
+                return;
+            }
+            // El servidor responde cuando el estado cambia (o a los ~25s sin cambios)
+            fetch('/agente/api/generar/' + id + '/esperar/?firma=' + encodeURIComponent(firma))
                 .then(function (r) { return r.json(); })
                 .then(function (d) {
+                    firma = d.firma;
                     if (d.estado === 'pendiente_revision') {
-                        clearInterval(poll); clearInterval(cycleTimer);
+                        clearInterval(cycleTimer);
                         _applyMsg(['¡Borrador listo!', 'Abriendo editor...']);
                         setTimeout(function () {
                             window.location.href = '/agente/borrador/' + id + '/';
                         }, 600);
                     } else if (d.estado === 'error') {
-                        clearInterval(poll); clearInterval(cycleTimer);
-                        _restoreForm(d.error || 'El servidor no pudo generar el borrador.');
-                    } else if (attempts >= 60) {
-                        clearInterval(poll); clearInterval(cycleTimer);
-                        _restoreForm('La generación tardó demasiado. Intenta de nuevo.');
+                        _terminar(d.error || 'El servidor no pudo generar el borrador.');
+                    } else {
+                        _esperar();
                     }
                 })
                 .catch(function () {
-                    if (attempts >= 60) {
-                        clearInterval(poll); clearInterval(cycleTimer);
-                        _restoreForm('No se pudo contactar al servidor.');
+                    if (Date.now() > limite) {
+                        _terminar('No se pudo contactar al servidor.');
+                    } else {
+                        setTimeout(_esperar, 3000);
                     }
                 });
-        }, 3000);
+        }
+
+        _esperar();
     }
 
     // ── Main click ────────────────────────────────────────────────────────
@@ -186,7 +199,7 @@
                 }, 1500);
             } else {
                 const liveTimer = _startCycle(liveSteps, 3500);
-                _pollGeneracion(data.generacion_id, liveTimer);
+                _esperarGeneracion(data.generacion_id, liveTimer);
             }
         })
         .catch(function (err) {
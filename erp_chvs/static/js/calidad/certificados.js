@@ -29,6 +29,12 @@ class CertificadosManager {
         document.getElementById('imprimirCarnetesBtn')
             .addEventListener('click', () => this.imprimirCarnets());
 
+        document.getElementById('descargarLotePdfBtn')
+            .addEventListener('click', () => this.descargarLote('pdf'));
+
+        document.getElementById('descargarLoteZipBtn')
+            .addEventListener('click', () => this.descargarLote('zip'));
+
         this.loadCertificados();
     }
 
@@ -185,8 +191,38 @@ class CertificadosManager {
             this.showAlert('No hay certificados generados para imprimir.', 'warning');
             return;
         }
-        const pks = this._loteExitososPks.join(',');
-        window.open(`/calidad/certificados/pdf-carnets/?pks=${pks}`, '_blank');
+        this.abrirLote('/calidad/certificados/pdf-carnets/', {});
+    }
+
+    descargarLote(formato) {
+        if (!this._loteExitososPks || !this._loteExitososPks.length) {
+            this.showAlert('No hay certificados generados para descargar.', 'warning');
+            return;
+        }
+        this.abrirLote('/calidad/certificados/pdf-lote/', { formato });
+    }
+
+    // POST en una pestaña nueva: lotes grandes de PKs no caben en la URL
+    abrirLote(url, extras) {
+        const form = document.createElement('form');
+        form.method = 'POST';
+        form.action = url;
+        form.target = '_blank';
+        const campos = {
+            csrfmiddlewaretoken: this.getCookie('csrftoken'),
+            pks: this._loteExitososPks.join(','),
+            ...extras,
+        };
+        for (const [name, value] of Object.entries(campos)) {
+            const input = document.createElement('input');
+            input.type = 'hidden';
+            input.name = name;
+            input.value = value;
+            form.appendChild(input);
+        }
+        document.body.appendChild(form);
+        form.submit();
+        form.remove();
     }
 
     mostrarResultadosLote(data) {
@@ -197,6 +233,9 @@ class CertificadosManager {
 
         const btnCarnets = document.getElementById('imprimirCarnetesBtn');
         btnCarnets.style.display = this._loteExitososPks.length ? 'inline-flex' : 'none';
+        for (const id of ['descargarLotePdfBtn', 'descargarLoteZipBtn']) {
+            document.getElementById(id).style.display = btnCarnets.style.display;
+        }
 
         const nuevos   = data.exitosos - (data.ya_existian || 0);
         const existian = data.ya_existian || 0;
@@ -233,6 +233,21 @@ document.addEventListener('DOMContentLoaded', function () {
 
     let configuracionDias = [];
 
+    // Matriz sede × complemento × nivel de todo el programa, por "programa|focalización"
+    const matricesConteo = {};
+
+    async function obtenerMatrizConteo(programaId, focalizacion) {
+        const clave = `${programaId}|${focalizacion}`;
+        if (!matricesConteo[clave]) {
+            const url      = `/facturacion/api/conteo-estudiantes-por-nivel/?programa_id=${programaId}&focalizacion=${encodeURIComponent(focalizacion)}`;
+            const response = await fetch(url);
+            const data     = await response.json();
+            if (!data.success) throw new Error(data.error);
+            matricesConteo[clave] = data.sedes;
+        }
+        return matricesConteo[clave];
+    }
+
     const predPrograma        = document.getElementById('pred-programa');
     const predSede            = document.getElementById('pred-sede');
     const predFocalizacion    = document.getElementById('pred-focalizacion');
@@ -331,37 +346,32 @@ document.addEventListener('DOMContentLoaded', function () {
             this.innerHTML = '<span class="spinner-border spinner-border-sm"></span> Cargando...';
 
             try {
-                const url      = `/facturacion/api/conteo-estudiantes-por-nivel/?programa_id=${programaId}&sede_nombre=${encodeURIComponent(sedeNombre)}&focalizacion=${focalizacion}&complemento=${encodeURIComponent(complemento)}`;
-                const response = await fetch(url);
-                const data     = await response.json();
-
-                if (data.success) {
-                    conteoEstudiantes = {
-                        total:        data.total,
-                        preescolar:   data.por_nivel.preescolar,
-                        primaria_1_3: data.por_nivel.primaria_1_3,
-                        primaria_4_5: data.por_nivel.primaria_4_5,
-                        secundaria:   data.por_nivel.secundaria,
-                        media:        data.por_nivel.media
-                    };
-
-                    document.getElementById('count-preescolar').textContent   = conteoEstudiantes.preescolar;
-                    document.getElementById('count-primaria-1-3').textContent  = conteoEstudiantes.primaria_1_3;
-                    document.getElementById('count-primaria-4-5').textContent  = conteoEstudiantes.primaria_4_5;
-                    document.getElementById('count-secundaria').textContent    = conteoEstudiantes.secundaria;
-                    document.getElementById('count-media').textContent         = conteoEstudiantes.media;
-                    document.getElementById('count-total').textContent         = conteoEstudiantes.total;
-
-                    document.getElementById('info-estudiantes-container').style.display = 'block';
-                    configuracionDias = [];
-                    actualizarTablaDias();
-                    actualizarTotales();
-                } else {
-                    alert('Error: ' + data.error);
-                }
+                const matriz = await obtenerMatrizConteo(programaId, focalizacion);
+                const conteo = (matriz[sedeNombre] || {})[complemento] || { total: 0, por_nivel: {} };
+
+                conteoEstudiantes = {
+                    total:        conteo.total,
+                    preescolar:   conteo.por_nivel.preescolar   || 0,
+                    primaria_1_3: conteo.por_nivel.primaria_1_3 || 0,
+                    primaria_4_5: conteo.por_nivel.primaria_4_5 || 0,
+                    secundaria:   conteo.por_nivel.secundaria   || 0,
+                    media:        conteo.por_nivel.media        || 0
+                };
+
+                document.getElementById('count-preescolar').textContent   = conteoEstudiantes.preescolar;
+                document.getElementById('count-primaria-1-3').textContent  = conteoEstudiantes.primaria_1_3;
+                document.getElementById('count-primaria-4-5').textContent  = conteoEstudiantes.primaria_4_5;
+                document.getElementById('count-secundaria').textContent    = conteoEstudiantes.secundaria;
+                document.getElementById('count-media').textContent         = conteoEstudiantes.media;
+                document.getElementById('count-total').textContent         = conteoEstudiantes.total;
+
+                document.getElementById('info-estudiantes-container').style.display = 'block';
+                configuracionDias = [];
+                actualizarTablaDias();
+                actualizarTotales();
             } catch (error) {
                 console.error('Error:', error);
-                alert('Error al cargar estudiantes');
+                alert('Error al cargar estudiantes: ' + error.message);
             } finally {
                 this.disabled  = false;
                 this.innerHTML = originalText;
@@ -605,44 +605,22 @@ class AnalisisNutricionalManager {
                 btnGuardar.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Guardando...';
             }
 
-            // Guardar cada nivel por separado
+            // Todos los niveles en una sola petición (el servidor los guarda en bloque)
             const niveles = this.recopilarDatosParaGuardar();
-            let guardadosExitosos = 0;
-            let errores = [];
-
-            for (const nivel of niveles) {
-                try {
-                    console.log('Enviando datos para nivel:', nivel.id_nivel_escolar, nivel);
-                    
-                    const response = await fetch('/nutricion/api/guardar-analisis-nutricional/', {
-                        method: 'POST',
-                        headers: {
-                            'Content-Type': 'application/json',
-                            'X-CSRFToken': getCookie('csrftoken')
-                        },
-                        body: JSON.stringify(nivel)
-                    });
-
-                    const resultado = await response.json();
-
-                    if (resultado.success) {
-                        guardadosExitosos++;
-                    } else {
-                        errores.push(`${nivel.id_nivel_escolar}: ${resultado.error}`);
-                    }
-                } catch (error) {
-                    errores.push(`${nivel.id_nivel_escolar}: ${error.message}`);
-                }
-            }
+            const response = await fetch('/nutricion/api/guardar-analisis-nutricional/', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': getCookie('csrftoken')
+                },
+                body: JSON.stringify({ id_menu: this.menuActual.id, niveles: niveles })
+            });
 
-            // Mostrar resultado
-            if (guardadosExitosos === niveles.length) {
-                alert(`✅ Análisis nutricional guardado exitosamente (${guardadosExitosos} niveles)`);
-            } else if (guardadosExitosos > 0) {
-                alert(`⚠️ Guardado parcial: ${guardadosExitosos}/${niveles.length} niveles guardados\nErrores: ${errores.join(', ')}`);
-            } else {
-                throw new Error('No se pudo guardar ningún nivel: ' + errores.join(', '));
+            const resultado = await response.json();
+            if (!resultado.success) {
+                throw new Error(resultado.error || 'Error desconocido');
             }
+            alert(`✅ Análisis nutricional guardado exitosamente (${resultado.niveles.length} niveles)`);
 
         } catch (error) {
             console.error('Error al guardar análisis:', error);
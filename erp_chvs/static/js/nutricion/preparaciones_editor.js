@@ -9,12 +9,14 @@
     if (!root) return;
 
     const menuId = root.getAttribute('data-menu-id');
+    const urlCatalogoComponentes = root.dataset.urlComponentes;
+    const urlBuscarIngredientes = root.dataset.urlBuscarIngredientes;
 
-    // Cargar datos desde el template
+    // Cargar datos desde el template (solo los del menú; los catálogos
+    // compartidos se piden aparte y el navegador los cachea por versión)
     let nivelesData = JSON.parse(document.getElementById('niveles-data')?.textContent || '[]');
-    const ingredientesCatalogo = JSON.parse(document.getElementById('ingredientes-catalogo')?.textContent || '[]');
     const preparacionesCatalogo = JSON.parse(document.getElementById('preparaciones-catalogo')?.textContent || '[]');
-    const componentesCatalogo = JSON.parse(document.getElementById('componentes-catalogo')?.textContent || '[]');
+    let componentesCatalogo = [];
     const gruposCatalogo = JSON.parse(document.getElementById('grupos-catalogo')?.textContent || '[]');
     const componentesPorGrupo = JSON.parse(document.getElementById('componentes-por-grupo')?.textContent || '{}');
     let copiaPreparacionEnCurso = false;
@@ -23,15 +25,27 @@
     console.log('[PrepEditor] Catálogos cargados:', {
         grupos: gruposCatalogo.length,
         componentesPorGrupo: Object.keys(componentesPorGrupo).length,
-        ingredientes: ingredientesCatalogo.length,
         preparaciones: preparacionesCatalogo.length
     });
 
-    // Crear mapa de ingredientes para cálculos nutricionales
-    const ingredientesMap = new Map();
-    ingredientesCatalogo.forEach(ing => {
-        ingredientesMap.set(String(ing.codigo), ing);
-    });
+    async function cargarCatalogoComponentes() {
+        if (!urlCatalogoComponentes) return;
+        try {
+            const resp = await fetch(urlCatalogoComponentes, { credentials: 'same-origin' });
+            if (resp.ok) componentesCatalogo = await resp.json();
+        } catch (err) {
+            console.error('[PrepEditor] No se pudo cargar el catálogo de componentes:', err);
+        }
+    }
+
+    async function buscarIngredientes(termino) {
+        const resp = await fetch(
+            `${urlBuscarIngredientes}?q=${encodeURIComponent(termino)}`,
+            { headers: { 'X-Requested-With': 'XMLHttpRequest' } }
+        );
+        const data = await resp.json();
+        return data.ingredientes || [];
+    }
 
     // ========================================
     // UTILIDADES
@@ -1084,10 +1098,6 @@
             `<option value="${prep.id_preparacion}">${escaparHtml(prep.preparacion)}</option>`
         )).join('');
 
-        const opcionesIngredientes = ingredientesCatalogo.map((ing) => (
-            `<option value="${escaparHtml(ing.codigo)}">${escaparHtml(ing.codigo)} - ${escaparHtml(ing.nombre_del_alimento)}</option>`
-        )).join('');
-
         const opcionesGrupos = gruposCatalogo.map((g) => (
             `<option value="${g.id}">${escaparHtml(g.nombre)}</option>`
         )).join('');
@@ -1292,16 +1302,15 @@
                         <div class="input-search-wrapper">
                             <i class="bi bi-search input-search-icon"></i>
                             <input id="filtroIngrediente" class="modal-input modal-input-search"
-                                   placeholder="Filtrar por nombre o código..."
+                                   placeholder="Buscar por nombre o código..."
                                    autocomplete="off" />
                         </div>
                         <select id="agregarIngredienteId" class="modal-select modal-select-multirow" size="5">
                             <option value="">— seleccione —</option>
-                            ${opcionesIngredientes}
                         </select>
                         <small class="modal-help-text" id="contadorIngredientes">
-                            <i class="bi bi-list-ul"></i>
-                            ${ingredientesCatalogo.length} ingredientes disponibles
+                            <i class="bi bi-search"></i>
+                            Escribe al menos 2 caracteres para buscar
                         </small>
                         <button type="button" id="btnAnadirALista" class="btn-agregar-a-lista">
                             <i class="bi bi-plus-circle"></i> Añadir a la lista
@@ -1367,32 +1376,47 @@
                 modo.addEventListener('change', actualizarVistaModo);
                 actualizarVistaModo();
 
-                // Filtro de ingredientes en tiempo real
-                filtroIng.addEventListener('input', () => {
-                    const termino = filtroIng.value.toLowerCase().trim();
-                    const filtrados = termino
-                        ? ingredientesCatalogo.filter(ing =>
-                            ing.nombre_del_alimento.toLowerCase().includes(termino) ||
-                            String(ing.codigo).toLowerCase().includes(termino)
-                          )
-                        : ingredientesCatalogo;
+                // Búsqueda de ingredientes en el servidor (typeahead con debounce)
+                const ingredientesVistos = new Map();
+                let debounceIngredientes = null;
+                let ultimaBusqueda = '';
+                const mostrarIngredientes = (termino, encontrados) => {
                     const valorActual = selectIng.value;
                     selectIng.innerHTML = '<option value="">— seleccione —</option>';
-                    filtrados.forEach(ing => {
+                    encontrados.forEach(ing => {
+                        ingredientesVistos.set(String(ing.codigo), ing);
                         const opt = document.createElement('option');
                         opt.value = ing.codigo;
                         opt.textContent = `${ing.codigo} - ${ing.nombre_del_alimento}`;
                         selectIng.appendChild(opt);
                     });
-                    if (valorActual && filtrados.some(ing => String(ing.codigo) === String(valorActual))) {
+                    if (valorActual && encontrados.some(ing => String(ing.codigo) === String(valorActual))) {
                         selectIng.value = valorActual;
                     }
                     if (contador) {
-                        contador.innerHTML = termino
-                            ? `<i class="bi bi-funnel-fill"></i> ${filtrados.length} de ${ingredientesCatalogo.length} ingredientes`
-                            : `<i class="bi bi-list-ul"></i> ${ingredientesCatalogo.length} ingredientes disponibles`;
+                        contador.innerHTML = termino.length >= 2
+                            ? `<i class="bi bi-funnel-fill"></i> ${encontrados.length} ingredientes encontrados`
+                            : '<i class="bi bi-search"></i> Escribe al menos 2 caracteres para buscar';
                     }
-                    if (filtrados.length === 1) selectIng.value = filtrados[0].codigo;
+                    if (encontrados.length === 1) selectIng.value = encontrados[0].codigo;
+                };
+                filtroIng.addEventListener('input', () => {
+                    const termino = filtroIng.value.trim();
+                    ultimaBusqueda = termino;
+                    clearTimeout(debounceIngredientes);
+                    if (termino.length < 2) {
+                        mostrarIngredientes(termino, []);
+                        return;
+                    }
+                    debounceIngredientes = setTimeout(async () => {
+                        try {
+                            const encontrados = await buscarIngredientes(termino);
+                            // Descarta respuestas de búsquedas ya reemplazadas
+                            if (termino === ultimaBusqueda) mostrarIngredientes(termino, encontrados);
+                        } catch {
+                            if (contador) contador.innerHTML = '<span class="text-danger">Error al buscar. Intenta de nuevo.</span>';
+                        }
+                    }, 250);
                 });
 
                 // Añadir ingrediente a la lista
@@ -1402,7 +1426,7 @@
                     if (ingSeleccionados.some(i => String(i.codigo) === String(codigo))) {
                         showNotification('Ese ingrediente ya está en la lista', 'info'); return;
                     }
-                    const ing = ingredientesCatalogo.find(i => String(i.codigo) === String(codigo));
+                    const ing = ingredientesVistos.get(String(codigo));
                     if (ing) {
                         ingSeleccionados.push({ codigo: ing.codigo, nombre: ing.nombre_del_alimento });
                         renderListaIng();
@@ -1628,7 +1652,7 @@
     // INICIALIZACIÓN
     // ========================================
 
-    function inicializar() {
+    async function inicializar() {
         document.querySelectorAll('.input-peso').forEach(input => {
             const row = input.closest('tr');
             if (row) {
@@ -1637,6 +1661,7 @@
             }
         });
 
+        await cargarCatalogoComponentes();
         inicializarSelectsGrupoComponente();
 
         if (typeof bootstrap !== 'undefined' && bootstrap.Tooltip) {